@@ -9,6 +9,10 @@ class Config:
     TESTING = False
     DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///:memory:")
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "openai_api_key")
+    # A comma-separated list of keys, e.g. of different organisations, across which OpenAI requests are balanced
+    OPENAI_API_KEYS = os.getenv("OPENAI_API_KEYS", "")
+    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "anthropic_api_key")
+    MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "mistral_api_key")
     QUALTRICS_API_KEY = os.getenv("QUALTRICS_API_KEY", "your_qualtrics_api_key")
     OTREE_API_KEY = os.getenv("OTREE_API_KEY", "your_otree_api_key")
 
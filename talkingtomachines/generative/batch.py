@@ -0,0 +1,234 @@
+import io
+import json
+import time
+from typing import Any, List, Optional, Union
+from talkingtomachines.generative.providers import normalize_usage
+from talkingtomachines.generative.resilience import (
+    LLMClientError,
+    LLMError,
+    LLMRateLimitError,
+    LLMServerError,
+)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = ["completed", "failed", "expired", "cancelled"]
+
+
+def build_batch_file(model_info: str, requests: dict[str, List[dict]]) -> bytes:
+    """Serialises chat completion requests into the JSONL format expected by the batch endpoint.
+
+    Args:
+        model_info (str): Information about the model.
+        requests (dict[str, List[dict]]): A dictionary mapping custom IDs to the message history of each request.
+
+    Returns:
+        bytes: The JSONL batch file.
+    """
+    lines = []
+    for custom_id, message_history in requests.items():
+        lines.append(
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {"model": model_info, "messages": message_history},
+                }
+            )
+        )
+
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def parse_batch_output(
+    output: str,
+    model_info: Optional[str] = None,
+    usage: Optional[dict[str, dict[str, int]]] = None,
+) -> dict[str, Union[str, LLMError]]:
+    """Parses the JSONL output or error file of a batch into a response or a typed error per custom ID.
+
+    Args:
+        output (str): The content of the output or error file.
+        model_info (Optional[str], optional): Information about the model. Defaults to None.
+        usage (Optional[dict[str, dict[str, int]]], optional): A dictionary to which the token usage of each successful request
+            is added, keyed by custom ID. Defaults to None.
+
+    Returns:
+        dict[str, Union[str, LLMError]]: A dictionary mapping custom IDs to the response, or to the error of a failed request.
+    """
+    results = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+
+        result = json.loads(line)
+        response = result.get("response") or {}
+        status_code = response.get("status_code")
+        if status_code == 200:
+            body = response.get("body") or {}
+            results[result["custom_id"]] = (
+                body["choices"][0]["message"]["content"] or ""
+            )
+            request_usage = normalize_usage(body.get("usage"))
+            if usage is not None and request_usage is not None:
+                usage[result["custom_id"]] = request_usage
+            continue
+
+        error = result.get("error") or (response.get("body") or {}).get("error") or {}
+        message = f"Batch request failed with status {status_code}: {error.get('message', error)}"
+        if status_code == 429:
+            error_class = LLMRateLimitError
+        elif status_code is None or status_code >= 500:
+            error_class = LLMServerError
+        else:
+            error_class = LLMClientError
+        results[result["custom_id"]] = error_class(message, model_info=model_info)
+
+    return results
+
+
+class BatchClient:
+    """Submits chat completion requests through the OpenAI Batch API and collects their results.
+
+    Args:
+        client (Optional[Any], optional): An OpenAI client, e.g. one pointed at a local stand-in batch server.
+            Defaults to the client used by query_llm.
+        poll_interval (float, optional): The number of seconds between status checks of a batch. Defaults to 30.
+        completion_window (str, optional): The time frame within which the batch should be processed. Defaults to "24h".
+        max_attempts (int, optional): The maximum number of batches in which a request is submitted before its
+            retryable failure is returned. Defaults to 3.
+
+    Raises:
+        ValueError: If the provided poll_interval is negative or max_attempts is less than 1.
+    """
+
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        poll_interval: float = 30,
+        completion_window: str = "24h",
+        max_attempts: int = 3,
+    ):
+        if poll_interval < 0:
+            raise ValueError(
+                f"Invalid value for poll_interval: {poll_interval}. poll_interval should be a non-negative number of seconds."
+            )
+        if max_attempts < 1:
+            raise ValueError(
+                f"Invalid value for max_attempts: {max_attempts}. max_attempts should be an integer that is equal to or greater than 1."
+            )
+
+        if client is None:
+            from talkingtomachines.generative.llm import openai_client
+
+            client = openai_client
+
+        self.client = client
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_attempts = max_attempts
+
+    def submit(self, model_info: str, requests: dict[str, List[dict]]) -> str:
+        """Upload the requests and create a batch.
+
+        Args:
+            model_info (str): Information about the model.
+            requests (dict[str, List[dict]]): A dictionary mapping custom IDs to the message history of each request.
+
+        Returns:
+            str: The ID of the created batch.
+        """
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", io.BytesIO(build_batch_file(model_info, requests))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def wait(self, batch_id: str) -> Any:
+        """Poll a batch until it reaches a terminal status.
+
+        Args:
+            batch_id (str): The ID of the batch.
+
+        Returns:
+            Any: The batch in its terminal status.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch_id)
+
+        return batch
+
+    def collect(
+        self,
+        batch: Any,
+        model_info: Optional[str] = None,
+        usage: Optional[dict[str, dict[str, int]]] = None,
+    ) -> dict[str, Union[str, LLMError]]:
+        """Download and parse the output and error files of a batch.
+
+        Args:
+            batch (Any): The batch in its terminal status.
+            model_info (Optional[str], optional): Information about the model. Defaults to None.
+            usage (Optional[dict[str, dict[str, int]]], optional): A dictionary to which the token usage of each successful
+                request is added, keyed by custom ID. Defaults to None.
+
+        Returns:
+            dict[str, Union[str, LLMError]]: A dictionary mapping custom IDs to the response, or to the error of a failed request.
+        """
+        results = {}
+        for file_id in [batch.error_file_id, batch.output_file_id]:
+            if file_id:
+                output = self.client.files.content(file_id).text
+                results.update(parse_batch_output(output, model_info, usage))
+
+        return results
+
+    def run(
+        self,
+        model_info: str,
+        requests: dict[str, List[dict]],
+        usage: Optional[dict[str, dict[str, int]]] = None,
+    ) -> dict[str, Union[str, LLMError]]:
+        """Run requests through the Batch API, resubmitting requests that failed with a retryable error in a follow-up batch.
+
+        Args:
+            model_info (str): Information about the model.
+            requests (dict[str, List[dict]]): A dictionary mapping custom IDs to the message history of each request.
+            usage (Optional[dict[str, dict[str, int]]], optional): A dictionary to which the token usage of each successful
+                request is added, keyed by custom ID. Defaults to None.
+
+        Returns:
+            dict[str, Union[str, LLMError]]: A dictionary mapping every custom ID to the response, or to the error of a failed request.
+        """
+        results = {}
+        pending_requests = dict(requests)
+        for _ in range(self.max_attempts):
+            if not pending_requests:
+                break
+
+            batch = self.wait(self.submit(model_info, pending_requests))
+            batch_results = self.collect(batch, model_info, usage)
+            for custom_id in pending_requests:
+                results[custom_id] = batch_results.get(
+                    custom_id,
+                    LLMServerError(
+                        f"Batch {batch.id} ended with status {batch.status} without a result for request {custom_id}.",
+                        model_info=model_info,
+                    ),
+                )
+
+            pending_requests = {
+                custom_id: message_history
+                for custom_id, message_history in pending_requests.items()
+                if isinstance(results[custom_id], LLMError)
+                and results[custom_id].retryable
+            }
+
+        return results
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+DEFAULT_CACHE_PATH = "storage/cache/llm_responses.db"
+
+
+def make_cache_key(
+    model_info: str, message_history: List[dict], **generation_params: Any
+) -> str:
+    """Computes a canonical hash for an LLM request. Requests with the same model, messages and generation parameters always map to the same key, regardless of dictionary ordering.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        **generation_params (Any): Additional generation parameters sent with the request (e.g. temperature).
+
+    Returns:
+        str: The SHA-256 hex digest identifying the request.
+    """
+    payload = {
+        "model_info": model_info,
+        "message_history": message_history,
+        "generation_params": generation_params,
+    }
+    canonical_payload = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical_payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """A two-tier cache for LLM responses, with an in-memory LRU tier backed by an on-disk SQLite tier.
+
+    Args:
+        path (Optional[str], optional): The path of the SQLite database. If None, only the in-memory tier is used.
+            Defaults to DEFAULT_CACHE_PATH.
+        namespace (str, optional): The namespace in which entries are read and written, e.g. one per experiment.
+            Defaults to "default".
+        max_memory_entries (int, optional): The maximum number of entries held in the in-memory tier. Defaults to 1024.
+        max_disk_entries (Optional[int], optional): The maximum number of entries held in the on-disk tier per namespace.
+            Defaults to None (unbounded).
+        ttl (Optional[float], optional): The number of seconds after which an entry expires. Defaults to None (never).
+
+    Raises:
+        ValueError: If the provided max_memory_entries, max_disk_entries or ttl is not positive.
+
+    Attributes:
+        namespace (str): The namespace in which entries are read and written.
+        hits (int): The number of cache lookups that returned a response.
+        misses (int): The number of cache lookups that did not return a response.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        namespace: str = "default",
+        max_memory_entries: int = 1024,
+        max_disk_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        if max_memory_entries < 1:
+            raise ValueError(
+                f"Invalid value for max_memory_entries: {max_memory_entries}. max_memory_entries should be an integer that is equal to or greater than 1."
+            )
+        if max_disk_entries is not None and max_disk_entries < 1:
+            raise ValueError(
+                f"Invalid value for max_disk_entries: {max_disk_entries}. max_disk_entries should be None or an integer that is equal to or greater than 1."
+            )
+        if ttl is not None and ttl <= 0:
+            raise ValueError(
+                f"Invalid value for ttl: {ttl}. ttl should be None or a positive number of seconds."
+            )
+
+        self.path = path
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )""")
+            self.connection.commit()
+
+    def is_expired(self, created_at: float, now: float) -> bool:
+        """Checks if an entry created at the provided time has outlived the cache TTL.
+
+        Args:
+            created_at (float): The time at which the entry was created.
+            now (float): The current time.
+
+        Returns:
+            bool: True if the entry has expired, False otherwise.
+        """
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a response in the current namespace, first in memory and then on disk.
+
+        Args:
+            key (str): The key of the request, as computed by make_cache_key.
+
+        Returns:
+            Optional[str]: The cached response, or None if there is no valid entry.
+        """
+        now = time.time()
+        memory_key = (self.namespace, key)
+        with self.lock:
+            if memory_key in self.memory:
+                response, created_at = self.memory[memory_key]
+                if not self.is_expired(created_at, now):
+                    self.memory.move_to_end(memory_key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return response
+                del self.memory[memory_key]
+
+            if self.connection is not None:
+                row = self.connection.execute(
+                    "SELECT response, created_at FROM responses WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is not None:
+                    response, created_at = row
+                    if not self.is_expired(created_at, now):
+                        self.connection.execute(
+                            "UPDATE responses SET last_accessed = ? WHERE namespace = ? AND key = ?",
+                            (now, self.namespace, key),
+                        )
+                        self.connection.commit()
+                        self.store_in_memory(memory_key, response, created_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return response
+                    self.connection.execute(
+                        "DELETE FROM responses WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+                    self.connection.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response in the current namespace, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The key of the request, as computed by make_cache_key.
+            response (str): The response to be cached.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        with self.lock:
+            self.store_in_memory((self.namespace, key), response, now)
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (namespace, key, response, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, response, now, now),
+                )
+                if self.max_disk_entries is not None:
+                    self.connection.execute(
+                        """DELETE FROM responses WHERE namespace = ? AND key IN (
+                            SELECT key FROM responses WHERE namespace = ?
+                            ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                        )""",
+                        (self.namespace, self.namespace, self.max_disk_entries),
+                    )
+                self.connection.commit()
+
+    def store_in_memory(
+        self, memory_key: tuple, response: str, created_at: float
+    ) -> None:
+        """Store an entry in the in-memory tier, evicting the least recently used entry if it is full.
+
+        Args:
+            memory_key (tuple): The (namespace, key) pair of the entry.
+            response (str): The response to be cached.
+            created_at (float): The time at which the entry was created.
+
+        Returns:
+            None
+        """
+        self.memory[memory_key] = (response, created_at)
+        self.memory.move_to_end(memory_key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def evict_expired(self) -> int:
+        """Remove all expired entries from both tiers.
+
+        Returns:
+            int: The number of entries removed from the on-disk tier.
+        """
+        if self.ttl is None:
+            return 0
+
+        now = time.time()
+        with self.lock:
+            for memory_key in [
+                memory_key
+                for memory_key, (_, created_at) in self.memory.items()
+                if self.is_expired(created_at, now)
+            ]:
+                del self.memory[memory_key]
+
+            if self.connection is None:
+                return 0
+            cursor = self.connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+            )
+            self.connection.commit()
+            return cursor.rowcount
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove all entries of a namespace from both tiers.
+
+        Args:
+            namespace (Optional[str], optional): The namespace to be cleared. Defaults to the current namespace.
+
+        Returns:
+            None
+        """
+        namespace = self.namespace if namespace is None else namespace
+        with self.lock:
+            for memory_key in [
+                memory_key for memory_key in self.memory if memory_key[0] == namespace
+            ]:
+                del self.memory[memory_key]
+
+            if self.connection is not None:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE namespace = ?", (namespace,)
+                )
+                self.connection.commit()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return the hit and miss counters of the cache.
+
+        Returns:
+            dict[str, Any]: The hit and miss counters, the hit rate and the number of entries held in memory.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+    def close(self) -> None:
+        """Close the connection to the on-disk tier.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
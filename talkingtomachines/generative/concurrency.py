@@ -0,0 +1,254 @@
+import time
+import asyncio
+import threading
+import contextlib
+import collections
+from typing import Any, AsyncIterator, Awaitable, Iterable, List
+
+
+async def gather_or_cancel(awaitables: Iterable[Awaitable[Any]]) -> List[Any]:
+    """Run awaitables concurrently and return their results in order. If one of them fails or the caller is cancelled,
+    the others are cancelled and awaited before the error is raised, so that none of them keeps running, spending calls
+    or changing state, after the caller has returned.
+
+    Args:
+        awaitables (Iterable[Awaitable[Any]]): The awaitables to run.
+
+    Returns:
+        List[Any]: The results of the awaitables.
+
+    Raises:
+        Exception: The first exception raised by an awaitable.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class AIMDController:
+    """An additive-increase/multiplicative-decrease (AIMD) controller of the number of concurrent LLM workloads, e.g.
+    sessions, so that an experiment settles at the largest concurrency the provider sustains.
+
+    Every successful call raises the limit by increase / limit, i.e. by about increase per round of calls at the current
+    limit. A rate-limited call, or a call slower than latency_tolerance times the smoothed latency, multiplies the limit
+    by decrease_factor. Decreases are applied at most once per smoothed latency, so that a burst of failures from the
+    same round of calls only cuts the limit once.
+
+    Args:
+        initial_limit (int, optional): The initial concurrency limit. Defaults to 4.
+        min_limit (int, optional): The minimum concurrency limit. Defaults to 1.
+        max_limit (int, optional): The maximum concurrency limit. Defaults to 256.
+        increase (float, optional): The additive increase of the limit per round of successful calls. Defaults to 1.
+        decrease_factor (float, optional): The factor by which the limit is multiplied on congestion. Defaults to 0.5.
+        latency_tolerance (float, optional): The ratio to the smoothed latency above which a call counts as a latency
+            spike. Defaults to 2.
+        smoothing (float, optional): The weight of the latest latency in the exponentially weighted moving average.
+            Defaults to 0.1.
+
+    Attributes:
+        limit (float): The current concurrency limit.
+        in_flight (int): The number of workloads currently admitted.
+        smoothed_latency (Optional[float]): The exponentially weighted moving average of call latencies in seconds.
+        metrics (dict[str, int]): The number of successes, rate limits, latency spikes and decreases.
+
+    Raises:
+        ValueError: If a provided parameter is out of range.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        increase: float = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2,
+        smoothing: float = 0.1,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                f"Invalid values for min_limit ({min_limit}), initial_limit ({initial_limit}) and max_limit ({max_limit}). "
+                "They should satisfy 1 <= min_limit <= initial_limit <= max_limit."
+            )
+        if increase <= 0 or not 0 < decrease_factor < 1:
+            raise ValueError(
+                f"Invalid values for increase ({increase}) and decrease_factor ({decrease_factor}). "
+                "increase should be positive and decrease_factor should be between 0 and 1."
+            )
+        if latency_tolerance <= 1 or not 0 < smoothing <= 1:
+            raise ValueError(
+                f"Invalid values for latency_tolerance ({latency_tolerance}) and smoothing ({smoothing}). "
+                "latency_tolerance should be greater than 1 and smoothing should be between 0 and 1."
+            )
+
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.smoothed_latency = None
+        self.last_decrease_time = None
+        self.metrics = {
+            "successes": 0,
+            "rate_limits": 0,
+            "latency_spikes": 0,
+            "decreases": 0,
+        }
+        self.waiters = collections.deque()
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def get_limit(self) -> int:
+        """Return the current concurrency limit.
+
+        Returns:
+            int: The number of workloads that may run concurrently.
+        """
+        return int(self.limit)
+
+    def wake_waiters(self) -> None:
+        """Admit waiting workloads while the number of admitted workloads is below the limit. Runs on the event loop.
+
+        Returns:
+            None
+        """
+        while self.waiters and self.in_flight < self.get_limit():
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def schedule_wake_waiters(self) -> None:
+        """Wake up waiting workloads on their event loop after the limit was raised, possibly from another thread.
+
+        Returns:
+            None
+        """
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.wake_waiters)
+
+    async def acquire(self) -> None:
+        """Wait until the number of admitted workloads is below the limit and admit a workload.
+
+        Returns:
+            None
+        """
+        self.loop = asyncio.get_running_loop()
+        if not self.waiters and self.in_flight < self.get_limit():
+            self.in_flight += 1
+            return
+
+        waiter = self.loop.create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The workload was admitted just before it was cancelled
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """Release the slot of a finished workload and admit waiting workloads.
+
+        Returns:
+            None
+        """
+        self.in_flight -= 1
+        self.wake_waiters()
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot of the controller for the duration of a workload.
+
+        Yields:
+            None
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def decrease(self) -> None:
+        """Multiply the limit by the decrease factor, at most once per smoothed latency. Must be called with the lock held.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        cooldown = self.smoothed_latency or 0.0
+        if self.last_decrease_time is not None and (
+            now - self.last_decrease_time < cooldown
+        ):
+            return
+
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.last_decrease_time = now
+        self.metrics["decreases"] += 1
+
+    def record_success(self, latency: float) -> None:
+        """Record the latency of a successful call, increasing the limit unless the latency spiked.
+
+        Args:
+            latency (float): The latency of the call in seconds.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.metrics["successes"] += 1
+            if (
+                self.smoothed_latency is not None
+                and latency > self.latency_tolerance * self.smoothed_latency
+            ):
+                self.metrics["latency_spikes"] += 1
+                self.decrease()
+            else:
+                self.limit = min(
+                    self.max_limit, self.limit + self.increase / self.limit
+                )
+                self.schedule_wake_waiters()
+
+            self.smoothed_latency = (
+                latency
+                if self.smoothed_latency is None
+                else (1 - self.smoothing) * self.smoothed_latency
+                + self.smoothing * latency
+            )
+
+    def record_rate_limit(self) -> None:
+        """Record a rate-limited call and decrease the limit.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.metrics["rate_limits"] += 1
+            self.decrease()
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Return the state and counters of the controller.
+
+        Returns:
+            dict[str, Any]: The current limit, the number of admitted workloads, the smoothed latency in seconds and the
+                number of successes, rate limits, latency spikes and decreases.
+        """
+        with self.lock:
+            return {
+                "limit": self.get_limit(),
+                "in_flight": self.in_flight,
+                "smoothed_latency": self.smoothed_latency,
+                **self.metrics,
+            }
@@ -0,0 +1,299 @@
+from typing import List, Optional
+from talkingtomachines.generative.llm import query_llm, query_llm_async
+from talkingtomachines.generative.tokens import (
+    TOKENS_PER_REPLY,
+    count_message_tokens,
+)
+from talkingtomachines.generative.usage import get_model_usage
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+SUMMARY_INSTRUCTION = (
+    "Summarise the following conversation from the perspective of the participant, keeping every fact, offer, "
+    "decision and commitment that later turns may refer to. Use at most {max_words} words."
+)
+
+
+def get_recent_start_index(messages: List[dict], max_tokens: int) -> int:
+    """Find the start of the longest run of most recent messages that fits within a token budget. The latest message is
+    always kept, even if it exceeds the budget on its own.
+
+    Args:
+        messages (List[dict]): The messages, in chronological order.
+        max_tokens (int): The token budget of the recent messages.
+
+    Returns:
+        int: The index of the earliest message that is kept.
+    """
+    num_tokens = 0
+    start_index = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        num_tokens += count_message_tokens(messages[index])
+        if num_tokens > max_tokens and start_index < len(messages):
+            break
+        start_index = index
+
+    return start_index
+
+
+class ContextPolicy:
+    """A base class for policies that select the messages sent to the LLM from the full message history of an agent.
+    The full history is kept on the agent; a policy only decides what is resent on each call.
+
+    Policies may keep state across calls, so each agent needs its own policy instance.
+    """
+
+    def apply(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        """Select the messages to be sent to the LLM.
+
+        Args:
+            message_history (List[dict]): The full message history of the agent, starting with its system message.
+            usage (Optional[dict[str, int]], optional): A record of token usage to which any LLM calls made by the policy are added,
+                under "by_model" if they use another model than the agent.
+                Defaults to None.
+
+        Returns:
+            List[dict]: The messages to be sent to the LLM.
+        """
+        return message_history
+
+    async def apply_async(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        """Asynchronously select the messages to be sent to the LLM.
+
+        Args:
+            message_history (List[dict]): The full message history of the agent, starting with its system message.
+            usage (Optional[dict[str, int]], optional): A record of token usage to which any LLM calls made by the policy are added,
+                under "by_model" if they use another model than the agent.
+                Defaults to None.
+
+        Returns:
+            List[dict]: The messages to be sent to the LLM.
+        """
+        return self.apply(message_history, usage)
+
+
+class SlidingWindowPolicy(ContextPolicy):
+    """Keeps the system message and the most recent messages that fit within a token budget.
+
+    Args:
+        max_tokens (int): The maximum number of prompt tokens sent per call.
+
+    Raises:
+        ValueError: If the provided max_tokens is less than 1.
+    """
+
+    def __init__(self, max_tokens: int):
+        if max_tokens < 1:
+            raise ValueError(
+                f"Invalid value for max_tokens: {max_tokens}. max_tokens should be an integer that is equal to or greater than 1."
+            )
+
+        self.max_tokens = max_tokens
+
+    def get_available_tokens(self, messages: List[dict]) -> int:
+        """Return the token budget left after the fixed messages and the reply overhead.
+
+        Args:
+            messages (List[dict]): The messages that are always sent.
+
+        Returns:
+            int: The number of tokens available for recent messages.
+        """
+        return (
+            self.max_tokens
+            - TOKENS_PER_REPLY
+            - sum(count_message_tokens(message) for message in messages)
+        )
+
+    def apply(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        system_messages, messages = message_history[:1], message_history[1:]
+        start_index = get_recent_start_index(
+            messages, self.get_available_tokens(system_messages)
+        )
+        return system_messages + messages[start_index:]
+
+
+class PinnedWindowPolicy(SlidingWindowPolicy):
+    """Keeps the system message, the first num_pinned messages (e.g. the opening question and answer), and the most recent
+    messages that fit within the remaining token budget.
+
+    Args:
+        max_tokens (int): The maximum number of prompt tokens sent per call.
+        num_pinned (int, optional): The number of messages after the system message that are always kept. Defaults to 2.
+
+    Raises:
+        ValueError: If the provided max_tokens is less than 1 or num_pinned is negative.
+    """
+
+    def __init__(self, max_tokens: int, num_pinned: int = 2):
+        super().__init__(max_tokens)
+        if num_pinned < 0:
+            raise ValueError(
+                f"Invalid value for num_pinned: {num_pinned}. num_pinned should be a non-negative integer."
+            )
+
+        self.num_pinned = num_pinned
+
+    def apply(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        pinned_messages = message_history[: 1 + self.num_pinned]
+        messages = message_history[1 + self.num_pinned :]
+        start_index = get_recent_start_index(
+            messages, self.get_available_tokens(pinned_messages)
+        )
+        return pinned_messages + messages[start_index:]
+
+
+class RollingSummaryPolicy(SlidingWindowPolicy):
+    """Keeps the system message and the most recent messages within a token budget, replacing older messages with a
+    rolling summary produced by a cheaper model.
+
+    When the history overflows the budget, the messages that no longer fit are folded into the summary together with
+    the previous summary, and the recent window is shrunk to half the budget so that summaries are only refreshed
+    every few turns rather than on every call.
+
+    Args:
+        max_tokens (int): The maximum number of prompt tokens sent per call.
+        summary_model_info (str, optional): The model that writes the summary. Defaults to "gpt-4o-mini".
+        max_summary_tokens (int, optional): The number of tokens reserved for the summary. Defaults to 256.
+
+    Attributes:
+        summary (str): The summary of the messages that were evicted from the recent window.
+        num_summarized (int): The number of messages after the system message covered by the summary.
+
+    Raises:
+        ValueError: If the provided max_tokens is not greater than max_summary_tokens.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        summary_model_info: str = "gpt-4o-mini",
+        max_summary_tokens: int = 256,
+    ):
+        super().__init__(max_tokens)
+        if max_summary_tokens < 1 or max_tokens <= max_summary_tokens:
+            raise ValueError(
+                f"Invalid values for max_tokens ({max_tokens}) and max_summary_tokens ({max_summary_tokens}). max_summary_tokens should be positive and less than max_tokens."
+            )
+
+        self.summary_model_info = summary_model_info
+        self.max_summary_tokens = max_summary_tokens
+        self.summary = ""
+        self.num_summarized = 0
+
+    def get_summary_end_index(self, message_history: List[dict]) -> Optional[int]:
+        """Check if the recent window overflows the budget and return the end of the messages to be summarised.
+
+        Args:
+            message_history (List[dict]): The full message history of the agent, starting with its system message.
+
+        Returns:
+            Optional[int]: The index after the last message to be folded into the summary, or None if the summary is up to date.
+        """
+        messages = message_history[1:]
+        available_tokens = (
+            self.get_available_tokens(message_history[:1]) - self.max_summary_tokens
+        )
+        unsummarized_messages = messages[self.num_summarized :]
+        if get_recent_start_index(unsummarized_messages, available_tokens) == 0:
+            return None
+
+        start_index = get_recent_start_index(
+            unsummarized_messages, available_tokens // 2
+        )
+        return self.num_summarized + start_index
+
+    def build_summary_request(self, messages: List[dict]) -> List[dict]:
+        """Construct the request asking the summary model to fold messages into the rolling summary.
+
+        Args:
+            messages (List[dict]): The messages to be folded into the summary.
+
+        Returns:
+            List[dict]: The message history of the summary request.
+        """
+        transcript = "\n".join(
+            f"{message['role']}: {message['content']}" for message in messages
+        )
+        if self.summary:
+            transcript = f"Earlier summary: {self.summary}\n\n{transcript}"
+
+        return [
+            {
+                "role": "system",
+                "content": SUMMARY_INSTRUCTION.format(
+                    max_words=self.max_summary_tokens * 3 // 4
+                ),
+            },
+            {"role": "user", "content": transcript},
+        ]
+
+    def get_summary_usage(
+        self, usage: Optional[dict[str, int]]
+    ) -> Optional[dict[str, int]]:
+        """Return the record to which the usage of summary calls is added, kept apart from the usage of the agent so that
+        it is priced at the rate of the summary model.
+
+        Args:
+            usage (Optional[dict[str, int]]): The record of token usage of the agent.
+
+        Returns:
+            Optional[dict[str, int]]: The record of token usage of the summary model, or None if usage is not recorded.
+        """
+        if usage is None:
+            return None
+        return get_model_usage(usage, self.summary_model_info)
+
+    def build_context(self, message_history: List[dict]) -> List[dict]:
+        """Construct the messages sent to the LLM from the system message, the summary and the unsummarised messages.
+
+        Args:
+            message_history (List[dict]): The full message history of the agent, starting with its system message.
+
+        Returns:
+            List[dict]: The messages to be sent to the LLM.
+        """
+        context = message_history[:1]
+        if self.summary:
+            context.append({"role": "system", "content": SUMMARY_PREFIX + self.summary})
+
+        return context + message_history[1 + self.num_summarized :]
+
+    def apply(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        summary_end_index = self.get_summary_end_index(message_history)
+        if summary_end_index is not None:
+            self.summary = query_llm(
+                self.summary_model_info,
+                self.build_summary_request(
+                    message_history[1 + self.num_summarized : 1 + summary_end_index]
+                ),
+                usage=self.get_summary_usage(usage),
+            )
+            self.num_summarized = summary_end_index
+
+        return self.build_context(message_history)
+
+    async def apply_async(
+        self, message_history: List[dict], usage: Optional[dict[str, int]] = None
+    ) -> List[dict]:
+        summary_end_index = self.get_summary_end_index(message_history)
+        if summary_end_index is not None:
+            self.summary = await query_llm_async(
+                self.summary_model_info,
+                self.build_summary_request(
+                    message_history[1 + self.num_summarized : 1 + summary_end_index]
+                ),
+                usage=self.get_summary_usage(usage),
+            )
+            self.num_summarized = summary_end_index
+
+        return self.build_context(message_history)
@@ -0,0 +1,363 @@
+import math
+import time
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+from talkingtomachines.generative.usage import add_usage, create_usage
+
+
+class HedgingPolicy:
+    """Cuts the tail latency of LLM calls by hedging: if a call has not returned after the latency percentile observed
+    for its model, a duplicate call is sent and the first result is used. The losing call is cancelled where possible.
+
+    Hedging only starts once min_samples latencies have been observed for a model. The number of hedges is capped at
+    max_hedge_ratio times the number of calls of the model, which bounds the extra spend.
+
+    Synchronous calls run in a thread pool so that they can be raced. A losing synchronous call cannot be interrupted
+    and runs to completion in the background. Its result is discarded, and its usage is recorded in the metrics of the
+    policy rather than in the usage of the caller. A losing asynchronous call is cancelled, so the tokens it may have
+    consumed are not accounted for.
+
+    Args:
+        percentile (float, optional): The latency percentile after which a call is hedged. Defaults to 95.
+        min_samples (int, optional): The number of latencies observed before a model is hedged. Defaults to 20.
+        window_size (int, optional): The number of recent latencies per model from which the percentile is computed.
+            Defaults to 1000.
+        max_hedge_ratio (float, optional): The maximum number of hedges per call. Defaults to 0.1.
+        max_workers (int, optional): The number of threads racing synchronous calls. Defaults to 64.
+
+    Attributes:
+        latencies (dict[str, deque]): The recent latencies of each model in seconds.
+        metrics (dict[str, dict[str, Any]]): The number of calls, hedges and hedges that returned first for each model,
+            and the usage of the losing calls that ran to completion under "losing_usage".
+
+    Raises:
+        ValueError: If a provided parameter is out of range.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        min_samples: int = 20,
+        window_size: int = 1000,
+        max_hedge_ratio: float = 0.1,
+        max_workers: int = 64,
+    ):
+        if not 0 < percentile < 100:
+            raise ValueError(
+                f"Invalid value for percentile: {percentile}. percentile should be between 0 and 100."
+            )
+        if min_samples < 1 or window_size < min_samples:
+            raise ValueError(
+                f"Invalid values for min_samples ({min_samples}) and window_size ({window_size}). "
+                "min_samples should be at least 1 and window_size should not be less than min_samples."
+            )
+        if not 0 <= max_hedge_ratio <= 1:
+            raise ValueError(
+                f"Invalid value for max_hedge_ratio: {max_hedge_ratio}. max_hedge_ratio should be between 0 and 1."
+            )
+
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_workers = max_workers
+        self.latencies = {}
+        self.metrics = {}
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Return the thread pool racing synchronous calls, constructing it on first use.
+
+        Returns:
+            concurrent.futures.ThreadPoolExecutor: The thread pool.
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="hedging"
+                )
+            return self.executor
+
+    def close(self) -> None:
+        """Shut down the thread pool racing synchronous calls without waiting for losing calls to finish.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+    def get_model_metrics(self, model_info: str) -> dict[str, int]:
+        """Return the hedging counters of a model, creating them if necessary. Must be called with the lock held.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            dict[str, Any]: The number of calls, hedges and hedge wins of the model, and the usage of its losing calls.
+        """
+        if model_info not in self.metrics:
+            self.metrics[model_info] = {
+                "calls": 0,
+                "hedges": 0,
+                "hedge_wins": 0,
+                "losing_usage": create_usage(),
+            }
+        return self.metrics[model_info]
+
+    def record_latency(self, model_info: str, latency: float) -> None:
+        """Record the latency of a successful call.
+
+        Args:
+            model_info (str): Information about the model.
+            latency (float): The latency of the call in seconds.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if model_info not in self.latencies:
+                self.latencies[model_info] = deque(maxlen=self.window_size)
+            self.latencies[model_info].append(latency)
+
+    def get_hedge_delay(self, model_info: str) -> Optional[float]:
+        """Return the number of seconds after which a call to the model is hedged.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            Optional[float]: The configured percentile of the recent latencies of the model, or None if too few
+                latencies have been observed.
+        """
+        with self.lock:
+            latencies = self.latencies.get(model_info, ())
+            if len(latencies) < self.min_samples:
+                return None
+
+            sorted_latencies = sorted(latencies)
+            index = math.ceil(self.percentile / 100 * len(sorted_latencies)) - 1
+            return sorted_latencies[max(0, index)]
+
+    def start_call(self, model_info: str) -> Optional[float]:
+        """Count a call towards the hedging budget of its model and return its hedge delay.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            Optional[float]: The number of seconds after which the call is hedged, or None if it is not hedged.
+        """
+        hedge_delay = self.get_hedge_delay(model_info)
+        with self.lock:
+            self.get_model_metrics(model_info)["calls"] += 1
+        return hedge_delay
+
+    def try_hedge(self, model_info: str) -> bool:
+        """Reserve a hedge from the budget of a model.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            bool: True if the hedge may be sent, False if the budget is exhausted.
+        """
+        with self.lock:
+            metrics = self.get_model_metrics(model_info)
+            if metrics["hedges"] + 1 > self.max_hedge_ratio * metrics["calls"]:
+                return False
+
+            metrics["hedges"] += 1
+            return True
+
+    def record_hedge_win(self, model_info: str) -> None:
+        """Record that a hedge returned before the call it duplicated.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.get_model_metrics(model_info)["hedge_wins"] += 1
+
+    def record_losing_call(
+        self,
+        model_info: str,
+        future: concurrent.futures.Future,
+        get_usage: Optional[Callable[[Any], Optional[dict[str, int]]]],
+    ) -> None:
+        """Record the usage of a losing call that ran to completion after the winning call returned.
+
+        Args:
+            model_info (str): Information about the model.
+            future (concurrent.futures.Future): The future of the losing call.
+            get_usage (Optional[Callable[[Any], Optional[dict[str, int]]]]): A function returning the usage of a result,
+                or None if results have no usage.
+
+        Returns:
+            None
+        """
+        if get_usage is None or future.cancelled() or future.exception() is not None:
+            return
+
+        with self.lock:
+            add_usage(
+                self.get_model_metrics(model_info)["losing_usage"],
+                get_usage(future.result()),
+            )
+
+    def get_metrics(self) -> dict[str, dict[str, Any]]:
+        """Return the hedging metrics of each model.
+
+        Returns:
+            dict[str, dict[str, Any]]: A dictionary mapping each model to its number of calls, hedges and hedge wins,
+                the usage of its losing calls and its current hedge delay in seconds.
+        """
+        with self.lock:
+            metrics = {
+                model_info: {
+                    **model_metrics,
+                    "losing_usage": dict(model_metrics["losing_usage"]),
+                }
+                for model_info, model_metrics in self.metrics.items()
+            }
+        for model_info in metrics:
+            metrics[model_info]["hedge_delay"] = self.get_hedge_delay(model_info)
+        return metrics
+
+    def timed(self, model_info: str, func: Callable[[], Any]) -> Callable[[], Any]:
+        """Wrap a function so that the latency of each successful call is recorded.
+
+        Args:
+            model_info (str): Information about the model.
+            func (Callable[[], Any]): The function performing the call.
+
+        Returns:
+            Callable[[], Any]: The wrapped function.
+        """
+
+        def timed_func() -> Any:
+            start_time = time.monotonic()
+            result = func()
+            self.record_latency(model_info, time.monotonic() - start_time)
+            return result
+
+        return timed_func
+
+    def call(
+        self,
+        model_info: str,
+        func: Callable[[], Any],
+        get_usage: Optional[Callable[[Any], Optional[dict[str, int]]]] = None,
+    ) -> Any:
+        """Call func, hedging it with a duplicate call if it has not returned after the hedge delay of the model.
+
+        func should not have side effects on the state of the caller, such as adding to its usage, as a losing call
+        may still be running after call returns.
+
+        Args:
+            model_info (str): Information about the model.
+            func (Callable[[], Any]): The function performing a single call.
+            get_usage (Optional[Callable[[Any], Optional[dict[str, int]]]], optional): A function returning the usage of a
+                result of func, with which the usage of losing calls is recorded. Defaults to None.
+
+        Returns:
+            Any: The value returned by the first successful call.
+
+        Raises:
+            Exception: The exception raised by the first call if every call fails.
+        """
+        hedge_delay = self.start_call(model_info)
+        if hedge_delay is None:
+            return self.timed(model_info, func)()
+
+        executor = self.get_executor()
+        primary = executor.submit(self.timed(model_info, func))
+        done, _ = concurrent.futures.wait([primary], timeout=hedge_delay)
+        if done or not self.try_hedge(model_info):
+            return primary.result()
+
+        hedge = executor.submit(self.timed(model_info, func))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.record_hedge_win(model_info)
+                    for loser in pending:
+                        # A running call cannot be cancelled, so its usage is recorded once it completes
+                        if not loser.cancel():
+                            loser.add_done_callback(
+                                lambda loser: self.record_losing_call(
+                                    model_info, loser, get_usage
+                                )
+                            )
+                    return future.result()
+
+        return primary.result()
+
+    async def call_async(
+        self, model_info: str, func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Asynchronously call func, hedging it with a duplicate call if it has not returned after the hedge delay of
+        the model. The losing call is cancelled, and its usage is not recorded under "losing_usage".
+
+        Args:
+            model_info (str): Information about the model.
+            func (Callable[[], Awaitable[Any]]): The coroutine function performing a single call.
+
+        Returns:
+            Any: The value returned by the first successful call.
+
+        Raises:
+            Exception: The exception raised by the first call if every call fails.
+        """
+
+        async def timed_func() -> Any:
+            start_time = time.monotonic()
+            result = await func()
+            self.record_latency(model_info, time.monotonic() - start_time)
+            return result
+
+        hedge_delay = self.start_call(model_info)
+        if hedge_delay is None:
+            return await timed_func()
+
+        primary = asyncio.ensure_future(timed_func())
+        try:
+            done, _ = await asyncio.wait([primary], timeout=hedge_delay)
+            if done or not self.try_hedge(model_info):
+                return await primary
+
+            hedge = asyncio.ensure_future(timed_func())
+            pending = {primary, hedge}
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            if task is hedge:
+                                self.record_hedge_win(model_info)
+                            return task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+            return primary.result()
+
+        finally:
+            if not primary.done():
+                primary.cancel()
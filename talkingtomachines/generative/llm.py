@@ -1,82 +1,1043 @@
-from typing import List
-from openai import OpenAI
+import time
+from operator import itemgetter
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
 from talkingtomachines.config import DevelopmentConfig
+from talkingtomachines.generative.cache import (
+    DEFAULT_CACHE_PATH,
+    ResponseCache,
+    make_cache_key,
+)
+from talkingtomachines.generative.concurrency import AIMDController
+from talkingtomachines.generative.hedging import HedgingPolicy
+from talkingtomachines.generative.mock import MockBackend
+from talkingtomachines.generative.pool import ProviderPool
+from talkingtomachines.generative.providers import (
+    AnthropicBackend,
+    Completion,
+    OpenAIBackend,
+    ProviderBackend,
+    Samples,
+)
+from talkingtomachines.generative.rate_limit import RateLimiter
+from talkingtomachines.generative.resilience import (
+    CircuitOpenError,
+    LLMClientError,
+    LLMError,
+    LLMRateLimitError,
+    LLMServerError,
+    LLMTimeoutError,
+    ResilientCaller,
+    RetryPolicy,
+    classify_error,
+)
+from talkingtomachines.generative.tokens import count_tokens, estimate_message_tokens
+from talkingtomachines.generative.usage import add_usage
+from talkingtomachines.generative.metrics import metrics_registry
 
-openai_client = OpenAI(api_key=DevelopmentConfig.OPENAI_API_KEY)
+OPENAI_MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]
+ANTHROPIC_MODELS = [
+    "claude-3-5-sonnet-20240620",
+    "claude-3-opus-20240229",
+    "claude-3-sonnet-20240229",
+    "claude-3-haiku-20240307",
+]
+MISTRAL_MODELS = [
+    "mistral-large-latest",
+    "mistral-medium-latest",
+    "mistral-small-latest",
+    "open-mistral-nemo",
+]
+MISTRAL_BASE_URL = "https://api.mistral.ai/v1"
+MOCK_MODELS = ["mock"]
 
+providers: dict[str, ProviderBackend] = {}
+model_providers: dict[str, str] = {}
 
-def query_llm(model_info: str, message_history: List[dict]) -> str:
-    """Queries a LLM for a response based on the latest message history.
+
+def register_provider(provider: ProviderBackend, models: List[str]) -> None:
+    """Registers a provider backend and the models it serves. Registering a model that is already served by another
+    provider routes it to the new provider. Models served by OpenAI-compatible endpoints (e.g. Meta Llama models hosted
+    on vLLM) can be added by registering an OpenAIBackend with the base URL of the endpoint.
+
+    Args:
+        provider (ProviderBackend): The provider backend.
+        models (List[str]): The models served by the provider.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the provided models is empty.
+    """
+    if not models:
+        raise ValueError(
+            f"Invalid value for models: {models}. models should contain at least one model."
+        )
+
+    providers[provider.name] = provider
+    for model_info in models:
+        model_providers[model_info] = provider.name
+
+
+def close_providers() -> None:
+    """Close the clients of the registered provider backends, e.g. when an application shuts down. The backends
+    construct new clients if they are used again. Asynchronous clients are dropped rather than closed; use
+    aclose_providers from an event loop to close them.
+
+    Returns:
+        None
+    """
+    for provider in providers.values():
+        provider.close()
+
+
+async def aclose_providers() -> None:
+    """Close the synchronous and asynchronous clients of the registered provider backends.
+
+    Returns:
+        None
+    """
+    for provider in providers.values():
+        await provider.aclose()
+
+
+def get_provider(model_info: str) -> ProviderBackend:
+    """Return the provider backend that serves a model.
+
+    Args:
+        model_info (str): Information about the model.
+
+    Returns:
+        ProviderBackend: The provider backend of the model.
+
+    Raises:
+        LLMClientError: If no registered provider serves the model.
+    """
+    if model_info not in model_providers:
+        raise LLMClientError(
+            f"Model type {model_info} is not supported.", model_info=model_info
+        )
+
+    return providers[model_providers[model_info]]
+
+
+def get_provider_metrics() -> dict[str, dict[str, dict[str, Any]]]:
+    """Return the per-member metrics of the registered provider pools.
+
+    Returns:
+        dict[str, dict[str, dict[str, Any]]]: A dictionary mapping the name of each provider pool to the metrics of its members.
+    """
+    return {
+        name: provider.get_metrics()
+        for name, provider in providers.items()
+        if isinstance(provider, ProviderPool)
+    }
+
+
+def create_openai_backend(api_keys: List[str]) -> ProviderBackend:
+    """Construct the default OpenAI backend, which balances requests across a pool when several API keys are provided.
+
+    Args:
+        api_keys (List[str]): The OpenAI API keys.
+
+    Returns:
+        ProviderBackend: An OpenAIBackend for a single key, or a ProviderPool of OpenAIBackends for several keys.
+    """
+    if len(api_keys) == 1:
+        return OpenAIBackend(name="openai", api_key=api_keys[0])
+
+    return ProviderPool(
+        [
+            OpenAIBackend(name=f"openai-{index}", api_key=api_key)
+            for index, api_key in enumerate(api_keys)
+        ],
+        name="openai",
+    )
+
+
+def get_supported_models() -> List[str]:
+    """Return the models served by the registered providers.
+
+    Returns:
+        List[str]: The supported models.
+    """
+    return list(model_providers)
+
+
+register_provider(
+    create_openai_backend(
+        [
+            api_key.strip()
+            for api_key in DevelopmentConfig.OPENAI_API_KEYS.split(",")
+            if api_key.strip()
+        ]
+        or [DevelopmentConfig.OPENAI_API_KEY]
+    ),
+    OPENAI_MODELS,
+)
+register_provider(
+    AnthropicBackend(name="anthropic", api_key=DevelopmentConfig.ANTHROPIC_API_KEY),
+    ANTHROPIC_MODELS,
+)
+register_provider(
+    OpenAIBackend(
+        name="mistral",
+        api_key=DevelopmentConfig.MISTRAL_API_KEY,
+        base_url=MISTRAL_BASE_URL,
+    ),
+    MISTRAL_MODELS,
+)
+# An offline backend for benchmarking, which can be replaced by registering a ReplayBackend or a configured MockBackend
+register_provider(MockBackend(name="mock"), MOCK_MODELS)
+
+
+def __getattr__(name: str) -> Any:
+    """Constructs the clients of the default OpenAI backend, which are also used by the Batch API, on first access.
+
+    Args:
+        name (str): The name of the module attribute.
+
+    Returns:
+        Any: The OpenAI client for "openai_client" and the asynchronous OpenAI client for "async_openai_client".
+
+    Raises:
+        AttributeError: If the module has no attribute with the provided name.
+    """
+    if name == "openai_client":
+        return providers["openai"].get_client()
+    if name == "async_openai_client":
+        return providers["openai"].get_async_client()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+response_cache: Optional[ResponseCache] = None
+hedging_policy: Optional[HedgingPolicy] = None
+concurrency_controller: Optional[AIMDController] = None
+rate_limiter = RateLimiter()
+resilient_caller = ResilientCaller()
+
+
+def configure_resilience(
+    max_attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30,
+    failure_threshold: int = 5,
+    recovery_timeout: float = 30,
+) -> None:
+    """Configures the retry policy and circuit breakers shared by every LLM call made in this process. Resets the state of existing circuit breakers.
+
+    Args:
+        max_attempts (int, optional): The maximum number of attempts per call, including the first. Defaults to 5.
+        base_delay (float, optional): The minimum number of seconds between attempts. Defaults to 0.5.
+        max_delay (float, optional): The maximum number of seconds between attempts. Defaults to 30.
+        failure_threshold (int, optional): The number of consecutive failures that opens the circuit of a model. Defaults to 5.
+        recovery_timeout (float, optional): The number of seconds a circuit stays open before a probe call. Defaults to 30.
+
+    Returns:
+        None
+    """
+    global resilient_caller
+    resilient_caller = ResilientCaller(
+        retry_policy=RetryPolicy(
+            max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay
+        ),
+        failure_threshold=failure_threshold,
+        recovery_timeout=recovery_timeout,
+    )
+
+
+def configure_rate_limit(
+    model_info: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> None:
+    """Configures the requests-per-minute and tokens-per-minute limits of a model, shared by every LLM call made in this process.
+
+    Args:
+        model_info (str): Information about the model.
+        requests_per_minute (Optional[int], optional): The maximum number of requests per minute. Defaults to None (unlimited).
+        tokens_per_minute (Optional[int], optional): The maximum number of tokens per minute. Defaults to None (unlimited).
+
+    Returns:
+        None
+    """
+    rate_limiter.configure(
+        model_info,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+
+
+def enable_hedging(
+    percentile: float = 95,
+    min_samples: int = 20,
+    window_size: int = 1000,
+    max_hedge_ratio: float = 0.1,
+) -> HedgingPolicy:
+    """Enables hedging of all subsequent calls to query_llm and query_llm_async: a call that has not returned after the
+    latency percentile observed for its model is duplicated, and the first response is used. Streamed calls are not hedged.
+
+    Args:
+        percentile (float, optional): The latency percentile after which a call is hedged. Defaults to 95.
+        min_samples (int, optional): The number of latencies observed before a model is hedged. Defaults to 20.
+        window_size (int, optional): The number of recent latencies per model from which the percentile is computed.
+            Defaults to 1000.
+        max_hedge_ratio (float, optional): The maximum number of hedges per call, which caps the extra spend. Defaults to 0.1.
+
+    Returns:
+        HedgingPolicy: The enabled hedging policy.
+    """
+    global hedging_policy
+    disable_hedging()
+    hedging_policy = HedgingPolicy(
+        percentile=percentile,
+        min_samples=min_samples,
+        window_size=window_size,
+        max_hedge_ratio=max_hedge_ratio,
+    )
+    return hedging_policy
+
+
+def disable_hedging() -> None:
+    """Disables hedging of LLM calls and closes the current hedging policy, if any.
+
+    Returns:
+        None
+    """
+    global hedging_policy
+    if hedging_policy is not None:
+        hedging_policy.close()
+    hedging_policy = None
+
+
+def get_hedging_policy() -> Optional[HedgingPolicy]:
+    """Return the hedging policy that is currently enabled.
+
+    Returns:
+        Optional[HedgingPolicy]: The hedging policy, or None if hedging is disabled.
+    """
+    return hedging_policy
+
+
+def enable_adaptive_concurrency(
+    initial_limit: int = 4,
+    min_limit: int = 1,
+    max_limit: int = 256,
+    increase: float = 1,
+    decrease_factor: float = 0.5,
+    latency_tolerance: float = 2,
+) -> AIMDController:
+    """Enables an AIMD concurrency controller that receives the latency and rate-limit feedback of all subsequent LLM
+    calls. Parallel executors, such as run_experiment_async, admit their workloads through the controller.
+
+    Args:
+        initial_limit (int, optional): The initial concurrency limit. Defaults to 4.
+        min_limit (int, optional): The minimum concurrency limit. Defaults to 1.
+        max_limit (int, optional): The maximum concurrency limit. Defaults to 256.
+        increase (float, optional): The additive increase of the limit per round of successful calls. Defaults to 1.
+        decrease_factor (float, optional): The factor by which the limit is multiplied on congestion. Defaults to 0.5.
+        latency_tolerance (float, optional): The ratio to the smoothed latency above which a call counts as a latency
+            spike. Defaults to 2.
+
+    Returns:
+        AIMDController: The enabled concurrency controller.
+    """
+    global concurrency_controller
+    concurrency_controller = AIMDController(
+        initial_limit=initial_limit,
+        min_limit=min_limit,
+        max_limit=max_limit,
+        increase=increase,
+        decrease_factor=decrease_factor,
+        latency_tolerance=latency_tolerance,
+    )
+    return concurrency_controller
+
+
+def disable_adaptive_concurrency() -> None:
+    """Disables the AIMD concurrency controller.
+
+    Returns:
+        None
+    """
+    global concurrency_controller
+    concurrency_controller = None
+
+
+def get_concurrency_controller() -> Optional[AIMDController]:
+    """Return the concurrency controller that is currently enabled.
+
+    Returns:
+        Optional[AIMDController]: The concurrency controller, or None if adaptive concurrency is disabled.
+    """
+    return concurrency_controller
+
+
+def report_call_outcome(
+    controller: Optional[AIMDController],
+    latency: Optional[float] = None,
+    exception: Optional[Exception] = None,
+) -> None:
+    """Report the outcome of a LLM call to the concurrency controller, if one is enabled.
+
+    Args:
+        controller (Optional[AIMDController]): The concurrency controller.
+        latency (Optional[float], optional): The latency of a successful call in seconds. Defaults to None.
+        exception (Optional[Exception], optional): The exception raised by a failed call. Defaults to None.
+
+    Returns:
+        None
+    """
+    if controller is None:
+        return
+    if exception is None:
+        controller.record_success(latency)
+    elif isinstance(classify_error(exception), LLMRateLimitError):
+        controller.record_rate_limit()
+
+
+def get_total_tokens(usage: Optional[dict[str, int]]) -> Optional[int]:
+    """Extract the total number of tokens consumed by a chat completion.
+
+    Args:
+        usage (Optional[dict[str, int]]): The usage of the completion returned by the provider backend.
+
+    Returns:
+        Optional[int]: The total number of tokens, or None if the provider did not report usage.
+    """
+    if usage is None:
+        return None
+    return usage.get("total_tokens")
+
+
+def enable_response_cache(
+    path: Optional[str] = DEFAULT_CACHE_PATH,
+    namespace: str = "default",
+    max_memory_entries: int = 1024,
+    max_disk_entries: Optional[int] = None,
+    ttl: Optional[float] = None,
+) -> ResponseCache:
+    """Enables caching of LLM responses for all subsequent calls to query_llm and query_llm_async.
+
+    Args:
+        path (Optional[str], optional): The path of the SQLite database backing the cache. If None, responses are only cached in memory.
+            Defaults to DEFAULT_CACHE_PATH.
+        namespace (str, optional): The namespace of the cache entries, e.g. the name of the experiment. Defaults to "default".
+        max_memory_entries (int, optional): The maximum number of entries held in memory. Defaults to 1024.
+        max_disk_entries (Optional[int], optional): The maximum number of entries held on disk per namespace. Defaults to None.
+        ttl (Optional[float], optional): The number of seconds after which an entry expires. Defaults to None.
+
+    Returns:
+        ResponseCache: The enabled response cache.
+    """
+    global response_cache
+    disable_response_cache()
+    response_cache = ResponseCache(
+        path=path,
+        namespace=namespace,
+        max_memory_entries=max_memory_entries,
+        max_disk_entries=max_disk_entries,
+        ttl=ttl,
+    )
+    return response_cache
+
+
+def disable_response_cache() -> None:
+    """Disables caching of LLM responses and closes the current response cache, if any.
+
+    Returns:
+        None
+    """
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the response cache that is currently enabled.
+
+    Returns:
+        Optional[ResponseCache]: The enabled response cache, or None if caching is disabled.
+    """
+    return response_cache
+
+
+def get_cached_response(
+    model_info: str, message_history: List[dict]
+) -> tuple[Optional[str], Optional[str]]:
+    """Look up a response for the provided request in the response cache, if caching is enabled.
 
     Args:
         model_info (str): Information about the model.
         message_history (List[dict]): Contains the history of message exchanged between user and assistant.
 
+    Returns:
+        tuple[Optional[str], Optional[str]]: The cache key of the request and the cached response. Both are None if caching is disabled.
+    """
+    if response_cache is None:
+        return None, None
+
+    cache_key = make_cache_key(model_info, message_history)
+    response = response_cache.get(cache_key)
+    metrics_registry.increment(
+        "llm_cache_misses_total" if response is None else "llm_cache_hits_total",
+        model=model_info,
+    )
+    return cache_key, response
+
+
+def store_cached_response(cache_key: Optional[str], response: str) -> None:
+    """Store a response in the response cache. Empty responses are not cached as they indicate a failed call.
+
+    Args:
+        cache_key (Optional[str]): The cache key of the request, or None if caching is disabled.
+        response (str): Response from the LLM.
+
+    Returns:
+        None
+    """
+    if response_cache is not None and cache_key is not None and response:
+        response_cache.set(cache_key, response)
+
+
+def query_llm(
+    model_info: str,
+    message_history: List[dict],
+    usage: Optional[dict[str, int]] = None,
+) -> str:
+    """Queries a LLM for a response based on the latest message history. Responses served from the response cache do not add to the usage.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
     Returns:
         str: Response from the LLM.
+
+    Raises:
+        LLMError: If the call to the LLM fails.
     """
-    if model_info in ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]:
-        return query_open_ai(model_info=model_info, message_history=message_history)
-    else:
-        # Log the exception
-        print(f"Model type {model_info} is not supported.")
-        return ""
+    cache_key, response = get_cached_response(model_info, message_history)
+    if response is not None:
+        return response
 
+    response = query_provider(
+        model_info=model_info, message_history=message_history, usage=usage
+    )
+    store_cached_response(cache_key, response)
+    return response
 
-def query_open_ai(model_info: str, message_history: List[dict]) -> str:
-    """Query OpenAI API with the provided prompt.
+
+async def query_llm_async(
+    model_info: str,
+    message_history: List[dict],
+    usage: Optional[dict[str, int]] = None,
+) -> str:
+    """Asynchronously queries a LLM for a response based on the latest message history. Responses served from the response cache do not add to the usage.
 
     Args:
         model_info (str): Information about the model.
         message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
 
     Returns:
         str: Response from the LLM.
+
+    Raises:
+        LLMError: If the call to the LLM fails.
+    """
+    cache_key, response = get_cached_response(model_info, message_history)
+    if response is not None:
+        return response
+
+    response = await query_provider_async(
+        model_info=model_info, message_history=message_history, usage=usage
+    )
+    store_cached_response(cache_key, response)
+    return response
+
+
+def check_num_samples(n: int) -> int:
+    """Checks that the number of samples requested for a prompt is valid.
+
+    Args:
+        n (int): The number of samples.
+
+    Returns:
+        int: The number of samples.
+
+    Raises:
+        ValueError: If n is less than 1.
     """
+    if n < 1:
+        raise ValueError(f"Invalid value for n: {n}. n should be at least 1.")
+
+    return n
+
+
+def query_llm_samples(
+    model_info: str,
+    message_history: List[dict],
+    n: int,
+    usage: Optional[dict[str, int]] = None,
+) -> List[str]:
+    """Queries a LLM for n independent responses to the latest message history, e.g. to estimate the distribution of the
+    answers of a persona to a survey question. Providers that support it generate every response in a single request,
+    so the prompt is only sent and billed once. Samples are not served from the response cache, as they are meant to be
+    independent draws.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        n (int): The number of responses.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        List[str]: Responses from the LLM.
+
+    Raises:
+        ValueError: If n is less than 1.
+        LLMError: If the call to the LLM fails.
+    """
+    check_num_samples(n)
+    return query_provider_samples(
+        model_info=model_info, message_history=message_history, n=n, usage=usage
+    )
+
+
+async def query_llm_samples_async(
+    model_info: str,
+    message_history: List[dict],
+    n: int,
+    usage: Optional[dict[str, int]] = None,
+) -> List[str]:
+    """Asynchronously queries a LLM for n independent responses to the latest message history. Samples are not served
+    from the response cache, as they are meant to be independent draws.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        n (int): The number of responses.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        List[str]: Responses from the LLM.
+
+    Raises:
+        ValueError: If n is less than 1.
+        LLMError: If the call to the LLM fails.
+    """
+    check_num_samples(n)
+    return await query_provider_samples_async(
+        model_info=model_info, message_history=message_history, n=n, usage=usage
+    )
+
+
+def find_stop_pattern(
+    previous_text: str, chunk: str, stop_pattern: Optional[str]
+) -> Optional[int]:
+    """Checks if a stop pattern is completed by the latest chunk of a streamed response, including patterns that span several chunks.
+
+    Args:
+        previous_text (str): The text streamed before the chunk.
+        chunk (str): The latest chunk of the streamed response.
+        stop_pattern (Optional[str]): The pattern after which the generation should stop.
+
+    Returns:
+        Optional[int]: The index in the chunk immediately after the stop pattern, or None if the pattern was not found.
+    """
+    if not stop_pattern:
+        return None
+
+    text = previous_text + chunk
+    pattern_index = text.find(
+        stop_pattern, max(0, len(previous_text) - len(stop_pattern) + 1)
+    )
+    if pattern_index == -1:
+        return None
+
+    return pattern_index + len(stop_pattern) - len(previous_text)
+
+
+def query_llm_stream(
+    model_info: str,
+    message_history: List[dict],
+    stop_pattern: Optional[str] = None,
+    usage: Optional[dict[str, int]] = None,
+) -> Iterator[str]:
+    """Queries a LLM for a streamed response based on the latest message history. The generation is cancelled as soon as the stop pattern appears.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        stop_pattern (Optional[str], optional): The pattern after which the generation is cancelled. The pattern itself is included
+            in the response. Defaults to None.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Yields:
+        str: The chunks of the response from the LLM.
+
+    Raises:
+        LLMError: If the call to the LLM fails.
+    """
+    cache_key, response = get_cached_response(model_info, message_history)
+    if response is not None:
+        stop_index = find_stop_pattern("", response, stop_pattern)
+        yield response if stop_index is None else response[:stop_index]
+        return
+
+    response = ""
+    chunks = query_provider_stream(
+        model_info=model_info, message_history=message_history, usage=usage
+    )
     try:
-        response = openai_client.chat.completions.create(
-            model=model_info, messages=message_history
-        )
-        return response.choices[0].message.content
+        for chunk in chunks:
+            stop_index = find_stop_pattern(response, chunk, stop_pattern)
+            if stop_index is not None:
+                yield chunk[:stop_index]
+                return
+            response += chunk
+            yield chunk
+    finally:
+        chunks.close()
+
+    # Only complete responses are cached, as a cancelled generation depends on the stop pattern
+    store_cached_response(cache_key, response)
 
-    except Exception as e:
-        # Log the exception
-        print(f"Error during OpenAI API call: {e}")
-        return ""
 
+def call_provider(
+    model_info: str,
+    estimated_tokens: int,
+    controller: Optional[AIMDController],
+    request: Callable[[], Any],
+    metric_name: str = "llm_request_duration_seconds",
+    get_usage: Optional[Callable[[Any], Optional[dict[str, int]]]] = itemgetter(
+        "usage"
+    ),
+) -> Any:
+    """Make a single request to a provider, waiting for the rate limiter, reporting its outcome to the concurrency
+    controller, recording its latency and correcting the rate limiter with the usage of the response.
 
-def query_anthropic(model_info: str, messsage_history: List[dict], prompt: str) -> str:
-    """Query Anthropic for the provided prompt."""
+    Args:
+        model_info (str): Information about the model.
+        estimated_tokens (int): The number of tokens reserved for the request.
+        controller (Optional[AIMDController]): The concurrency controller.
+        request (Callable[[], Any]): The function making the request.
+        metric_name (str, optional): The name of the histogram recording the latency. Defaults to "llm_request_duration_seconds".
+        get_usage (Optional[Callable[[Any], Optional[dict[str, int]]]], optional): The function extracting the usage from the
+            response, or None if the caller corrects the rate limiter itself, e.g. once a stream ends. Defaults to the "usage"
+            of the response.
+
+    Returns:
+        Any: The response returned by request.
+    """
+    rate_limiter.acquire(model_info, estimated_tokens)
+    start_time = time.perf_counter()
     try:
-        # Implement integration with Anthropic
-        pass
+        response = request()
     except Exception as e:
-        # Log the exception
-        print(f"Error during Anthropic integration: {e}")
-        return ""
+        report_call_outcome(controller, exception=e)
+        raise
+    latency = time.perf_counter() - start_time
+    report_call_outcome(controller, latency=latency)
+    metrics_registry.observe(metric_name, latency, model=model_info)
+    if get_usage is not None:
+        rate_limiter.reconcile(
+            model_info, estimated_tokens, get_total_tokens(get_usage(response))
+        )
+    return response
 
 
-def integrate_with_mistral(
-    model_info: str, messsage_history: List[dict], prompt: str
-) -> str:
-    """Query Mistral for the provided prompt."""
+async def call_provider_async(
+    model_info: str,
+    estimated_tokens: int,
+    controller: Optional[AIMDController],
+    request: Callable[[], Awaitable[Any]],
+    metric_name: str = "llm_request_duration_seconds",
+    get_usage: Optional[Callable[[Any], Optional[dict[str, int]]]] = itemgetter(
+        "usage"
+    ),
+) -> Any:
+    """Asynchronously make a single request to a provider, as call_provider does.
+
+    Args:
+        model_info (str): Information about the model.
+        estimated_tokens (int): The number of tokens reserved for the request.
+        controller (Optional[AIMDController]): The concurrency controller.
+        request (Callable[[], Awaitable[Any]]): The coroutine function making the request.
+        metric_name (str, optional): The name of the histogram recording the latency. Defaults to "llm_request_duration_seconds".
+        get_usage (Optional[Callable[[Any], Optional[dict[str, int]]]], optional): The function extracting the usage from the
+            response, or None if the caller corrects the rate limiter itself. Defaults to the "usage" of the response.
+
+    Returns:
+        Any: The response returned by request.
+    """
+    await rate_limiter.acquire_async(model_info, estimated_tokens)
+    start_time = time.perf_counter()
     try:
-        # Implement integration with Mistral
-        pass
+        response = await request()
     except Exception as e:
-        # Log the exception
-        print(f"Error during Mistral integration: {e}")
-        return ""
+        report_call_outcome(controller, exception=e)
+        raise
+    latency = time.perf_counter() - start_time
+    report_call_outcome(controller, latency=latency)
+    metrics_registry.observe(metric_name, latency, model=model_info)
+    if get_usage is not None:
+        rate_limiter.reconcile(
+            model_info, estimated_tokens, get_total_tokens(get_usage(response))
+        )
+    return response
 
 
-def integrate_with_meta(
-    model_info: str, messsage_history: List[dict], prompt: str
+def query_provider(
+    model_info: str,
+    message_history: List[dict],
+    usage: Optional[dict[str, int]] = None,
 ) -> str:
-    """Query Meta for the provided prompt."""
+    """Query the provider serving the model with the provided prompt. Transient failures are retried with backoff, and
+    slow calls are hedged if hedging is enabled.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        str: Response from the LLM.
+
+    Raises:
+        LLMError: If the call fails permanently, the retries are exhausted or the circuit breaker of the model is open.
+    """
+    provider = get_provider(model_info)
+    policy = hedging_policy
+    controller = concurrency_controller
+    estimated_tokens = estimate_message_tokens(message_history)
+
+    def create_chat_completion() -> Completion:
+        return call_provider(
+            model_info,
+            estimated_tokens,
+            controller,
+            lambda: provider.complete(model_info, message_history),
+        )
+
+    if policy is not None:
+        completion = resilient_caller.call(
+            model_info,
+            lambda: policy.call(
+                model_info, create_chat_completion, get_usage=itemgetter("usage")
+            ),
+        )
+    else:
+        completion = resilient_caller.call(model_info, create_chat_completion)
+
+    # Only the usage of the returned completion is added, so a losing hedge never changes the usage after the call
+    if usage is not None:
+        add_usage(usage, completion["usage"])
+    return completion["content"]
+
+
+async def query_provider_async(
+    model_info: str,
+    message_history: List[dict],
+    usage: Optional[dict[str, int]] = None,
+) -> str:
+    """Asynchronously query the provider serving the model with the provided prompt. Transient failures are retried with
+    backoff, and slow calls are hedged if hedging is enabled.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        str: Response from the LLM.
+
+    Raises:
+        LLMError: If the call fails permanently, the retries are exhausted or the circuit breaker of the model is open.
+    """
+    provider = get_provider(model_info)
+    policy = hedging_policy
+    controller = concurrency_controller
+    estimated_tokens = estimate_message_tokens(message_history)
+
+    async def create_chat_completion() -> Completion:
+        return await call_provider_async(
+            model_info,
+            estimated_tokens,
+            controller,
+            lambda: provider.complete_async(model_info, message_history),
+        )
+
+    # Losing hedges are cancelled, so unlike in query_provider their usage is not accounted for
+    if policy is not None:
+        completion = await resilient_caller.call_async(
+            model_info, lambda: policy.call_async(model_info, create_chat_completion)
+        )
+    else:
+        completion = await resilient_caller.call_async(
+            model_info, create_chat_completion
+        )
+
+    if usage is not None:
+        add_usage(usage, completion["usage"])
+    return completion["content"]
+
+
+def query_provider_samples(
+    model_info: str,
+    message_history: List[dict],
+    n: int,
+    usage: Optional[dict[str, int]] = None,
+) -> List[str]:
+    """Query the provider serving the model for n completions of the provided prompt. Transient failures are retried
+    with backoff. Samples are not hedged, as a hedge would duplicate every sample.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        n (int): The number of completions.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        List[str]: Responses from the LLM.
+
+    Raises:
+        LLMError: If the call fails permanently, the retries are exhausted or the circuit breaker of the model is open.
+    """
+    provider = get_provider(model_info)
+    controller = concurrency_controller
+    estimated_tokens = estimate_message_tokens(message_history)
+
+    def create_chat_completions() -> Samples:
+        return call_provider(
+            model_info,
+            estimated_tokens,
+            controller,
+            lambda: provider.complete_samples(model_info, message_history, n),
+        )
+
+    samples = resilient_caller.call(model_info, create_chat_completions)
+
+    if usage is not None:
+        add_usage(usage, samples["usage"])
+    return samples["contents"]
+
+
+async def query_provider_samples_async(
+    model_info: str,
+    message_history: List[dict],
+    n: int,
+    usage: Optional[dict[str, int]] = None,
+) -> List[str]:
+    """Asynchronously query the provider serving the model for n completions of the provided prompt. Transient failures
+    are retried with backoff. Samples are not hedged, as a hedge would duplicate every sample.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        n (int): The number of completions.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Returns:
+        List[str]: Responses from the LLM.
+
+    Raises:
+        LLMError: If the call fails permanently, the retries are exhausted or the circuit breaker of the model is open.
+    """
+    provider = get_provider(model_info)
+    controller = concurrency_controller
+    estimated_tokens = estimate_message_tokens(message_history)
+
+    async def create_chat_completions() -> Samples:
+        return await call_provider_async(
+            model_info,
+            estimated_tokens,
+            controller,
+            lambda: provider.complete_samples_async(model_info, message_history, n),
+        )
+
+    samples = await resilient_caller.call_async(model_info, create_chat_completions)
+
+    if usage is not None:
+        add_usage(usage, samples["usage"])
+    return samples["contents"]
+
+
+def query_provider_stream(
+    model_info: str,
+    message_history: List[dict],
+    usage: Optional[dict[str, int]] = None,
+) -> Iterator[str]:
+    """Query the provider serving the model with the provided prompt and stream the response. Failures are retried with
+    backoff until the first chunk of the stream is received.
+
+    Closing the generator closes the underlying HTTP stream, which cancels the generation.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        usage (Optional[dict[str, int]], optional): A record of token usage to which the usage of the call is added. Defaults to None.
+
+    Yields:
+        str: The chunks of the response from the LLM.
+
+    Raises:
+        LLMError: If the call fails permanently, the retries are exhausted, the circuit breaker of the model is open or the stream is interrupted.
+    """
+    provider = get_provider(model_info)
+    controller = concurrency_controller
+    estimated_tokens = estimate_message_tokens(message_history)
+
+    def open_stream() -> tuple[Iterator[Completion], Optional[Completion]]:
+        completions = provider.stream(model_info, message_history)
+        try:
+            return completions, next(completions, None)
+        except Exception:
+            completions.close()
+            raise
+
+    # The usage of a stream is only known once it ends, so the rate limiter is corrected below
+    completions, completion = resilient_caller.call(
+        model_info,
+        lambda: call_provider(
+            model_info,
+            estimated_tokens,
+            controller,
+            open_stream,
+            metric_name="llm_time_to_first_token_seconds",
+            get_usage=None,
+        ),
+    )
+    streamed_text, reported_usage = "", None
     try:
-        # Implement integration with Meta
-        pass
+        while completion is not None:
+            if get_total_tokens(completion["usage"]) is not None:
+                reported_usage = completion["usage"]
+            if completion["content"]:
+                streamed_text += completion["content"]
+                yield completion["content"]
+            completion = next(completions, None)
+
     except Exception as e:
-        # Log the exception
-        print(f"Error during Meta integration: {e}")
-        return ""
+        raise classify_error(e, model_info) from e
+
+    finally:
+        completions.close()
+        # A cancelled stream ends before the provider reports usage, so the tokens streamed so far are estimated
+        if reported_usage is None:
+            completion_tokens = count_tokens(streamed_text)
+            reported_usage = {
+                "prompt_tokens": estimated_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": estimated_tokens + completion_tokens,
+                "cached_tokens": 0,
+            }
+        rate_limiter.reconcile(
+            model_info, estimated_tokens, reported_usage["total_tokens"]
+        )
+        if usage is not None:
+            add_usage(usage, reported_usage)
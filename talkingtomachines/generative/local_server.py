@@ -0,0 +1,370 @@
+import json
+import time
+import uuid
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, List, Optional
+from talkingtomachines.generative.resilience import LLMClientError
+from talkingtomachines.generative.tokens import count_tokens, estimate_message_tokens
+
+Responder = Callable[[str, List[dict]], str]
+
+
+def build_chat_completion(
+    model_info: str, content: str, message_history: Optional[List[dict]] = None
+) -> dict[str, Any]:
+    """Constructs a chat completion object in the format returned by the chat completions endpoint.
+
+    Args:
+        model_info (str): Information about the model.
+        content (str): The content of the assistant message.
+        message_history (Optional[List[dict]], optional): The messages of the request, from which the reported token usage
+            is estimated. Defaults to None, which omits the usage.
+
+    Returns:
+        dict[str, Any]: The chat completion object.
+    """
+    chat_completion = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model_info,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+    if message_history is not None:
+        prompt_tokens = estimate_message_tokens(message_history)
+        completion_tokens = count_tokens(content)
+        chat_completion["usage"] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    return chat_completion
+
+
+def build_chat_completion_chunks(model_info: str, content: str) -> List[dict[str, Any]]:
+    """Constructs the chunks streamed by the chat completions endpoint for a response, one per word.
+
+    Args:
+        model_info (str): Information about the model.
+        content (str): The content of the assistant message.
+
+    Returns:
+        List[dict[str, Any]]: The chat completion chunk objects.
+    """
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    words = content.split(" ")
+    deltas = [
+        {"content": word if index == 0 else " " + word}
+        for index, word in enumerate(words)
+    ]
+    return [
+        {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model_info,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": delta,
+                    "finish_reason": "stop" if index == len(deltas) - 1 else None,
+                }
+            ],
+        }
+        for index, delta in enumerate(deltas)
+    ]
+
+
+class LocalLLMServer:
+    """A local stand-in for the OpenAI HTTP API, serving the chat completions, file and batch endpoints so that
+    experiments can be run, load-tested and benchmarked without network access. Responses are produced by the
+    provided responder, e.g. the respond method of a MockBackend.
+
+    Example:
+        with LocalLLMServer(responder) as server:
+            client = OpenAI(base_url=server.base_url, api_key="local")
+
+    Args:
+        responder (Responder): A function returning the response to a message history for a given model.
+        host (str, optional): The host to bind to. Defaults to "127.0.0.1".
+        port (int, optional): The port to bind to. Defaults to 0, which selects a free port.
+
+    Attributes:
+        files (dict[str, dict[str, Any]]): The uploaded and generated files, keyed by file ID.
+        batches (dict[str, dict[str, Any]]): The created batches, keyed by batch ID.
+    """
+
+    def __init__(self, responder: Responder, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.RLock()
+        self.httpd = ThreadingHTTPServer((host, port), self.create_handler())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Return the base URL to be passed to an OpenAI client.
+
+        Returns:
+            str: The base URL of the server.
+        """
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "LocalLLMServer":
+        """Start serving requests in a background thread.
+
+        Returns:
+            LocalLLMServer: The started server.
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests and release the port.
+
+        Returns:
+            None
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> "LocalLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def create_file(self, filename: str, purpose: str, content: bytes) -> dict:
+        """Store a file and return its file object.
+
+        Args:
+            filename (str): The name of the file.
+            purpose (str): The intended purpose of the file.
+            content (bytes): The content of the file.
+
+        Returns:
+            dict: The file object.
+        """
+        file_object = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_object["id"]] = {"object": file_object, "content": content}
+        return file_object
+
+    def create_batch(self, body: dict) -> dict:
+        """Create a batch from an uploaded input file. The batch is processed on its first retrieval.
+
+        Args:
+            body (dict): The request body of the batch creation.
+
+        Returns:
+            dict: The batch object.
+        """
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        return batch
+
+    def process_batch(self, batch: dict) -> None:
+        """Run every request of a batch through the responder and store the output and error files.
+
+        Args:
+            batch (dict): The batch object.
+
+        Returns:
+            None
+        """
+        content = self.files[batch["input_file_id"]]["content"].decode("utf-8")
+        output_lines, error_lines = [], []
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+
+            request = json.loads(line)
+            body = request["body"]
+            result = {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+            }
+            try:
+                response = self.responder(body["model"], body["messages"])
+                result["response"] = {
+                    "status_code": 200,
+                    "body": build_chat_completion(
+                        body["model"], response, body["messages"]
+                    ),
+                }
+                result["error"] = None
+                output_lines.append(json.dumps(result))
+            except Exception as e:
+                result["response"] = {"status_code": 500, "body": {}}
+                result["error"] = {"code": "server_error", "message": str(e)}
+                error_lines.append(json.dumps(result))
+
+        batch["request_counts"] = {
+            "total": len(output_lines) + len(error_lines),
+            "completed": len(output_lines),
+            "failed": len(error_lines),
+        }
+        if output_lines:
+            batch["output_file_id"] = self.create_file(
+                "output.jsonl", "batch_output", "\n".join(output_lines).encode("utf-8")
+            )["id"]
+        if error_lines:
+            batch["error_file_id"] = self.create_file(
+                "errors.jsonl", "batch_output", "\n".join(error_lines).encode("utf-8")
+            )["id"]
+        batch["status"] = "completed"
+
+    def create_handler(self) -> type:
+        """Construct the request handler class bound to this server.
+
+        Returns:
+            type: The request handler class.
+        """
+        server = self
+
+        class LocalLLMRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def send_json(self, status_code: int, payload: Any) -> None:
+                self.send_bytes(status_code, json.dumps(payload).encode("utf-8"))
+
+            def send_bytes(
+                self,
+                status_code: int,
+                content: bytes,
+                content_type: str = "application/json",
+            ) -> None:
+                self.send_response(status_code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def read_body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def send_not_found(self) -> None:
+                self.send_json(
+                    404, {"error": {"message": f"Unknown path {self.path}."}}
+                )
+
+            def send_chat_completion(self, body: dict) -> None:
+                try:
+                    response = server.responder(body["model"], body["messages"])
+                except Exception as e:
+                    status_code = 400 if isinstance(e, LLMClientError) else 500
+                    return self.send_json(
+                        status_code, {"error": {"message": str(e), "type": "error"}}
+                    )
+
+                if not body.get("stream"):
+                    return self.send_json(
+                        200,
+                        build_chat_completion(
+                            body["model"], response, body["messages"]
+                        ),
+                    )
+
+                events = [
+                    f"data: {json.dumps(chunk)}\n\n"
+                    for chunk in build_chat_completion_chunks(body["model"], response)
+                ]
+                events.append("data: [DONE]\n\n")
+                self.send_bytes(
+                    200, "".join(events).encode("utf-8"), "text/event-stream"
+                )
+
+            def do_GET(self) -> None:
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    with server.lock:
+                        batch = server.batches.get(parts[2])
+                        if batch is not None and batch["status"] == "validating":
+                            server.process_batch(batch)
+                    if batch is None:
+                        return self.send_not_found()
+                    return self.send_json(200, batch)
+
+                if parts[:2] == ["v1", "files"] and len(parts) == 4:
+                    stored_file = server.files.get(parts[2])
+                    if stored_file is None or parts[3] != "content":
+                        return self.send_not_found()
+                    return self.send_bytes(
+                        200, stored_file["content"], "application/octet-stream"
+                    )
+
+                self.send_not_found()
+
+            def do_POST(self) -> None:
+                path = self.path.split("?")[0].rstrip("/")
+                body = self.read_body()
+                if path == "/v1/files":
+                    message = BytesParser(policy=default_policy).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode(
+                            "utf-8"
+                        )
+                        + body
+                    )
+                    fields = {}
+                    for part in message.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        fields[name] = (
+                            part.get_filename(),
+                            part.get_payload(decode=True),
+                        )
+                    filename, content = fields["file"]
+                    return self.send_json(
+                        200,
+                        server.create_file(
+                            filename, fields["purpose"][1].decode("utf-8"), content
+                        ),
+                    )
+
+                if path == "/v1/batches":
+                    return self.send_json(200, server.create_batch(json.loads(body)))
+
+                if path == "/v1/chat/completions":
+                    return self.send_chat_completion(json.loads(body))
+
+                self.send_not_found()
+
+        return LocalLLMRequestHandler
@@ -0,0 +1,114 @@
+from typing import Any, List, Union
+
+
+class Message:
+    """A compact record of a message exchanged with a synthetic agent. Unlike a dictionary, a message has no per-instance
+    hash table, which matters when tens of thousands of agents hold their conversations in memory.
+
+    Messages support read access by key, e.g. message["content"], so that they can be passed wherever a message
+    dictionary is read. They are converted to dictionaries with to_dict before being sent to a provider.
+
+    Args:
+        role (str): The identifier of the party that generated the message.
+        content (str): The content of the message.
+    """
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value of a field of the message, as dict.get does.
+
+        Args:
+            key (str): The name of the field, either "role" or "content".
+            default (Any, optional): The value returned for any other key. Defaults to None.
+
+        Returns:
+            Any: The value of the field, or the default.
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Message, dict)):
+            return self.role == other.get("role") and self.content == other.get(
+                "content"
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+    def to_dict(self) -> dict[str, str]:
+        """Converts the Message object to a dictionary.
+
+        Returns:
+            dict[str, str]: A dictionary with the role and content of the message.
+        """
+        return {"role": self.role, "content": self.content}
+
+
+def to_message_dicts(messages: List[Union[Message, dict]]) -> List[dict]:
+    """Convert messages to the dictionaries expected by providers. Message dictionaries are passed through unchanged.
+
+    Args:
+        messages (List[Union[Message, dict]]): The messages.
+
+    Returns:
+        List[dict]: The messages as dictionaries.
+    """
+    return [
+        message.to_dict() if isinstance(message, Message) else message
+        for message in messages
+    ]
+
+
+class StringTable:
+    """A table of shared strings, so that large strings that are equal but built separately, e.g. the system messages of
+    the agents that play the same role under the same treatment, are held once and referenced by every agent.
+
+    Unlike sys.intern, the strings are released together with the table, e.g. when the experiment that owns it ends.
+
+    Attributes:
+        strings (dict[str, str]): The shared copy of each distinct string.
+    """
+
+    __slots__ = ("strings",)
+
+    def __init__(self):
+        self.strings = {}
+
+    def share(self, string: str) -> str:
+        """Return the shared copy of a string, adding the string to the table if it is new.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            str: The shared string, which is equal to the provided string.
+        """
+        return self.strings.setdefault(string, string)
+
+    def clear(self) -> None:
+        """Release the shared strings. Strings that are still referenced by agents stay valid, but are no longer shared
+        with agents created afterwards.
+
+        Returns:
+            None
+        """
+        self.strings.clear()
+
+    def __len__(self) -> int:
+        return len(self.strings)
@@ -0,0 +1,281 @@
+import math
+import threading
+from typing import Any, Optional
+
+DEFAULT_QUANTILES = [0.5, 0.9, 0.99, 0.999]
+METRIC_DESCRIPTIONS = {
+    "llm_request_duration_seconds": "Duration of successful LLM calls.",
+    "llm_time_to_first_token_seconds": "Time until the first chunk of streamed LLM calls, including retries.",
+    "llm_errors_total": "Failed LLM call attempts by error type.",
+    "llm_retries_total": "Retried LLM call attempts.",
+    "llm_cache_hits_total": "LLM responses served from the response cache.",
+    "llm_cache_misses_total": "LLM requests not found in the response cache.",
+    "turn_duration_seconds": "Duration of conversation turns.",
+    "session_duration_seconds": "Duration of sessions.",
+    "sessions_total": "Finished sessions by status.",
+}
+
+
+class Histogram:
+    """A histogram with log-linear buckets in the style of HdrHistogram. Values are counted in integer multiples of unit,
+    and each power of two is split into 2 ** (precision_bits - 1) buckets, so that percentiles are reported with a
+    relative error below 2 ** -precision_bits while recording stays O(1).
+
+    Args:
+        unit (float, optional): The smallest distinguishable value, e.g. one microsecond for durations in seconds.
+            Defaults to 1e-6.
+        precision_bits (int, optional): The number of significant bits kept per value. Defaults to 7.
+
+    Attributes:
+        counts (dict[int, int]): The number of values recorded in each non-empty bucket.
+        count (int): The number of values recorded.
+        sum (float): The sum of the values recorded.
+    """
+
+    def __init__(self, unit: float = 1e-6, precision_bits: int = 7):
+        self.unit = unit
+        self.precision_bits = precision_bits
+        self.counts = {}
+        self.count = 0
+        self.sum = 0.0
+
+    def get_bucket_index(self, value: float) -> int:
+        """Return the index of the bucket that holds a value.
+
+        Args:
+            value (float): The value.
+
+        Returns:
+            int: The index of the bucket.
+        """
+        units = max(0, int(value / self.unit))
+        shift = units.bit_length() - self.precision_bits
+        if shift <= 0:
+            return units
+        return (shift << self.precision_bits) + (units >> shift)
+
+    def get_bucket_value(self, index: int) -> float:
+        """Return the midpoint of a bucket.
+
+        Args:
+            index (int): The index of the bucket.
+
+        Returns:
+            float: The value representing the bucket.
+        """
+        shift = index >> self.precision_bits
+        if shift == 0:
+            return index * self.unit
+        lower_bound = (index & ((1 << self.precision_bits) - 1)) << shift
+        return (lower_bound + (1 << shift) / 2) * self.unit
+
+    def record(self, value: float) -> None:
+        """Record a value.
+
+        Args:
+            value (float): The value to be recorded.
+
+        Returns:
+            None
+        """
+        index = self.get_bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, histogram: "Histogram") -> None:
+        """Add the values recorded in another histogram with the same buckets.
+
+        Args:
+            histogram (Histogram): The histogram to be merged.
+
+        Returns:
+            None
+        """
+        for index, count in histogram.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += histogram.count
+        self.sum += histogram.sum
+
+    def get_percentile(self, percentile: float) -> Optional[float]:
+        """Return a percentile of the recorded values.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            Optional[float]: The value at the percentile, or None if no values were recorded.
+        """
+        if self.count == 0:
+            return None
+
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        cumulative_count = 0
+        for index in sorted(self.counts):
+            cumulative_count += self.counts[index]
+            if cumulative_count >= rank:
+                return self.get_bucket_value(index)
+        return self.get_bucket_value(max(self.counts))
+
+    def summarize(self) -> dict[str, Any]:
+        """Summarise the recorded values.
+
+        Returns:
+            dict[str, Any]: The count, mean and the 50th, 90th and 99th percentiles of the recorded values.
+        """
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.get_percentile(50),
+            "p90": self.get_percentile(90),
+            "p99": self.get_percentile(99),
+        }
+
+
+def format_labels(labels: tuple, extra_labels: tuple = ()) -> str:
+    """Format metric labels in the Prometheus text format.
+
+    Args:
+        labels (tuple): The label names and values, as sorted (name, value) pairs.
+        extra_labels (tuple, optional): Additional (name, value) pairs, e.g. the quantile. Defaults to ().
+
+    Returns:
+        str: The formatted labels, or an empty string if there are none.
+    """
+    pairs = labels + extra_labels
+    if not pairs:
+        return ""
+
+    formatted_pairs = []
+    for name, value in pairs:
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        formatted_pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(formatted_pairs) + "}"
+
+
+class MetricsRegistry:
+    """An in-process registry of counters and latency histograms, exported in the Prometheus text format.
+
+    Metrics are identified by their name and labels. Updates take a single lock and do not allocate once a series
+    exists, so that instrumenting the hot path is cheap.
+
+    Attributes:
+        counters (dict[str, dict[tuple, float]]): The value of each counter series, keyed by name and labels.
+        histograms (dict[str, dict[tuple, Histogram]]): The histogram of each series, keyed by name and labels.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (float, optional): The amount to add. Defaults to 1.
+            **labels (Any): The labels of the series.
+
+        Returns:
+            None
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a value in a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            value (float): The value to be recorded.
+            **labels (Any): The labels of the series.
+
+        Returns:
+            None
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.record(value)
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        """Return the value of a counter series.
+
+        Args:
+            name (str): The name of the counter.
+            **labels (Any): The labels of the series.
+
+        Returns:
+            float: The value of the counter, or 0 if it was never incremented.
+        """
+        with self.lock:
+            return self.counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def get_histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        """Return the histogram of a series.
+
+        Args:
+            name (str): The name of the histogram.
+            **labels (Any): The labels of the series.
+
+        Returns:
+            Optional[Histogram]: The histogram, or None if no value was recorded.
+        """
+        with self.lock:
+            return self.histograms.get(name, {}).get(tuple(sorted(labels.items())))
+
+    def reset(self) -> None:
+        """Remove every metric from the registry.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def export_prometheus(self, quantiles: Optional[list[float]] = None) -> str:
+        """Export the metrics in the Prometheus text format. Histograms are exported as summaries with quantiles, sum
+        and count.
+
+        Args:
+            quantiles (Optional[list[float]], optional): The quantiles reported for each histogram. Defaults to DEFAULT_QUANTILES.
+
+        Returns:
+            str: The metrics in the Prometheus text format.
+        """
+        quantiles = DEFAULT_QUANTILES if quantiles is None else quantiles
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {METRIC_DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, histogram in sorted(series.items()):
+                    for quantile in quantiles:
+                        value = histogram.get_percentile(quantile * 100)
+                        lines.append(
+                            f"{name}{format_labels(labels, (('quantile', quantile),))} {value}"
+                        )
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{format_labels(labels)} {histogram.count}"
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,409 @@
+import os
+import glob
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Iterator, List, Optional
+from talkingtomachines.generative.providers import (
+    Completion,
+    ProviderBackend,
+    Samples,
+)
+from talkingtomachines.generative.resilience import LLMClientError
+from talkingtomachines.generative.tokens import count_tokens, estimate_message_tokens
+
+SUPPORTED_LATENCY_DISTRIBUTIONS = ["constant", "uniform", "exponential", "lognormal"]
+MOCK_VOCABULARY = [
+    "I",
+    "think",
+    "that",
+    "the",
+    "offer",
+    "is",
+    "fair",
+    "and",
+    "would",
+    "like",
+    "to",
+    "accept",
+    "it",
+    "but",
+    "we",
+    "could",
+    "also",
+    "discuss",
+    "a",
+    "different",
+    "split",
+    "of",
+    "money",
+    "today",
+]
+
+
+def get_request_seed(
+    model_info: str, message_history: List[dict], seed: int, sample_index: int = 0
+) -> int:
+    """Derive a deterministic seed from a request, so that mock responses do not depend on the order in which requests arrive.
+
+    Args:
+        model_info (str): Information about the model.
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+        seed (int): The seed of the backend.
+        sample_index (int, optional): The index of the sample, when several completions of the request are generated. Defaults to 0.
+
+    Returns:
+        int: The seed of the request.
+    """
+    request = [seed, model_info, message_history]
+    if sample_index:
+        request.append(sample_index)
+    payload = json.dumps(request, sort_keys=True)
+    return int.from_bytes(hashlib.sha256(payload.encode("utf-8")).digest()[:8], "big")
+
+
+def get_message_history_key(message_history: List[dict]) -> str:
+    """Compute the key under which the response to a message history is recorded for replay.
+
+    Args:
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+    Returns:
+        str: The key of the message history.
+    """
+    payload = json.dumps(
+        [[message["role"], message["content"]] for message in message_history],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MockBackend(ProviderBackend):
+    """A deterministic, offline backend that generates synthetic responses, used to benchmark orchestration overhead
+    without calling a live API.
+
+    Responses are derived from a hash of the request, so the same request always receives the same response
+    regardless of concurrency. Latencies are sampled from the configured distribution.
+
+    Args:
+        name (str, optional): The name of the provider. Defaults to "mock".
+        latency_distribution (str, optional): The distribution of the latency of each call, one of "constant",
+            "uniform", "exponential" or "lognormal". Defaults to "constant".
+        mean_latency (float, optional): The mean latency in seconds. Defaults to 0.
+        latency_spread (float, optional): The spread of the latency distribution. This is the half-width for "uniform"
+            and the standard deviation of the underlying normal distribution for "lognormal". Defaults to 0.5.
+        min_response_length (int, optional): The minimum number of words of a response. Defaults to 5.
+        max_response_length (int, optional): The maximum number of words of a response. Defaults to 30.
+        end_of_conversation (Optional[str], optional): A sentence appended to responses with the provided probability.
+            Defaults to None.
+        end_of_conversation_probability (float, optional): The probability of appending end_of_conversation. Defaults to 0.
+        seed (int, optional): The seed of the backend. Defaults to 0.
+
+    Raises:
+        ValueError: If the provided latency distribution is not supported or a parameter is out of range.
+    """
+
+    def __init__(
+        self,
+        name: str = "mock",
+        latency_distribution: str = "constant",
+        mean_latency: float = 0.0,
+        latency_spread: float = 0.5,
+        min_response_length: int = 5,
+        max_response_length: int = 30,
+        end_of_conversation: Optional[str] = None,
+        end_of_conversation_probability: float = 0.0,
+        seed: int = 0,
+    ):
+        if latency_distribution not in SUPPORTED_LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unsupported latency_distribution: {latency_distribution}. Supported distributions are: {SUPPORTED_LATENCY_DISTRIBUTIONS}."
+            )
+        if mean_latency < 0 or latency_spread < 0:
+            raise ValueError(
+                f"Invalid values for mean_latency ({mean_latency}) and latency_spread ({latency_spread}). Both should be non-negative."
+            )
+        if min_response_length < 1 or max_response_length < min_response_length:
+            raise ValueError(
+                f"Invalid values for min_response_length ({min_response_length}) and max_response_length ({max_response_length}). "
+                "min_response_length should be at least 1 and max_response_length should not be less than min_response_length."
+            )
+        if not 0 <= end_of_conversation_probability <= 1:
+            raise ValueError(
+                f"Invalid value for end_of_conversation_probability: {end_of_conversation_probability}. end_of_conversation_probability should be between 0 and 1."
+            )
+
+        super().__init__(name)
+        self.latency_distribution = latency_distribution
+        self.mean_latency = mean_latency
+        self.latency_spread = latency_spread
+        self.min_response_length = min_response_length
+        self.max_response_length = max_response_length
+        self.end_of_conversation = end_of_conversation
+        self.end_of_conversation_probability = end_of_conversation_probability
+        self.seed = seed
+
+    def get_latency(self, generator: random.Random) -> float:
+        """Sample the latency of a call from the configured distribution.
+
+        Args:
+            generator (random.Random): The random number generator of the request.
+
+        Returns:
+            float: The latency in seconds.
+        """
+        if self.mean_latency == 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return max(
+                0.0,
+                generator.uniform(
+                    self.mean_latency - self.latency_spread,
+                    self.mean_latency + self.latency_spread,
+                ),
+            )
+        if self.latency_distribution == "exponential":
+            return generator.expovariate(1 / self.mean_latency)
+        if self.latency_distribution == "lognormal":
+            # Choose mu so that the mean of the lognormal distribution equals mean_latency
+            mu = math.log(self.mean_latency) - self.latency_spread**2 / 2
+            return generator.lognormvariate(mu, self.latency_spread)
+        return self.mean_latency
+
+    def generate(
+        self, model_info: str, message_history: List[dict], sample_index: int = 0
+    ) -> tuple[str, float]:
+        """Generate the response to a request and the latency with which it is returned.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            sample_index (int, optional): The index of the sample, when several completions of the request are generated. Defaults to 0.
+
+        Returns:
+            tuple[str, float]: The response and its latency in seconds.
+        """
+        generator = random.Random(
+            get_request_seed(model_info, message_history, self.seed, sample_index)
+        )
+        latency = self.get_latency(generator)
+        num_words = generator.randint(
+            self.min_response_length, self.max_response_length
+        )
+        response = " ".join(generator.choice(MOCK_VOCABULARY) for _ in range(num_words))
+        response = response[0].upper() + response[1:] + "."
+        if (
+            self.end_of_conversation
+            and generator.random() < self.end_of_conversation_probability
+        ):
+            response += " " + self.end_of_conversation
+
+        return response, latency
+
+    def respond(self, model_info: str, message_history: List[dict]) -> str:
+        """Generate the response to a request after waiting for its latency. Can be used as the responder of a LocalLLMServer.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+        Returns:
+            str: The response.
+        """
+        response, latency = self.generate(model_info, message_history)
+        time.sleep(latency)
+        return response
+
+    def build_completion(
+        self, message_history: List[dict], response: str
+    ) -> Completion:
+        """Construct a completion with estimated token usage.
+
+        Args:
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            response (str): The response.
+
+        Returns:
+            Completion: The content and usage of the completion.
+        """
+        prompt_tokens = estimate_message_tokens(message_history)
+        completion_tokens = count_tokens(response)
+        return {
+            "content": response,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "cached_tokens": 0,
+            },
+        }
+
+    def complete(self, model_info: str, message_history: List[dict]) -> Completion:
+        return self.build_completion(
+            message_history, self.respond(model_info, message_history)
+        )
+
+    async def complete_async(
+        self, model_info: str, message_history: List[dict]
+    ) -> Completion:
+        response, latency = self.generate(model_info, message_history)
+        await asyncio.sleep(latency)
+        return self.build_completion(message_history, response)
+
+    def generate_samples(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> tuple[Samples, float]:
+        """Generate n samples of the response to a request in a single call, as providers with native support do. The
+        prompt is counted once, and the samples are returned after the slowest one.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            n (int): The number of samples.
+
+        Returns:
+            tuple[Samples, float]: The samples and their latency in seconds.
+        """
+        responses, latencies = zip(
+            *(
+                self.generate(model_info, message_history, sample_index)
+                for sample_index in range(n)
+            )
+        )
+        prompt_tokens = estimate_message_tokens(message_history)
+        completion_tokens = sum(count_tokens(response) for response in responses)
+        samples = {
+            "contents": list(responses),
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "cached_tokens": 0,
+            },
+        }
+        return samples, max(latencies)
+
+    def complete_samples(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        samples, latency = self.generate_samples(model_info, message_history, n)
+        time.sleep(latency)
+        return samples
+
+    async def complete_samples_async(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        samples, latency = self.generate_samples(model_info, message_history, n)
+        await asyncio.sleep(latency)
+        return samples
+
+    def stream(
+        self, model_info: str, message_history: List[dict]
+    ) -> Iterator[Completion]:
+        response, latency = self.generate(model_info, message_history)
+        words = response.split(" ")
+        for index, word in enumerate(words):
+            time.sleep(latency / len(words))
+            yield {"content": word if index == 0 else " " + word, "usage": None}
+
+        yield {
+            "content": "",
+            "usage": self.build_completion(message_history, response)["usage"],
+        }
+
+
+class ReplayBackend(MockBackend):
+    """A backend that serves the responses recorded in previous experiment runs, keyed by the exact message history
+    of each request.
+
+    Requests that were not recorded raise LLMClientError, unless fallback is enabled, in which case they receive a
+    synthetic response as in MockBackend.
+
+    Args:
+        transcripts (dict[str, str]): A dictionary mapping message history keys to recorded responses.
+        name (str, optional): The name of the provider. Defaults to "replay".
+        fallback (bool, optional): Indicates whether unrecorded requests receive a synthetic response. Defaults to False.
+        **mock_options (Any): The options of the latency distribution and synthetic responses, as in MockBackend.
+    """
+
+    def __init__(
+        self,
+        transcripts: dict[str, str],
+        name: str = "replay",
+        fallback: bool = False,
+        **mock_options: Any,
+    ):
+        super().__init__(name=name, **mock_options)
+        self.transcripts = transcripts
+        self.fallback = fallback
+
+    @classmethod
+    def from_experiments(
+        cls,
+        paths: Optional[List[str]] = None,
+        directory: str = "storage/experiment",
+        **options: Any,
+    ) -> "ReplayBackend":
+        """Construct a replay backend from experiments saved by save_experiment.
+
+        Args:
+            paths (Optional[List[str]], optional): The paths of the experiment JSON files. Defaults to every file in directory.
+            directory (str, optional): The directory of the saved experiments. Defaults to "storage/experiment".
+            **options (Any): The options of the backend.
+
+        Returns:
+            ReplayBackend: The replay backend.
+        """
+        if paths is None:
+            paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+
+        transcripts = {}
+        for path in paths:
+            with open(path, "r") as file:
+                experiment = json.load(file)
+            transcripts.update(cls.extract_transcripts(experiment))
+
+        return cls(transcripts, **options)
+
+    @staticmethod
+    def extract_transcripts(experiment: dict[str, Any]) -> dict[str, str]:
+        """Extract the recorded request-response pairs from the message histories of the agents of a saved experiment.
+        The responses generated by an agent's LLM are recorded with the "user" role.
+
+        Args:
+            experiment (dict[str, Any]): The saved experiment.
+
+        Returns:
+            dict[str, str]: A dictionary mapping message history keys to recorded responses.
+        """
+        transcripts = {}
+        for session_info in experiment.get("sessions", {}).values():
+            for agent in session_info.get("agents", []):
+                message_history = agent.get("message_history", [])
+                for index, message in enumerate(message_history):
+                    if index > 0 and message["role"] == "user":
+                        key = get_message_history_key(message_history[:index])
+                        transcripts[key] = message["content"]
+
+        return transcripts
+
+    def generate(
+        self, model_info: str, message_history: List[dict], sample_index: int = 0
+    ) -> tuple[str, float]:
+        response, latency = super().generate(model_info, message_history, sample_index)
+        recorded_response = self.transcripts.get(
+            get_message_history_key(message_history)
+        )
+        if recorded_response is not None:
+            return recorded_response, latency
+        if self.fallback:
+            return response, latency
+
+        raise LLMClientError(
+            f"No recorded response for the request to model {model_info}.",
+            model_info=model_info,
+        )
@@ -0,0 +1,224 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, List, Optional
+from talkingtomachines.generative.prompt import (
+    generate_demographic_prompt,
+    generate_demographic_prompts,
+)
+from talkingtomachines.generative.tokens import count_tokens
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def is_missing_value(value: Any) -> bool:
+    """Check if a demographic value is missing, i.e. None, NaN, NaT, NA or an empty string.
+
+    Args:
+        value (Any): The value to be checked.
+
+    Returns:
+        bool: True if the value is missing, False otherwise.
+    """
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+
+    try:
+        # NaN and NaT are the only values that are not equal to themselves
+        return bool(value != value)
+    except (TypeError, ValueError):
+        # pd.NA cannot be converted to a boolean
+        return True
+
+
+class PersonaCompiler:
+    """Compiles the demographic information of synthetic subjects into personas that fit within a token budget, so that
+    wide panels with hundreds of columns do not inflate the prompt of every turn of every session.
+
+    The fields are ordered by the priority list, then by descending relevance score, then in the order of the
+    demographic information. They are added in that order while they fit within the budget, so that a field that does
+    not fit is skipped in favour of shorter fields of lower priority. The personas keep the format of
+    generate_demographic_prompt, numbered over the selected fields. Personas are cached by the ID of the subject.
+
+    The compiler only changes the prompts. The demographic information used to assign subjects to sessions is unchanged.
+
+    Args:
+        max_tokens (Optional[int], optional): The token budget of each persona. Defaults to None, which selects every field.
+        priority (Optional[List[str]], optional): The fields to be selected first, in order of importance. Defaults to None.
+        relevance_scores (Optional[dict[str, float]], optional): The relevance of each field to the experiment. Fields
+            with a score of zero or less are never selected. Defaults to None.
+        exclude_fields (Optional[List[str]], optional): The fields that are never selected. Defaults to ["ID"].
+        skip_missing (bool, optional): Whether to skip fields whose value is missing. Defaults to True.
+
+    Attributes:
+        personas (dict[Any, dict[str, Any]]): The compiled persona of each subject, keyed by ID.
+
+    Raises:
+        ValueError: If the provided max_tokens is less than 1.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        priority: Optional[List[str]] = None,
+        relevance_scores: Optional[dict[str, float]] = None,
+        exclude_fields: Optional[List[str]] = None,
+        skip_missing: bool = True,
+    ):
+        if max_tokens is not None and max_tokens < 1:
+            raise ValueError(
+                f"Invalid value for max_tokens: {max_tokens}. max_tokens should be an integer that is equal to or greater than 1."
+            )
+
+        self.max_tokens = max_tokens
+        self.priority = list(priority or [])
+        self.relevance_scores = dict(relevance_scores or {})
+        self.exclude_fields = set(["ID"] if exclude_fields is None else exclude_fields)
+        self.skip_missing = skip_missing
+        self.personas = {}
+        self.field_orders = {}
+
+    def order_fields(self, fields: List[str]) -> List[str]:
+        """Order the candidate fields of a persona by importance, leaving out excluded and irrelevant fields.
+
+        Args:
+            fields (List[str]): The fields of the demographic information, in their original order.
+
+        Returns:
+            List[str]: The candidate fields, from the most to the least important.
+        """
+        key = tuple(fields)
+        if key not in self.field_orders:
+            priority_ranks = {field: rank for rank, field in enumerate(self.priority)}
+            candidate_fields = [
+                field
+                for field in fields
+                if field not in self.exclude_fields
+                and self.relevance_scores.get(field, 1) > 0
+            ]
+            # sorted is stable, so fields without a priority or score keep their original order
+            self.field_orders[key] = sorted(
+                candidate_fields,
+                key=lambda field: (
+                    priority_ranks.get(field, len(priority_ranks)),
+                    -self.relevance_scores.get(field, 0),
+                ),
+            )
+
+        return self.field_orders[key]
+
+    def select_fields(self, demographic_info: dict[str, Any]) -> dict[str, Any]:
+        """Select the fields of a persona that fit within the token budget.
+
+        Args:
+            demographic_info (dict[str, Any]): The demographic information of the synthetic subject.
+
+        Returns:
+            dict[str, Any]: The selected fields and their values, in order of importance.
+        """
+        selected_fields = {}
+        num_tokens = 0
+        for field in self.order_fields(list(demographic_info)):
+            value = demographic_info[field]
+            if self.skip_missing and is_missing_value(value):
+                continue
+
+            field_tokens = count_tokens(
+                f"{len(selected_fields) + 1}) Interviewer: {field} Me: {value} "
+            )
+            if (
+                self.max_tokens is not None
+                and num_tokens + field_tokens > self.max_tokens
+            ):
+                continue
+
+            selected_fields[field] = value
+            num_tokens += field_tokens
+
+        return selected_fields
+
+    def add_persona(
+        self, subject_id: Any, selected_fields: dict[str, Any], full_prompt: str
+    ) -> str:
+        """Format the selected fields of a subject as a persona and cache it, unless the subject has no ID.
+
+        Args:
+            subject_id (Any): The ID of the subject, or None.
+            selected_fields (dict[str, Any]): The selected fields and their values, in order of importance.
+            full_prompt (str): The demographic prompt with every field of the subject.
+
+        Returns:
+            str: The persona, formatted as a demographic prompt.
+        """
+        prompt = generate_demographic_prompt(selected_fields)
+        if subject_id is not None:
+            self.personas[subject_id] = {
+                "prompt": prompt,
+                "fields": list(selected_fields),
+                "num_tokens": count_tokens(prompt),
+                "full_num_tokens": count_tokens(full_prompt),
+            }
+
+        return prompt
+
+    def compile(self, demographic_info: dict[str, Any]) -> str:
+        """Compile the persona of a synthetic subject, reusing the cached persona of its ID if there is one.
+
+        Args:
+            demographic_info (dict[str, Any]): The demographic information of the synthetic subject.
+
+        Returns:
+            str: The persona, formatted as a demographic prompt.
+        """
+        subject_id = demographic_info.get("ID")
+        if subject_id is not None and subject_id in self.personas:
+            return self.personas[subject_id]["prompt"]
+
+        return self.add_persona(
+            subject_id,
+            self.select_fields(demographic_info),
+            generate_demographic_prompt(demographic_info),
+        )
+
+    def compile_personas(self, agent_demographics: pd.DataFrame) -> List[str]:
+        """Compile the personas of every row of a DataFrame, reusing the cached personas of known IDs.
+
+        Args:
+            agent_demographics (pd.DataFrame): The demographic information of the synthetic subjects, with one row per subject.
+
+        Returns:
+            List[str]: The persona of each row, in the order of the rows.
+        """
+        full_prompts = generate_demographic_prompts(agent_demographics)
+        personas = []
+        for demographic_info, full_prompt in zip(
+            agent_demographics.to_dict(orient="records"), full_prompts
+        ):
+            subject_id = demographic_info.get("ID")
+            if subject_id is not None and subject_id in self.personas:
+                personas.append(self.personas[subject_id]["prompt"])
+            else:
+                personas.append(
+                    self.add_persona(
+                        subject_id, self.select_fields(demographic_info), full_prompt
+                    )
+                )
+
+        return personas
+
+    def get_token_report(self) -> dict[Any, dict[str, int]]:
+        """Return the token cost of each compiled persona.
+
+        Returns:
+            dict[Any, dict[str, int]]: A dictionary mapping the ID of each subject to the number of selected fields, the
+                number of tokens of its persona and the number of tokens of its full demographic prompt.
+        """
+        return {
+            subject_id: {
+                "num_fields": len(persona["fields"]),
+                "num_tokens": persona["num_tokens"],
+                "full_num_tokens": persona["full_num_tokens"],
+            }
+            for subject_id, persona in self.personas.items()
+        }
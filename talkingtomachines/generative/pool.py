@@ -0,0 +1,461 @@
+import time
+import asyncio
+from typing import Any, Iterator, List, Optional, Union
+from talkingtomachines.generative.providers import (
+    Completion,
+    ProviderBackend,
+    Samples,
+)
+from talkingtomachines.generative.rate_limit import TokenBucket
+from talkingtomachines.generative.resilience import (
+    LLMError,
+    LLMRateLimitError,
+    LLMServerError,
+    LLMTimeoutError,
+    classify_error,
+)
+from talkingtomachines.generative.tokens import estimate_message_tokens
+
+SUPPORTED_ROUTING_STRATEGIES = ["least_outstanding", "remaining_quota"]
+
+
+class PoolMember:
+    """A provider backend in a pool, e.g. one API key or one endpoint, with its own limits, health and metrics.
+
+    Args:
+        backend (ProviderBackend): The provider backend of the member.
+        requests_per_minute (Optional[int], optional): The maximum number of requests per minute of the member. Defaults to None (unlimited).
+        tokens_per_minute (Optional[int], optional): The maximum number of tokens per minute of the member. Defaults to None (unlimited).
+
+    Attributes:
+        backend (ProviderBackend): The provider backend of the member.
+        request_bucket (Optional[TokenBucket]): The requests-per-minute bucket of the member.
+        token_bucket (Optional[TokenBucket]): The tokens-per-minute bucket of the member.
+        in_flight (int): The number of outstanding requests.
+        consecutive_failures (int): The number of consecutive server-side failures.
+        ejected_until (Optional[float]): The monotonic time at which an ejected member returns to the pool, or None.
+        metrics (dict[str, Any]): The number of requests, failures, ejections and tokens, and the total latency of the member.
+    """
+
+    def __init__(
+        self,
+        backend: ProviderBackend,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.request_bucket = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60)
+            if requests_per_minute
+            else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+            if tokens_per_minute
+            else None
+        )
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = None
+        self.metrics = {
+            "requests": 0,
+            "failures": 0,
+            "ejections": 0,
+            "total_tokens": 0,
+            "total_latency": 0.0,
+        }
+
+    def is_ejected(self, now: float) -> bool:
+        """Check if the member is ejected from the pool.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            bool: True if the member is ejected, False otherwise.
+        """
+        return self.ejected_until is not None and now < self.ejected_until
+
+    def get_wait_time(self, num_tokens: int) -> float:
+        """Return the number of seconds until the member has quota for a request.
+
+        Args:
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            float: The number of seconds to wait, or 0 if the member has quota now.
+        """
+        wait_time = 0.0
+        if self.request_bucket is not None:
+            wait_time = max(wait_time, self.request_bucket.get_wait_time(1))
+        if self.token_bucket is not None:
+            wait_time = max(wait_time, self.token_bucket.get_wait_time(num_tokens))
+
+        return wait_time
+
+    def get_remaining_quota(self) -> float:
+        """Return the share of the member's per-minute quota that is still available.
+
+        Returns:
+            float: The smallest available share of the request and token buckets, or 1 if the member is unlimited.
+        """
+        remaining_quota = 1.0
+        for bucket in (self.request_bucket, self.token_bucket):
+            if bucket is not None:
+                bucket.refill()
+                remaining_quota = min(
+                    remaining_quota, bucket.available / bucket.capacity
+                )
+
+        return remaining_quota
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Return the metrics of the member.
+
+        Returns:
+            dict[str, Any]: The counters of the member, its outstanding requests, mean latency in seconds, remaining quota
+                and whether it is currently ejected.
+        """
+        successes = self.metrics["requests"] - self.metrics["failures"]
+        return {
+            **self.metrics,
+            "in_flight": self.in_flight,
+            "mean_latency": (
+                self.metrics["total_latency"] / successes if successes else None
+            ),
+            "remaining_quota": self.get_remaining_quota(),
+            "ejected": self.is_ejected(time.monotonic()),
+        }
+
+
+class ProviderPool(ProviderBackend):
+    """A backend that balances requests across several backends of the same provider, e.g. API keys of different
+    organisations or replicas of a self-hosted endpoint, so that an experiment can scale past the limits of one member.
+
+    Each request is routed to the member with the fewest outstanding requests ("least_outstanding") or the largest
+    share of its per-minute quota left ("remaining_quota"). A member is ejected for ejection_time seconds after
+    failure_threshold consecutive server-side failures, or as soon as it is rate limited. If every member is ejected,
+    requests are routed to the member that returns first rather than failing.
+
+    Args:
+        members (List[Union[PoolMember, ProviderBackend]]): The members of the pool. Backends are added without limits.
+        name (str, optional): The name of the provider. Defaults to "pool".
+        routing (str, optional): The routing strategy, either "least_outstanding" or "remaining_quota".
+            Defaults to "least_outstanding".
+        failure_threshold (int, optional): The number of consecutive failures that ejects a member. Defaults to 3.
+        ejection_time (float, optional): The number of seconds an ejected member is excluded from routing. Defaults to 30.
+
+    Attributes:
+        members (List[PoolMember]): The members of the pool.
+
+    Raises:
+        ValueError: If the provided members are empty or not uniquely named, or the routing strategy is not supported.
+    """
+
+    def __init__(
+        self,
+        members: List[Union[PoolMember, ProviderBackend]],
+        name: str = "pool",
+        routing: str = "least_outstanding",
+        failure_threshold: int = 3,
+        ejection_time: float = 30,
+    ):
+        if not members:
+            raise ValueError(
+                f"Invalid value for members: {members}. members should contain at least one backend."
+            )
+        if routing not in SUPPORTED_ROUTING_STRATEGIES:
+            raise ValueError(
+                f"Unsupported routing: {routing}. Supported strategies are: {SUPPORTED_ROUTING_STRATEGIES}."
+            )
+
+        super().__init__(name)
+        self.members = [
+            member if isinstance(member, PoolMember) else PoolMember(member)
+            for member in members
+        ]
+        member_names = [member.backend.name for member in self.members]
+        if len(set(member_names)) != len(member_names):
+            raise ValueError(
+                f"Invalid value for members: {member_names}. The backends of a pool should have unique names."
+            )
+
+        self.routing = routing
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+
+    def get_sort_key(self, member: PoolMember, num_tokens: int) -> tuple:
+        """Return the key by which members are ranked for routing, lowest first.
+
+        Args:
+            member (PoolMember): The member of the pool.
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            tuple: The sort key of the member.
+        """
+        wait_time = member.get_wait_time(num_tokens)
+        if self.routing == "remaining_quota":
+            return (wait_time, -member.get_remaining_quota(), member.in_flight)
+        return (wait_time, member.in_flight, member.metrics["requests"])
+
+    def reserve(self, num_tokens: int) -> tuple[PoolMember, float]:
+        """Select the member that serves a request and reserve its quota.
+
+        Args:
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            tuple[PoolMember, float]: The selected member and the number of seconds to wait before sending the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            candidates = [
+                member for member in self.members if not member.is_ejected(now)
+            ]
+            if not candidates:
+                candidates = [
+                    min(self.members, key=lambda member: member.ejected_until)
+                ]
+
+            member = min(
+                candidates, key=lambda member: self.get_sort_key(member, num_tokens)
+            )
+            wait_time = member.get_wait_time(num_tokens)
+            if member.request_bucket is not None:
+                member.request_bucket.consume(1)
+            if member.token_bucket is not None:
+                member.token_bucket.consume(num_tokens)
+            member.in_flight += 1
+            member.metrics["requests"] += 1
+
+        return member, wait_time
+
+    def release(self, member: PoolMember) -> None:
+        """Release the request reserved on a member, whatever its outcome, including when it is cancelled.
+
+        Args:
+            member (PoolMember): The member that served the request.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            member.in_flight -= 1
+
+    def record_success(
+        self,
+        member: PoolMember,
+        num_tokens: int,
+        usage: Optional[dict[str, int]],
+        latency: float,
+    ) -> None:
+        """Record a successful request and reconcile the token quota of the member with the reported usage.
+
+        Args:
+            member (PoolMember): The member that served the request.
+            num_tokens (int): The estimated number of tokens of the request.
+            usage (Optional[dict[str, int]]): The usage reported by the provider.
+            latency (float): The duration of the request in seconds.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            member.consecutive_failures = 0
+            member.ejected_until = None
+            member.metrics["total_latency"] += latency
+            if usage:
+                member.metrics["total_tokens"] += usage.get("total_tokens", 0)
+                if member.token_bucket is not None:
+                    member.token_bucket.consume(
+                        usage.get("total_tokens", 0) - num_tokens
+                    )
+
+    def record_failure(self, member: PoolMember, error: LLMError) -> None:
+        """Record a failed request and eject the member if it is rate limited or has failed repeatedly. Client errors
+        are caused by the request rather than the member and do not count towards ejection.
+
+        Args:
+            member (PoolMember): The member that served the request.
+            error (LLMError): The classified error raised by the request.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            member.metrics["failures"] += 1
+            ejection_time = None
+            if isinstance(error, LLMRateLimitError):
+                ejection_time = (
+                    error.retry_after
+                    if error.retry_after is not None
+                    else self.ejection_time
+                )
+            elif isinstance(error, (LLMServerError, LLMTimeoutError)):
+                member.consecutive_failures += 1
+                if member.consecutive_failures >= self.failure_threshold:
+                    ejection_time = self.ejection_time
+
+            if ejection_time is not None:
+                member.ejected_until = time.monotonic() + ejection_time
+                member.metrics["ejections"] += 1
+                print(
+                    f"Ejecting {member.backend.name} from provider pool {self.name} for {ejection_time:.2f}s after {error}."
+                )
+
+    def get_metrics(self) -> dict[str, dict[str, Any]]:
+        """Return the metrics of each member of the pool.
+
+        Returns:
+            dict[str, dict[str, Any]]: A dictionary mapping the name of each member to its metrics.
+        """
+        with self.lock:
+            return {
+                member.backend.name: member.get_metrics() for member in self.members
+            }
+
+    def get_client(self) -> Any:
+        """Return the synchronous client of the first member of the pool, e.g. for the Batch API.
+
+        Returns:
+            Any: The synchronous client.
+        """
+        return self.members[0].backend.get_client()
+
+    def get_async_client(self) -> Any:
+        """Return the asynchronous client of the first member of the pool.
+
+        Returns:
+            Any: The asynchronous client.
+        """
+        return self.members[0].backend.get_async_client()
+
+    def complete(self, model_info: str, message_history: List[dict]) -> Completion:
+        num_tokens = estimate_message_tokens(message_history)
+        member, wait_time = self.reserve(num_tokens)
+        try:
+            time.sleep(wait_time)
+            start_time = time.monotonic()
+            completion = member.backend.complete(model_info, message_history)
+        except Exception as e:
+            error = classify_error(e, model_info)
+            self.record_failure(member, error)
+            raise error from e
+        finally:
+            self.release(member)
+
+        self.record_success(
+            member, num_tokens, completion["usage"], time.monotonic() - start_time
+        )
+        return completion
+
+    async def complete_async(
+        self, model_info: str, message_history: List[dict]
+    ) -> Completion:
+        num_tokens = estimate_message_tokens(message_history)
+        member, wait_time = self.reserve(num_tokens)
+        try:
+            await asyncio.sleep(wait_time)
+            start_time = time.monotonic()
+            completion = await member.backend.complete_async(
+                model_info, message_history
+            )
+        except Exception as e:
+            error = classify_error(e, model_info)
+            self.record_failure(member, error)
+            raise error from e
+        finally:
+            # A cancelled request, e.g. a losing hedge, frees its slot without counting as a failure
+            self.release(member)
+
+        self.record_success(
+            member, num_tokens, completion["usage"], time.monotonic() - start_time
+        )
+        return completion
+
+    def complete_samples(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        num_tokens = estimate_message_tokens(message_history)
+        member, wait_time = self.reserve(num_tokens)
+        try:
+            time.sleep(wait_time)
+            start_time = time.monotonic()
+            samples = member.backend.complete_samples(model_info, message_history, n)
+        except Exception as e:
+            error = classify_error(e, model_info)
+            self.record_failure(member, error)
+            raise error from e
+        finally:
+            self.release(member)
+
+        self.record_success(
+            member, num_tokens, samples["usage"], time.monotonic() - start_time
+        )
+        return samples
+
+    async def complete_samples_async(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        num_tokens = estimate_message_tokens(message_history)
+        member, wait_time = self.reserve(num_tokens)
+        try:
+            await asyncio.sleep(wait_time)
+            start_time = time.monotonic()
+            samples = await member.backend.complete_samples_async(
+                model_info, message_history, n
+            )
+        except Exception as e:
+            error = classify_error(e, model_info)
+            self.record_failure(member, error)
+            raise error from e
+        finally:
+            # A cancelled request, e.g. a losing hedge, frees its slot without counting as a failure
+            self.release(member)
+
+        self.record_success(
+            member, num_tokens, samples["usage"], time.monotonic() - start_time
+        )
+        return samples
+
+    def stream(
+        self, model_info: str, message_history: List[dict]
+    ) -> Iterator[Completion]:
+        num_tokens = estimate_message_tokens(message_history)
+        member, wait_time = self.reserve(num_tokens)
+        completions, usage = None, None
+        try:
+            time.sleep(wait_time)
+            start_time = time.monotonic()
+            completions = member.backend.stream(model_info, message_history)
+            for completion in completions:
+                if completion["usage"] is not None:
+                    usage = completion["usage"]
+                yield completion
+        except GeneratorExit:
+            # A stream closed by the caller, e.g. at a stop pattern, is not a failure of the member
+            self.record_success(
+                member, num_tokens, usage, time.monotonic() - start_time
+            )
+            raise
+        except Exception as e:
+            error = classify_error(e, model_info)
+            self.record_failure(member, error)
+            raise error from e
+        else:
+            self.record_success(
+                member, num_tokens, usage, time.monotonic() - start_time
+            )
+        finally:
+            self.release(member)
+            if completions is not None:
+                completions.close()
+
+    def close(self) -> None:
+        for member in self.members:
+            member.backend.close()
+
+    async def aclose(self) -> None:
+        for member in self.members:
+            await member.backend.aclose()
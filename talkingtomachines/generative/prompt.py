@@ -1,3 +1,277 @@
+from __future__ import annotations
+import string
+from typing import TYPE_CHECKING, Any, List, Optional, Union
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SUPPORTED_PROMPT_LAYOUTS = ["default", "cache_friendly"]
+CONVERSATIONAL_AGENT_PLACEHOLDERS = [
+    "experiment_context",
+    "treatment",
+    "role",
+    "role_description",
+    "demographic_info",
+]
+CONVERSATIONAL_AGENT_SYSTEM_MESSAGE_SECTIONS = {
+    "default": [
+        "{experiment_context}",
+        "{treatment}",
+        "{role_description}",
+        "{demographic_info}",
+    ],
+    "cache_friendly": [
+        "{experiment_context}",
+        "{role_description}",
+        "{treatment}",
+        "{demographic_info}",
+    ],
+}
+
+
+def check_prompt_layout(prompt_layout: str) -> str:
+    """Check if the provided prompt layout is supported.
+
+    Args:
+        prompt_layout (str): The layout of the system messages.
+
+    Returns:
+        str: The validated prompt layout.
+
+    Raises:
+        ValueError: If the provided prompt layout is not supported.
+    """
+    if prompt_layout not in SUPPORTED_PROMPT_LAYOUTS:
+        raise ValueError(
+            f"Unsupported prompt_layout: {prompt_layout}. Supported layouts are: {SUPPORTED_PROMPT_LAYOUTS}."
+        )
+
+    return prompt_layout
+
+
+class PromptTemplate:
+    """A prompt template with named placeholders, e.g. "{treatment}", that is parsed once and rendered many times.
+
+    The template is made of sections joined by a separator. Filling some placeholders with partial returns a new
+    template in which the filled sections are plain text, so that the prompt shared by many agents is assembled once and
+    each agent only fills its own placeholders. Values are inserted as they are, so braces in values need no escaping.
+
+    Args:
+        sections (Union[str, List[str]]): The template, or the templates of its sections. Literal braces are written as
+            "{{" and "}}".
+        separator (str, optional): The separator placed between sections. Defaults to "\n\n".
+        skip_empty_sections (bool, optional): Whether to strip surrounding whitespace from each section and drop empty
+            sections, as join_prompt_sections does. Defaults to False.
+
+    Attributes:
+        sections (List[tuple]): The parsed sections. Each part of a section is either a string or the (name, conversion,
+            format_spec) of a placeholder.
+        placeholders (List[str]): The names of the placeholders that are not filled yet, in order of appearance.
+
+    Raises:
+        ValueError: If a section is not a valid template or has a placeholder without a name.
+    """
+
+    def __init__(
+        self,
+        sections: Union[str, List[str]],
+        separator: str = "\n\n",
+        skip_empty_sections: bool = False,
+    ):
+        if isinstance(sections, str):
+            sections = [sections]
+
+        self.separator = separator
+        self.skip_empty_sections = skip_empty_sections
+        self.sections = self.merge_sections(
+            [
+                self.parse_section(section) if isinstance(section, str) else section
+                for section in sections
+            ]
+        )
+        self.placeholders = list(
+            dict.fromkeys(
+                part[0]
+                for section in self.sections
+                for part in section
+                if isinstance(part, tuple)
+            )
+        )
+
+    @staticmethod
+    def parse_section(section: str) -> tuple:
+        """Parses the template of a section into its literal text and placeholders.
+
+        Args:
+            section (str): The template of the section.
+
+        Returns:
+            tuple: The parts of the section.
+
+        Raises:
+            ValueError: If the section is not a valid template or has a placeholder without a name.
+        """
+        parts = []
+        try:
+            parsed_section = list(string.Formatter().parse(section))
+        except ValueError as e:
+            raise ValueError(f"Invalid value for template: {section!r}. {e}.")
+
+        for literal_text, name, format_spec, conversion in parsed_section:
+            if literal_text:
+                parts.append(literal_text)
+            if name is None:
+                continue
+            if not name.isidentifier():
+                raise ValueError(
+                    f"Invalid value for template: {section!r}. Placeholders should be named, e.g. {{treatment}}."
+                )
+            parts.append((name, conversion, format_spec or ""))
+
+        return tuple(parts)
+
+    def merge_sections(self, sections: List[tuple]) -> List[tuple]:
+        """Joins the text of consecutive sections without placeholders, dropping empty sections if skip_empty_sections
+        is set.
+
+        Args:
+            sections (List[tuple]): The parsed sections.
+
+        Returns:
+            List[tuple]: The merged sections.
+        """
+        merged_sections = []
+        literal_sections = []
+        for section in sections:
+            if all(isinstance(part, str) for part in section):
+                text = "".join(section)
+                if self.skip_empty_sections:
+                    text = text.strip()
+                    if not text:
+                        continue
+                literal_sections.append(text)
+                continue
+
+            if literal_sections:
+                merged_sections.append((self.separator.join(literal_sections),))
+                literal_sections = []
+            merged_sections.append(section)
+
+        if literal_sections:
+            merged_sections.append((self.separator.join(literal_sections),))
+        return merged_sections
+
+    @staticmethod
+    def format_value(value: Any, conversion: Optional[str], format_spec: str) -> str:
+        """Formats the value of a placeholder, as str.format does.
+
+        Args:
+            value (Any): The value.
+            conversion (Optional[str]): The conversion of the placeholder, e.g. "r", or None.
+            format_spec (str): The format specification of the placeholder.
+
+        Returns:
+            str: The formatted value.
+        """
+        if conversion == "r":
+            value = repr(value)
+        elif conversion == "a":
+            value = ascii(value)
+        elif conversion == "s":
+            value = str(value)
+        return format(value, format_spec)
+
+    def fill_section(self, section: tuple, values: dict[str, Any]) -> tuple:
+        """Fills the placeholders of a section for which a value is provided.
+
+        Args:
+            section (tuple): The parsed section.
+            values (dict[str, Any]): The values of the placeholders.
+
+        Returns:
+            tuple: The parts of the section, with the filled placeholders turned into text.
+        """
+        parts = []
+        for part in section:
+            if isinstance(part, tuple) and part[0] in values:
+                part = self.format_value(values[part[0]], part[1], part[2])
+            if isinstance(part, str) and parts and isinstance(parts[-1], str):
+                parts[-1] += part
+            else:
+                parts.append(part)
+        return tuple(parts)
+
+    def partial(self, **values: Any) -> "PromptTemplate":
+        """Fills some of the placeholders. Values of placeholders that the template does not have are ignored.
+
+        Args:
+            **values (Any): The values of the placeholders.
+
+        Returns:
+            PromptTemplate: The template with the provided placeholders filled.
+        """
+        return PromptTemplate(
+            [self.fill_section(section, values) for section in self.sections],
+            separator=self.separator,
+            skip_empty_sections=self.skip_empty_sections,
+        )
+
+    def render(self, **values: Any) -> str:
+        """Fills every placeholder and returns the prompt.
+
+        Args:
+            **values (Any): The values of the placeholders.
+
+        Returns:
+            str: The rendered prompt.
+
+        Raises:
+            ValueError: If the value of a placeholder is missing.
+        """
+        missing_placeholders = [
+            placeholder
+            for placeholder in self.placeholders
+            if placeholder not in values
+        ]
+        if missing_placeholders:
+            raise ValueError(
+                f"Missing values for placeholders: {missing_placeholders}."
+            )
+
+        rendered_sections = []
+        for section in self.sections:
+            text = "".join(
+                (
+                    part
+                    if isinstance(part, str)
+                    else self.format_value(values[part[0]], part[1], part[2])
+                )
+                for part in section
+            )
+            if self.skip_empty_sections:
+                text = text.strip()
+                if not text:
+                    continue
+            rendered_sections.append(text)
+        return self.separator.join(rendered_sections)
+
+
+def join_prompt_sections(*sections: str) -> str:
+    """Join the sections of a system message in the order given, stripping surrounding whitespace and dropping empty
+    sections, so that the shared sections form a byte-identical prefix across agents and sessions.
+
+    Args:
+        *sections (str): The sections of the system message, from the most to the least widely shared.
+
+    Returns:
+        str: The joined system message.
+    """
+    return "\n\n".join(
+        section.strip() for section in sections if section and section.strip()
+    )
+
+
 def generate_demographic_prompt(demographic_info: dict) -> str:
     """Formats the demographic information of a synthetic subject into a prompt.
 
@@ -23,36 +297,274 @@ def generate_demographic_prompt(demographic_info: dict) -> str:
         return ""
 
 
+def format_demographic_values(values: pd.Series) -> List[str]:
+    """Converts a column of demographic information to strings, as str does for each value.
+
+    Args:
+        values (pd.Series): A column of the demographic information.
+
+    Returns:
+        List[str]: The values of the column as strings.
+    """
+    # astype(str) converts NumPy numbers, booleans and objects as str does, in a single pass
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufO":
+        return values.astype(str).tolist()
+
+    # Other types, e.g. datetimes and nullable extension types, are boxed as in DataFrame.to_dict before formatting
+    return [str(value) for value in values.to_frame(name=0).to_dict(orient="list")[0]]
+
+
+def generate_demographic_prompts(agent_demographics: pd.DataFrame) -> List[str]:
+    """Formats the demographic information of every synthetic subject in a DataFrame into prompts, with the same format
+    as generate_demographic_prompt. The prompt template is compiled once from the columns, and the values are converted
+    column by column, so that large panels are rendered without building a dictionary per row.
+
+    Args:
+        agent_demographics (pd.DataFrame): The demographic information of the synthetic subjects, with one row per subject.
+
+    Returns:
+        List[str]: The demographic prompt of each row, in the order of the rows.
+    """
+    template = "".join(
+        f"{counter}) Interviewer: {str(question).replace('{', '{{').replace('}', '}}')} Me: {{}} "
+        for counter, question in enumerate(agent_demographics.columns, start=1)
+    )
+    columns = [
+        format_demographic_values(agent_demographics.iloc[:, index])
+        for index in range(agent_demographics.shape[1])
+    ]
+    if not columns:
+        return [""] * len(agent_demographics)
+
+    return [template.format(*values) for values in zip(*columns)]
+
+
 def generate_conversational_agent_system_message(
     experiment_context: str,
     treatment: str,
     role_description: str,
     demographic_info: str,
+    prompt_layout: str = "default",
 ) -> str:
     """Constructs system message for conversational agents by combining experiment_context, treatment, role description, and demographic_info.
 
+    The "cache_friendly" layout orders the sections from the most to the least widely shared: the experiment context
+    (shared by every agent), the role description (shared by every agent with the same role), the treatment (shared by
+    every session with the same treatment) and the demographic information (unique to the agent). This keeps the
+    leading part of the prompt byte-identical across agents and sessions, so that provider-side prompt caching hits.
+
     Args:
         experiment_context (str): The context of the experiment.
         treatment (str): The treatment that is assigned to the session.
         role_description (str): A description of the agent's role.
         demographic_info (str): The demographic information of the synthetic subject.
+        prompt_layout (str, optional): The layout of the system message, either "default" or "cache_friendly".
+            Defaults to "default".
 
     Returns:
         str: The constructed conversational system message.
+
+    Raises:
+        ValueError: If the provided prompt layout is not supported.
     """
-    return f"{experiment_context}\n\n{treatment}\n\n{role_description}\n\n{demographic_info}"
+    return compile_conversational_agent_system_message_template(
+        experiment_context=experiment_context,
+        treatment=treatment,
+        role_description=role_description,
+        prompt_layout=prompt_layout,
+    ).render(demographic_info=demographic_info)
+
+
+def compile_conversational_agent_system_message_template(
+    experiment_context: str,
+    treatment: str,
+    role_description: str,
+    role: str = "",
+    prompt_layout: str = "default",
+    template: Optional[str] = None,
+) -> PromptTemplate:
+    """Compiles the system message of the conversational agents that play a role under a treatment, leaving only the
+    demographic information to be filled for each agent.
+
+    Args:
+        experiment_context (str): The context of the experiment.
+        treatment (str): The treatment that is assigned to the session.
+        role_description (str): A description of the agents' role.
+        role (str, optional): The name of the agents' role. Defaults to "".
+        prompt_layout (str, optional): The layout of the system message, either "default" or "cache_friendly".
+            Ignored if a template is provided. Defaults to "default".
+        template (Optional[str], optional): A custom template of the system message, with any of the placeholders
+            {experiment_context}, {treatment}, {role}, {role_description} and {demographic_info}. Defaults to None,
+            which uses the prompt layout.
+
+    Returns:
+        PromptTemplate: The compiled system message, with the {demographic_info} placeholder left to be filled.
+
+    Raises:
+        ValueError: If the provided prompt layout is not supported.
+        ValueError: If the provided template is not valid or has an unsupported placeholder.
+    """
+    if template is None:
+        prompt_layout = check_prompt_layout(prompt_layout)
+        system_message_template = PromptTemplate(
+            CONVERSATIONAL_AGENT_SYSTEM_MESSAGE_SECTIONS[prompt_layout],
+            skip_empty_sections=prompt_layout == "cache_friendly",
+        )
+    else:
+        system_message_template = check_conversational_agent_template(template)
+
+    return system_message_template.partial(
+        experiment_context=experiment_context,
+        treatment=treatment,
+        role=role,
+        role_description=role_description,
+    )
+
+
+def check_conversational_agent_template(template: str) -> PromptTemplate:
+    """Check if the provided template of the system message of conversational agents is valid.
+
+    Args:
+        template (str): The template of the system message.
+
+    Returns:
+        PromptTemplate: The parsed template.
+
+    Raises:
+        ValueError: If the provided template is not valid or has an unsupported placeholder.
+    """
+    system_message_template = PromptTemplate(template)
+    for placeholder in system_message_template.placeholders:
+        if placeholder not in CONVERSATIONAL_AGENT_PLACEHOLDERS:
+            raise ValueError(
+                f"Unsupported placeholder in template: {placeholder}. Supported placeholders are: {CONVERSATIONAL_AGENT_PLACEHOLDERS}."
+            )
+
+    return system_message_template
 
 
 def generate_conversational_session_system_message(
-    experiment_context: str, treatment: str
+    experiment_context: str, treatment: str, prompt_layout: str = "default"
 ) -> str:
     """Constructs system message for conversational sessions by combining experiment_context and treatment.
 
     Args:
         experiment_context (str): The context of the experiment.
         treatment (str): The treatment that is assigned to the session.
+        prompt_layout (str, optional): The layout of the system message, either "default" or "cache_friendly".
+            Defaults to "default".
 
     Returns:
         str: The constructed conversational system message.
+
+    Raises:
+        ValueError: If the provided prompt layout is not supported.
     """
+    if check_prompt_layout(prompt_layout) == "cache_friendly":
+        return join_prompt_sections(experiment_context, treatment)
+
     return f"{experiment_context}\n\n{treatment}"
+
+
+def format_survey_question(
+    question_id: str, question: str, options: Optional[List[str]] = None
+) -> str:
+    """Formats a survey question, and its answer options if it has any, as a line of a questionnaire.
+
+    Args:
+        question_id (str): The ID of the question.
+        question (str): The text of the question.
+        options (Optional[List[str]], optional): The answer options of a closed question. Defaults to None.
+
+    Returns:
+        str: The formatted question.
+    """
+    if options:
+        return f"{question_id}: {question} Options: {'; '.join(options)}"
+
+    return f"{question_id}: {question}"
+
+
+def generate_survey_system_message(
+    experiment_context: str, treatment: str, demographic_info: str
+) -> str:
+    """Constructs system message for survey respondents by combining experiment_context, treatment and demographic_info.
+    The sections are ordered from the most to the least widely shared, so that provider-side prompt caching hits.
+
+    Args:
+        experiment_context (str): The context of the experiment.
+        treatment (str): The treatment that is assigned to the respondent.
+        demographic_info (str): The demographic information of the synthetic respondent.
+
+    Returns:
+        str: The constructed survey system message.
+    """
+    return compile_survey_system_message_template(
+        experiment_context=experiment_context, treatment=treatment
+    ).render(demographic_info=demographic_info)
+
+
+def compile_survey_system_message_template(
+    experiment_context: str, treatment: str
+) -> PromptTemplate:
+    """Compiles the system message of the survey respondents under a treatment, leaving only the demographic information
+    to be filled for each respondent.
+
+    Args:
+        experiment_context (str): The context of the experiment.
+        treatment (str): The treatment that is assigned to the respondents.
+
+    Returns:
+        PromptTemplate: The compiled system message, with the {demographic_info} placeholder left to be filled.
+    """
+    return PromptTemplate(
+        ["{experiment_context}", "{treatment}", "{demographic_info}"],
+        skip_empty_sections=True,
+    ).partial(experiment_context=experiment_context, treatment=treatment)
+
+
+def generate_survey_block_prompt(
+    questions: dict[str, str], options: Optional[dict[str, List[str]]] = None
+) -> str:
+    """Constructs the prompt that asks a synthetic respondent to answer a block of survey questions as a JSON object.
+
+    Args:
+        questions (dict[str, str]): A dictionary mapping the IDs of the questions to their text.
+        options (Optional[dict[str, List[str]]], optional): A dictionary mapping the IDs of closed questions to their
+            answer options. Defaults to None.
+
+    Returns:
+        str: The constructed prompt.
+    """
+    options = options or {}
+    formatted_questions = "\n".join(
+        format_survey_question(question_id, question, options.get(question_id))
+        for question_id, question in questions.items()
+    )
+    return (
+        "Answer each of the following survey questions as the respondent described above. Respond only with a JSON "
+        "object that maps each question ID to your answer. Where options are listed, answer with exactly one of the "
+        f"options.\n\n{formatted_questions}"
+    )
+
+
+def generate_survey_question_prompt(
+    question_id: str, question: str, options: Optional[List[str]] = None
+) -> str:
+    """Constructs the prompt that asks a synthetic respondent to answer a single survey question.
+
+    Args:
+        question_id (str): The ID of the question.
+        question (str): The text of the question.
+        options (Optional[List[str]], optional): The answer options of a closed question. Defaults to None.
+
+    Returns:
+        str: The constructed prompt.
+    """
+    instruction = "Respond only with your answer"
+    if options:
+        instruction += ", which must be exactly one of the options"
+    return (
+        f"Answer the following survey question as the respondent described above. {instruction}.\n\n"
+        f"{format_survey_question(question_id, question, options)}"
+    )
@@ -0,0 +1,612 @@
+import json
+import asyncio
+import threading
+import importlib.util
+from typing import Any, Iterator, List, Optional
+from talkingtomachines.generative.usage import add_usage, create_usage
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_KEEPALIVE_EXPIRY = 120.0
+Completion = dict[str, Any]
+Samples = dict[str, Any]
+
+
+def merge_completions(completions: List[Completion]) -> Samples:
+    """Merge completions requested separately for the same prompt into samples.
+
+    Args:
+        completions (List[Completion]): The completions.
+
+    Returns:
+        Samples: The contents of the completions and their aggregated usage, or None as usage if no completion reported usage.
+    """
+    usage = None
+    for completion in completions:
+        if completion["usage"] is not None:
+            if usage is None:
+                usage = create_usage()
+            add_usage(usage, completion["usage"])
+
+    return {
+        "contents": [completion["content"] for completion in completions],
+        "usage": usage,
+    }
+
+
+def is_http2_available() -> bool:
+    """Checks if the optional h2 package required for HTTP/2 support in httpx is installed.
+
+    Returns:
+        bool: True if HTTP/2 can be used, False otherwise.
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def read_usage_value(usage: Any, name: str) -> int:
+    """Read a token count from a usage object or dictionary returned by a provider.
+
+    Args:
+        usage (Any): The usage object or dictionary.
+        name (str): The name of the token count.
+
+    Returns:
+        int: The token count, or 0 if it is not reported.
+    """
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
+
+
+def normalize_usage(usage: Any) -> Optional[dict[str, int]]:
+    """Converts the usage reported by an OpenAI-compatible provider into a dictionary of token counts.
+
+    Args:
+        usage (Any): The usage object or dictionary of a chat completion.
+
+    Returns:
+        Optional[dict[str, int]]: The prompt, completion, total and cached token counts, or None if usage was not reported.
+    """
+    if usage is None:
+        return None
+
+    prompt_tokens_details = (
+        usage.get("prompt_tokens_details")
+        if isinstance(usage, dict)
+        else getattr(usage, "prompt_tokens_details", None)
+    )
+    return {
+        "prompt_tokens": read_usage_value(usage, "prompt_tokens"),
+        "completion_tokens": read_usage_value(usage, "completion_tokens"),
+        "total_tokens": read_usage_value(usage, "total_tokens"),
+        "cached_tokens": (
+            read_usage_value(prompt_tokens_details, "cached_tokens")
+            if prompt_tokens_details is not None
+            else 0
+        ),
+    }
+
+
+class ProviderBackend:
+    """A base class for LLM provider backends. A backend owns the long-lived, connection-pooled HTTP clients used to reach
+    its provider, so that connections and TLS sessions are reused across calls.
+
+    Backends return completions as dictionaries with a "content" key holding the response text and a "usage" key holding
+    the token counts reported by the provider (or None). Samples, i.e. several completions of the same prompt, are
+    returned with a "contents" key holding the list of responses instead. The HTTP clients, and the SDKs they depend on, are only
+    constructed on first use so that registering a backend is cheap.
+
+    Args:
+        name (str): The name of the provider.
+        http2 (bool, optional): Indicates whether HTTP/2 is used when the h2 package is installed. Defaults to True.
+        max_connections (int, optional): The maximum number of pooled connections. Defaults to DEFAULT_MAX_CONNECTIONS.
+        timeout (float, optional): The number of seconds before a request times out. Defaults to DEFAULT_TIMEOUT.
+
+    Attributes:
+        client (Any): The synchronous client of the backend, or None until it is first used.
+        async_client (Any): The asynchronous client of the backend, or None until it is first used.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        http2: bool = True,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.name = name
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.client = None
+        self.async_client = None
+        self.lock = threading.Lock()
+
+    def get_http_client_options(self) -> dict[str, Any]:
+        """Return the keyword arguments shared by the pooled httpx clients of the backend.
+
+        Returns:
+            dict[str, Any]: The HTTP/2, connection pool and timeout options.
+        """
+        import httpx
+
+        return {
+            "http2": self.http2 and is_http2_available(),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+            ),
+            "timeout": httpx.Timeout(self.timeout, connect=DEFAULT_CONNECT_TIMEOUT),
+        }
+
+    def create_client(self) -> Any:
+        """Construct the synchronous client of the backend.
+
+        Returns:
+            Any: The synchronous client.
+        """
+        raise NotImplementedError
+
+    def create_async_client(self) -> Any:
+        """Construct the asynchronous client of the backend.
+
+        Returns:
+            Any: The asynchronous client.
+        """
+        raise NotImplementedError
+
+    def get_client(self) -> Any:
+        """Return the synchronous client of the backend, constructing it on first use.
+
+        Returns:
+            Any: The synchronous client.
+        """
+        with self.lock:
+            if self.client is None:
+                self.client = self.create_client()
+            return self.client
+
+    def get_async_client(self) -> Any:
+        """Return the asynchronous client of the backend, constructing it on first use.
+
+        Returns:
+            Any: The asynchronous client.
+        """
+        with self.lock:
+            if self.async_client is None:
+                self.async_client = self.create_async_client()
+            return self.async_client
+
+    def complete(self, model_info: str, message_history: List[dict]) -> Completion:
+        """Request a chat completion.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+        Returns:
+            Completion: The content and usage of the completion.
+        """
+        raise NotImplementedError
+
+    async def complete_async(
+        self, model_info: str, message_history: List[dict]
+    ) -> Completion:
+        """Asynchronously request a chat completion.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+        Returns:
+            Completion: The content and usage of the completion.
+        """
+        raise NotImplementedError
+
+    def complete_samples(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        """Request n independent completions of the same prompt. Backends whose provider can generate several
+        completions per request override this method, so that the prompt is only sent and billed once. Otherwise,
+        the completions are requested one after the other.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            n (int): The number of completions.
+
+        Returns:
+            Samples: The contents and aggregated usage of the completions.
+        """
+        return merge_completions(
+            [self.complete(model_info, message_history) for _ in range(n)]
+        )
+
+    async def complete_samples_async(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        """Asynchronously request n independent completions of the same prompt. Without native support, the
+        completions are requested concurrently.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            n (int): The number of completions.
+
+        Returns:
+            Samples: The contents and aggregated usage of the completions.
+        """
+        return merge_completions(
+            await asyncio.gather(
+                *(self.complete_async(model_info, message_history) for _ in range(n))
+            )
+        )
+
+    def stream(
+        self, model_info: str, message_history: List[dict]
+    ) -> Iterator[Completion]:
+        """Request a streamed chat completion. Closing the iterator cancels the generation.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+        Yields:
+            Completion: Partial completions, whose content is the next chunk of the response and whose usage is set once reported.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Close the synchronous client of the backend, if it was constructed, and drop the asynchronous client. The
+        asynchronous client can only be closed from an event loop, with aclose.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+            self.async_client = None
+
+    async def close_async_client(self, async_client: Any) -> None:
+        """Close an asynchronous client constructed by create_async_client.
+
+        Args:
+            async_client (Any): The asynchronous client.
+
+        Returns:
+            None
+        """
+        await async_client.aclose()
+
+    async def aclose(self) -> None:
+        """Close the synchronous and asynchronous clients of the backend, if they were constructed.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            async_client, self.async_client = self.async_client, None
+        self.close()
+        if async_client is not None:
+            await self.close_async_client(async_client)
+
+
+class OpenAIBackend(ProviderBackend):
+    """A backend for the OpenAI API and OpenAI-compatible endpoints, such as Mistral or local vLLM and llama.cpp servers.
+
+    Args:
+        name (str, optional): The name of the provider. Defaults to "openai".
+        api_key (str, optional): The API key of the provider. Defaults to "EMPTY", which suits local servers.
+        base_url (Optional[str], optional): The base URL of an OpenAI-compatible endpoint. Defaults to None (the OpenAI API).
+        http2 (bool, optional): Indicates whether HTTP/2 is used when the h2 package is installed. Defaults to True.
+        max_connections (int, optional): The maximum number of pooled connections. Defaults to DEFAULT_MAX_CONNECTIONS.
+        timeout (float, optional): The number of seconds before a request times out. Defaults to DEFAULT_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        name: str = "openai",
+        api_key: str = "EMPTY",
+        base_url: Optional[str] = None,
+        http2: bool = True,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        super().__init__(
+            name, http2=http2, max_connections=max_connections, timeout=timeout
+        )
+        self.api_key = api_key
+        self.base_url = base_url
+
+    def create_client(self) -> Any:
+        import httpx
+        from openai import OpenAI
+
+        # Retries are handled by the resilience layer of query_llm rather than by the SDK
+        return OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0,
+            http_client=httpx.Client(**self.get_http_client_options()),
+        )
+
+    def create_async_client(self) -> Any:
+        import httpx
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0,
+            http_client=httpx.AsyncClient(**self.get_http_client_options()),
+        )
+
+    async def close_async_client(self, async_client: Any) -> None:
+        await async_client.close()
+
+    def complete(self, model_info: str, message_history: List[dict]) -> Completion:
+        response = self.get_client().chat.completions.create(
+            model=model_info, messages=message_history
+        )
+        return {
+            "content": response.choices[0].message.content or "",
+            "usage": normalize_usage(getattr(response, "usage", None)),
+        }
+
+    async def complete_async(
+        self, model_info: str, message_history: List[dict]
+    ) -> Completion:
+        response = await self.get_async_client().chat.completions.create(
+            model=model_info, messages=message_history
+        )
+        return {
+            "content": response.choices[0].message.content or "",
+            "usage": normalize_usage(getattr(response, "usage", None)),
+        }
+
+    def complete_samples(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        response = self.get_client().chat.completions.create(
+            model=model_info, messages=message_history, n=n
+        )
+        return {
+            "contents": [choice.message.content or "" for choice in response.choices],
+            "usage": normalize_usage(getattr(response, "usage", None)),
+        }
+
+    async def complete_samples_async(
+        self, model_info: str, message_history: List[dict], n: int
+    ) -> Samples:
+        response = await self.get_async_client().chat.completions.create(
+            model=model_info, messages=message_history, n=n
+        )
+        return {
+            "contents": [choice.message.content or "" for choice in response.choices],
+            "usage": normalize_usage(getattr(response, "usage", None)),
+        }
+
+    def stream(
+        self, model_info: str, message_history: List[dict]
+    ) -> Iterator[Completion]:
+        response_stream = self.get_client().chat.completions.create(
+            model=model_info,
+            messages=message_history,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            for event in response_stream:
+                content = (
+                    event.choices[0].delta.content if event.choices else None
+                ) or ""
+                usage = normalize_usage(getattr(event, "usage", None))
+                if content or usage:
+                    yield {"content": content, "usage": usage}
+        finally:
+            response_stream.close()
+
+
+class AnthropicBackend(ProviderBackend):
+    """A backend for the Anthropic Messages API.
+
+    System messages are passed through the system parameter, and the remaining messages are sent in order. When
+    prompt_caching is enabled, the system prompt is marked as a cache breakpoint so that requests sharing it are
+    served from Anthropic's prompt cache. The Messages API returns a single completion per request, so samples are
+    requested separately, and read the prompt from the cache when prompt_caching is enabled.
+
+    Args:
+        name (str, optional): The name of the provider. Defaults to "anthropic".
+        api_key (str, optional): The API key of the provider. Defaults to "EMPTY".
+        base_url (str, optional): The base URL of the API. Defaults to "https://api.anthropic.com/v1".
+        max_tokens (int, optional): The maximum number of tokens to generate per response. Defaults to 1024.
+        prompt_caching (bool, optional): Indicates whether the system prompt is cached. Defaults to False.
+        http2 (bool, optional): Indicates whether HTTP/2 is used when the h2 package is installed. Defaults to True.
+        max_connections (int, optional): The maximum number of pooled connections. Defaults to DEFAULT_MAX_CONNECTIONS.
+        timeout (float, optional): The number of seconds before a request times out. Defaults to DEFAULT_TIMEOUT.
+    """
+
+    API_VERSION = "2023-06-01"
+    PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+    def __init__(
+        self,
+        name: str = "anthropic",
+        api_key: str = "EMPTY",
+        base_url: str = "https://api.anthropic.com/v1",
+        max_tokens: int = 1024,
+        prompt_caching: bool = False,
+        http2: bool = True,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        super().__init__(
+            name, http2=http2, max_connections=max_connections, timeout=timeout
+        )
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_tokens = max_tokens
+        self.prompt_caching = prompt_caching
+
+    def get_headers(self) -> dict[str, str]:
+        """Return the authentication and version headers of the Messages API.
+
+        Returns:
+            dict[str, str]: The request headers.
+        """
+        headers = {"x-api-key": self.api_key, "anthropic-version": self.API_VERSION}
+        if self.prompt_caching:
+            headers["anthropic-beta"] = self.PROMPT_CACHING_BETA
+
+        return headers
+
+    def create_client(self) -> Any:
+        import httpx
+
+        return httpx.Client(
+            base_url=self.base_url,
+            headers=self.get_headers(),
+            **self.get_http_client_options(),
+        )
+
+    def create_async_client(self) -> Any:
+        import httpx
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.get_headers(),
+            **self.get_http_client_options(),
+        )
+
+    def build_payload(
+        self, model_info: str, message_history: List[dict], stream: bool = False
+    ) -> dict[str, Any]:
+        """Convert a message history into the request body of the Messages API.
+
+        Args:
+            model_info (str): Information about the model.
+            message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+            stream (bool, optional): Indicates whether the response is streamed. Defaults to False.
+
+        Returns:
+            dict[str, Any]: The request body.
+        """
+        payload = {
+            "model": model_info,
+            "max_tokens": self.max_tokens,
+            "messages": [
+                {"role": message["role"], "content": message["content"]}
+                for message in message_history
+                if message["role"] != "system"
+            ],
+        }
+        system_message = "\n\n".join(
+            message["content"]
+            for message in message_history
+            if message["role"] == "system"
+        )
+        if system_message and self.prompt_caching:
+            payload["system"] = [
+                {
+                    "type": "text",
+                    "text": system_message,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+        elif system_message:
+            payload["system"] = system_message
+        if stream:
+            payload["stream"] = True
+
+        return payload
+
+    def parse_response(self, body: dict[str, Any]) -> Completion:
+        """Convert the response body of the Messages API into a completion.
+
+        Args:
+            body (dict[str, Any]): The response body.
+
+        Returns:
+            Completion: The content and usage of the completion.
+        """
+        usage = body.get("usage") or {}
+        # Prompt token counts include cached tokens, as reported by OpenAI-compatible providers
+        prompt_tokens = (
+            read_usage_value(usage, "input_tokens")
+            + read_usage_value(usage, "cache_read_input_tokens")
+            + read_usage_value(usage, "cache_creation_input_tokens")
+        )
+        completion_tokens = read_usage_value(usage, "output_tokens")
+        return {
+            "content": "".join(
+                block.get("text", "")
+                for block in body.get("content", [])
+                if block.get("type") == "text"
+            ),
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "cached_tokens": read_usage_value(usage, "cache_read_input_tokens"),
+            },
+        }
+
+    def complete(self, model_info: str, message_history: List[dict]) -> Completion:
+        response = self.get_client().post(
+            "/messages", json=self.build_payload(model_info, message_history)
+        )
+        response.raise_for_status()
+        return self.parse_response(response.json())
+
+    async def complete_async(
+        self, model_info: str, message_history: List[dict]
+    ) -> Completion:
+        response = await self.get_async_client().post(
+            "/messages", json=self.build_payload(model_info, message_history)
+        )
+        response.raise_for_status()
+        return self.parse_response(response.json())
+
+    def stream(
+        self, model_info: str, message_history: List[dict]
+    ) -> Iterator[Completion]:
+        prompt_tokens, cached_tokens = 0, 0
+        with self.get_client().stream(
+            "POST",
+            "/messages",
+            json=self.build_payload(model_info, message_history, stream=True),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+
+                event = json.loads(line[len("data:") :])
+                if event.get("type") == "message_start":
+                    usage = event.get("message", {}).get("usage", {})
+                    cached_tokens = read_usage_value(usage, "cache_read_input_tokens")
+                    prompt_tokens = (
+                        read_usage_value(usage, "input_tokens")
+                        + cached_tokens
+                        + read_usage_value(usage, "cache_creation_input_tokens")
+                    )
+                elif event.get("type") == "content_block_delta":
+                    text = event.get("delta", {}).get("text", "")
+                    if text:
+                        yield {"content": text, "usage": None}
+                elif event.get("type") == "message_delta":
+                    completion_tokens = read_usage_value(
+                        event.get("usage", {}), "output_tokens"
+                    )
+                    yield {
+                        "content": "",
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                            "cached_tokens": cached_tokens,
+                        },
+                    }
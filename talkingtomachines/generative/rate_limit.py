@@ -0,0 +1,198 @@
+import time
+import asyncio
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """A token bucket that refills continuously up to its capacity.
+
+    Args:
+        capacity (float): The maximum number of units held by the bucket.
+        refill_rate (float): The number of units added to the bucket per second.
+
+    Attributes:
+        capacity (float): The maximum number of units held by the bucket.
+        refill_rate (float): The number of units added to the bucket per second.
+        available (float): The number of units currently available. May become negative after reconciliation.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.available = capacity
+        self.last_refill = time.monotonic()
+
+    def refill(self) -> None:
+        """Add the units accrued since the last refill, up to the capacity of the bucket.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        self.available = min(
+            self.capacity,
+            self.available + max(0.0, now - self.last_refill) * self.refill_rate,
+        )
+        self.last_refill = now
+
+    def get_wait_time(self, amount: float) -> float:
+        """Return the number of seconds until the requested amount becomes available. Requests larger than the capacity only wait for a full bucket.
+
+        Args:
+            amount (float): The number of units requested.
+
+        Returns:
+            float: The number of seconds to wait, or 0 if the amount is available now.
+        """
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+
+        return (amount - self.available) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        """Remove the provided amount from the bucket.
+
+        Args:
+            amount (float): The number of units to remove. Negative amounts return units to the bucket.
+
+        Returns:
+            None
+        """
+        self.available = min(self.capacity, self.available - amount)
+
+
+class RateLimiter:
+    """A process-wide rate limiter with separate request and token buckets per model.
+
+    Models without configured limits are not rate limited.
+
+    Attributes:
+        request_buckets (dict[str, TokenBucket]): The requests-per-minute bucket of each model.
+        token_buckets (dict[str, TokenBucket]): The tokens-per-minute bucket of each model.
+    """
+
+    def __init__(self):
+        self.request_buckets = {}
+        self.token_buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(
+        self,
+        model_info: str,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ) -> None:
+        """Configure the rate limits of a model. Passing None removes the corresponding limit.
+
+        Args:
+            model_info (str): Information about the model.
+            requests_per_minute (Optional[int], optional): The maximum number of requests per minute. Defaults to None.
+            tokens_per_minute (Optional[int], optional): The maximum number of tokens per minute. Defaults to None.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the provided requests_per_minute or tokens_per_minute is not positive.
+        """
+        for name, limit in [
+            ("requests_per_minute", requests_per_minute),
+            ("tokens_per_minute", tokens_per_minute),
+        ]:
+            if limit is not None and limit <= 0:
+                raise ValueError(
+                    f"Invalid value for {name}: {limit}. {name} should be None or a positive integer."
+                )
+
+        with self.lock:
+            for buckets, limit in [
+                (self.request_buckets, requests_per_minute),
+                (self.token_buckets, tokens_per_minute),
+            ]:
+                if limit is None:
+                    buckets.pop(model_info, None)
+                else:
+                    buckets[model_info] = TokenBucket(
+                        capacity=limit, refill_rate=limit / 60
+                    )
+
+    def reserve(self, model_info: str, num_tokens: int) -> float:
+        """Reserve one request and the provided number of tokens if both are available.
+
+        Args:
+            model_info (str): Information about the model.
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            float: 0 if the reservation succeeded, otherwise the number of seconds to wait before trying again.
+        """
+        with self.lock:
+            request_bucket = self.request_buckets.get(model_info)
+            token_bucket = self.token_buckets.get(model_info)
+            wait_time = max(
+                request_bucket.get_wait_time(1) if request_bucket else 0.0,
+                token_bucket.get_wait_time(num_tokens) if token_bucket else 0.0,
+            )
+            if wait_time > 0:
+                return wait_time
+
+            if request_bucket:
+                request_bucket.consume(1)
+            if token_bucket:
+                token_bucket.consume(num_tokens)
+            return 0.0
+
+    def acquire(self, model_info: str, num_tokens: int) -> None:
+        """Block until one request and the provided number of tokens are available for the model.
+
+        Args:
+            model_info (str): Information about the model.
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            None
+        """
+        wait_time = self.reserve(model_info, num_tokens)
+        while wait_time > 0:
+            time.sleep(wait_time)
+            wait_time = self.reserve(model_info, num_tokens)
+
+    async def acquire_async(self, model_info: str, num_tokens: int) -> None:
+        """Wait without blocking the event loop until one request and the provided number of tokens are available for the model.
+
+        Args:
+            model_info (str): Information about the model.
+            num_tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+            None
+        """
+        wait_time = self.reserve(model_info, num_tokens)
+        while wait_time > 0:
+            await asyncio.sleep(wait_time)
+            wait_time = self.reserve(model_info, num_tokens)
+
+    def reconcile(
+        self, model_info: str, estimated_tokens: int, actual_tokens: Optional[int]
+    ) -> None:
+        """Correct the token bucket of a model once the actual token usage of a request is known.
+
+        Args:
+            model_info (str): Information about the model.
+            estimated_tokens (int): The number of tokens reserved for the request.
+            actual_tokens (Optional[int]): The number of tokens reported by the provider, or None if unknown.
+
+        Returns:
+            None
+        """
+        if actual_tokens is None:
+            return
+
+        with self.lock:
+            token_bucket = self.token_buckets.get(model_info)
+            if token_bucket:
+                token_bucket.refill()
+                token_bucket.consume(actual_tokens - estimated_tokens)
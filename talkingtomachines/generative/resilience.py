@@ -0,0 +1,423 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from talkingtomachines.generative.metrics import metrics_registry
+
+
+class LLMError(Exception):
+    """Base class for errors raised when a LLM call fails.
+
+    Args:
+        message (str): A description of the error.
+        model_info (Optional[str], optional): Information about the model. Defaults to None.
+        retry_after (Optional[float], optional): The number of seconds the provider asked to wait before retrying. Defaults to None.
+
+    Attributes:
+        model_info (Optional[str]): Information about the model.
+        retry_after (Optional[float]): The number of seconds the provider asked to wait before retrying.
+        retryable (bool): Whether the failed call may succeed if it is retried.
+    """
+
+    retryable = False
+
+    def __init__(
+        self,
+        message: str,
+        model_info: Optional[str] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.model_info = model_info
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMError):
+    """Raised when the provider rejects a call because a rate limit was exceeded."""
+
+    retryable = True
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a call times out or the connection to the provider fails."""
+
+    retryable = True
+
+
+class LLMServerError(LLMError):
+    """Raised when the provider fails to process a call because of a server-side error."""
+
+    retryable = True
+
+
+class LLMClientError(LLMError):
+    """Raised when a call is rejected because of the request itself (e.g. authentication, invalid model or malformed messages)."""
+
+    retryable = False
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the provider while the circuit breaker of a model is open."""
+
+    retryable = False
+
+
+def get_retry_after(exception: Exception) -> Optional[float]:
+    """Extract the Retry-After header from the HTTP response attached to an exception, if any.
+
+    Args:
+        exception (Exception): The exception raised by the provider SDK.
+
+    Returns:
+        Optional[float]: The number of seconds to wait, or None if the header is absent or invalid.
+    """
+    headers = getattr(getattr(exception, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exception: Exception, model_info: Optional[str] = None) -> LLMError:
+    """Maps an exception raised during a LLM call onto the typed LLMError hierarchy.
+
+    Args:
+        exception (Exception): The exception raised during the call.
+        model_info (Optional[str], optional): Information about the model. Defaults to None.
+
+    Returns:
+        LLMError: The classified error.
+    """
+    import httpx
+    import openai
+
+    if isinstance(exception, LLMError):
+        return exception
+
+    message = f"{type(exception).__name__}: {exception}"
+    retry_after = get_retry_after(exception)
+    status_code = getattr(exception, "status_code", None)
+    if status_code is None and isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+
+    if isinstance(exception, openai.RateLimitError) or status_code == 429:
+        error_class = LLMRateLimitError
+    elif isinstance(
+        exception,
+        (
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            httpx.TransportError,
+            asyncio.TimeoutError,
+        ),
+    ):
+        error_class = LLMTimeoutError
+    elif isinstance(exception, openai.InternalServerError) or (
+        isinstance(status_code, int) and status_code >= 500
+    ):
+        error_class = LLMServerError
+    else:
+        error_class = LLMClientError
+
+    return error_class(message, model_info=model_info, retry_after=retry_after)
+
+
+class RetryPolicy:
+    """A bounded retry policy with exponential backoff and decorrelated jitter.
+
+    Args:
+        max_attempts (int, optional): The maximum number of attempts per call, including the first. Defaults to 5.
+        base_delay (float, optional): The minimum number of seconds between attempts. Defaults to 0.5.
+        max_delay (float, optional): The maximum number of seconds between attempts. Defaults to 30.
+
+    Raises:
+        ValueError: If the provided max_attempts is less than 1 or the delays are invalid.
+    """
+
+    def __init__(
+        self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30
+    ):
+        if max_attempts < 1:
+            raise ValueError(
+                f"Invalid value for max_attempts: {max_attempts}. max_attempts should be an integer that is equal to or greater than 1."
+            )
+        if base_delay <= 0 or max_delay < base_delay:
+            raise ValueError(
+                f"Invalid values for base_delay ({base_delay}) and max_delay ({max_delay}). Both should be positive and max_delay should not be less than base_delay."
+            )
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_next_delay(self, previous_delay: float, error: LLMError) -> float:
+        """Compute the delay before the next attempt using decorrelated jitter, honouring any Retry-After hint of the provider.
+
+        Args:
+            previous_delay (float): The delay used before the previous attempt.
+            error (LLMError): The error raised by the previous attempt.
+
+        Returns:
+            float: The number of seconds to wait before the next attempt.
+        """
+        delay = min(
+            self.max_delay,
+            random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)),
+        )
+        if error.retry_after is not None:
+            delay = max(delay, min(error.retry_after, self.max_delay))
+
+        return delay
+
+
+class CircuitBreaker:
+    """A circuit breaker that fails fast once a model has failed repeatedly, e.g. during a provider outage.
+
+    The circuit opens after failure_threshold consecutive server-side failures. While open, calls raise
+    CircuitOpenError without reaching the provider. After recovery_timeout seconds, a single probe call
+    is let through and closes the circuit again if it succeeds.
+
+    Args:
+        failure_threshold (int, optional): The number of consecutive failures that opens the circuit. Defaults to 5.
+        recovery_timeout (float, optional): The number of seconds the circuit stays open before a probe call. Defaults to 30.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def get_state(self) -> str:
+        """Return the state of the circuit.
+
+        Returns:
+            str: "closed", "open" or "half_open".
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.recovery_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self, model_info: Optional[str] = None) -> bool:
+        """Check whether a call may proceed.
+
+        Args:
+            model_info (Optional[str], optional): Information about the model. Defaults to None.
+
+        Returns:
+            bool: True if the call is the probe call of a half open circuit, False otherwise.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with a probe call already in flight.
+        """
+        with self.lock:
+            state = self.get_state()
+            if state == "closed":
+                return False
+            if state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+
+        raise CircuitOpenError(
+            f"Circuit breaker for model {model_info} is open after {self.consecutive_failures} consecutive failures.",
+            model_info=model_info,
+        )
+
+    def record_success(self) -> None:
+        """Record a successful call and close the circuit.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another probe call through after the probe call ended without an outcome, e.g. because it was cancelled.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self, error: LLMError) -> None:
+        """Record a failed call. Only server-side failures and timeouts count towards opening the circuit.
+
+        Args:
+            error (LLMError): The error raised by the call.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.probe_in_flight = False
+            if not isinstance(error, (LLMServerError, LLMTimeoutError)):
+                return
+
+            self.consecutive_failures += 1
+            if (
+                self.opened_at is not None
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Runs LLM calls with bounded retries and a circuit breaker per model.
+
+    Args:
+        retry_policy (Optional[RetryPolicy], optional): The retry policy. Defaults to RetryPolicy().
+        failure_threshold (int, optional): The number of consecutive failures that opens a circuit. Defaults to 5.
+        recovery_timeout (float, optional): The number of seconds a circuit stays open before a probe call. Defaults to 30.
+
+    Attributes:
+        retry_policy (RetryPolicy): The retry policy.
+        circuit_breakers (dict[str, CircuitBreaker]): The circuit breaker of each model.
+    """
+
+    def __init__(
+        self,
+        retry_policy: Optional[RetryPolicy] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+    ):
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.circuit_breakers = {}
+        self.lock = threading.Lock()
+
+    def get_circuit_breaker(self, model_info: str) -> CircuitBreaker:
+        """Return the circuit breaker of a model, creating it if necessary.
+
+        Args:
+            model_info (str): Information about the model.
+
+        Returns:
+            CircuitBreaker: The circuit breaker of the model.
+        """
+        with self.lock:
+            if model_info not in self.circuit_breakers:
+                self.circuit_breakers[model_info] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout,
+                )
+            return self.circuit_breakers[model_info]
+
+    def handle_failure(
+        self,
+        exception: Exception,
+        model_info: str,
+        circuit_breaker: CircuitBreaker,
+        attempt: int,
+        delay: float,
+    ) -> float:
+        """Classify a failed attempt and decide whether to retry it.
+
+        Args:
+            exception (Exception): The exception raised by the attempt.
+            model_info (str): Information about the model.
+            circuit_breaker (CircuitBreaker): The circuit breaker of the model.
+            attempt (int): The number of the failed attempt, starting at 1.
+            delay (float): The delay used before the failed attempt.
+
+        Returns:
+            float: The number of seconds to wait before the next attempt.
+
+        Raises:
+            LLMError: If the error is not retryable or the attempts are exhausted.
+        """
+        error = classify_error(exception, model_info)
+        metrics_registry.increment(
+            "llm_errors_total", model=model_info, error=type(error).__name__
+        )
+        circuit_breaker.record_failure(error)
+        if not error.retryable or attempt >= self.retry_policy.max_attempts:
+            raise error from exception
+
+        metrics_registry.increment("llm_retries_total", model=model_info)
+
+        delay = self.retry_policy.get_next_delay(delay, error)
+        print(
+            f"Retrying call to model {model_info} in {delay:.2f}s after attempt {attempt} failed with {error}."
+        )
+        return delay
+
+    def call(self, model_info: str, func: Callable[[], Any]) -> Any:
+        """Call func with retries, failing fast while the circuit of the model is open.
+
+        Args:
+            model_info (str): Information about the model.
+            func (Callable[[], Any]): The function performing a single attempt of the call.
+
+        Returns:
+            Any: The value returned by func.
+
+        Raises:
+            LLMError: If the call fails permanently or the circuit is open.
+        """
+        circuit_breaker = self.get_circuit_breaker(model_info)
+        delay = self.retry_policy.base_delay
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            is_probe = circuit_breaker.before_call(model_info)
+            try:
+                result = func()
+            except Exception as e:
+                delay = self.handle_failure(
+                    e, model_info, circuit_breaker, attempt, delay
+                )
+                time.sleep(delay)
+            except BaseException:
+                # A cancelled probe has no outcome, but must not keep the circuit open for good
+                if is_probe:
+                    circuit_breaker.release_probe()
+                raise
+            else:
+                circuit_breaker.record_success()
+                return result
+
+    async def call_async(
+        self, model_info: str, func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Asynchronously call func with retries, failing fast while the circuit of the model is open.
+
+        Args:
+            model_info (str): Information about the model.
+            func (Callable[[], Awaitable[Any]]): The coroutine function performing a single attempt of the call.
+
+        Returns:
+            Any: The value returned by func.
+
+        Raises:
+            LLMError: If the call fails permanently or the circuit is open.
+        """
+        circuit_breaker = self.get_circuit_breaker(model_info)
+        delay = self.retry_policy.base_delay
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            is_probe = circuit_breaker.before_call(model_info)
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self.handle_failure(
+                    e, model_info, circuit_breaker, attempt, delay
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                # A cancelled probe has no outcome, but must not keep the circuit open for good
+                if is_probe:
+                    circuit_breaker.release_probe()
+                raise
+            else:
+                circuit_breaker.record_success()
+                return result
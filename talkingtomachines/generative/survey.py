@@ -0,0 +1,53 @@
+import json
+from typing import Any, List, Optional
+
+
+def parse_survey_answers(response: str) -> dict[str, Any]:
+    """Parses the answers to a block of survey questions from a response that contains a JSON object, possibly wrapped
+    in a Markdown code block or surrounded by text.
+
+    Args:
+        response (str): The response generated by the LLM.
+
+    Returns:
+        dict[str, Any]: A dictionary mapping the IDs of the questions to their answers, or an empty dictionary if the
+            response does not contain a JSON object.
+    """
+    start_index, end_index = response.find("{"), response.rfind("}")
+    if start_index == -1 or end_index < start_index:
+        return {}
+
+    try:
+        answers = json.loads(response[start_index : end_index + 1])
+    except json.JSONDecodeError:
+        return {}
+
+    return answers if isinstance(answers, dict) else {}
+
+
+def validate_survey_answer(
+    answer: Any, options: Optional[List[str]] = None
+) -> Optional[str]:
+    """Validates the answer to a survey question. Answers to closed questions must match one of the options, ignoring
+    case and surrounding whitespace, and answers to open questions must not be empty.
+
+    Args:
+        answer (Any): The answer to be validated.
+        options (Optional[List[str]], optional): The answer options of a closed question. Defaults to None.
+
+    Returns:
+        Optional[str]: The answer, normalised to the matching option for closed questions, or None if the answer is invalid.
+    """
+    if answer is None or isinstance(answer, (dict, list)):
+        return None
+
+    answer = str(answer).strip()
+    if not answer:
+        return None
+    if not options:
+        return answer
+
+    for option in options:
+        if answer.casefold() == option.strip().casefold():
+            return option
+    return None
@@ -1,9 +1,33 @@
-from typing import Any, List, Callable
+import copy
+from typing import Any, List, Callable, Optional
 from talkingtomachines.generative.prompt import (
+    PromptTemplate,
     generate_conversational_agent_system_message,
     generate_demographic_prompt,
+    generate_survey_block_prompt,
+    generate_survey_question_prompt,
+    generate_survey_system_message,
 )
-from talkingtomachines.generative.llm import query_llm
+from talkingtomachines.generative.llm import (
+    LLMError,
+    query_llm,
+    query_llm_async,
+    query_llm_samples,
+    query_llm_samples_async,
+    query_llm_stream,
+)
+from talkingtomachines.generative.concurrency import gather_or_cancel
+from talkingtomachines.generative.context import ContextPolicy
+from talkingtomachines.generative.message import (
+    Message,
+    StringTable,
+    to_message_dicts,
+)
+from talkingtomachines.generative.survey import (
+    parse_survey_answers,
+    validate_survey_answer,
+)
+from talkingtomachines.generative.usage import add_usage, create_usage
 
 DemographicInfo = dict[str, Any]
 
@@ -20,6 +44,8 @@ class SyntheticAgent:
         demographic_prompt_generator (Callable[[DemographicInfo], str], optional):
             A function that generates a demographic prompt based on the demographic information.
             Defaults to generate_demographic_prompt.
+        shared_strings (Optional[StringTable], optional): A table through which large strings shared with other agents,
+            such as the experiment context, are held by reference. Defaults to None.
 
     Attributes:
         experiment_id (str): The ID of the experiment.
@@ -29,6 +55,16 @@ class SyntheticAgent:
         model_info (str): The information about the model used by the agent.
     """
 
+    # Agents are created by the ten thousand, so they hold their attributes in slots rather than a __dict__
+    __slots__ = (
+        "experiment_id",
+        "experiment_context",
+        "session_id",
+        "demographic_info",
+        "model_info",
+        "shared_strings",
+    )
+
     def __init__(
         self,
         experiment_id: str,
@@ -39,13 +75,28 @@ class SyntheticAgent:
         demographic_prompt_generator: Callable[
             [DemographicInfo], str
         ] = generate_demographic_prompt,
+        shared_strings: Optional[StringTable] = None,
     ):
+        self.shared_strings = shared_strings
         self.experiment_id = experiment_id
-        self.experiment_context = experiment_context
+        self.experiment_context = self.share_string(experiment_context)
         self.session_id = session_id
         self.demographic_info = demographic_prompt_generator(demographic_info)
         self.model_info = model_info
 
+    def share_string(self, string: str) -> str:
+        """Return the copy of a string held by the table of shared strings of the agent, if it has one.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            str: The shared string, or the provided string if the agent has no table of shared strings.
+        """
+        if self.shared_strings is None:
+            return string
+        return self.shared_strings.share(string)
+
     def get_experiment_id(self) -> str:
         """Return the experiment ID of the synthetic agent.
 
@@ -129,15 +180,37 @@ class ConversationalSyntheticAgent(SyntheticAgent):
         demographic_prompt_generator (Callable[[DemographicInfo], str], optional):
             A function that generates a demographic prompt based on the demographic information.
             Defaults to generate_demographic_prompt.
+        context_policy (Optional[ContextPolicy], optional): The policy selecting the messages resent to the LLM on each call.
+            Defaults to None, which resends the full message history.
+        prompt_layout (str, optional): The layout of the system message, either "default" or "cache_friendly".
+            Defaults to "default".
+        shared_strings (Optional[StringTable], optional): A table through which large strings shared with other agents,
+            such as the experiment context, role description and treatment, are held by reference. The system message is
+            only shared if the agent has no demographic information. Defaults to None.
+        system_message_template (Optional[PromptTemplate], optional): The system message compiled for the role and
+            treatment of the agent, in which only the {demographic_info} placeholder is left to be filled. Defaults to
+            None, which builds the system message from the prompt layout.
 
     Attributes:
         role (str): The name of the role assigned to the agent.
         role_description (str): The description of the role assigned to the agent.
         treatment (str): The treatment assigned to the session.
         system_message (str): The system message generated for the conversation.
-        message_history (List[dict]): The history of the conversation with the synthetic agent.
+        message_history (List[Message]): The history of the conversation with the synthetic agent.
+        usage (dict[str, int]): The number of LLM calls and tokens consumed by the synthetic agent.
+        context_policy (ContextPolicy): The policy selecting the messages resent to the LLM on each call.
     """
 
+    __slots__ = (
+        "role",
+        "role_description",
+        "treatment",
+        "system_message",
+        "message_history",
+        "usage",
+        "context_policy",
+    )
+
     def __init__(
         self,
         experiment_id: str,
@@ -151,6 +224,10 @@ class ConversationalSyntheticAgent(SyntheticAgent):
         demographic_prompt_generator: Callable[
             [DemographicInfo], str
         ] = generate_demographic_prompt,
+        context_policy: Optional[ContextPolicy] = None,
+        prompt_layout: str = "default",
+        shared_strings: Optional[StringTable] = None,
+        system_message_template: Optional[PromptTemplate] = None,
     ):
         super().__init__(
             experiment_id,
@@ -159,19 +236,35 @@ class ConversationalSyntheticAgent(SyntheticAgent):
             demographic_info,
             model_info,
             demographic_prompt_generator,
+            shared_strings,
         )
         self.role = role
-        self.role_description = role_description
-        self.treatment = treatment
-        self.system_message = generate_conversational_agent_system_message(
-            experiment_context=self.experiment_context,
-            treatment=self.treatment,
-            role_description=self.role_description,
-            demographic_info=self.demographic_info,
+        self.role_description = self.share_string(role_description)
+        self.treatment = self.share_string(treatment)
+        if system_message_template is None:
+            system_message = generate_conversational_agent_system_message(
+                experiment_context=self.experiment_context,
+                treatment=self.treatment,
+                role_description=self.role_description,
+                demographic_info=self.demographic_info,
+                prompt_layout=prompt_layout,
+            )
+        else:
+            system_message = system_message_template.render(
+                demographic_info=self.demographic_info
+            )
+        # A system message with demographic information is unique to the agent, so only those without it, e.g. of
+        # interviewers, are shared rather than kept in the table for the lifetime of the experiment
+        self.system_message = (
+            system_message
+            if self.demographic_info
+            else self.share_string(system_message)
+        )
+        self.message_history = [Message("system", self.system_message)]
+        self.usage = create_usage()
+        self.context_policy = (
+            context_policy if context_policy is not None else ContextPolicy()
         )
-        self.message_history = [
-            {"role": "system", "content": self.system_message},
-        ]
 
     def get_role(self) -> str:
         """Return the assigned role of the synthetic agent.
@@ -211,7 +304,15 @@ class ConversationalSyntheticAgent(SyntheticAgent):
         Returns:
             List[dict]: The conversation history of the synthetic agent
         """
-        return self.message_history
+        return to_message_dicts(self.message_history)
+
+    def get_usage(self) -> dict[str, int]:
+        """Return the number of LLM calls and tokens consumed by the synthetic agent.
+
+        Returns:
+            dict[str, int]: The token usage of the synthetic agent.
+        """
+        return self.usage
 
     def to_dict(self) -> dict[str, Any]:
         """Converts the ConversationalSyntheticAgent object to a dictionary.
@@ -229,9 +330,27 @@ class ConversationalSyntheticAgent(SyntheticAgent):
             "role_description": self.role_description,
             "treatment": self.treatment,
             "system_message": self.system_message,
-            "message_history": self.message_history,
+            "message_history": to_message_dicts(self.message_history),
+            "usage": self.usage,
         }
 
+    def restore_state(self, agent_dict: dict[str, Any]) -> None:
+        """Restore the message history and usage of the synthetic agent from a dictionary returned by to_dict, e.g. to
+        resume a session from a checkpoint. The state of the context policy is not restored.
+
+        Args:
+            agent_dict (dict[str, Any]): A dictionary representation of the agent.
+
+        Returns:
+            None
+        """
+        self.message_history = [
+            Message(message["role"], message["content"])
+            for message in agent_dict["message_history"]
+        ]
+        self.usage = create_usage()
+        add_usage(self.usage, agent_dict["usage"])
+
     def update_message_history(self, message: str, role: str) -> None:
         """Update the message history of the synthetic agent with a new message.
 
@@ -242,29 +361,611 @@ class ConversationalSyntheticAgent(SyntheticAgent):
         Returns:
             None
         """
-        self.message_history.append({"role": role, "content": message})
+        self.message_history.append(Message(role, message))
+
+    def prepare_request(self, question: str) -> List[dict]:
+        """Add a question posed to the synthetic agent to its message history and return the messages to be sent to the LLM,
+        as selected by the context policy of the agent.
+
+        Args:
+            question (str): A question or prompt to which the agent should respond.
+
+        Returns:
+            List[dict]: The message history to be sent to the LLM.
+        """
+        self.update_message_history(message=question, role="assistant")
+        return to_message_dicts(
+            self.context_policy.apply(self.message_history, usage=self.usage)
+        )
+
+    async def prepare_request_async(self, question: str) -> List[dict]:
+        """Asynchronously add a question posed to the synthetic agent to its message history and return the messages to be
+        sent to the LLM, as selected by the context policy of the agent.
+
+        Args:
+            question (str): A question or prompt to which the agent should respond.
+
+        Returns:
+            List[dict]: The message history to be sent to the LLM.
+        """
+        self.update_message_history(message=question, role="assistant")
+        return to_message_dicts(
+            await self.context_policy.apply_async(
+                self.message_history, usage=self.usage
+            )
+        )
+
+    def record_response(self, response: str) -> None:
+        """Add the response generated by the LLM for a prepared request to the message history.
+
+        Args:
+            response (str): The response generated by the LLM.
+
+        Returns:
+            None
+        """
+        self.update_message_history(message=response, role="user")
+
+    def discard_request(self) -> None:
+        """Remove a prepared request whose LLM call failed from the message history, so that the question can be posed again.
+
+        Returns:
+            None
+        """
+        self.message_history.pop()
+
+    def fork(self) -> "ConversationalSyntheticAgent":
+        """Create a branch of the synthetic agent, which continues the conversation independently of the agent from
+        its current message history. The branch starts with an empty usage record, so that the usage of calls made
+        before the fork is only counted once across branches.
+
+        Returns:
+            ConversationalSyntheticAgent: The branch of the synthetic agent.
+        """
+        branch = copy.copy(self)
+        branch.message_history = list(self.message_history)
+        branch.usage = create_usage()
+        branch.context_policy = copy.copy(self.context_policy)
+        return branch
+
+    def create_branches(
+        self, responses: List[str]
+    ) -> List["ConversationalSyntheticAgent"]:
+        """Fork the synthetic agent once per sampled response to a prepared request, and remove the request from the
+        message history of the agent itself.
+
+        Args:
+            responses (List[str]): The responses sampled from the LLM for the prepared request.
+
+        Returns:
+            List[ConversationalSyntheticAgent]: One branch per response, with the request and the response in its message history.
+        """
+        branches = []
+        for response in responses:
+            branch = self.fork()
+            branch.record_response(response)
+            branches.append(branch)
+
+        self.discard_request()
+        return branches
+
+    def respond_samples(
+        self, question: str, n: int
+    ) -> List["ConversationalSyntheticAgent"]:
+        """Sample n independent responses to a question posed to the synthetic agent in a single LLM call, and fan them
+        out into n conversation branches. The agent itself is left unchanged, apart from its usage, which records the
+        call.
+
+        Args:
+            question (str): A question or prompt to which the agent should respond.
+            n (int): The number of responses.
+
+        Returns:
+            List[ConversationalSyntheticAgent]: One branch per response, whose last message is the response.
+
+        Raises:
+            ValueError: If n is less than 1.
+            LLMError: If the call to the LLM fails. The question is removed from the message history so that it can be posed again.
+        """
+        try:
+            message_history = self.prepare_request(question)
+            responses = query_llm_samples(
+                model_info=self.model_info,
+                message_history=message_history,
+                n=n,
+                usage=self.usage,
+            )
+            return self.create_branches(responses)
+
+        except Exception:
+            # The question is removed whatever the error, so that no question is left without a response
+            self.discard_request()
+            raise
+
+    async def respond_samples_async(
+        self, question: str, n: int
+    ) -> List["ConversationalSyntheticAgent"]:
+        """Asynchronously sample n independent responses to a question posed to the synthetic agent in a single LLM
+        call, and fan them out into n conversation branches.
+
+        Args:
+            question (str): A question or prompt to which the agent should respond.
+            n (int): The number of responses.
+
+        Returns:
+            List[ConversationalSyntheticAgent]: One branch per response, whose last message is the response.
+
+        Raises:
+            ValueError: If n is less than 1.
+            LLMError: If the call to the LLM fails. The question is removed from the message history so that it can be posed again.
+        """
+        try:
+            message_history = await self.prepare_request_async(question)
+            responses = await query_llm_samples_async(
+                model_info=self.model_info,
+                message_history=message_history,
+                n=n,
+                usage=self.usage,
+            )
+            return self.create_branches(responses)
+
+        except Exception:
+            # The question is removed whatever the error, so that no question is left without a response
+            self.discard_request()
+            raise
 
-    def respond(self, question: str) -> str:
+    def respond(
+        self,
+        question: str,
+        stream: bool = False,
+        stop_pattern: Optional[str] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> str:
         """Generate a response to a question posed to the synthetic agent.
 
+        Args:
+            question (str): A question or prompt to which the agent should respond.
+            stream (bool, optional): Indicates whether the response is streamed from the LLM. Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which the generation is cancelled. Defaults to None.
+            on_chunk (Optional[Callable[[str], None]], optional): When streaming, a function called with every chunk of the response
+                as it arrives. Defaults to None.
+
+        Returns:
+            str: The response generated by the synthetic agent.
+
+        Raises:
+            LLMError: If the call to the LLM fails. The question is removed from the message history so that it can be posed again.
+        """
+        try:
+            message_history = self.prepare_request(question)
+            if stream:
+                chunks = []
+                for chunk in query_llm_stream(
+                    model_info=self.model_info,
+                    message_history=message_history,
+                    stop_pattern=stop_pattern,
+                    usage=self.usage,
+                ):
+                    chunks.append(chunk)
+                    if on_chunk is not None:
+                        on_chunk(chunk)
+                response = "".join(chunks)
+            else:
+                response = query_llm(
+                    model_info=self.model_info,
+                    message_history=message_history,
+                    usage=self.usage,
+                )
+            self.record_response(response)
+            return response
+
+        except Exception:
+            # The question is removed whatever the error, so that no question is left without a response
+            self.discard_request()
+            raise
+
+    async def respond_async(self, question: str) -> str:
+        """Asynchronously generate a response to a question posed to the synthetic agent.
+
         Args:
             question (str): A question or prompt to which the agent should respond.
 
         Returns:
             str: The response generated by the synthetic agent.
+
+        Raises:
+            LLMError: If the call to the LLM fails. The question is removed from the message history so that it can be posed again.
         """
         try:
-            self.update_message_history(message=question, role="assistant")
-            response = query_llm(
+            message_history = await self.prepare_request_async(question)
+            response = await query_llm_async(
                 model_info=self.model_info,
-                message_history=self.message_history,
+                message_history=message_history,
+                usage=self.usage,
             )
-            self.update_message_history(message=response, role="user")
+            self.record_response(response)
             return response
 
-        except Exception as e:
-            # Log the exception
-            print(
-                f"Error during response generation by ConversationalSyntheticAgent object: {e}"
+        except Exception:
+            # The question is removed whatever the error, so that no question is left without a response
+            self.discard_request()
+            raise
+
+
+class SurveySyntheticAgent(SyntheticAgent):
+    """A synthetic respondent that answers a questionnaire in blocks of questions, one LLM call per block, rather than one
+    call per question. Each block is answered as a JSON object mapping question IDs to answers. Only the questions whose
+    answers are missing or fail validation are asked again, one at a time. Inherits from the SyntheticAgent base class.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        experiment_context (str): The context of the experiment.
+        session_id (int): The ID of the session.
+        demographic_info (DemographicInfo): The demographic information of the respondent.
+        model_info (str): The information about the model used by the agent.
+        treatment (str): The treatment assigned to the respondent.
+        questions (dict[str, str]): A dictionary mapping the IDs of the questions to their text, in the order they are asked.
+        options (Optional[dict[str, List[str]]], optional): A dictionary mapping the IDs of closed questions to their answer
+            options. Defaults to None.
+        block_size (int, optional): The maximum number of questions answered in one call. Defaults to 20.
+        demographic_prompt_generator (Callable[[DemographicInfo], str], optional):
+            A function that generates a demographic prompt based on the demographic information.
+            Defaults to generate_demographic_prompt.
+        shared_strings (Optional[StringTable], optional): A table through which large strings shared with other agents,
+            such as the experiment context and treatment, are held by reference. Defaults to None.
+        system_message_template (Optional[PromptTemplate], optional): The system message compiled for the treatment of
+            the respondent, in which only the {demographic_info} placeholder is left to be filled. Defaults to None.
+
+    Attributes:
+        treatment (str): The treatment assigned to the respondent.
+        system_message (str): The system message of the respondent.
+        questions (dict[str, str]): The questions of the questionnaire.
+        options (dict[str, List[str]]): The answer options of the closed questions.
+        block_size (int): The maximum number of questions answered in one call.
+        answers (dict[str, Optional[str]]): The answers given so far, or None for questions without a valid answer.
+        fallback_question_ids (List[str]): The IDs of the questions that were asked again individually.
+        usage (dict[str, int]): The number of LLM calls and tokens consumed by the agent.
+
+    Raises:
+        ValueError: If the provided questions is empty or block_size is less than 1.
+    """
+
+    __slots__ = (
+        "treatment",
+        "system_message",
+        "questions",
+        "options",
+        "block_size",
+        "answers",
+        "fallback_question_ids",
+        "usage",
+    )
+
+    def __init__(
+        self,
+        experiment_id: str,
+        experiment_context: str,
+        session_id: int,
+        demographic_info: DemographicInfo,
+        model_info: str,
+        treatment: str,
+        questions: dict[str, str],
+        options: Optional[dict[str, List[str]]] = None,
+        block_size: int = 20,
+        demographic_prompt_generator: Callable[
+            [DemographicInfo], str
+        ] = generate_demographic_prompt,
+        shared_strings: Optional[StringTable] = None,
+        system_message_template: Optional[PromptTemplate] = None,
+    ):
+        if not questions:
+            raise ValueError(
+                f"Invalid value for questions: {questions}. questions should contain at least one question."
             )
-            return ""
+        if block_size < 1:
+            raise ValueError(
+                f"Invalid value for block_size: {block_size}. block_size should be an integer that is equal to or greater than 1."
+            )
+
+        super().__init__(
+            experiment_id,
+            experiment_context,
+            session_id,
+            demographic_info,
+            model_info,
+            demographic_prompt_generator,
+            shared_strings,
+        )
+        self.treatment = self.share_string(treatment)
+        if system_message_template is None:
+            self.system_message = generate_survey_system_message(
+                experiment_context=self.experiment_context,
+                treatment=self.treatment,
+                demographic_info=self.demographic_info,
+            )
+        else:
+            self.system_message = system_message_template.render(
+                demographic_info=self.demographic_info
+            )
+        self.questions = questions
+        self.options = options or {}
+        self.block_size = block_size
+        self.answers = {}
+        self.fallback_question_ids = []
+        self.usage = create_usage()
+
+    def get_treatment(self) -> str:
+        """Return the treatment assigned to the respondent.
+
+        Returns:
+            str: The treatment assigned to the respondent.
+        """
+        return self.treatment
+
+    def get_system_message(self) -> str:
+        """Return the system message of the respondent.
+
+        Returns:
+            str: The system message of the respondent.
+        """
+        return self.system_message
+
+    def get_answers(self) -> dict[str, Optional[str]]:
+        """Return the answers given so far.
+
+        Returns:
+            dict[str, Optional[str]]: A dictionary mapping the IDs of the answered questions to their answers, or None for
+                questions without a valid answer.
+        """
+        return self.answers
+
+    def get_usage(self) -> dict[str, int]:
+        """Return the number of LLM calls and tokens consumed by the agent.
+
+        Returns:
+            dict[str, int]: The token usage of the agent.
+        """
+        return self.usage
+
+    def to_dict(self) -> dict[str, Any]:
+        """Converts the SurveySyntheticAgent object to a dictionary.
+
+        Returns:
+            dict[str, Any]: A dictionary representation of the SurveySyntheticAgent object.
+        """
+        return {
+            "experiment_id": self.experiment_id,
+            "experiment_context": self.experiment_context,
+            "session_id": self.session_id,
+            "demographic_info": self.demographic_info,
+            "model_info": self.model_info,
+            "treatment": self.treatment,
+            "system_message": self.system_message,
+            "answers": self.answers,
+            "fallback_question_ids": self.fallback_question_ids,
+            "usage": self.usage,
+        }
+
+    def restore_state(self, agent_dict: dict[str, Any]) -> None:
+        """Restore the answers and usage of the respondent from a dictionary returned by to_dict, e.g. to resume a survey
+        from a checkpoint at its first unanswered block.
+
+        Args:
+            agent_dict (dict[str, Any]): A dictionary representation of the agent.
+
+        Returns:
+            None
+        """
+        self.answers = dict(agent_dict["answers"])
+        self.fallback_question_ids = list(agent_dict["fallback_question_ids"])
+        self.usage = dict(agent_dict["usage"])
+
+    def get_question_blocks(self) -> List[List[str]]:
+        """Split the questions that have not been answered yet into blocks, so that an interrupted survey resumes where it
+        stopped.
+
+        Returns:
+            List[List[str]]: The IDs of the questions of each block.
+        """
+        question_ids = [
+            question_id
+            for question_id in self.questions
+            if question_id not in self.answers
+        ]
+        return [
+            question_ids[index : index + self.block_size]
+            for index in range(0, len(question_ids), self.block_size)
+        ]
+
+    def build_block_request(self, question_ids: List[str]) -> List[dict]:
+        """Construct the messages that ask for the answers to a block of questions.
+
+        Args:
+            question_ids (List[str]): The IDs of the questions of the block.
+
+        Returns:
+            List[dict]: The message history to be sent to the LLM.
+        """
+        block_prompt = generate_survey_block_prompt(
+            {question_id: self.questions[question_id] for question_id in question_ids},
+            self.options,
+        )
+        return [
+            {"role": "system", "content": self.system_message},
+            {"role": "user", "content": block_prompt},
+        ]
+
+    def build_question_request(self, question_id: str) -> List[dict]:
+        """Construct the messages that ask for the answer to a single question.
+
+        Args:
+            question_id (str): The ID of the question.
+
+        Returns:
+            List[dict]: The message history to be sent to the LLM.
+        """
+        question_prompt = generate_survey_question_prompt(
+            question_id, self.questions[question_id], self.options.get(question_id)
+        )
+        return [
+            {"role": "system", "content": self.system_message},
+            {"role": "user", "content": question_prompt},
+        ]
+
+    def record_block_answers(self, question_ids: List[str], response: str) -> List[str]:
+        """Record the valid answers in the response to a block of questions.
+
+        Args:
+            question_ids (List[str]): The IDs of the questions of the block.
+            response (str): The response generated by the LLM.
+
+        Returns:
+            List[str]: The IDs of the questions whose answers are missing or invalid.
+        """
+        parsed_answers = parse_survey_answers(response)
+        invalid_question_ids = []
+        for question_id in question_ids:
+            answer = validate_survey_answer(
+                parsed_answers.get(question_id), self.options.get(question_id)
+            )
+            if answer is None:
+                invalid_question_ids.append(question_id)
+            else:
+                self.answers[question_id] = answer
+
+        return invalid_question_ids
+
+    def record_question_answer(self, question_id: str, response: str) -> None:
+        """Record the answer to a question that was asked individually, or None if it is still invalid.
+
+        Args:
+            question_id (str): The ID of the question.
+            response (str): The response generated by the LLM.
+
+        Returns:
+            None
+        """
+        self.answers[question_id] = validate_survey_answer(
+            response, self.options.get(question_id)
+        )
+        # Recorded with the answer, so that a fallback that failed and is asked again on resume is only listed once
+        self.fallback_question_ids.append(question_id)
+
+    def answer_question(self, question_id: str) -> None:
+        """Ask a question individually and record its answer.
+
+        Args:
+            question_id (str): The ID of the question.
+
+        Returns:
+            None
+
+        Raises:
+            LLMError: If the call to the LLM fails.
+        """
+        response = query_llm(
+            model_info=self.model_info,
+            message_history=self.build_question_request(question_id),
+            usage=self.usage,
+        )
+        self.record_question_answer(question_id, response)
+
+    async def answer_question_async(self, question_id: str) -> None:
+        """Asynchronously ask a question individually and record its answer.
+
+        Args:
+            question_id (str): The ID of the question.
+
+        Returns:
+            None
+
+        Raises:
+            LLMError: If the call to the LLM fails.
+        """
+        response = await query_llm_async(
+            model_info=self.model_info,
+            message_history=self.build_question_request(question_id),
+            usage=self.usage,
+        )
+        self.record_question_answer(question_id, response)
+
+    def answer_block(self, question_ids: List[str]) -> None:
+        """Answer a block of questions in one call, and ask the questions without a valid answer individually.
+
+        Args:
+            question_ids (List[str]): The IDs of the questions of the block.
+
+        Returns:
+            None
+
+        Raises:
+            LLMError: If a call to the LLM fails. The answers recorded so far are kept.
+        """
+        response = query_llm(
+            model_info=self.model_info,
+            message_history=self.build_block_request(question_ids),
+            usage=self.usage,
+        )
+        for question_id in self.record_block_answers(question_ids, response):
+            self.answer_question(question_id)
+
+    async def answer_block_async(self, question_ids: List[str]) -> None:
+        """Asynchronously answer a block of questions in one call, and ask the questions without a valid answer
+        individually and concurrently.
+
+        Args:
+            question_ids (List[str]): The IDs of the questions of the block.
+
+        Returns:
+            None
+
+        Raises:
+            LLMError: If a call to the LLM fails. The answers recorded so far are kept.
+        """
+        response = await query_llm_async(
+            model_info=self.model_info,
+            message_history=self.build_block_request(question_ids),
+            usage=self.usage,
+        )
+        await gather_or_cancel(
+            self.answer_question_async(question_id)
+            for question_id in self.record_block_answers(question_ids, response)
+        )
+
+    def answer_survey(self) -> dict[str, Optional[str]]:
+        """Answer the questions of the questionnaire that have not been answered yet.
+
+        Returns:
+            dict[str, Optional[str]]: A dictionary mapping the IDs of the questions to their answers, in the order of the
+                questionnaire, with None for questions without a valid answer.
+
+        Raises:
+            LLMError: If a call to the LLM fails. The answers recorded so far are kept, so that the survey can be resumed.
+        """
+        for question_ids in self.get_question_blocks():
+            self.answer_block(question_ids)
+
+        return {
+            question_id: self.answers.get(question_id) for question_id in self.questions
+        }
+
+    async def answer_survey_async(self) -> dict[str, Optional[str]]:
+        """Asynchronously answer the questions of the questionnaire that have not been answered yet, with the blocks
+        answered concurrently.
+
+        Returns:
+            dict[str, Optional[str]]: A dictionary mapping the IDs of the questions to their answers, in the order of the
+                questionnaire, with None for questions without a valid answer.
+
+        Raises:
+            LLMError: If a call to the LLM fails. The other blocks are cancelled, and the answers recorded so far are kept,
+                so that the survey can be resumed.
+        """
+        await gather_or_cancel(
+            self.answer_block_async(question_ids)
+            for question_ids in self.get_question_blocks()
+        )
+
+        return {
+            question_id: self.answers.get(question_id) for question_id in self.questions
+        }
@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+CHARACTERS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+TOKEN_COUNT_CACHE_CHARACTERS = 4_000_000
+MAX_CACHED_TEXT_LENGTH = 16_384
+
+encoding: Optional[Any] = None
+
+
+class TokenCountCache:
+    """A least recently used cache of token counts, bounded by the total length of the cached texts rather than their
+    number, so that it never holds more than max_characters characters of messages and personas in memory.
+
+    Args:
+        max_characters (int, optional): The maximum total length of the cached texts. Defaults to 4,000,000.
+        max_text_length (int, optional): The length above which texts are not cached. Defaults to 16,384.
+
+    Attributes:
+        token_counts (OrderedDict[str, int]): The token count of each cached text, from least to most recently used.
+        num_characters (int): The total length of the cached texts.
+        hits (int): The number of counts served from the cache.
+        misses (int): The number of counts that were not cached.
+    """
+
+    def __init__(
+        self,
+        max_characters: int = TOKEN_COUNT_CACHE_CHARACTERS,
+        max_text_length: int = MAX_CACHED_TEXT_LENGTH,
+    ):
+        self.max_characters = max_characters
+        self.max_text_length = max_text_length
+        self.token_counts = OrderedDict()
+        self.num_characters = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[int]:
+        """Return the cached token count of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            Optional[int]: The token count, or None if the text is not cached.
+        """
+        with self.lock:
+            num_tokens = self.token_counts.get(text)
+            if num_tokens is None:
+                self.misses += 1
+                return None
+
+            self.token_counts.move_to_end(text)
+            self.hits += 1
+            return num_tokens
+
+    def set(self, text: str, num_tokens: int) -> None:
+        """Cache the token count of a text, evicting the least recently used texts beyond max_characters. Texts longer
+        than max_text_length are not cached.
+
+        Args:
+            text (str): The text.
+            num_tokens (int): The token count of the text.
+
+        Returns:
+            None
+        """
+        if len(text) > self.max_text_length:
+            return
+
+        with self.lock:
+            if text in self.token_counts:
+                return
+
+            self.token_counts[text] = num_tokens
+            self.num_characters += len(text)
+            while self.num_characters > self.max_characters:
+                evicted_text, _ = self.token_counts.popitem(last=False)
+                self.num_characters -= len(evicted_text)
+
+    def clear(self) -> None:
+        """Remove every cached token count.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.token_counts.clear()
+            self.num_characters = 0
+
+
+token_count_cache = TokenCountCache()
+
+
+def configure_tokenizer(encoding_name: Optional[str] = None) -> None:
+    """Configures the tokenizer used to count tokens. By default, tokens are estimated from the length of the text. Exact
+    counts require the optional tiktoken package.
+
+    Args:
+        encoding_name (Optional[str], optional): The name of the tiktoken encoding, e.g. "o200k_base" for gpt-4o.
+            Defaults to None, which restores the length-based estimate.
+
+    Returns:
+        None
+
+    Raises:
+        ImportError: If an encoding is requested and tiktoken is not installed.
+    """
+    global encoding
+    if encoding_name is None:
+        encoding = None
+    else:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+
+    token_count_cache.clear()
+
+
+def count_tokens(text: str) -> int:
+    """Counts the number of tokens in a piece of text. Without a configured tokenizer, roughly four characters per token
+    are assumed for English text. Counts of the tokenizer are cached, as the same messages are counted again on every
+    turn.
+
+    Args:
+        text (str): The text to be measured.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if not text:
+        return 0
+    if encoding is None:
+        return max(1, -(-len(text) // CHARACTERS_PER_TOKEN))
+
+    num_tokens = token_count_cache.get(text)
+    if num_tokens is None:
+        num_tokens = len(encoding.encode(text))
+        token_count_cache.set(text, num_tokens)
+    return num_tokens
+
+
+def count_message_tokens(message: dict) -> int:
+    """Counts the number of prompt tokens consumed by a single message, including the per-message overhead of the chat format.
+
+    Args:
+        message (dict): A message with a role and content.
+
+    Returns:
+        int: The number of prompt tokens.
+    """
+    return TOKENS_PER_MESSAGE + count_tokens(str(message.get("content", "")))
+
+
+def estimate_message_tokens(message_history: List[dict]) -> int:
+    """Estimates the number of prompt tokens consumed by a message history, including the per-message overhead of the chat format.
+
+    Args:
+        message_history (List[dict]): Contains the history of message exchanged between user and assistant.
+
+    Returns:
+        int: The estimated number of prompt tokens.
+    """
+    return TOKENS_PER_REPLY + sum(
+        count_message_tokens(message) for message in message_history
+    )
@@ -0,0 +1,191 @@
+from typing import Iterable, Optional
+
+USAGE_FIELDS = ["prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens"]
+
+# Prices in USD per million tokens. Cached prompt tokens are billed at the discounted cached_prompt price.
+MODEL_PRICES = {
+    "gpt-4o": {"prompt": 2.50, "cached_prompt": 1.25, "completion": 10.00},
+    "gpt-4o-mini": {"prompt": 0.15, "cached_prompt": 0.075, "completion": 0.60},
+    "gpt-4-turbo": {"prompt": 10.00, "cached_prompt": 10.00, "completion": 30.00},
+    "gpt-4": {"prompt": 30.00, "cached_prompt": 30.00, "completion": 60.00},
+    "gpt-3.5-turbo": {"prompt": 0.50, "cached_prompt": 0.50, "completion": 1.50},
+    "claude-3-5-sonnet-20240620": {
+        "prompt": 3.00,
+        "cached_prompt": 0.30,
+        "completion": 15.00,
+    },
+    "claude-3-opus-20240229": {
+        "prompt": 15.00,
+        "cached_prompt": 1.50,
+        "completion": 75.00,
+    },
+    "claude-3-sonnet-20240229": {
+        "prompt": 3.00,
+        "cached_prompt": 0.30,
+        "completion": 15.00,
+    },
+    "claude-3-haiku-20240307": {
+        "prompt": 0.25,
+        "cached_prompt": 0.03,
+        "completion": 1.25,
+    },
+    "mistral-large-latest": {"prompt": 2.00, "cached_prompt": 2.00, "completion": 6.00},
+    "mistral-medium-latest": {
+        "prompt": 2.70,
+        "cached_prompt": 2.70,
+        "completion": 8.10,
+    },
+    "mistral-small-latest": {
+        "prompt": 0.20,
+        "cached_prompt": 0.20,
+        "completion": 0.60,
+    },
+    "open-mistral-nemo": {"prompt": 0.15, "cached_prompt": 0.15, "completion": 0.15},
+    "mock": {"prompt": 0.0, "cached_prompt": 0.0, "completion": 0.0},
+}
+
+
+def create_usage() -> dict[str, int]:
+    """Create an empty record of token usage.
+
+    Returns:
+        dict[str, int]: The number of calls and the prompt, completion, cached and total token counts, all set to 0.
+    """
+    usage = {"calls": 0}
+    usage.update({field: 0 for field in USAGE_FIELDS})
+    return usage
+
+
+def add_usage(total_usage: dict[str, int], usage: Optional[dict[str, int]]) -> None:
+    """Add the usage of a call, or an aggregated record of usage, to a record of token usage.
+
+    Args:
+        total_usage (dict[str, int]): The record of token usage to be updated in place.
+        usage (Optional[dict[str, int]]): The usage to be added. Usage without a "calls" count is counted as one call.
+
+    Returns:
+        None
+    """
+    if usage is None:
+        return
+
+    total_usage["calls"] = total_usage.get("calls", 0) + usage.get("calls", 1)
+    for field in USAGE_FIELDS:
+        total_usage[field] = total_usage.get(field, 0) + usage.get(field, 0)
+    for model_info, model_usage in usage.get("by_model", {}).items():
+        add_usage(get_model_usage(total_usage, model_info), model_usage)
+
+
+def get_model_usage(usage: dict[str, int], model_info: str) -> dict[str, int]:
+    """Return the record of the usage of calls to another model than the one of a record of token usage, e.g. the
+    summary model of a context policy, creating it if necessary. These calls are kept under "by_model" rather than
+    added to the token counts of the record, so that they are priced at the rate of their own model.
+
+    Args:
+        usage (dict[str, int]): The record of token usage.
+        model_info (str): Information about the other model.
+
+    Returns:
+        dict[str, int]: The record of token usage of the other model.
+    """
+    return usage.setdefault("by_model", {}).setdefault(model_info, create_usage())
+
+
+def set_model_price(
+    model_info: str,
+    prompt: float,
+    completion: float,
+    cached_prompt: Optional[float] = None,
+) -> None:
+    """Set the price of a model used for cost estimates.
+
+    Args:
+        model_info (str): Information about the model.
+        prompt (float): The price of a million prompt tokens in USD.
+        completion (float): The price of a million completion tokens in USD.
+        cached_prompt (Optional[float], optional): The price of a million cached prompt tokens in USD. Defaults to the prompt price.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If a provided price is negative.
+    """
+    cached_prompt = prompt if cached_prompt is None else cached_prompt
+    if min(prompt, completion, cached_prompt) < 0:
+        raise ValueError(
+            f"Invalid prices for model {model_info}: prompt ({prompt}), completion ({completion}) and cached_prompt ({cached_prompt}) should be non-negative."
+        )
+
+    MODEL_PRICES[model_info] = {
+        "prompt": prompt,
+        "cached_prompt": cached_prompt,
+        "completion": completion,
+    }
+
+
+def estimate_cost(model_info: str, usage: dict[str, int]) -> Optional[float]:
+    """Estimate the cost of the token usage of a model, including the calls to other models kept under "by_model".
+    Prompt token counts include cached prompt tokens.
+
+    Args:
+        model_info (str): Information about the model.
+        usage (dict[str, int]): The token usage.
+
+    Returns:
+        Optional[float]: The estimated cost in USD, or None if the price of one of the models is unknown.
+    """
+    prices = MODEL_PRICES.get(model_info)
+    if prices is None:
+        return None
+
+    cached_tokens = usage.get("cached_tokens", 0)
+    uncached_tokens = max(0, usage.get("prompt_tokens", 0) - cached_tokens)
+    cost = (
+        uncached_tokens * prices["prompt"]
+        + cached_tokens * prices["cached_prompt"]
+        + usage.get("completion_tokens", 0) * prices["completion"]
+    ) / 1_000_000
+    for other_model_info, model_usage in usage.get("by_model", {}).items():
+        model_cost = estimate_cost(other_model_info, model_usage)
+        if model_cost is None:
+            return None
+        cost += model_cost
+
+    return cost
+
+
+def get_cache_hit_rate(usage: dict[str, int]) -> Optional[float]:
+    """Compute the share of prompt tokens that were served from the provider's prompt cache.
+
+    Args:
+        usage (dict[str, int]): The token usage.
+
+    Returns:
+        Optional[float]: The ratio of cached to prompt tokens, or None if no prompt tokens were used.
+    """
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    if prompt_tokens == 0:
+        return None
+
+    return usage.get("cached_tokens", 0) / prompt_tokens
+
+
+def summarize_usage(model_info: str, usages: Iterable[dict[str, int]]) -> dict:
+    """Add up records of token usage, and estimate their cost and prompt cache hit rate.
+
+    Args:
+        model_info (str): Information about the model.
+        usages (Iterable[dict[str, int]]): The records of token usage.
+
+    Returns:
+        dict: The total number of calls and tokens, the estimated cost in USD under "cost" (None if the price of the model
+            is unknown) and the share of prompt tokens served from cache under "cache_hit_rate".
+    """
+    total_usage = create_usage()
+    for usage in usages:
+        add_usage(total_usage, usage)
+
+    total_usage["cost"] = estimate_cost(model_info, total_usage)
+    total_usage["cache_hit_rate"] = get_cache_hit_rate(total_usage)
+    return total_usage
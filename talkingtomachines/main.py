@@ -1,6 +1,9 @@
 # Entry point of the application
-from flask import Flask
+from flask import Flask, Response
 from talkingtomachines.config import DevelopmentConfig
+from talkingtomachines.generative.metrics import metrics_registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 def create_app(config_class=DevelopmentConfig):
@@ -12,6 +15,12 @@ def create_app(config_class=DevelopmentConfig):
     def home():
         return "Welcome to the Talking To Machines Platform"
 
+    @app.route("/metrics")
+    def metrics():
+        return Response(
+            metrics_registry.export_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE
+        )
+
     return app
 
 
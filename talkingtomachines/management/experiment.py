@@ -1,10 +1,23 @@
-from typing import Any
-import pandas as pd
+from __future__ import annotations
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+)
+import copy
+import time
+import asyncio
+import contextlib
 import datetime
-from tqdm import tqdm
 from talkingtomachines.generative.synthetic_agent import (
     ConversationalSyntheticAgent,
     DemographicInfo,
+    SurveySyntheticAgent,
 )
 from talkingtomachines.management.treatment import (
     simple_random_assignment_session,
@@ -12,11 +25,47 @@ from talkingtomachines.management.treatment import (
     full_factorial_assignment_session,
 )
 from talkingtomachines.generative.prompt import (
+    PromptTemplate,
+    check_conversational_agent_template,
+    check_prompt_layout,
+    compile_conversational_agent_system_message_template,
+    compile_survey_system_message_template,
     generate_conversational_session_system_message,
+    generate_demographic_prompt,
+    generate_demographic_prompts,
+)
+from talkingtomachines.generative.llm import (
+    LLMError,
+    disable_adaptive_concurrency,
+    enable_adaptive_concurrency,
+    get_concurrency_controller,
+    get_supported_models,
+)
+from talkingtomachines.generative.batch import BatchClient
+from talkingtomachines.generative.context import ContextPolicy
+from talkingtomachines.generative.message import StringTable
+from talkingtomachines.generative.persona import PersonaCompiler
+from talkingtomachines.generative.usage import (
+    add_usage,
+    create_usage,
+    summarize_usage,
+)
+from talkingtomachines.generative.metrics import metrics_registry
+from talkingtomachines.management.work_queue import WorkQueue
+from talkingtomachines.storage.experiment import (
+    JSONLSessionSink,
+    get_session_stream_path,
+    load_experiment_checkpoint,
+    save_experiment,
+    save_experiment_checkpoint,
+    save_session_checkpoint,
 )
-from talkingtomachines.storage.experiment import save_experiment
 
-SUPPORTED_MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from talkingtomachines.generative.concurrency import AIMDController
+
 SUPPORTED_ASSIGNMENT_STRATEGIES = [
     "simple_random",
     "complete_random",
@@ -25,6 +74,9 @@ SUPPORTED_ASSIGNMENT_STRATEGIES = [
     "cluster_randomisation",
     "manual",
 ]
+SUPPORTED_LLM_ERROR_HANDLING = ["abort", "raise"]
+SUPPORTED_EXECUTION_MODES = ["sequential", "batch"]
+END_OF_CONVERSATION = "Thank you for the conversation."
 
 
 class Experiment:
@@ -71,6 +123,8 @@ class AIConversationalExperiment(Experiment):
         treatments (dict[str, Any], optional): The treatments for the experiment. Defaults to an empty dictionary.
         treatment_assignment_strategy (str, optional): The strategy used for assigning treatments to agents.
             Defaults to "simple_random".
+        persona_compiler (Optional[PersonaCompiler], optional): The compiler selecting the demographic fields of each
+            agent's prompt within a token budget. Defaults to None, which includes every field.
 
     Raises:
         ValueError: If the provided model_info is not supported.
@@ -86,6 +140,11 @@ class AIConversationalExperiment(Experiment):
         treatments (dict[str, Any]): The treatments for the experiment.
         treatment_assignment_strategy (str): The strategy used for assigning treatments to agents.
         experiment_context (str): The context or purpose of the experiment.
+        demographic_prompts (Optional[dict[Any, str]]): The demographic prompt of each row of agent_demographics, keyed
+            by ID. Rendered for the whole DataFrame on first use.
+        demographic_row_indices (dict[Any, int]): The position of each row of agent_demographics with a rendered prompt,
+            keyed by ID.
+        persona_compiler (Optional[PersonaCompiler]): The compiler selecting the demographic fields of each agent's prompt.
     """
 
     def __init__(
@@ -96,6 +155,7 @@ class AIConversationalExperiment(Experiment):
         max_conversation_length: int = 10,
         treatments: dict[str, Any] = {},
         treatment_assignment_strategy: str = "simple_random",
+        persona_compiler: Optional[PersonaCompiler] = None,
     ):
         super().__init__()
 
@@ -109,6 +169,9 @@ class AIConversationalExperiment(Experiment):
         )
         self.treatments = self.check_treatments(treatments)
         self.experiment_context = experiment_context
+        self.demographic_prompts = None
+        self.demographic_row_indices = {}
+        self.persona_compiler = persona_compiler
 
     def check_model_info(self, model_info: str) -> str:
         """Checks if the provided model_info is supported.
@@ -122,9 +185,10 @@ class AIConversationalExperiment(Experiment):
         Raises:
             ValueError: If the provided model_info is not supported.
         """
-        if model_info not in SUPPORTED_MODELS:
+        supported_models = get_supported_models()
+        if model_info not in supported_models:
             raise ValueError(
-                f"Unsupported model_info: {model_info}. Supported models are: {SUPPORTED_MODELS}."
+                f"Unsupported model_info: {model_info}. Supported models are: {supported_models}."
             )
 
         return model_info
@@ -175,6 +239,76 @@ class AIConversationalExperiment(Experiment):
 
         return agent_demographics
 
+    def render_demographic_prompts(self) -> dict[Any, str]:
+        """Renders the demographic prompts of every row of agent_demographics in a single pass, or compiles them with the
+        persona compiler if the experiment has one.
+
+        Returns:
+            dict[Any, str]: The demographic prompt of each row, keyed by ID, or an empty dictionary if the IDs are not
+                unique.
+        """
+        if not self.agent_demographics["ID"].is_unique:
+            return {}
+
+        if self.persona_compiler is not None:
+            demographic_prompts = self.persona_compiler.compile_personas(
+                self.agent_demographics
+            )
+        else:
+            demographic_prompts = generate_demographic_prompts(self.agent_demographics)
+        return dict(zip(self.agent_demographics["ID"].tolist(), demographic_prompts))
+
+    def is_demographic_row(
+        self, demographic_info: dict[str, Any], row_index: int
+    ) -> bool:
+        """Checks if demographic information holds the same fields and values as a row of agent_demographics, so that the
+        prompt rendered for the row can be reused.
+
+        Args:
+            demographic_info (dict[str, Any]): The demographic information of the synthetic subject.
+            row_index (int): The position of the row in agent_demographics.
+
+        Returns:
+            bool: True if the demographic information matches the row, False otherwise.
+        """
+        row = self.agent_demographics.iloc[row_index]
+        if list(demographic_info) != row.index.tolist():
+            return False
+
+        # Missing values are NaN, which is the only value that differs from itself
+        return all(
+            value == row[field] or (value != value and row[field] != row[field])
+            for field, value in demographic_info.items()
+        )
+
+    def get_demographic_prompt(self, demographic_info: dict[str, Any]) -> str:
+        """Returns the demographic prompt of a synthetic subject. Prompts of rows of agent_demographics are looked up in
+        demographic_prompts, which is rendered on first use, and any other demographic information, including a row whose
+        values were changed, is formatted directly.
+
+        Args:
+            demographic_info (dict[str, Any]): The demographic information of the synthetic subject.
+
+        Returns:
+            str: The formatted demographic information as a prompt.
+        """
+        if self.demographic_prompts is None:
+            self.demographic_prompts = self.render_demographic_prompts()
+            self.demographic_row_indices = {
+                row_id: row_index
+                for row_index, row_id in enumerate(self.demographic_prompts)
+            }
+
+        row_index = self.demographic_row_indices.get(demographic_info.get("ID"))
+        if row_index is not None and self.is_demographic_row(
+            demographic_info, row_index
+        ):
+            return self.demographic_prompts[demographic_info["ID"]]
+
+        if self.persona_compiler is not None:
+            return self.persona_compiler.compile(demographic_info)
+        return generate_demographic_prompt(demographic_info)
+
     def check_max_conversation_length(self, max_conversation_length: int) -> int:
         """Checks if the provided max_conversation is an integer greater than or equal to 5.
 
@@ -215,6 +349,445 @@ class AIConversationalExperiment(Experiment):
 
         return treatments
 
+    def check_num_sessions(self, num_sessions: int) -> int:
+        """Checks if the provided num_sessions is valid.
+
+        Args:
+            num_sessions (int): The num_sessions to be checked.
+
+        Returns:
+            int: The validated num_sessions.
+
+        Raises:
+            ValueError: If the provided check_num_sessions is not valid.
+        """
+        if num_sessions < 1:
+            raise ValueError(
+                f"Unsupported valid for num_sessions: {num_sessions}. num_sessions should be an integer that is equal to or greater than 1."
+            )
+
+        return num_sessions
+
+    def assign_treatment(self) -> dict[int, str]:
+        """Assign treatments to sessions based on the specified treatment assignment strategy.
+
+        Returns:
+            dict[int, str]: A dictionary where the keys represent session numbers and the values represent the assigned treatment labels.
+        """
+        if self.treatment_assignment_strategy == "simple_random":
+            treatment_labels = list(self.treatments.keys())
+            return simple_random_assignment_session(treatment_labels, self.num_sessions)
+
+        elif self.treatment_assignment_strategy == "complete_random":
+            treatment_labels = list(self.treatments.keys())
+            return complete_random_assignment_session(
+                treatment_labels, self.num_sessions
+            )
+
+        elif self.treatment_assignment_strategy == "full_factorial":
+            treatment_labels = []
+            for _, inner_treatment_dict in self.treatments.items():
+                inner_treatment_labels = list(inner_treatment_dict.keys())
+                treatment_labels.append(inner_treatment_labels)
+            return full_factorial_assignment_session(
+                treatment_labels, self.num_sessions
+            )
+
+        else:
+            raise ValueError(
+                f"Unsupported treatment_assignment_strategy: {self.treatment_assignment_strategy}. Supported strategies are: {SUPPORTED_ASSIGNMENT_STRATEGIES}."
+            )
+
+    def select_session_ids(self, test_mode: bool) -> list[int]:
+        """Select the session IDs to be run. If test_mode is set to True, only the first session is selected.
+
+        Args:
+            test_mode (bool): Indicates whether the experiment is in test mode or not.
+
+        Returns:
+            list[int]: The session IDs to be run.
+        """
+        if test_mode:
+            return [self.session_id_list[0]]
+
+        return self.session_id_list
+
+    def check_on_llm_error(self, on_llm_error: str) -> str:
+        """Checks if the provided on_llm_error is supported.
+
+        Args:
+            on_llm_error (str): The on_llm_error to be checked.
+
+        Returns:
+            str: The validated on_llm_error.
+
+        Raises:
+            ValueError: If the provided on_llm_error is not supported.
+        """
+        if on_llm_error not in SUPPORTED_LLM_ERROR_HANDLING:
+            raise ValueError(
+                f"Unsupported on_llm_error: {on_llm_error}. Supported values are: {SUPPORTED_LLM_ERROR_HANDLING}."
+            )
+
+        return on_llm_error
+
+    def check_max_concurrency(self, max_concurrency: int) -> int:
+        """Checks if the provided max_concurrency is valid.
+
+        Args:
+            max_concurrency (int): The maximum number of sessions that are run concurrently.
+
+        Returns:
+            int: The validated max_concurrency.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+        """
+        if max_concurrency < 1:
+            raise ValueError(
+                f"Invalid value for max_concurrency: {max_concurrency}. max_concurrency should be an integer that is equal to or greater than 1."
+            )
+
+        return max_concurrency
+
+    def observe_session(
+        self, session_info: dict[str, Any], start_time: Optional[float] = None
+    ) -> None:
+        """Count a finished session by status and record its duration in the metrics registry.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            start_time (Optional[float], optional): The time.perf_counter() value at which the session was started.
+                Defaults to None, in which case no duration is recorded.
+
+        Returns:
+            None
+        """
+        metrics_registry.increment(
+            "sessions_total",
+            experiment_id=self.experiment_id,
+            status=session_info["status"],
+        )
+        if start_time is not None:
+            metrics_registry.observe(
+                "session_duration_seconds",
+                time.perf_counter() - start_time,
+                experiment_id=self.experiment_id,
+                status=session_info["status"],
+            )
+
+    def save_experiment(self, experiment: dict[int, Any]) -> None:
+        """Save the experimental data.
+
+        Args:
+            experiment (dict[int, Any]): The experiment data to be saved.
+
+        Returns:
+            None
+        """
+        save_experiment(experiment)
+
+    def collect_session(
+        self, session_info: dict[str, Any], checkpoint: bool = False
+    ) -> dict[str, Any]:
+        """Convert the agents of a finished session to dictionaries and, if checkpoint is True, save the session.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            checkpoint (bool, optional): Indicates whether the session is saved. Defaults to False.
+
+        Returns:
+            dict[str, Any]: The session information, with agents converted to dictionaries.
+        """
+        session_info["agents"] = [
+            agent if isinstance(agent, dict) else agent.to_dict()
+            for agent in session_info["agents"]
+        ]
+        if checkpoint:
+            save_session_checkpoint(self.experiment_id, session_info)
+        return session_info
+
+    async def run_sessions_async(
+        self,
+        session_id_list: list[int],
+        test_mode: bool = True,
+        max_concurrency: int = 10,
+        on_llm_error: str = "abort",
+        adaptive_concurrency: bool = False,
+        checkpoint: bool = False,
+    ) -> tuple[list[dict[str, Any]], Optional[dict[str, Any]]]:
+        """Asynchronously runs sessions with run_session_async, up to max_concurrency at a time, and collects them with
+        collect_session.
+
+        Args:
+            session_id_list (list[int]): The IDs of the sessions to be run.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to True.
+            max_concurrency (int, optional): The maximum number of sessions that are run concurrently. Defaults to 10.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the other sessions,
+                or "raise" to stop the experiment. Defaults to "abort".
+            adaptive_concurrency (bool, optional): Indicates whether sessions are admitted through the AIMD concurrency controller of
+                the LLM layer. The controller enabled with enable_adaptive_concurrency is used if there is one; otherwise one
+                capped at max_concurrency is enabled for the duration of the run. Sessions never exceed max_concurrency,
+                whatever the limit of the controller. Defaults to False.
+            checkpoint (bool, optional): Indicates whether each session is saved as soon as it finishes. Defaults to False.
+
+        Returns:
+            tuple[list[dict[str, Any]], Optional[dict[str, Any]]]: The session information of each session, in the order of
+                session_id_list, and the state of the concurrency controller if adaptive_concurrency is True, or None.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        from tqdm import tqdm
+
+        async with self.admit_sessions(max_concurrency, adaptive_concurrency) as (
+            admit,
+            controller,
+        ):
+            with tqdm(total=len(session_id_list)) as progress_bar:
+
+                async def run_tracked_session(session_id: int) -> dict[str, Any]:
+                    session_info = await self.run_admitted_session_async(
+                        session_id,
+                        admit,
+                        test_mode=test_mode,
+                        on_llm_error=on_llm_error,
+                        checkpoint=checkpoint,
+                    )
+                    progress_bar.update(1)
+                    return session_info
+
+                session_info_list = await asyncio.gather(
+                    *[run_tracked_session(session_id) for session_id in session_id_list]
+                )
+
+            return session_info_list, (
+                controller.get_metrics() if controller is not None else None
+            )
+
+    @contextlib.asynccontextmanager
+    async def admit_sessions(
+        self, max_concurrency: int, adaptive_concurrency: bool = False
+    ) -> AsyncIterator[
+        tuple[Callable[[], AsyncContextManager[None]], Optional[AIMDController]]
+    ]:
+        """Bound the sessions that run concurrently to max_concurrency and, if adaptive_concurrency is True, admit them
+        through the AIMD concurrency controller of the LLM layer.
+
+        Args:
+            max_concurrency (int): The maximum number of sessions that are run concurrently.
+            adaptive_concurrency (bool, optional): Indicates whether sessions are admitted through the concurrency controller.
+                The controller enabled with enable_adaptive_concurrency is used if there is one; otherwise one capped at
+                max_concurrency is enabled until the context exits. Defaults to False.
+
+        Yields:
+            tuple[Callable[[], AsyncContextManager[None]], Optional[AIMDController]]: A function returning the context in
+                which a session runs once admitted, and the concurrency controller, or None.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+        """
+        self.check_max_concurrency(max_concurrency)
+
+        controller, owns_controller = None, False
+        if adaptive_concurrency:
+            controller = get_concurrency_controller()
+            if controller is None:
+                controller = enable_adaptive_concurrency(
+                    initial_limit=min(4, max_concurrency), max_limit=max_concurrency
+                )
+                owns_controller = True
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        @contextlib.asynccontextmanager
+        async def admit() -> AsyncIterator[None]:
+            # max_concurrency bounds the sessions even if a shared controller allows more
+            async with semaphore:
+                if controller is None:
+                    yield
+                else:
+                    async with controller.slot():
+                        yield
+
+        try:
+            yield admit, controller
+        finally:
+            if owns_controller:
+                disable_adaptive_concurrency()
+
+    async def run_admitted_session_async(
+        self,
+        session_id: int,
+        admit: Callable[[], AsyncContextManager[None]],
+        test_mode: bool = True,
+        on_llm_error: str = "abort",
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Once admitted, initialises a session, runs it with run_session_async and collects it with collect_session.
+        The session is only initialised once admitted, so that memory is bounded by the sessions running concurrently.
+
+        Args:
+            session_id (int): The ID of the session to be run.
+            admit (Callable[[], AsyncContextManager[None]]): A function returning the context in which the session runs, as
+                yielded by admit_sessions.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to True.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the session, or "raise" to stop the experiment.
+                Defaults to "abort".
+            checkpoint (bool, optional): Indicates whether the session is saved as soon as it finishes. Defaults to False.
+
+        Returns:
+            dict[str, Any]: The session information, with agents converted to dictionaries.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        async with admit():
+            session_info = self.initialize_session(session_id)
+            try:
+                session_info = await self.run_session_async(
+                    session_info, test_mode=test_mode, on_llm_error=on_llm_error
+                )
+            except LLMError:
+                # The aborted session is saved before the error stops the experiment
+                await asyncio.to_thread(self.collect_session, session_info, checkpoint)
+                raise
+            # Sessions are saved off the event loop so that disk writes do not delay the LLM calls in flight
+            return await asyncio.to_thread(
+                self.collect_session, session_info, checkpoint
+            )
+
+    def save_checkpoint(self, session_id_list: list[int]) -> None:
+        """Save the configuration of the experiment, the assignment of the sessions to be run and the names of the
+        arguments that are not saved, from which the experiment can be resumed.
+
+        Args:
+            session_id_list (list[int]): The IDs of the sessions to be run.
+
+        Returns:
+            None
+        """
+        save_experiment_checkpoint(
+            self.experiment_id,
+            {
+                "config": self.to_config(),
+                "sessions": [
+                    self.get_session_spec(session_id) for session_id in session_id_list
+                ],
+                "unsaved_arguments": self.get_unsaved_arguments(),
+            },
+        )
+
+    def get_unsaved_arguments(self) -> list[str]:
+        """Return the names of the arguments of the experiment that were provided but are not saved by to_config, which
+        have to be provided again to resume the experiment with the same prompts.
+
+        Returns:
+            list[str]: The names of the provided arguments among context_policy and persona_compiler.
+        """
+        return [
+            argument
+            for argument in ("context_policy", "persona_compiler")
+            if getattr(self, argument, None) is not None
+        ]
+
+    def run_checkpointed_session(
+        self, session_info: dict[str, Any], checkpoint: bool, **kwargs: Any
+    ) -> dict[str, Any]:
+        """Runs a session with run_session and collects it with collect_session, also when a failed LLM call stops the
+        experiment.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            checkpoint (bool): Indicates whether the session is saved when it finishes.
+            **kwargs (Any): Additional arguments of run_session.
+
+        Returns:
+            dict[str, Any]: The session information at the end of the session, with agents converted to dictionaries.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        try:
+            session_info = self.run_session(session_info, **kwargs)
+        except LLMError:
+            # The aborted session is saved before the error stops the experiment
+            self.collect_session(session_info, checkpoint)
+            raise
+
+        return self.collect_session(session_info, checkpoint)
+
+    def resume_sessions(
+        self,
+        saved_sessions: dict[int, dict[str, Any]],
+        restart_aborted: bool = True,
+        **kwargs: Any,
+    ) -> list[dict[str, Any]]:
+        """Runs the sessions of the experiment that were not saved, reusing the saved sessions. Every session that is run
+        is saved as soon as it finishes.
+
+        Args:
+            saved_sessions (dict[int, dict[str, Any]]): The saved session information of each finished session, keyed by session ID.
+            restart_aborted (bool, optional): Indicates whether saved sessions that were aborted are resumed with restore_session,
+                rather than kept as they are. Defaults to True.
+            **kwargs (Any): Additional arguments of run_session.
+
+        Returns:
+            list[dict[str, Any]]: The session information of each session, in the order of session_id_list.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        # Imported on first use to keep importing the package fast
+        from tqdm import tqdm
+
+        session_info_list = []
+        for session_id in tqdm(self.session_id_list):
+            saved_session_info = saved_sessions.get(session_id)
+            if saved_session_info is not None and (
+                saved_session_info["status"] == "completed" or not restart_aborted
+            ):
+                session_info_list.append(saved_session_info)
+                continue
+
+            session_info = self.initialize_session(session_id)
+            if saved_session_info is not None:
+                self.restore_session(session_info, saved_session_info)
+            session_info_list.append(
+                self.run_checkpointed_session(session_info, True, **kwargs)
+            )
+
+        return session_info_list
+
+    @classmethod
+    def from_config(
+        cls, config: dict[str, Any], **kwargs: Any
+    ) -> "AIConversationalExperiment":
+        """Rebuilds an experiment from the configuration returned by to_config, keeping its experiment ID. The
+        assignment of treatments and agents to sessions is drawn anew; sessions run from a work queue use the
+        assignment stored in their specification instead.
+
+        Args:
+            config (dict[str, Any]): The configuration of the experiment.
+            **kwargs (Any): Additional arguments of the experiment that are not in the configuration, such as the
+                context_policy or persona_compiler.
+
+        Returns:
+            AIConversationalExperiment: The rebuilt experiment.
+        """
+        # Imported on first use to keep importing the package fast
+        import pandas as pd
+
+        arguments = {
+            key: value
+            for key, value in config.items()
+            if key not in ("experiment_type", "experiment_id")
+        }
+        arguments["agent_demographics"] = pd.DataFrame(config["agent_demographics"])
+        experiment = cls(**arguments, **kwargs)
+        experiment.experiment_id = config["experiment_id"]
+        return experiment
+
     def get_model_info(self) -> str:
         """Return the model used in this experiment.
 
@@ -263,6 +836,30 @@ class AIConversationalExperiment(Experiment):
         """
         return self.treatment_assignment_strategy
 
+    def get_num_sessions(self) -> int:
+        """Return the num_sessions defined this experiment.
+
+        Returns:
+            int: The num_sessions information.
+        """
+        return self.num_sessions
+
+    def get_treatment_assignment(self) -> dict[int, str]:
+        """Return the treatment_assignment defined this experiment.
+
+        Returns:
+            dict[int, str]: The treatment_assignment information.
+        """
+        return self.treatment_assignment
+
+    def get_session_id_list(self) -> list[int]:
+        """Return the session_id_list of this experiment.
+
+        Returns:
+            list[int]: The session_id_list information.
+        """
+        return self.session_id_list
+
 
 class AItoAIConversationalExperiment(AIConversationalExperiment):
     """A class representing an AI-to-AI conversational experiment. Inherits from the AIConversationalExperiment class.
@@ -281,12 +878,23 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         treatments (dict[str, Any], optional): The treatments for the experiment. Defaults to an empty dictionary.
         treatment_assignment_strategy (str, optional): The strategy used for assigning treatments to agents.
             Defaults to "simple_random".
+        context_policy (Optional[ContextPolicy], optional): The policy selecting the messages resent to the LLM on each call.
+            Each agent receives its own copy. Defaults to None, which resends the full message history.
+        prompt_layout (str, optional): The layout of the system messages, either "default" or "cache_friendly". The
+            "cache_friendly" layout keeps the shared part of the prompts byte-identical across agents and sessions so that
+            provider-side prompt caching hits. Defaults to "default".
+        system_message_template (Optional[str], optional): A custom template of the agents' system messages, with any of
+            the placeholders {experiment_context}, {treatment}, {role}, {role_description} and {demographic_info}.
+            Overrides prompt_layout for the agents' system messages. Defaults to None.
+        persona_compiler (Optional[PersonaCompiler], optional): The compiler selecting the demographic fields of each
+            agent's prompt within a token budget. Defaults to None, which includes every field.
 
     Raises:
         ValueError: If the provided num_sessions is not valid.
         ValueError: If the provided num_agents_per_session is less than 2 or will exceed the total number of demographic information.
         ValueError: If the provided number of agent_roles is not equal to num_agents_per_session.
         ValueError: If the number of roles defined does not match the number of agents assigned to each session.
+        ValueError: If the provided system_message_template is not valid or has an unsupported placeholder.
 
     Attributes:
         num_sessions (int): The number of sessions in the experiment.
@@ -295,6 +903,13 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         treatment_assignment (dict[int, str]): The assignment of treatments to agents.
         session_id_list (list[int]): List of session IDs.
         agent_assignment (dict[int, list[DemographicInfo]]): The assignment of agents to sessions.
+        context_policy (Optional[ContextPolicy]): The policy selecting the messages resent to the LLM on each call.
+        prompt_layout (str): The layout of the system messages.
+        shared_strings (StringTable): The table through which the agents of the experiment share the experiment context,
+            role descriptions, treatments and the system messages of agents without demographic information.
+        system_message_template (Optional[str]): The custom template of the agents' system messages.
+        system_message_templates (dict[tuple[str, str], PromptTemplate]): The system messages compiled for each pair of
+            treatment and role, in which only the demographic information is left to be filled.
     """
 
     def __init__(
@@ -308,6 +923,10 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         max_conversation_length: int = 10,
         treatments: dict[str, Any] = {},
         treatment_assignment_strategy: str = "simple_random",
+        context_policy: Optional[ContextPolicy] = None,
+        prompt_layout: str = "default",
+        system_message_template: Optional[str] = None,
+        persona_compiler: Optional[PersonaCompiler] = None,
     ):
         super().__init__(
             model_info,
@@ -316,7 +935,15 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
             max_conversation_length,
             treatments,
             treatment_assignment_strategy,
+            persona_compiler,
         )
+        self.context_policy = context_policy
+        self.prompt_layout = check_prompt_layout(prompt_layout)
+        if system_message_template is not None:
+            check_conversational_agent_template(system_message_template)
+        self.system_message_template = system_message_template
+        self.system_message_templates = {}
+        self.shared_strings = StringTable()
 
         self.num_sessions = self.check_num_sessions(num_sessions)
         self.num_agents_per_session = self.check_num_agents_per_session(
@@ -327,25 +954,6 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         self.session_id_list = list(self.treatment_assignment.keys())
         self.agent_assignment = self.assign_agents_to_session()
 
-    def check_num_sessions(self, num_sessions: int) -> int:
-        """Checks if the provided num_sessions is valid.
-
-        Args:
-            num_sessions (int): The num_sessions to be checked.
-
-        Returns:
-            int: The validated num_sessions.
-
-        Raises:
-            ValueError: If the provided check_num_sessions is not valid.
-        """
-        if num_sessions < 1:
-            raise ValueError(
-                f"Unsupported valid for num_sessions: {num_sessions}. num_sessions should be an integer that is equal to or greater than 1."
-            )
-
-        return num_sessions
-
     def check_num_agents_per_session(self, num_agents_per_session: int) -> int:
         """Checks if the provided num_agents_per_session is valid.
 
@@ -389,13 +997,31 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
 
         return agent_roles
 
-    def get_num_sessions(self) -> int:
-        """Return the num_sessions defined this experiment.
+    def get_system_message_template(self, treatment: str, role: str) -> PromptTemplate:
+        """Returns the system message of the agents that play a role under a treatment, compiling it on first use.
+
+        Args:
+            treatment (str): The treatment assigned to the session.
+            role (str): The name of the role.
 
         Returns:
-            int: The num_sessions information.
+            PromptTemplate: The compiled system message, in which only the demographic information is left to be filled.
         """
-        return self.num_sessions
+        # The compiled message only depends on the text of the treatment, which is hashable even if the treatment is not
+        key = (str(treatment), role)
+        if key not in self.system_message_templates:
+            self.system_message_templates[key] = (
+                compile_conversational_agent_system_message_template(
+                    experiment_context=self.experiment_context,
+                    treatment=treatment,
+                    role_description=self.agent_roles[role],
+                    role=role,
+                    prompt_layout=self.prompt_layout,
+                    template=self.system_message_template,
+                )
+            )
+
+        return self.system_message_templates[key]
 
     def get_num_agents_per_session(self) -> int:
         """Return the num_agents_per_session defined this experiment.
@@ -413,22 +1039,6 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         """
         return self.agent_roles
 
-    def get_treatment_assignment(self) -> dict[int, str]:
-        """Return the treatment_assignment defined this experiment.
-
-        Returns:
-            dict[int, str]: The treatment_assignment information.
-        """
-        return self.treatment_assignment
-
-    def get_session_id_list(self) -> list[int]:
-        """Return the session_id_list of this experiment.
-
-        Returns:
-            list[int]: The session_id_list information.
-        """
-        return self.session_id_list
-
     def get_agent_assignment(self) -> dict[int, list[DemographicInfo]]:
         """Return the agent_assignment for this experiment.
 
@@ -437,36 +1047,6 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
         """
         return self.agent_assignment
 
-    def assign_treatment(self) -> dict[int, str]:
-        """Assign treatments to sessions based on the specified treatment assignment strategy.
-
-        Returns:
-            dict[int, str]: A dictionary where the keys represent session numbers and the values represent the assigned treatment labels.
-        """
-        if self.treatment_assignment_strategy == "simple_random":
-            treatment_labels = list(self.treatments.keys())
-            return simple_random_assignment_session(treatment_labels, self.num_sessions)
-
-        elif self.treatment_assignment_strategy == "complete_random":
-            treatment_labels = list(self.treatments.keys())
-            return complete_random_assignment_session(
-                treatment_labels, self.num_sessions
-            )
-
-        elif self.treatment_assignment_strategy == "full_factorial":
-            treatment_labels = []
-            for _, inner_treatment_dict in self.treatments.items():
-                inner_treatment_labels = list(inner_treatment_dict.keys())
-                treatment_labels.append(inner_treatment_labels)
-            return full_factorial_assignment_session(
-                treatment_labels, self.num_sessions
-            )
-
-        else:
-            raise ValueError(
-                f"Unsupported treatment_assignment_strategy: {self.treatment_assignment_strategy}. Supported strategies are: {SUPPORTED_ASSIGNMENT_STRATEGIES}."
-            )
-
     def assign_agents_to_session(self) -> dict[int, list[DemographicInfo]]:
         """Randomly assigns agents' demographics to each session based on the given number of agents per session.
 
@@ -489,46 +1069,481 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
 
         return agent_to_session_assignment
 
-    def run_experiment(self, test_mode: bool = True) -> dict[str, Any]:
+    def run_experiment(
+        self,
+        test_mode: bool = True,
+        on_llm_error: str = "abort",
+        mode: str = "sequential",
+        batch_client: Optional[BatchClient] = None,
+        stream: bool = False,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
         """Runs an experiment based on the experimental settings defined during class initialisation. If test_mode is set to True, the first session will be selected and run.
 
+        With checkpoint set to True, the assignment of the experiment is saved before the first session and every session is
+        saved as soon as it finishes, so that an interrupted experiment can be resumed with resume_experiment.
+
         Args:
             test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
                 Defaults to True.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            mode (str, optional): "sequential" to run the sessions one after another, or "batch" to advance all sessions in lock-step
+                through the Batch API. Defaults to "sequential".
+            batch_client (Optional[BatchClient], optional): The client used to submit batches when mode is "batch".
+                Defaults to a BatchClient using the OpenAI client of query_llm.
+            stream (bool, optional): Indicates whether responses are streamed when mode is "sequential". Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+                Defaults to END_OF_CONVERSATION.
+            checkpoint (bool, optional): Indicates whether each session is saved as soon as it finishes. Defaults to False.
 
         Returns:
-            dict[str, Any]: A dictionary containing the experiment ID and session information.
-        """
+            dict[str, Any]: A dictionary containing the experiment ID, session information and token usage.
 
-        if test_mode:
-            session_id_list = [self.session_id_list[0]]
-        else:
-            session_id_list = self.session_id_list
+        Raises:
+            ValueError: If the provided mode is not supported.
+        """
+        if mode not in SUPPORTED_EXECUTION_MODES:
+            raise ValueError(
+                f"Unsupported mode: {mode}. Supported modes are: {SUPPORTED_EXECUTION_MODES}."
+            )
 
-        experiment = {"experiment_id": self.experiment_id, "sessions": {}}
-        for session_id in tqdm(session_id_list):
-            session_info = {}
-            session_info["session_id"] = session_id
-            treatment_label = self.treatment_assignment[session_id]
-            session_info["treatment"] = self.treatments[treatment_label]
-            session_info["session_system_message"] = (
-                generate_conversational_session_system_message(
-                    experiment_context=self.experiment_context,
-                    treatment=session_info["treatment"],
+        # Imported on first use to keep importing the package fast
+        from tqdm import tqdm
+
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+
+        if mode == "batch":
+            session_info_list = [
+                self.collect_session(session_info, checkpoint)
+                for session_info in self.run_sessions_batch(
+                    [
+                        self.initialize_session(session_id)
+                        for session_id in session_id_list
+                    ],
+                    test_mode=test_mode,
+                    on_llm_error=on_llm_error,
+                    batch_client=batch_client,
                 )
-            )
-            session_info["agents_demographic"] = self.agent_assignment[session_id]
-            session_info["agents"] = self.initialize_agents(session_info)
-            session_info = self.run_session(session_info, test_mode=test_mode)
-            session_info["agents"] = [
-                agent.to_dict() for agent in session_info["agents"]
             ]
-            experiment["sessions"][session_id] = session_info
+        else:
+            session_info_list = []
+            for session_id in tqdm(session_id_list):
+                session_info = self.initialize_session(session_id)
+                session_info_list.append(
+                    self.run_checkpointed_session(
+                        session_info,
+                        checkpoint,
+                        test_mode=test_mode,
+                        on_llm_error=on_llm_error,
+                        stream=stream,
+                        stop_pattern=stop_pattern,
+                    )
+                )
+
+        experiment = self.assemble_experiment(session_info_list)
+        self.save_experiment(experiment)
+
+        return experiment
+
+    async def run_experiment_async(
+        self,
+        test_mode: bool = True,
+        max_concurrency: int = 10,
+        on_llm_error: str = "abort",
+        adaptive_concurrency: bool = False,
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Asynchronously runs an experiment, executing up to max_concurrency sessions concurrently. If test_mode is set to True, the first session will be selected and run.
+
+        The returned experiment is keyed and ordered exactly as in run_experiment, regardless of the order in which sessions complete.
+
+        Args:
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
+                Defaults to True.
+            max_concurrency (int, optional): The maximum number of sessions that are run concurrently.
+                Defaults to 10.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the other sessions,
+                or "raise" to stop the experiment. Defaults to "abort".
+            adaptive_concurrency (bool, optional): Indicates whether sessions are admitted through the AIMD concurrency controller of
+                the LLM layer, which raises the number of concurrent sessions while latency is stable and cuts it on rate limits or
+                latency spikes. The controller enabled with enable_adaptive_concurrency is used if there is one; otherwise one
+                capped at max_concurrency is enabled for the duration of the run. Sessions never exceed max_concurrency,
+                whatever the limit of the controller. Defaults to False.
+            checkpoint (bool, optional): Indicates whether each session is saved as soon as it finishes, so that an interrupted
+                experiment can be resumed with resume_experiment. Defaults to False.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information and token usage, and the state of the
+                concurrency controller under "concurrency" if adaptive_concurrency is True.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+        """
+        self.check_max_concurrency(max_concurrency)
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+        session_info_list, concurrency_metrics = await self.run_sessions_async(
+            session_id_list,
+            test_mode=test_mode,
+            max_concurrency=max_concurrency,
+            on_llm_error=on_llm_error,
+            adaptive_concurrency=adaptive_concurrency,
+            checkpoint=checkpoint,
+        )
+
+        experiment = self.assemble_experiment(session_info_list)
+        if concurrency_metrics is not None:
+            experiment["concurrency"] = concurrency_metrics
 
         self.save_experiment(experiment)
 
         return experiment
 
+    def iter_sessions(
+        self,
+        test_mode: bool = True,
+        on_llm_error: str = "abort",
+        stream: bool = False,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
+        checkpoint: bool = False,
+    ) -> Iterator[dict[str, Any]]:
+        """Runs the sessions of the experiment one after another, yielding each session as soon as it finishes. Unlike
+        run_experiment, finished sessions are not kept, so memory does not grow with the number of sessions.
+
+        Args:
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
+                Defaults to True.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            stream (bool, optional): Indicates whether responses are streamed. Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+                Defaults to END_OF_CONVERSATION.
+            checkpoint (bool, optional): Indicates whether each session is also saved as a checkpoint, so that the experiment
+                can be resumed with resume_experiment. Defaults to False.
+
+        Yields:
+            dict[str, Any]: The session information of each session, with agents converted to dictionaries, in the order of the session IDs.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+
+        for session_id in session_id_list:
+            session_info = self.run_checkpointed_session(
+                self.initialize_session(session_id),
+                checkpoint,
+                test_mode=test_mode,
+                on_llm_error=on_llm_error,
+                stream=stream,
+                stop_pattern=stop_pattern,
+            )
+            yield session_info
+
+    async def iter_sessions_async(
+        self,
+        test_mode: bool = True,
+        max_concurrency: int = 10,
+        on_llm_error: str = "abort",
+        adaptive_concurrency: bool = False,
+        checkpoint: bool = False,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Asynchronously runs up to max_concurrency sessions concurrently, yielding each session as soon as it finishes.
+        A session is only initialised once a slot is free, so that memory is bounded by max_concurrency rather than by
+        the number of sessions.
+
+        Args:
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
+                Defaults to True.
+            max_concurrency (int, optional): The maximum number of sessions that are run concurrently.
+                Defaults to 10.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the other sessions,
+                or "raise" to stop the experiment. Defaults to "abort".
+            adaptive_concurrency (bool, optional): Indicates whether sessions are admitted through the AIMD concurrency controller of
+                the LLM layer, as in run_experiment_async. Defaults to False.
+            checkpoint (bool, optional): Indicates whether each session is also saved as a checkpoint, so that the experiment
+                can be resumed with resume_experiment. Defaults to False.
+
+        Yields:
+            dict[str, Any]: The session information of each session, with agents converted to dictionaries, in the order in which the sessions finish.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        self.check_max_concurrency(max_concurrency)
+
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+
+        pending_session_ids = iter(session_id_list)
+        in_flight = set()
+        async with self.admit_sessions(max_concurrency, adaptive_concurrency) as (
+            admit,
+            _,
+        ):
+            try:
+                while True:
+                    # Tasks are only created for max_concurrency sessions at a time, so that pending sessions cost nothing
+                    for session_id in pending_session_ids:
+                        in_flight.add(
+                            asyncio.ensure_future(
+                                self.run_admitted_session_async(
+                                    session_id,
+                                    admit,
+                                    test_mode=test_mode,
+                                    on_llm_error=on_llm_error,
+                                    checkpoint=checkpoint,
+                                )
+                            )
+                        )
+                        if len(in_flight) >= max_concurrency:
+                            break
+                    if not in_flight:
+                        break
+
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+            finally:
+                # Sessions still in flight are cancelled if the consumer stops early or a session raises
+                for task in in_flight:
+                    task.cancel()
+                if in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
+
+    def stream_experiment(
+        self,
+        sink: Optional[Callable[[dict[str, Any]], None]] = None,
+        test_mode: bool = True,
+        on_llm_error: str = "abort",
+        stream: bool = False,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Runs an experiment like run_experiment, but hands each session to a sink as soon as it finishes instead of
+        collecting the sessions in memory, so that experiments with millions of sessions can be run in constant memory.
+
+        Args:
+            sink (Optional[Callable[[dict[str, Any]], None]], optional): The function to which each finished session is passed.
+                Defaults to writing the sessions to storage/experiment/<experiment_id>.jsonl with a JSONLSessionSink.
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
+                Defaults to True.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            stream (bool, optional): Indicates whether responses are streamed. Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+                Defaults to END_OF_CONVERSATION.
+            checkpoint (bool, optional): Indicates whether each session is also saved as a checkpoint. Defaults to False.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, the number of sessions and token usage.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        from tqdm import tqdm
+
+        with self.open_session_sink(sink) as session_sink:
+            return self.drain_sessions(
+                tqdm(
+                    self.iter_sessions(
+                        test_mode=test_mode,
+                        on_llm_error=on_llm_error,
+                        stream=stream,
+                        stop_pattern=stop_pattern,
+                        checkpoint=checkpoint,
+                    )
+                ),
+                session_sink,
+            )
+
+    async def stream_experiment_async(
+        self,
+        sink: Optional[Callable[[dict[str, Any]], None]] = None,
+        test_mode: bool = True,
+        max_concurrency: int = 10,
+        on_llm_error: str = "abort",
+        adaptive_concurrency: bool = False,
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Asynchronously runs an experiment like run_experiment_async, but hands each session to a sink as soon as it
+        finishes instead of collecting the sessions in memory. Sessions reach the sink in the order in which they finish.
+
+        Args:
+            sink (Optional[Callable[[dict[str, Any]], None]], optional): The function to which each finished session is passed.
+                Defaults to writing the sessions to storage/experiment/<experiment_id>.jsonl with a JSONLSessionSink.
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not.
+                Defaults to True.
+            max_concurrency (int, optional): The maximum number of sessions that are run concurrently.
+                Defaults to 10.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the other sessions,
+                or "raise" to stop the experiment. Defaults to "abort".
+            adaptive_concurrency (bool, optional): Indicates whether sessions are admitted through the AIMD concurrency controller of
+                the LLM layer, as in run_experiment_async. Defaults to False.
+            checkpoint (bool, optional): Indicates whether each session is also saved as a checkpoint. Defaults to False.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, the number of sessions and token usage.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        with self.open_session_sink(sink) as session_sink:
+            return await self.drain_sessions_async(
+                self.iter_sessions_async(
+                    test_mode=test_mode,
+                    max_concurrency=max_concurrency,
+                    on_llm_error=on_llm_error,
+                    adaptive_concurrency=adaptive_concurrency,
+                    checkpoint=checkpoint,
+                ),
+                session_sink,
+            )
+
+    @contextlib.contextmanager
+    def open_session_sink(
+        self, sink: Optional[Callable[[dict[str, Any]], None]] = None
+    ) -> Iterator[Callable[[dict[str, Any]], None]]:
+        """Provide the sink to which finished sessions are passed, defaulting to a JSONLSessionSink that writes to
+        storage/experiment/<experiment_id>.jsonl and is closed when the context exits.
+
+        Args:
+            sink (Optional[Callable[[dict[str, Any]], None]], optional): The function to which each finished session is passed.
+                Defaults to None.
+
+        Yields:
+            Callable[[dict[str, Any]], None]: The provided sink, or the write method of the default JSONLSessionSink.
+        """
+        if sink is not None:
+            yield sink
+            return
+
+        jsonl_sink = JSONLSessionSink(get_session_stream_path(self.experiment_id))
+        try:
+            yield jsonl_sink.write
+        finally:
+            jsonl_sink.close()
+
+    def drain_sessions(
+        self,
+        sessions: Iterable[dict[str, Any]],
+        sink: Callable[[dict[str, Any]], None],
+    ) -> dict[str, Any]:
+        """Hand each finished session to a sink, keeping only running usage totals.
+
+        Args:
+            sessions (Iterable[dict[str, Any]]): The finished sessions, with agents converted to dictionaries.
+            sink (Callable[[dict[str, Any]], None]): The function to which each session is passed.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, the number of sessions and token usage.
+        """
+        drain_totals = self.create_drain_totals()
+        for session_info in sessions:
+            self.drain_session(drain_totals, session_info, sink)
+
+        return self.summarize_drain_totals(drain_totals)
+
+    async def drain_sessions_async(
+        self,
+        sessions: AsyncIterator[dict[str, Any]],
+        sink: Callable[[dict[str, Any]], None],
+    ) -> dict[str, Any]:
+        """Asynchronously hand each finished session to a sink, keeping only running usage totals.
+
+        Args:
+            sessions (AsyncIterator[dict[str, Any]]): The finished sessions, with agents converted to dictionaries.
+            sink (Callable[[dict[str, Any]], None]): The function to which each session is passed.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, the number of sessions and token usage.
+        """
+        drain_totals = self.create_drain_totals()
+        async for session_info in sessions:
+            self.drain_session(drain_totals, session_info, sink)
+
+        return self.summarize_drain_totals(drain_totals)
+
+    def create_drain_totals(self) -> dict[str, Any]:
+        """Create the empty running totals of drain_session.
+
+        Returns:
+            dict[str, Any]: A session count of 0 under "num_sessions" and empty usage totals under "usage".
+        """
+        return {"num_sessions": 0, "usage": self.create_usage_totals()}
+
+    def drain_session(
+        self,
+        drain_totals: dict[str, Any],
+        session_info: dict[str, Any],
+        sink: Callable[[dict[str, Any]], None],
+    ) -> None:
+        """Add a finished session to the running totals and hand it to a sink.
+
+        Args:
+            drain_totals (dict[str, Any]): The running totals from create_drain_totals, updated in place.
+            session_info (dict[str, Any]): The session information, with agents converted to dictionaries.
+            sink (Callable[[dict[str, Any]], None]): The function to which the session is passed.
+
+        Returns:
+            None
+        """
+        self.add_session_usage(drain_totals["usage"], session_info)
+        sink(session_info)
+        drain_totals["num_sessions"] += 1
+
+    def summarize_drain_totals(self, drain_totals: dict[str, Any]) -> dict[str, Any]:
+        """Summarise the running totals of drain_session.
+
+        Args:
+            drain_totals (dict[str, Any]): The running totals from create_drain_totals.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, the number of sessions and token usage.
+        """
+        return {
+            "experiment_id": self.experiment_id,
+            "num_sessions": drain_totals["num_sessions"],
+            "usage": self.summarize_usage_totals(drain_totals["usage"]),
+        }
+
+    def initialize_session(self, session_id: int) -> dict[str, Any]:
+        """Constructs the session information for the provided session ID, including its treatment, system message, assigned demographics and agents.
+
+        Args:
+            session_id (int): The ID of the session to be initialised.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the session information.
+        """
+        session_info = {}
+        session_info["session_id"] = session_id
+        treatment_label = self.treatment_assignment[session_id]
+        session_info["treatment"] = self.treatments[treatment_label]
+        session_info["session_system_message"] = (
+            generate_conversational_session_system_message(
+                experiment_context=self.experiment_context,
+                treatment=session_info["treatment"],
+                prompt_layout=self.prompt_layout,
+            )
+        )
+        session_info["agents_demographic"] = self.agent_assignment[session_id]
+        session_info["agents"] = self.initialize_agents(session_info)
+
+        return session_info
+
     def initialize_agents(
         self, session_info: dict[str, Any]
     ) -> list[ConversationalSyntheticAgent]:
@@ -559,89 +1574,803 @@ class AItoAIConversationalExperiment(AIConversationalExperiment):
                     role_description=list(self.agent_roles.values())[i],
                     model_info=self.model_info,
                     treatment=session_info["treatment"],
+                    context_policy=copy.deepcopy(self.context_policy),
+                    prompt_layout=self.prompt_layout,
+                    demographic_prompt_generator=self.get_demographic_prompt,
+                    shared_strings=self.shared_strings,
+                    system_message_template=self.get_system_message_template(
+                        session_info["treatment"], list(self.agent_roles.keys())[i]
+                    ),
                 )
             )
 
         return agent_list
 
     def run_session(
-        self, session_info: dict[str, Any], test_mode: bool = False
+        self,
+        session_info: dict[str, Any],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+        stream: bool = False,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
     ) -> dict[str, Any]:
-        """Runs a session involving a conversation between multiple AI agents.
+        """Runs a session involving a conversation between multiple AI agents. A session that was previously aborted is resumed from its last successful turn.
 
         Args:
             session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to stop the session and record the error in session_info when a LLM call fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
+            stream (bool, optional): Indicates whether responses are streamed. Streamed turns record their time to first token and
+                duration in session_info["turn_metrics"]. Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+                Defaults to END_OF_CONVERSATION.
 
         Returns:
             dict[str, Any]: A dictionary containing the updated session information at the end of the session.
-        """
-        message_history = []
-        conversation_length = 0
-        num_agents = len(session_info["agents"])
-        response = session_info["session_system_message"]
-        agent_role = "system"
-        while (
-            "Thank you for the conversation." not in response
-            and conversation_length < self.max_conversation_length
-        ):
-            message_history.append({agent_role: response})
-            if test_mode:
-                print({agent_role: response})
-                print()
-            agent = session_info["agents"][conversation_length % num_agents]
 
-            if conversation_length == 0:
-                response = agent.respond(question="Start")
-            else:
-                response = agent.respond(question=response)
-            agent_role = agent.get_role()
-            conversation_length += 1
-        message_history.append({agent_role: response})
-        message_history.append({"system": "End"})
-        if test_mode:
-            print({agent_role: response})
-            print()
-            print({"system": "End"})
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        self.check_on_llm_error(on_llm_error)
+        start_time = time.perf_counter()
+        message_history, conversation_length, response = self.get_conversation_state(
+            session_info, test_mode
+        )
+        try:
+            while not self.is_conversation_over(response, conversation_length):
+                turn_start_time = time.perf_counter()
+                agent, question = self.get_next_turn(
+                    session_info, conversation_length, response
+                )
+                if stream:
+                    response = self.stream_turn(
+                        session_info, agent, question, stop_pattern, test_mode
+                    )
+                    conversation_length += 1
+                    self.record_turn(message_history, agent.get_role(), response)
+                else:
+                    response = agent.respond(question=question)
+                    conversation_length += 1
+                    self.record_turn(
+                        message_history, agent.get_role(), response, test_mode
+                    )
+                self.observe_turn(agent.get_role(), turn_start_time)
+        except LLMError as e:
+            return self.abort_session(
+                session_info, message_history, e, on_llm_error, start_time
+            )
 
-        session_info["message_history"] = message_history
-        return session_info
+        return self.complete_session(
+            session_info, message_history, test_mode, start_time
+        )
 
-    def save_experiment(self, experiment: dict[int, Any]) -> None:
-        """Save the experimental data.
+    async def run_session_async(
+        self,
+        session_info: dict[str, Any],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+    ) -> dict[str, Any]:
+        """Asynchronously runs a session involving a conversation between multiple AI agents. A session that was previously aborted is resumed from its last successful turn.
 
         Args:
-            experiment (dict[int, Any]): The experiment data to be saved.
+            session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to stop the session and record the error in session_info when a LLM call fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
 
         Returns:
-            None
-        """
-        save_experiment(experiment)
+            dict[str, Any]: A dictionary containing the updated session information at the end of the session.
 
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        self.check_on_llm_error(on_llm_error)
+        start_time = time.perf_counter()
+        message_history, conversation_length, response = self.get_conversation_state(
+            session_info, test_mode
+        )
+        try:
+            while not self.is_conversation_over(response, conversation_length):
+                turn_start_time = time.perf_counter()
+                agent, question = self.get_next_turn(
+                    session_info, conversation_length, response
+                )
+                response = await agent.respond_async(question=question)
+                conversation_length += 1
+                self.record_turn(message_history, agent.get_role(), response, test_mode)
+                self.observe_turn(agent.get_role(), turn_start_time)
+        except LLMError as e:
+            return self.abort_session(
+                session_info, message_history, e, on_llm_error, start_time
+            )
 
-class AItoAIInterviewExperiment(AItoAIConversationalExperiment):
-    """A class representing an AI-to-AI interview experiment. Inherits from the AItoAIConversationalExperiment class.
+        return self.complete_session(
+            session_info, message_history, test_mode, start_time
+        )
 
-    This class extends the `AItoAIConversationalExperiment` class and provides additional functionality
-    specific to AI-to-AI interview experiments. More specifically, one of the agents in the session will serve
-    as the interviewer and will not be given a demographic profile.
+    def run_sessions_batch(
+        self,
+        session_info_list: list[dict[str, Any]],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+        batch_client: Optional[BatchClient] = None,
+    ) -> list[dict[str, Any]]:
+        """Runs several sessions in lock-step through the Batch API. At each turn, the next request of every live session is
+        collected into one batch, and the results are fanned back into the message history of the responding agents.
 
-    Args:
-        model_info (str): The information about the AI model used in the experiment.
-        experiment_context (str): The context or purpose of the experiment.
-        agent_demographics (pd.DataFrame): The demographic information of the agents participating in the experiment.
-        agent_roles (dict[str, str]): Dictionary mapping agent roles to their descriptions.
-        num_agents_per_session (int, optional): Number of agents per session. Defaults to 2.
-        num_sessions (int, optional): Number of sessions. Defaults to 10.
-        max_conversation_length (int, optional): Maximum length of a conversation. Defaults to 10.
-        treatments (dict[str, Any], optional): The treatments for the experiment. Defaults to an empty dictionary.
-        treatment_assignment_strategy (str, optional): The strategy used for assigning treatments to agents.
-            Defaults to "simple_random".
+        Args:
+            session_info_list (list[dict[str, Any]]): A list of dictionaries containing session information.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to stop a session and record the error in its session information when its request fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
+            batch_client (Optional[BatchClient], optional): The client used to submit batches.
+                Defaults to a BatchClient using the OpenAI client of query_llm.
 
-    Raises:
-        ValueError: If the provided num_sessions is not valid.
-        ValueError: If the provided num_agents_per_session is less than 2 or will exceed the total number of demographic information.
-        ValueError: If the provided number of agent_roles is not equal to num_agents_per_session or if the first role is not Interviewer.
-        ValueError: If the number of roles defined does not match the number of agents assigned to each session. Also if the first role is not Interviewer.
+        Returns:
+            list[dict[str, Any]]: A list of dictionaries containing the updated session information, in the order provided.
+
+        Raises:
+            LLMError: If a request fails and on_llm_error is "raise".
+        """
+        self.check_on_llm_error(on_llm_error)
+        if batch_client is None:
+            batch_client = BatchClient()
+        start_time = time.perf_counter()
+
+        conversation_states = {}
+        for session_info in session_info_list:
+            message_history, conversation_length, response = (
+                self.get_conversation_state(session_info, test_mode)
+            )
+            conversation_states[session_info["session_id"]] = {
+                "session_info": session_info,
+                "message_history": message_history,
+                "conversation_length": conversation_length,
+                "response": response,
+            }
+
+        live_session_ids = [
+            session_id
+            for session_id, state in conversation_states.items()
+            if not self.is_conversation_over(
+                state["response"], state["conversation_length"]
+            )
+        ]
+        for session_id, state in conversation_states.items():
+            if session_id not in live_session_ids:
+                self.complete_session(
+                    state["session_info"], state["message_history"], test_mode
+                )
+
+        while live_session_ids:
+            turn_start_time = time.perf_counter()
+            requests, turn_agents = {}, {}
+            for session_id in list(live_session_ids):
+                state = conversation_states[session_id]
+                agent, question = self.get_next_turn(
+                    state["session_info"],
+                    state["conversation_length"],
+                    state["response"],
+                )
+                custom_id = f"session-{session_id}-turn-{state['conversation_length']}"
+                try:
+                    requests[custom_id] = list(agent.prepare_request(question))
+                except LLMError as e:
+                    # A context policy may call a LLM, e.g. to summarise the conversation
+                    agent.discard_request()
+                    live_session_ids.remove(session_id)
+                    self.abort_session(
+                        state["session_info"],
+                        state["message_history"],
+                        e,
+                        on_llm_error,
+                        start_time,
+                    )
+                    continue
+                turn_agents[session_id] = (custom_id, agent)
+
+            if not requests:
+                break
+
+            batch_usage = {}
+            results = batch_client.run(self.model_info, requests, usage=batch_usage)
+
+            next_live_session_ids = []
+            for session_id in live_session_ids:
+                state = conversation_states[session_id]
+                custom_id, agent = turn_agents[session_id]
+                result = results[custom_id]
+                if isinstance(result, LLMError):
+                    agent.discard_request()
+                    self.abort_session(
+                        state["session_info"],
+                        state["message_history"],
+                        result,
+                        on_llm_error,
+                        start_time,
+                    )
+                    continue
+
+                agent.record_response(result)
+                add_usage(agent.get_usage(), batch_usage.get(custom_id))
+                state["response"] = result
+                state["conversation_length"] += 1
+                self.record_turn(
+                    state["message_history"], agent.get_role(), result, test_mode
+                )
+                self.observe_turn(agent.get_role(), turn_start_time)
+                if self.is_conversation_over(
+                    state["response"], state["conversation_length"]
+                ):
+                    self.complete_session(
+                        state["session_info"],
+                        state["message_history"],
+                        test_mode,
+                        start_time,
+                    )
+                else:
+                    next_live_session_ids.append(session_id)
+
+            live_session_ids = next_live_session_ids
+
+        return session_info_list
+
+    def stream_turn(
+        self,
+        session_info: dict[str, Any],
+        agent: ConversationalSyntheticAgent,
+        question: str,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
+        test_mode: bool = False,
+    ) -> str:
+        """Streams the response of an agent for one turn, recording its time to first token and duration in session_info["turn_metrics"].
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            agent (ConversationalSyntheticAgent): The agent that responds in this turn.
+            question (str): The question the agent responds to.
+            stop_pattern (Optional[str], optional): The pattern after which the generation is cancelled. Defaults to END_OF_CONVERSATION.
+            test_mode (bool, optional): Indicates whether the response is printed as it is streamed. Defaults to False.
+
+        Returns:
+            str: The response of the agent.
+        """
+        start_time = time.perf_counter()
+        first_chunk_time = None
+
+        def on_chunk(chunk: str) -> None:
+            nonlocal first_chunk_time
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter()
+                if test_mode:
+                    print(f"{agent.get_role()}: ", end="")
+            if test_mode:
+                print(chunk, end="", flush=True)
+
+        response = agent.respond(
+            question=question, stream=True, stop_pattern=stop_pattern, on_chunk=on_chunk
+        )
+        end_time = time.perf_counter()
+        if test_mode:
+            print()
+            print()
+
+        session_info.setdefault("turn_metrics", []).append(
+            {
+                "role": agent.get_role(),
+                "time_to_first_token": (
+                    None if first_chunk_time is None else first_chunk_time - start_time
+                ),
+                "duration": end_time - start_time,
+            }
+        )
+        return response
+
+    def get_conversation_state(
+        self, session_info: dict[str, Any], test_mode: bool = False
+    ) -> tuple[list[dict[str, str]], int, str]:
+        """Return the state of the conversation of a session. A new conversation starts with the session system message, while an aborted conversation resumes from its last successful turn.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+
+        Returns:
+            tuple[list[dict[str, str]], int, str]: The message history of the session, the number of turns taken and the latest response.
+        """
+        if session_info.get("status") == "aborted":
+            message_history = session_info["message_history"]
+        else:
+            message_history = []
+            self.record_turn(
+                message_history,
+                "system",
+                session_info["session_system_message"],
+                test_mode,
+            )
+
+        response = list(message_history[-1].values())[0]
+        return message_history, len(message_history) - 1, response
+
+    def is_conversation_over(self, response: str, conversation_length: int) -> bool:
+        """Checks if a conversation has ended, either because the latest response contains the end-of-conversation sentinel or because the maximum conversation length is reached.
+
+        Args:
+            response (str): The latest response in the conversation.
+            conversation_length (int): The number of turns taken.
+
+        Returns:
+            bool: True if the conversation has ended, False otherwise.
+        """
+        return (
+            END_OF_CONVERSATION in response
+            or conversation_length >= self.max_conversation_length
+        )
+
+    def get_next_turn(
+        self, session_info: dict[str, Any], conversation_length: int, response: str
+    ) -> tuple[ConversationalSyntheticAgent, str]:
+        """Return the agent that speaks next in a round-robin conversation and the question it responds to.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            conversation_length (int): The number of turns taken.
+            response (str): The latest response in the conversation.
+
+        Returns:
+            tuple[ConversationalSyntheticAgent, str]: The agent that speaks next and the question it responds to.
+        """
+        agents = session_info["agents"]
+        agent = agents[conversation_length % len(agents)]
+        question = "Start" if conversation_length == 0 else response
+
+        return agent, question
+
+    def record_turn(
+        self,
+        message_history: list[dict[str, str]],
+        agent_role: str,
+        response: str,
+        test_mode: bool = False,
+    ) -> None:
+        """Append a turn to the message history of a session.
+
+        Args:
+            message_history (list[dict[str, str]]): The message history of the session.
+            agent_role (str): The role of the party that generated the response.
+            response (str): The response generated.
+            test_mode (bool, optional): Indicates whether the turn is printed. Defaults to False.
+
+        Returns:
+            None
+        """
+        message_history.append({agent_role: response})
+        if test_mode:
+            print({agent_role: response})
+            print()
+
+    def complete_session(
+        self,
+        session_info: dict[str, Any],
+        message_history: list[dict[str, str]],
+        test_mode: bool = False,
+        start_time: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """Mark a session as completed and store its message history.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            message_history (list[dict[str, str]]): The message history of the session.
+            test_mode (bool, optional): Indicates whether the end of the session is printed. Defaults to False.
+            start_time (Optional[float], optional): The time.perf_counter() value at which the session was started, used to
+                record its duration. Defaults to None.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the updated session information.
+        """
+        message_history.append({"system": "End"})
+        if test_mode:
+            print({"system": "End"})
+
+        session_info["message_history"] = message_history
+        session_info["status"] = "completed"
+        session_info["usage"] = self.get_session_usage(session_info)
+        session_info.pop("error", None)
+        self.observe_session(session_info, start_time)
+        return session_info
+
+    def abort_session(
+        self,
+        session_info: dict[str, Any],
+        message_history: list[dict[str, str]],
+        error: LLMError,
+        on_llm_error: str,
+        start_time: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """Mark a session as aborted after a failed LLM call, keeping the turns completed so far so that it can be resumed.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            message_history (list[dict[str, str]]): The message history of the session.
+            error (LLMError): The error raised by the failed LLM call.
+            on_llm_error (str): "abort" to return the session information, or "raise" to raise the error.
+            start_time (Optional[float], optional): The time.perf_counter() value at which the session was started, used to
+                record its duration. Defaults to None.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the updated session information.
+
+        Raises:
+            LLMError: If on_llm_error is "raise".
+        """
+        print(f"Session {session_info['session_id']} aborted: {error}")
+        session_info["message_history"] = message_history
+        session_info["status"] = "aborted"
+        session_info["error"] = {"type": type(error).__name__, "message": str(error)}
+        session_info["usage"] = self.get_session_usage(session_info)
+        self.observe_session(session_info, start_time)
+        if on_llm_error == "raise":
+            raise error
+
+        return session_info
+
+    def observe_turn(self, agent_role: str, start_time: float) -> None:
+        """Record the duration of a turn in the metrics registry.
+
+        Args:
+            agent_role (str): The role of the agent that took the turn.
+            start_time (float): The time.perf_counter() value at which the turn was started.
+
+        Returns:
+            None
+        """
+        metrics_registry.observe(
+            "turn_duration_seconds",
+            time.perf_counter() - start_time,
+            experiment_id=self.experiment_id,
+            role=agent_role,
+        )
+
+    def get_session_usage(self, session_info: dict[str, Any]) -> dict[str, Any]:
+        """Add up the token usage of the agents of a session and estimate its cost.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+
+        Returns:
+            dict[str, Any]: The number of LLM calls, tokens and the estimated cost of the session.
+        """
+        return summarize_usage(
+            self.model_info, [agent.get_usage() for agent in session_info["agents"]]
+        )
+
+    def create_usage_totals(self) -> dict[str, Any]:
+        """Create empty running usage totals for add_session_usage.
+
+        Returns:
+            dict[str, Any]: An empty record of token usage under "total", and empty dictionaries under "by_treatment" and "by_role".
+        """
+        return {"total": create_usage(), "by_treatment": {}, "by_role": {}}
+
+    def add_session_usage(
+        self, usage_totals: dict[str, Any], session_info: dict[str, Any]
+    ) -> None:
+        """Add the token usage of a finished session to running totals per experiment, treatment and agent role, so that
+        usage can be summarised without keeping the sessions in memory.
+
+        Args:
+            usage_totals (dict[str, Any]): The running totals under "total", "by_treatment" and "by_role", updated in place.
+            session_info (dict[str, Any]): The session information, with agents converted to dictionaries.
+
+        Returns:
+            None
+        """
+        treatment_label = self.treatment_assignment[session_info["session_id"]]
+        add_usage(usage_totals["total"], session_info.get("usage"))
+        add_usage(
+            usage_totals["by_treatment"].setdefault(treatment_label, create_usage()),
+            session_info.get("usage"),
+        )
+        for agent in session_info["agents"]:
+            add_usage(
+                usage_totals["by_role"].setdefault(agent["role"], create_usage()),
+                agent.get("usage"),
+            )
+
+    def summarize_usage_totals(self, usage_totals: dict[str, Any]) -> dict[str, Any]:
+        """Estimate the cost and prompt cache hit rate of running usage totals built with add_session_usage.
+
+        Args:
+            usage_totals (dict[str, Any]): The running totals under "total", "by_treatment" and "by_role".
+
+        Returns:
+            dict[str, Any]: The total usage under "total", and the usage of each treatment label and agent role under "by_treatment" and "by_role".
+        """
+        return {
+            "total": summarize_usage(self.model_info, [usage_totals["total"]]),
+            "by_treatment": {
+                treatment_label: summarize_usage(self.model_info, [usage])
+                for treatment_label, usage in usage_totals["by_treatment"].items()
+            },
+            "by_role": {
+                role: summarize_usage(self.model_info, [usage])
+                for role, usage in usage_totals["by_role"].items()
+            },
+        }
+
+    def summarize_experiment_usage(
+        self, sessions: dict[int, dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Add up the token usage of the sessions of an experiment, in total, per treatment and per agent role.
+
+        Args:
+            sessions (dict[int, dict[str, Any]]): The session information of the experiment, keyed by session ID, with agents converted to dictionaries.
+
+        Returns:
+            dict[str, Any]: The total usage under "total", and the usage of each treatment label and agent role under "by_treatment" and "by_role".
+        """
+        usage_totals = self.create_usage_totals()
+        for session_info in sessions.values():
+            self.add_session_usage(usage_totals, session_info)
+
+        return self.summarize_usage_totals(usage_totals)
+
+    def assemble_experiment(
+        self, session_info_list: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Builds the experiment data from its collected sessions.
+
+        Args:
+            session_info_list (list[dict[str, Any]]): The session information of each session, with agents converted to dictionaries.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information and token usage.
+        """
+        experiment = {"experiment_id": self.experiment_id, "sessions": {}}
+        for session_info in session_info_list:
+            experiment["sessions"][session_info["session_id"]] = session_info
+        experiment["usage"] = self.summarize_experiment_usage(experiment["sessions"])
+        return experiment
+
+    def restore_session(
+        self, session_info: dict[str, Any], saved_session_info: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Restore the conversation of an aborted session from its checkpoint, so that run_session resumes it from its last
+        successful turn.
+
+        Args:
+            session_info (dict[str, Any]): The session information of the session, as returned by initialize_session.
+            saved_session_info (dict[str, Any]): The saved session information of the aborted session.
+
+        Returns:
+            dict[str, Any]: The session information, with the state of the aborted session.
+        """
+        for agent, agent_dict in zip(
+            session_info["agents"], saved_session_info["agents"]
+        ):
+            agent.restore_state(agent_dict)
+        session_info["message_history"] = saved_session_info["message_history"]
+        session_info["status"] = "aborted"
+        session_info["error"] = saved_session_info.get("error")
+        return session_info
+
+    def resume(
+        self,
+        saved_sessions: dict[int, dict[str, Any]],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+        restart_aborted: bool = True,
+        stream: bool = False,
+        stop_pattern: Optional[str] = END_OF_CONVERSATION,
+    ) -> dict[str, Any]:
+        """Runs the sessions of the experiment that were not saved, reusing the saved sessions, and saves the experiment.
+        With the same assignment, context_policy, persona_compiler, stream and stop_pattern, the output is identical to
+        that of an uninterrupted run.
+
+        Args:
+            saved_sessions (dict[int, dict[str, Any]]): The saved session information of each finished session, keyed by session ID.
+            test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            restart_aborted (bool, optional): Indicates whether saved sessions that were aborted are resumed from their last
+                successful turn, rather than kept as they are. Defaults to True.
+            stream (bool, optional): Indicates whether responses are streamed. Defaults to False.
+            stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+                Defaults to END_OF_CONVERSATION.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information and token usage.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        session_info_list = self.resume_sessions(
+            saved_sessions,
+            restart_aborted=restart_aborted,
+            test_mode=test_mode,
+            on_llm_error=on_llm_error,
+            stream=stream,
+            stop_pattern=stop_pattern,
+        )
+        experiment = self.assemble_experiment(session_info_list)
+        self.save_experiment(experiment)
+
+        return experiment
+
+    def to_config(self) -> dict[str, Any]:
+        """Converts the settings of the experiment to a JSON-serialisable configuration, from which workers rebuild the
+        experiment with from_config. The context_policy and persona_compiler are not included.
+
+        Returns:
+            dict[str, Any]: The type and ID of the experiment and the arguments it was constructed with.
+        """
+        return {
+            "experiment_type": type(self).__name__,
+            "experiment_id": self.experiment_id,
+            "model_info": self.model_info,
+            "experiment_context": self.experiment_context,
+            "agent_demographics": self.agent_demographics.to_dict(orient="list"),
+            "agent_roles": self.agent_roles,
+            "num_agents_per_session": self.num_agents_per_session,
+            "num_sessions": self.num_sessions,
+            "max_conversation_length": self.max_conversation_length,
+            "treatments": self.treatments,
+            "treatment_assignment_strategy": self.treatment_assignment_strategy,
+            "prompt_layout": self.prompt_layout,
+            "system_message_template": self.system_message_template,
+        }
+
+    def get_session_spec(self, session_id: int) -> dict[str, Any]:
+        """Return the specification of a session, from which a worker runs the session without the random assignment of
+        the experiment.
+
+        Args:
+            session_id (int): The ID of the session.
+
+        Returns:
+            dict[str, Any]: The session ID, treatment label and assigned demographics of the session.
+        """
+        return {
+            "session_id": session_id,
+            "treatment_label": self.treatment_assignment[session_id],
+            "agents_demographic": self.agent_assignment[session_id],
+        }
+
+    def apply_session_spec(self, spec: dict[str, Any]) -> int:
+        """Restore the assignment of a session from its specification.
+
+        Args:
+            spec (dict[str, Any]): The specification of the session, as returned by get_session_spec.
+
+        Returns:
+            int: The ID of the session.
+        """
+        session_id = spec["session_id"]
+        treatment_label = spec["treatment_label"]
+        # JSON turns the tuple labels of full factorial designs into lists
+        if isinstance(treatment_label, list):
+            treatment_label = tuple(treatment_label)
+
+        self.treatment_assignment[session_id] = treatment_label
+        self.agent_assignment[session_id] = spec["agents_demographic"]
+        if session_id not in self.session_id_list:
+            self.session_id_list.append(session_id)
+        return session_id
+
+    def run_session_spec(
+        self, spec: dict[str, Any], on_llm_error: str = "abort"
+    ) -> dict[str, Any]:
+        """Runs the session described by a specification, as a worker of a work queue does.
+
+        Args:
+            spec (dict[str, Any]): The specification of the session, as returned by get_session_spec.
+            on_llm_error (str, optional): "abort" to stop the session and record the error in session_info when a LLM call fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
+
+        Returns:
+            dict[str, Any]: A dictionary containing the session information at the end of the session, with agents
+                converted to dictionaries.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        session_info = self.run_session(
+            self.initialize_session(self.apply_session_spec(spec)),
+            on_llm_error=on_llm_error,
+        )
+        session_info["agents"] = [agent.to_dict() for agent in session_info["agents"]]
+        return session_info
+
+    def enqueue_sessions(self, work_queue: WorkQueue, test_mode: bool = False) -> int:
+        """Stores the configuration of the experiment in a work queue and enqueues its sessions, so that they can be run
+        by workers with run_worker. If test_mode is set to True, only the first session is enqueued.
+
+        Args:
+            work_queue (WorkQueue): The queue shared with the workers.
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not. Defaults to False.
+
+        Returns:
+            int: The number of sessions added to the queue.
+        """
+        work_queue.save_config(self.experiment_id, self.to_config())
+        return work_queue.enqueue(
+            self.experiment_id,
+            {
+                session_id: self.get_session_spec(session_id)
+                for session_id in self.select_session_ids(test_mode)
+            },
+        )
+
+    def merge_results(self, work_queue: WorkQueue) -> dict[str, Any]:
+        """Rebuilds the experiment from the results written to a work queue by its workers, in the same format as
+        run_experiment, and saves it. Sessions without a result, e.g. because they are still running, are left out.
+
+        Args:
+            work_queue (WorkQueue): The queue shared with the workers.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information and token usage.
+        """
+        for spec in work_queue.get_specs(self.experiment_id).values():
+            self.apply_session_spec(spec)
+
+        results = work_queue.get_results(self.experiment_id)
+        experiment = {"experiment_id": self.experiment_id, "sessions": {}}
+        for session_id in self.session_id_list:
+            if session_id in results:
+                experiment["sessions"][session_id] = results[session_id]
+
+        progress = work_queue.get_progress(self.experiment_id)
+        num_missing_sessions = (
+            progress["pending"] + progress["leased"] + progress["failed"]
+        )
+        if num_missing_sessions:
+            print(
+                f"{num_missing_sessions} sessions of experiment {self.experiment_id} have no result yet: {progress}."
+            )
+
+        experiment["usage"] = self.summarize_experiment_usage(experiment["sessions"])
+        self.save_experiment(experiment)
+
+        return experiment
+
+
+class AItoAIInterviewExperiment(AItoAIConversationalExperiment):
+    """A class representing an AI-to-AI interview experiment. Inherits from the AItoAIConversationalExperiment class.
+
+    This class extends the `AItoAIConversationalExperiment` class and provides additional functionality
+    specific to AI-to-AI interview experiments. More specifically, one of the agents in the session will serve
+    as the interviewer and will not be given a demographic profile.
+
+    Args:
+        model_info (str): The information about the AI model used in the experiment.
+        experiment_context (str): The context or purpose of the experiment.
+        agent_demographics (pd.DataFrame): The demographic information of the agents participating in the experiment.
+        agent_roles (dict[str, str]): Dictionary mapping agent roles to their descriptions.
+        num_agents_per_session (int, optional): Number of agents per session. Defaults to 2.
+        num_sessions (int, optional): Number of sessions. Defaults to 10.
+        max_conversation_length (int, optional): Maximum length of a conversation. Defaults to 10.
+        treatments (dict[str, Any], optional): The treatments for the experiment. Defaults to an empty dictionary.
+        treatment_assignment_strategy (str, optional): The strategy used for assigning treatments to agents.
+            Defaults to "simple_random".
+        context_policy (Optional[ContextPolicy], optional): The policy selecting the messages resent to the LLM on each call.
+            Each agent receives its own copy. Defaults to None, which resends the full message history.
+        prompt_layout (str, optional): The layout of the system messages, either "default" or "cache_friendly". The
+            "cache_friendly" layout keeps the shared part of the prompts byte-identical across agents and sessions so that
+            provider-side prompt caching hits. Defaults to "default".
+        system_message_template (Optional[str], optional): A custom template of the agents' system messages, with any of
+            the placeholders {experiment_context}, {treatment}, {role}, {role_description} and {demographic_info}.
+            Overrides prompt_layout for the agents' system messages. Defaults to None.
+        persona_compiler (Optional[PersonaCompiler], optional): The compiler selecting the demographic fields of each
+            agent's prompt within a token budget. Defaults to None, which includes every field.
+
+    Raises:
+        ValueError: If the provided num_sessions is not valid.
+        ValueError: If the provided num_agents_per_session is less than 2 or will exceed the total number of demographic information.
+        ValueError: If the provided number of agent_roles is not equal to num_agents_per_session or if the first role is not Interviewer.
+        ValueError: If the number of roles defined does not match the number of agents assigned to each session. Also if the first role is not Interviewer.
+        ValueError: If the provided system_message_template is not valid or has an unsupported placeholder.
 
     Attributes:
         num_sessions (int): The number of sessions in the experiment.
@@ -663,6 +2392,10 @@ class AItoAIInterviewExperiment(AItoAIConversationalExperiment):
         max_conversation_length: int = 10,
         treatments: dict[str, Any] = {},
         treatment_assignment_strategy: str = "simple_random",
+        context_policy: Optional[ContextPolicy] = None,
+        prompt_layout: str = "default",
+        system_message_template: Optional[str] = None,
+        persona_compiler: Optional[PersonaCompiler] = None,
     ):
         super().__init__(
             model_info,
@@ -674,6 +2407,10 @@ class AItoAIInterviewExperiment(AItoAIConversationalExperiment):
             max_conversation_length,
             treatments,
             treatment_assignment_strategy,
+            context_policy,
+            prompt_layout,
+            system_message_template,
+            persona_compiler,
         )
 
         self.num_agents_per_session = self.check_num_agents_per_session(
@@ -788,7 +2525,730 @@ class AItoAIInterviewExperiment(AItoAIConversationalExperiment):
                     role_description=list(self.agent_roles.values())[i],
                     model_info=self.model_info,
                     treatment=session_info["treatment"],
+                    context_policy=copy.deepcopy(self.context_policy),
+                    prompt_layout=self.prompt_layout,
+                    demographic_prompt_generator=self.get_demographic_prompt,
+                    shared_strings=self.shared_strings,
+                    system_message_template=self.get_system_message_template(
+                        session_info["treatment"], list(self.agent_roles.keys())[i]
+                    ),
                 )
             )
 
         return agent_list
+
+
+class AISurveyExperiment(AIConversationalExperiment):
+    """A class representing a survey experiment, in which each session is a synthetic respondent answering a
+    questionnaire, e.g. the Afrobarometer items. Inherits from the AIConversationalExperiment class.
+
+    Respondents answer the questionnaire in blocks of questions, one LLM call per block, and only the questions whose
+    answers fail validation are asked again individually. Compared to an interview, this cuts the number of calls per
+    respondent by up to block_size times and avoids resending an ever-growing conversation.
+
+    Args:
+        model_info (str): The information about the AI model used in the experiment.
+        experiment_context (str): The context or purpose of the experiment.
+        agent_demographics (pd.DataFrame): The demographic information of the respondents, with one row per respondent.
+        questions (dict[str, str]): A dictionary mapping the IDs of the questions to their text, in the order they are asked.
+        options (Optional[dict[str, list[str]]], optional): A dictionary mapping the IDs of closed questions to their answer
+            options. Defaults to None.
+        block_size (int, optional): The maximum number of questions answered in one call. Defaults to 20.
+        num_sessions (Optional[int], optional): The number of respondents. Defaults to None, which surveys every profile in
+            agent_demographics.
+        treatments (dict[str, Any], optional): The treatments for the experiment. Defaults to an empty dictionary.
+        treatment_assignment_strategy (str, optional): The strategy used for assigning treatments to respondents.
+            Defaults to "simple_random".
+        persona_compiler (Optional[PersonaCompiler], optional): The compiler selecting the demographic fields of each
+            respondent's prompt within a token budget. Defaults to None, which includes every field.
+
+    Raises:
+        ValueError: If the provided questions is empty or contains options for unknown questions.
+        ValueError: If the provided block_size is less than 1.
+        ValueError: If the provided num_sessions is less than 1 or exceeds the number of profiles in agent_demographics.
+
+    Attributes:
+        questions (dict[str, str]): The questions of the questionnaire.
+        options (dict[str, list[str]]): The answer options of the closed questions.
+        block_size (int): The maximum number of questions answered in one call.
+        num_sessions (int): The number of respondents.
+        treatment_assignment (dict[int, str]): The assignment of treatments to sessions.
+        session_id_list (list[int]): List of session IDs.
+        respondent_assignment (dict[int, DemographicInfo]): The demographic information of the respondent of each session.
+        shared_strings (StringTable): The table through which the respondents share the experiment context and treatments.
+        system_message_templates (dict[str, PromptTemplate]): The system messages compiled for each treatment, in which
+            only the demographic information is left to be filled.
+    """
+
+    def __init__(
+        self,
+        model_info: str,
+        experiment_context: str,
+        agent_demographics: pd.DataFrame,
+        questions: dict[str, str],
+        options: Optional[dict[str, list[str]]] = None,
+        block_size: int = 20,
+        num_sessions: Optional[int] = None,
+        treatments: dict[str, Any] = {},
+        treatment_assignment_strategy: str = "simple_random",
+        persona_compiler: Optional[PersonaCompiler] = None,
+    ):
+        super().__init__(
+            model_info,
+            experiment_context,
+            agent_demographics,
+            treatments=treatments,
+            treatment_assignment_strategy=treatment_assignment_strategy,
+            persona_compiler=persona_compiler,
+        )
+        self.questions = self.check_questions(questions)
+        self.options = self.check_options(options or {})
+        self.block_size = self.check_block_size(block_size)
+        self.num_sessions = self.check_num_sessions(
+            len(self.agent_demographics) if num_sessions is None else num_sessions
+        )
+        self.shared_strings = StringTable()
+        self.system_message_templates = {}
+
+        self.treatment_assignment = self.assign_treatment()
+        self.session_id_list = list(self.treatment_assignment.keys())
+        self.respondent_assignment = self.assign_respondents_to_session()
+
+    def check_questions(self, questions: dict[str, str]) -> dict[str, str]:
+        """Checks if the provided questions is valid.
+
+        Args:
+            questions (dict[str, str]): The questions to be checked.
+
+        Returns:
+            dict[str, str]: The validated questions.
+
+        Raises:
+            ValueError: If the provided questions is empty.
+        """
+        if not questions:
+            raise ValueError(
+                f"Invalid value for questions: {questions}. questions should contain at least one question."
+            )
+
+        return questions
+
+    def check_options(self, options: dict[str, list[str]]) -> dict[str, list[str]]:
+        """Checks if the provided options only refer to questions of the questionnaire.
+
+        Args:
+            options (dict[str, list[str]]): The options to be checked.
+
+        Returns:
+            dict[str, list[str]]: The validated options.
+
+        Raises:
+            ValueError: If the provided options refer to unknown questions.
+        """
+        unknown_question_ids = [
+            question_id for question_id in options if question_id not in self.questions
+        ]
+        if unknown_question_ids:
+            raise ValueError(
+                f"Invalid value for options: options are provided for unknown questions {unknown_question_ids}."
+            )
+
+        return options
+
+    def check_block_size(self, block_size: int) -> int:
+        """Checks if the provided block_size is valid.
+
+        Args:
+            block_size (int): The block_size to be checked.
+
+        Returns:
+            int: The validated block_size.
+
+        Raises:
+            ValueError: If the provided block_size is less than 1.
+        """
+        if block_size < 1:
+            raise ValueError(
+                f"Invalid value for block_size: {block_size}. block_size should be an integer that is equal to or greater than 1."
+            )
+
+        return block_size
+
+    def check_num_sessions(self, num_sessions: int) -> int:
+        """Checks if the provided num_sessions is valid and does not exceed the number of profiles.
+
+        Args:
+            num_sessions (int): The num_sessions to be checked.
+
+        Returns:
+            int: The validated num_sessions.
+
+        Raises:
+            ValueError: If the provided num_sessions is less than 1 or exceeds the number of profiles in agent_demographics.
+        """
+        super().check_num_sessions(num_sessions)
+        if num_sessions > len(self.agent_demographics):
+            raise ValueError(
+                f"Total number of respondents required for experiment ({num_sessions}) exceed the number of profiles provided in agent_demographics ({len(self.agent_demographics)})."
+            )
+
+        return num_sessions
+
+    def get_questions(self) -> dict[str, str]:
+        """Return the questions of the questionnaire.
+
+        Returns:
+            dict[str, str]: The questions of the questionnaire.
+        """
+        return self.questions
+
+    def get_respondent_assignment(self) -> dict[int, DemographicInfo]:
+        """Return the respondent_assignment for this experiment.
+
+        Returns:
+            dict[int, DemographicInfo]: The respondent_assignment information.
+        """
+        return self.respondent_assignment
+
+    def assign_respondents_to_session(self) -> dict[int, DemographicInfo]:
+        """Randomly assigns one respondent profile to each session.
+
+        Returns:
+            dict[int, DemographicInfo]: A dictionary mapping session IDs to the demographic information of their respondent.
+        """
+        randomised_agent_demographics = self.agent_demographics.sample(
+            frac=1
+        ).reset_index(drop=True)
+
+        respondent_demographics = randomised_agent_demographics.iloc[
+            : len(self.session_id_list)
+        ].to_dict(orient="records")
+        return dict(zip(self.session_id_list, respondent_demographics))
+
+    def get_treatment(self, treatment_label: Any) -> str:
+        """Return the treatment of a treatment label. The label of a full factorial design is a tuple with one label per
+        factor, whose treatments are combined.
+
+        Args:
+            treatment_label (Any): The treatment label assigned to a session.
+
+        Returns:
+            str: The treatment, or an empty string if the experiment has no treatments.
+        """
+        if isinstance(treatment_label, tuple):
+            return "\n\n".join(
+                subtreatments[label]
+                for subtreatments, label in zip(
+                    self.treatments.values(), treatment_label
+                )
+            )
+
+        return self.treatments.get(treatment_label, "")
+
+    def get_system_message_template(self, treatment: str) -> PromptTemplate:
+        """Returns the system message of the respondents under a treatment, compiling it on first use.
+
+        Args:
+            treatment (str): The treatment assigned to the respondents.
+
+        Returns:
+            PromptTemplate: The compiled system message, in which only the demographic information is left to be filled.
+        """
+        if treatment not in self.system_message_templates:
+            self.system_message_templates[treatment] = (
+                compile_survey_system_message_template(
+                    experiment_context=self.experiment_context, treatment=treatment
+                )
+            )
+
+        return self.system_message_templates[treatment]
+
+    def initialize_session(self, session_id: int) -> dict[str, Any]:
+        """Constructs the session information for the provided session ID, including its treatment, respondent demographics and respondent agent.
+
+        Args:
+            session_id (int): The ID of the session to be initialised.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the session information.
+        """
+        session_info = {}
+        session_info["session_id"] = session_id
+        session_info["treatment"] = self.get_treatment(
+            self.treatment_assignment[session_id]
+        )
+        session_info["respondent_demographic"] = self.respondent_assignment[session_id]
+        session_info["agents"] = [
+            SurveySyntheticAgent(
+                experiment_id=self.experiment_id,
+                experiment_context=self.experiment_context,
+                session_id=session_id,
+                demographic_info=session_info["respondent_demographic"],
+                model_info=self.model_info,
+                treatment=session_info["treatment"],
+                questions=self.questions,
+                options=self.options,
+                block_size=self.block_size,
+                demographic_prompt_generator=self.get_demographic_prompt,
+                shared_strings=self.shared_strings,
+                system_message_template=self.get_system_message_template(
+                    session_info["treatment"]
+                ),
+            )
+        ]
+
+        return session_info
+
+    def run_session(
+        self,
+        session_info: dict[str, Any],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+    ) -> dict[str, Any]:
+        """Runs a session in which the respondent answers the questionnaire. A session that was previously aborted is resumed from its first unanswered block.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the answers are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to stop the session and record the error in session_info when a LLM call fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
+
+        Returns:
+            dict[str, Any]: A dictionary containing the updated session information at the end of the session.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        self.check_on_llm_error(on_llm_error)
+        start_time = time.perf_counter()
+        try:
+            session_info["agents"][0].answer_survey()
+        except LLMError as e:
+            return self.finish_session(
+                session_info, test_mode, start_time, e, on_llm_error
+            )
+
+        return self.finish_session(session_info, test_mode, start_time)
+
+    async def run_session_async(
+        self,
+        session_info: dict[str, Any],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+    ) -> dict[str, Any]:
+        """Asynchronously runs a session in which the respondent answers the questionnaire, with its blocks answered concurrently.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the answers are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to stop the session and record the error in session_info when a LLM call fails,
+                or "raise" to additionally raise the error. Defaults to "abort".
+
+        Returns:
+            dict[str, Any]: A dictionary containing the updated session information at the end of the session.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        self.check_on_llm_error(on_llm_error)
+        start_time = time.perf_counter()
+        try:
+            await session_info["agents"][0].answer_survey_async()
+        except LLMError as e:
+            return self.finish_session(
+                session_info, test_mode, start_time, e, on_llm_error
+            )
+
+        return self.finish_session(session_info, test_mode, start_time)
+
+    def finish_session(
+        self,
+        session_info: dict[str, Any],
+        test_mode: bool = False,
+        start_time: Optional[float] = None,
+        error: Optional[LLMError] = None,
+        on_llm_error: str = "abort",
+    ) -> dict[str, Any]:
+        """Record the answers, status and usage of a session, which is aborted if a LLM call failed.
+
+        Args:
+            session_info (dict[str, Any]): A dictionary containing session information.
+            test_mode (bool, optional): Indicates whether the answers are printed. Defaults to False.
+            start_time (Optional[float], optional): The time.perf_counter() value at which the session was started, used to
+                record its duration. Defaults to None.
+            error (Optional[LLMError], optional): The error raised by a failed LLM call. Defaults to None.
+            on_llm_error (str, optional): "abort" to return the session information of an aborted session, or "raise" to
+                raise the error. Defaults to "abort".
+
+        Returns:
+            dict[str, Any]: A dictionary containing the updated session information.
+
+        Raises:
+            LLMError: If a LLM call failed and on_llm_error is "raise".
+        """
+        agent = session_info["agents"][0]
+        session_info["answers"] = {
+            question_id: agent.get_answers().get(question_id)
+            for question_id in self.questions
+        }
+        session_info["usage"] = summarize_usage(self.model_info, [agent.get_usage()])
+        if error is None:
+            session_info["status"] = "completed"
+            session_info.pop("error", None)
+        else:
+            print(f"Session {session_info['session_id']} aborted: {error}")
+            session_info["status"] = "aborted"
+            session_info["error"] = {
+                "type": type(error).__name__,
+                "message": str(error),
+            }
+        if test_mode:
+            print(session_info["answers"])
+            print()
+
+        self.observe_session(session_info, start_time)
+        if error is not None and on_llm_error == "raise":
+            raise error
+
+        return session_info
+
+    def run_experiment(
+        self,
+        test_mode: bool = True,
+        on_llm_error: str = "abort",
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Runs the survey, one respondent after another. If test_mode is set to True, the first session will be selected and run.
+
+        Args:
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not. Defaults to True.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            checkpoint (bool, optional): Indicates whether each session is saved as soon as it finishes, so that an interrupted
+                survey can be resumed with resume_experiment. Defaults to False.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information, the answers as one row per
+                respondent under "responses" and token usage.
+        """
+        from tqdm import tqdm
+
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+
+        session_info_list = [
+            self.run_checkpointed_session(
+                self.initialize_session(session_id),
+                checkpoint,
+                test_mode=test_mode,
+                on_llm_error=on_llm_error,
+            )
+            for session_id in tqdm(session_id_list)
+        ]
+        experiment = self.build_experiment(session_info_list)
+        self.save_experiment(experiment)
+
+        return experiment
+
+    async def run_experiment_async(
+        self,
+        test_mode: bool = True,
+        max_concurrency: int = 10,
+        on_llm_error: str = "abort",
+        adaptive_concurrency: bool = False,
+        checkpoint: bool = False,
+    ) -> dict[str, Any]:
+        """Asynchronously runs the survey, surveying up to max_concurrency respondents concurrently. If test_mode is set to True, the first session will be selected and run.
+
+        Args:
+            test_mode (bool, optional): Indicates whether the experiment is in test mode or not. Defaults to True.
+            max_concurrency (int, optional): The maximum number of respondents that are surveyed concurrently. Defaults to 10.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the other sessions,
+                or "raise" to stop the experiment. Defaults to "abort".
+            adaptive_concurrency (bool, optional): Indicates whether respondents are admitted through the AIMD concurrency
+                controller of the LLM layer, as in AItoAIConversationalExperiment.run_experiment_async. Defaults to False.
+            checkpoint (bool, optional): Indicates whether each session is saved as soon as it finishes, so that an interrupted
+                survey can be resumed with resume_experiment. Defaults to False.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information, the answers as one row per
+                respondent under "responses", token usage, and the state of the concurrency controller under "concurrency"
+                if adaptive_concurrency is True.
+
+        Raises:
+            ValueError: If the provided max_concurrency is less than 1.
+        """
+        self.check_max_concurrency(max_concurrency)
+        session_id_list = self.select_session_ids(test_mode)
+        if checkpoint:
+            self.save_checkpoint(session_id_list)
+        session_info_list, concurrency_metrics = await self.run_sessions_async(
+            session_id_list,
+            test_mode=test_mode,
+            max_concurrency=max_concurrency,
+            on_llm_error=on_llm_error,
+            adaptive_concurrency=adaptive_concurrency,
+            checkpoint=checkpoint,
+        )
+        experiment = self.build_experiment(session_info_list)
+        if concurrency_metrics is not None:
+            experiment["concurrency"] = concurrency_metrics
+        self.save_experiment(experiment)
+
+        return experiment
+
+    def build_experiment(
+        self, session_info_list: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """Assemble the results of the sessions of the survey, with one row of answers per respondent.
+
+        Args:
+            session_info_list (list[dict[str, Any]]): A list of dictionaries containing the session information.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information keyed by session ID, the rows of
+                answers under "responses" and the total and per-treatment usage under "usage".
+        """
+        experiment = {"experiment_id": self.experiment_id, "sessions": {}}
+        responses, treatment_usages = [], {}
+        for session_info in session_info_list:
+            session_id = session_info["session_id"]
+            experiment["sessions"][session_id] = self.collect_session(session_info)
+            responses.append(
+                {
+                    "session_id": session_id,
+                    "ID": session_info["respondent_demographic"].get("ID"),
+                    "treatment": self.treatment_assignment[session_id],
+                    **session_info["answers"],
+                }
+            )
+            treatment_usages.setdefault(
+                str(self.treatment_assignment[session_id]), []
+            ).append(session_info["usage"])
+
+        experiment["responses"] = responses
+        experiment["usage"] = {
+            "total": summarize_usage(
+                self.model_info,
+                [session_info["usage"] for session_info in session_info_list],
+            ),
+            "by_treatment": {
+                treatment_label: summarize_usage(self.model_info, usages)
+                for treatment_label, usages in treatment_usages.items()
+            },
+        }
+
+        return experiment
+
+    def restore_session(
+        self, session_info: dict[str, Any], saved_session_info: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Restore the answers of an aborted session from its checkpoint, so that run_session resumes it from its first
+        unanswered block.
+
+        Args:
+            session_info (dict[str, Any]): The session information of the session, as returned by initialize_session.
+            saved_session_info (dict[str, Any]): The saved session information of the aborted session.
+
+        Returns:
+            dict[str, Any]: The session information, with the state of the aborted session.
+        """
+        session_info["agents"][0].restore_state(saved_session_info["agents"][0])
+        session_info["status"] = "aborted"
+        session_info["error"] = saved_session_info.get("error")
+        return session_info
+
+    def resume(
+        self,
+        saved_sessions: dict[int, dict[str, Any]],
+        test_mode: bool = False,
+        on_llm_error: str = "abort",
+        restart_aborted: bool = True,
+    ) -> dict[str, Any]:
+        """Surveys the respondents whose sessions were not saved, reusing the saved sessions, and saves the experiment.
+        With the same assignment and persona_compiler, the output is identical to that of an uninterrupted run.
+
+        Args:
+            saved_sessions (dict[int, dict[str, Any]]): The saved session information of each finished session, keyed by session ID.
+            test_mode (bool, optional): Indicates whether the answers are printed. Defaults to False.
+            on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+                or "raise" to stop the experiment. Defaults to "abort".
+            restart_aborted (bool, optional): Indicates whether saved sessions that were aborted are resumed from their first
+                unanswered block, rather than kept as they are. Defaults to True.
+
+        Returns:
+            dict[str, Any]: A dictionary containing the experiment ID, session information, the answers as one row per
+                respondent under "responses" and token usage.
+
+        Raises:
+            LLMError: If a LLM call fails and on_llm_error is "raise".
+        """
+        session_info_list = self.resume_sessions(
+            saved_sessions,
+            restart_aborted=restart_aborted,
+            test_mode=test_mode,
+            on_llm_error=on_llm_error,
+        )
+        experiment = self.build_experiment(session_info_list)
+        self.save_experiment(experiment)
+
+        return experiment
+
+    def to_config(self) -> dict[str, Any]:
+        """Converts the settings of the survey to a JSON-serialisable configuration, from which the survey is rebuilt with
+        from_config. The persona_compiler is not included.
+
+        Returns:
+            dict[str, Any]: The type and ID of the experiment and the arguments it was constructed with.
+        """
+        return {
+            "experiment_type": type(self).__name__,
+            "experiment_id": self.experiment_id,
+            "model_info": self.model_info,
+            "experiment_context": self.experiment_context,
+            "agent_demographics": self.agent_demographics.to_dict(orient="list"),
+            "questions": self.questions,
+            "options": self.options,
+            "block_size": self.block_size,
+            "num_sessions": self.num_sessions,
+            "treatments": self.treatments,
+            "treatment_assignment_strategy": self.treatment_assignment_strategy,
+        }
+
+    def get_session_spec(self, session_id: int) -> dict[str, Any]:
+        """Return the specification of a session, from which the session is run without the random assignment of the
+        survey.
+
+        Args:
+            session_id (int): The ID of the session.
+
+        Returns:
+            dict[str, Any]: The session ID, treatment label and respondent demographics of the session.
+        """
+        return {
+            "session_id": session_id,
+            "treatment_label": self.treatment_assignment[session_id],
+            "respondent_demographic": self.respondent_assignment[session_id],
+        }
+
+    def apply_session_spec(self, spec: dict[str, Any]) -> int:
+        """Restore the assignment of a session from its specification.
+
+        Args:
+            spec (dict[str, Any]): The specification of the session, as returned by get_session_spec.
+
+        Returns:
+            int: The ID of the session.
+        """
+        session_id = spec["session_id"]
+        treatment_label = spec["treatment_label"]
+        # JSON turns the tuple labels of full factorial designs into lists
+        if isinstance(treatment_label, list):
+            treatment_label = tuple(treatment_label)
+
+        self.treatment_assignment[session_id] = treatment_label
+        self.respondent_assignment[session_id] = spec["respondent_demographic"]
+        if session_id not in self.session_id_list:
+            self.session_id_list.append(session_id)
+        return session_id
+
+
+def load_experiment_from_config(
+    config: dict[str, Any], **kwargs: Any
+) -> AIConversationalExperiment:
+    """Rebuilds an experiment of the type recorded in a configuration returned by to_config.
+
+    Args:
+        config (dict[str, Any]): The configuration of the experiment.
+        **kwargs (Any): Additional arguments of the experiment that are not in the configuration.
+
+    Returns:
+        AIConversationalExperiment: The rebuilt experiment.
+
+    Raises:
+        ValueError: If the type of the experiment is not supported.
+    """
+    experiment_classes = {
+        experiment_class.__name__: experiment_class
+        for experiment_class in [
+            AItoAIConversationalExperiment,
+            AItoAIInterviewExperiment,
+            AISurveyExperiment,
+        ]
+    }
+    experiment_type = config.get("experiment_type")
+    if experiment_type not in experiment_classes:
+        raise ValueError(
+            f"Unsupported experiment_type: {experiment_type}. Supported types are: {list(experiment_classes)}."
+        )
+
+    return experiment_classes[experiment_type].from_config(config, **kwargs)
+
+
+def resume_experiment(
+    experiment_id: str,
+    test_mode: bool = False,
+    on_llm_error: str = "abort",
+    restart_aborted: bool = True,
+    stream: bool = False,
+    stop_pattern: Optional[str] = END_OF_CONVERSATION,
+    **experiment_kwargs: Any,
+) -> dict[str, Any]:
+    """Resumes an experiment that was run with checkpoint set to True, e.g. after a crash. The experiment is rebuilt with its
+    saved assignment and treatments, finished sessions are reused and the other sessions are run. The output is identical
+    to that of an uninterrupted run if stream and stop_pattern are also the same.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        test_mode (bool, optional): Indicates whether the session messages are printed. Defaults to False.
+        on_llm_error (str, optional): "abort" to record a failed LLM call in the affected session and continue with the next session,
+            or "raise" to stop the experiment. Defaults to "abort".
+        restart_aborted (bool, optional): Indicates whether saved sessions that were aborted are resumed from their last
+            successful turn. Defaults to True.
+        stream (bool, optional): Indicates whether responses are streamed, which is not supported by survey experiments.
+            Defaults to False.
+        stop_pattern (Optional[str], optional): When streaming, the pattern after which a generation is cancelled.
+            Defaults to END_OF_CONVERSATION.
+        **experiment_kwargs (Any): Additional arguments of the experiment that are not in its configuration, such as the
+            context_policy or persona_compiler. Those the experiment was run with must be provided again.
+
+    Returns:
+        dict[str, Any]: A dictionary containing the experiment ID, session information and token usage.
+
+    Raises:
+        ValueError: If the experiment has no checkpoint, was run with a context_policy or persona_compiler that is not
+            provided, or is a survey experiment resumed with stream set to True.
+        LLMError: If a LLM call fails and on_llm_error is "raise".
+    """
+    checkpoint, saved_sessions = load_experiment_checkpoint(experiment_id)
+    missing_arguments = [
+        argument
+        for argument in checkpoint.get("unsaved_arguments", [])
+        if experiment_kwargs.get(argument) is None
+    ]
+    if missing_arguments:
+        raise ValueError(
+            f"Invalid arguments for resume_experiment: experiment {experiment_id} was run with {missing_arguments}, which are not saved in its checkpoint and should be provided again."
+        )
+
+    experiment = load_experiment_from_config(checkpoint["config"], **experiment_kwargs)
+    experiment.session_id_list = [
+        experiment.apply_session_spec(spec) for spec in checkpoint["sessions"]
+    ]
+
+    resume_kwargs = {}
+    if stream:
+        if not isinstance(experiment, AItoAIConversationalExperiment):
+            raise ValueError(
+                f"Invalid value for stream: {stream}. Responses of {type(experiment).__name__} cannot be streamed."
+            )
+        resume_kwargs = {"stream": stream, "stop_pattern": stop_pattern}
+
+    return experiment.resume(
+        saved_sessions,
+        test_mode=test_mode,
+        on_llm_error=on_llm_error,
+        restart_aborted=restart_aborted,
+        **resume_kwargs,
+    )
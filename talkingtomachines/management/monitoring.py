@@ -1,8 +1,39 @@
+from talkingtomachines.generative.metrics import Histogram, metrics_registry
+
+
 def monitor_experiment(experiment_id: str) -> dict:
-    """Monitor the specified experiment."""
+    """Monitor the specified experiment using the metrics recorded in this process.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+
+    Returns:
+        dict: The number of completed and aborted sessions, and summaries of the session and turn durations in seconds.
+    """
     try:
-        # Implement experiment monitoring functionality
-        pass
+        session_durations, turn_durations = Histogram(), Histogram()
+        with metrics_registry.lock:
+            for name, histogram in (
+                ("session_duration_seconds", session_durations),
+                ("turn_duration_seconds", turn_durations),
+            ):
+                for labels, series_histogram in metrics_registry.histograms.get(
+                    name, {}
+                ).items():
+                    if ("experiment_id", experiment_id) in labels:
+                        histogram.merge(series_histogram)
+
+        return {
+            "experiment_id": experiment_id,
+            "completed_sessions": metrics_registry.get_counter(
+                "sessions_total", experiment_id=experiment_id, status="completed"
+            ),
+            "aborted_sessions": metrics_registry.get_counter(
+                "sessions_total", experiment_id=experiment_id, status="aborted"
+            ),
+            "session_duration": session_durations.summarize(),
+            "turn_duration": turn_durations.summarize(),
+        }
     except Exception as e:
         # Log the exception
         print(f"Error during experiment monitoring: {e}")
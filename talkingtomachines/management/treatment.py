@@ -1,9 +1,12 @@
+from __future__ import annotations
 import random
-import pandas as pd
 from talkingtomachines.generative.synthetic_agent import DemographicInfo
-from typing import List, Any, Tuple
+from typing import TYPE_CHECKING, List, Any, Tuple
 from itertools import product
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def simple_random_assignment_session(
     treatment_labels: List[str], num_sessions: int
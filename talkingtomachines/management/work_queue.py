@@ -0,0 +1,442 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import contextlib
+from typing import Any, Iterator, Optional
+
+DEFAULT_LEASE_DURATION = 300
+DEFAULT_MAX_ATTEMPTS = 3
+TASK_STATUSES = ["pending", "leased", "done", "failed"]
+
+
+def generate_worker_id() -> str:
+    """Generates an ID for a worker that is unique across processes and machines.
+
+    Returns:
+        str: The host name, process ID and a random suffix, e.g. "host-1234-1a2b3c4d".
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class WorkQueue:
+    """A durable queue of experiment sessions backed by a SQLite file, so that several worker processes, on one machine
+    or on machines sharing a filesystem with working file locks, can run the sessions of one experiment.
+
+    The coordinator stores the configuration of the experiment and enqueues one task per session. Each worker claims a
+    task with a lease, runs the session and writes the result back. A worker renews its lease while it runs a session,
+    so that the lease of a worker that died expires and its task is claimed again by another worker. A task that was
+    claimed max_attempts times without a result is marked as failed.
+
+    Args:
+        path (str): The path to the SQLite file, which is created if it does not exist.
+        lease_duration (float, optional): The number of seconds for which a claimed task is reserved for its worker.
+            Defaults to DEFAULT_LEASE_DURATION.
+        max_attempts (int, optional): The maximum number of times a task is claimed. Defaults to DEFAULT_MAX_ATTEMPTS.
+
+    Raises:
+        ValueError: If the provided lease_duration is not positive or max_attempts is less than 1.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_duration: float = DEFAULT_LEASE_DURATION,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        if lease_duration <= 0:
+            raise ValueError(
+                f"Invalid value for lease_duration: {lease_duration}. lease_duration should be a positive number of seconds."
+            )
+        if max_attempts < 1:
+            raise ValueError(
+                f"Invalid value for max_attempts: {max_attempts}. max_attempts should be an integer that is equal to or greater than 1."
+            )
+
+        self.path = path
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        self.create_tables()
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the queue for the duration of a transaction. Connections are not shared, so that the
+        queue can be used from several threads, e.g. by the thread renewing a lease.
+
+        Yields:
+            sqlite3.Connection: The connection, within a transaction that holds the write lock.
+        """
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def create_tables(self) -> None:
+        """Create the tables of the queue if they do not exist.
+
+        Returns:
+            None
+        """
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS experiments (
+                    experiment_id TEXT PRIMARY KEY,
+                    config TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tasks (
+                    experiment_id TEXT NOT NULL,
+                    session_id INTEGER NOT NULL,
+                    spec TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    PRIMARY KEY (experiment_id, session_id)
+                );
+                CREATE INDEX IF NOT EXISTS tasks_by_status
+                    ON tasks (experiment_id, status, lease_expires_at);
+                """)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def save_config(self, experiment_id: str, config: dict[str, Any]) -> None:
+        """Store the configuration of an experiment, replacing any previous configuration.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            config (dict[str, Any]): The configuration of the experiment, as returned by its to_config method.
+
+        Returns:
+            None
+        """
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO experiments (experiment_id, config) VALUES (?, ?)",
+                (experiment_id, json.dumps(config, default=str)),
+            )
+
+    def load_config(self, experiment_id: str) -> dict[str, Any]:
+        """Return the configuration of an experiment.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+
+        Returns:
+            dict[str, Any]: The configuration of the experiment.
+
+        Raises:
+            ValueError: If the experiment is not in the queue.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT config FROM experiments WHERE experiment_id = ?",
+                (experiment_id,),
+            ).fetchone()
+
+        if row is None:
+            raise ValueError(
+                f"Invalid value for experiment_id: {experiment_id}. The experiment is not in the queue at {self.path}."
+            )
+
+        return json.loads(row[0])
+
+    def enqueue(self, experiment_id: str, specs: dict[int, dict[str, Any]]) -> int:
+        """Enqueue the sessions of an experiment. Sessions that are already in the queue are left unchanged, so that
+        enqueuing again after a restart does not run finished sessions again.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            specs (dict[int, dict[str, Any]]): The specification of each session, keyed by session ID.
+
+        Returns:
+            int: The number of sessions added to the queue.
+        """
+        with self.connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO tasks (experiment_id, session_id, spec) VALUES (?, ?, ?)",
+                [
+                    (experiment_id, session_id, json.dumps(spec, default=str))
+                    for session_id, spec in specs.items()
+                ],
+            )
+            return cursor.rowcount
+
+    def claim(
+        self, experiment_id: str, worker_id: str
+    ) -> Optional[tuple[int, dict[str, Any]]]:
+        """Claim a pending task, or a task whose lease expired, and lease it to a worker.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            worker_id (str): The ID of the worker.
+
+        Returns:
+            Optional[tuple[int, dict[str, Any]]]: The session ID and specification of the claimed task, or None if no
+                task is available.
+        """
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', worker_id = NULL, lease_expires_at = NULL "
+                "WHERE experiment_id = ? AND status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (experiment_id, now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT session_id, spec FROM tasks WHERE experiment_id = ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)) "
+                "ORDER BY attempts, session_id LIMIT 1",
+                (experiment_id, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE tasks SET status = 'leased', worker_id = ?, lease_expires_at = ?, attempts = attempts + 1 "
+                "WHERE experiment_id = ? AND session_id = ?",
+                (worker_id, now + self.lease_duration, experiment_id, row[0]),
+            )
+
+        return row[0], json.loads(row[1])
+
+    def renew(self, experiment_id: str, session_id: int, worker_id: str) -> bool:
+        """Extend the lease of a task held by a worker.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            session_id (int): The ID of the session.
+            worker_id (str): The ID of the worker.
+
+        Returns:
+            bool: True if the lease was extended, False if the worker no longer holds it.
+        """
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires_at = ? "
+                "WHERE experiment_id = ? AND session_id = ? AND status = 'leased' AND worker_id = ?",
+                (
+                    time.time() + self.lease_duration,
+                    experiment_id,
+                    session_id,
+                    worker_id,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def complete(
+        self,
+        experiment_id: str,
+        session_id: int,
+        worker_id: str,
+        result: dict[str, Any],
+    ) -> bool:
+        """Store the result of a task. If the lease of the worker expired, the result is still stored unless another
+        worker already stored one, as both results are valid runs of the session.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            session_id (int): The ID of the session.
+            worker_id (str): The ID of the worker.
+            result (dict[str, Any]): The session information at the end of the session.
+
+        Returns:
+            bool: True if the result was stored, False if the task already had a result.
+        """
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = 'done', worker_id = ?, lease_expires_at = NULL, result = ? "
+                "WHERE experiment_id = ? AND session_id = ? AND status != 'done'",
+                (worker_id, json.dumps(result, default=str), experiment_id, session_id),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, experiment_id: str, session_id: int, worker_id: str) -> None:
+        """Return a task held by a worker to the queue, e.g. after the worker failed to run it.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+            session_id (int): The ID of the session.
+            worker_id (str): The ID of the worker.
+
+        Returns:
+            None
+        """
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker_id = NULL, lease_expires_at = NULL "
+                "WHERE experiment_id = ? AND session_id = ? AND status = 'leased' AND worker_id = ?",
+                (self.max_attempts, experiment_id, session_id, worker_id),
+            )
+
+    def get_specs(self, experiment_id: str) -> dict[int, dict[str, Any]]:
+        """Return the specification of every session of an experiment.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+
+        Returns:
+            dict[int, dict[str, Any]]: The specification of each session, keyed by session ID.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT session_id, spec FROM tasks WHERE experiment_id = ? ORDER BY session_id",
+                (experiment_id,),
+            ).fetchall()
+
+        return {session_id: json.loads(spec) for session_id, spec in rows}
+
+    def get_results(self, experiment_id: str) -> dict[int, dict[str, Any]]:
+        """Return the results stored for the sessions of an experiment.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+
+        Returns:
+            dict[int, dict[str, Any]]: The session information of each finished session, keyed by session ID.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT session_id, result FROM tasks WHERE experiment_id = ? AND status = 'done' ORDER BY session_id",
+                (experiment_id,),
+            ).fetchall()
+
+        return {session_id: json.loads(result) for session_id, result in rows}
+
+    def get_progress(self, experiment_id: str) -> dict[str, int]:
+        """Return the number of tasks of an experiment in each status.
+
+        Args:
+            experiment_id (str): The ID of the experiment.
+
+        Returns:
+            dict[str, int]: The number of pending, leased, done and failed tasks.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE experiment_id = ? GROUP BY status",
+                (experiment_id,),
+            ).fetchall()
+
+        progress = {status: 0 for status in TASK_STATUSES}
+        progress.update(dict(rows))
+        return progress
+
+
+class LeaseKeeper:
+    """Renews the lease of a task in a background thread while a worker runs its session.
+
+    Args:
+        work_queue (WorkQueue): The queue holding the task.
+        experiment_id (str): The ID of the experiment.
+        session_id (int): The ID of the session.
+        worker_id (str): The ID of the worker.
+    """
+
+    def __init__(
+        self, work_queue: WorkQueue, experiment_id: str, session_id: int, worker_id: str
+    ):
+        self.work_queue = work_queue
+        self.experiment_id = experiment_id
+        self.session_id = session_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        """Renew the lease every third of the lease duration until stopped or the lease is lost.
+
+        Returns:
+            None
+        """
+        while not self.stopped.wait(self.work_queue.lease_duration / 3):
+            try:
+                if not self.work_queue.renew(
+                    self.experiment_id, self.session_id, self.worker_id
+                ):
+                    return
+            except sqlite3.Error as e:
+                # Log the exception and retry at the next renewal
+                print(f"Error during lease renewal of session {self.session_id}: {e}")
+
+    def __enter__(self) -> "LeaseKeeper":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_worker(
+    work_queue: WorkQueue,
+    experiment_id: str,
+    worker_id: Optional[str] = None,
+    on_llm_error: str = "abort",
+    max_sessions: Optional[int] = None,
+    **experiment_kwargs: Any,
+) -> int:
+    """Run sessions of an experiment from a work queue until no task is left to be claimed.
+
+    The experiment is rebuilt from the configuration stored by the coordinator. Arguments that cannot be stored in the
+    configuration, such as the context_policy or persona_compiler, are passed as experiment_kwargs.
+
+    Args:
+        work_queue (WorkQueue): The queue of the experiment.
+        experiment_id (str): The ID of the experiment.
+        worker_id (Optional[str], optional): The ID of the worker. Defaults to None, which generates a unique ID.
+        on_llm_error (str, optional): "abort" to store a session aborted by a failed LLM call as its result, or "raise"
+            to return its task to the queue and raise the error. Defaults to "abort".
+        max_sessions (Optional[int], optional): The maximum number of sessions run by the worker. Defaults to None,
+            which runs sessions until the queue is empty.
+        **experiment_kwargs (Any): Additional arguments used to rebuild the experiment.
+
+    Returns:
+        int: The number of sessions whose result was stored by the worker.
+
+    Raises:
+        ValueError: If the experiment is not in the queue or its type is not supported.
+        LLMError: If a LLM call fails and on_llm_error is "raise".
+    """
+    # Imported here as the experiment module depends on this one
+    from talkingtomachines.management.experiment import load_experiment_from_config
+
+    worker_id = worker_id or generate_worker_id()
+    experiment = load_experiment_from_config(
+        work_queue.load_config(experiment_id), **experiment_kwargs
+    )
+    experiment.check_on_llm_error(on_llm_error)
+
+    num_sessions = 0
+    while max_sessions is None or num_sessions < max_sessions:
+        task = work_queue.claim(experiment_id, worker_id)
+        if task is None:
+            break
+
+        session_id, spec = task
+        try:
+            with LeaseKeeper(work_queue, experiment_id, session_id, worker_id):
+                session_info = experiment.run_session_spec(
+                    spec, on_llm_error=on_llm_error
+                )
+        except BaseException:
+            work_queue.release(experiment_id, session_id, worker_id)
+            raise
+
+        if work_queue.complete(experiment_id, session_id, worker_id, session_info):
+            num_sessions += 1
+
+    return num_sessions
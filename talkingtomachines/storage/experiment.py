@@ -1,7 +1,9 @@
 import os
-from typing import Any
+from typing import Any, Iterator, Optional
 import json
 
+EXPERIMENT_DIRECTORY = "storage/experiment"
+
 
 def save_experiment(experiment: dict[int, Any]) -> None:
     """Save an experiment to a local JSON file in the storage/experiment folder at the root directory.
@@ -12,6 +14,206 @@ def save_experiment(experiment: dict[int, Any]) -> None:
     Returns:
         None
     """
-    os.makedirs("storage/experiment", exist_ok=True)
-    with open(f"storage/experiment/{experiment['experiment_id']}.json", "w") as file:
+    os.makedirs(EXPERIMENT_DIRECTORY, exist_ok=True)
+    with open(
+        f"{EXPERIMENT_DIRECTORY}/{experiment['experiment_id']}.json", "w"
+    ) as file:
         json.dump(experiment, file)
+
+
+def get_checkpoint_directory(experiment_id: str) -> str:
+    """Return the folder in which the checkpoint of an experiment is saved.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+
+    Returns:
+        str: The path to the checkpoint folder of the experiment.
+    """
+    return f"{EXPERIMENT_DIRECTORY}/{experiment_id}"
+
+
+def write_json_atomically(path: str, data: Any) -> None:
+    """Write data to a JSON file through a temporary file that replaces it, so that a crash never leaves a partially
+    written file behind.
+
+    Args:
+        path (str): The path to the JSON file.
+        data (Any): The data to be written.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(data, file, default=str)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def save_experiment_checkpoint(experiment_id: str, checkpoint: dict[str, Any]) -> None:
+    """Save the configuration and session assignment of an experiment, from which it can be resumed.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        checkpoint (dict[str, Any]): The configuration of the experiment under "config" and the specification of each
+            session under "sessions".
+
+    Returns:
+        None
+    """
+    write_json_atomically(
+        f"{get_checkpoint_directory(experiment_id)}/experiment.json", checkpoint
+    )
+
+
+def save_session_checkpoint(experiment_id: str, session_info: dict[str, Any]) -> None:
+    """Save a finished session of an experiment, replacing any earlier checkpoint of the session.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        session_info (dict[str, Any]): The session information, with agents converted to dictionaries.
+
+    Returns:
+        None
+    """
+    write_json_atomically(
+        f"{get_checkpoint_directory(experiment_id)}/sessions/{session_info['session_id']}.json",
+        session_info,
+    )
+
+
+def load_experiment_checkpoint(
+    experiment_id: str,
+) -> tuple[dict[str, Any], dict[int, dict[str, Any]]]:
+    """Load the checkpoint of an experiment.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+
+    Returns:
+        tuple[dict[str, Any], dict[int, dict[str, Any]]]: The configuration and session assignment of the experiment, and
+            the session information of each finished session keyed by session ID.
+
+    Raises:
+        ValueError: If the experiment has no checkpoint.
+    """
+    checkpoint_directory = get_checkpoint_directory(experiment_id)
+    checkpoint_path = f"{checkpoint_directory}/experiment.json"
+    if not os.path.exists(checkpoint_path):
+        raise ValueError(
+            f"Invalid value for experiment_id: {experiment_id}. No checkpoint was found at {checkpoint_path}."
+        )
+
+    with open(checkpoint_path) as file:
+        checkpoint = json.load(file)
+
+    sessions = {}
+    sessions_directory = f"{checkpoint_directory}/sessions"
+    if os.path.isdir(sessions_directory):
+        for file_name in os.listdir(sessions_directory):
+            if not file_name.endswith(".json"):
+                continue
+            with open(f"{sessions_directory}/{file_name}") as file:
+                session_info = json.load(file)
+            sessions[session_info["session_id"]] = session_info
+
+    return checkpoint, sessions
+
+
+def get_session_stream_path(experiment_id: str) -> str:
+    """Return the path to the JSON Lines file to which the sessions of a streamed experiment are written.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+
+    Returns:
+        str: The path to the JSON Lines file of the experiment.
+    """
+    return f"{EXPERIMENT_DIRECTORY}/{experiment_id}.jsonl"
+
+
+class JSONLSessionSink:
+    """Writes the sessions of an experiment to a JSON Lines file as they finish, one session per line, so that finished
+    sessions do not have to be kept in memory. The file is opened in append mode, so that a sink can be reopened to add
+    sessions to an existing file.
+
+    Args:
+        path (str): The path to the JSON Lines file.
+        flush_every (int, optional): The number of sessions after which the file is flushed to disk. Defaults to 1.
+
+    Attributes:
+        num_sessions (int): The number of sessions written by the sink.
+
+    Raises:
+        ValueError: If the provided flush_every is less than 1.
+    """
+
+    def __init__(self, path: str, flush_every: int = 1):
+        if flush_every < 1:
+            raise ValueError(
+                f"Invalid value for flush_every: {flush_every}. flush_every should be an integer that is equal to or greater than 1."
+            )
+
+        self.path = path
+        self.flush_every = flush_every
+        self.num_sessions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a")
+
+    def write(self, session_info: dict[str, Any]) -> None:
+        """Write a finished session as one line of the file.
+
+        Args:
+            session_info (dict[str, Any]): The session information, with agents converted to dictionaries.
+
+        Returns:
+            None
+        """
+        self.file.write(json.dumps(session_info, default=str) + "\n")
+        self.num_sessions += 1
+        if self.num_sessions % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self) -> None:
+        """Flush and close the file.
+
+        Returns:
+            None
+        """
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self) -> "JSONLSessionSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def read_sessions(
+    path: str, session_ids: Optional[set[int]] = None
+) -> Iterator[dict[str, Any]]:
+    """Read the sessions of a JSON Lines file one at a time, without loading the whole file into memory. A truncated last
+    line, e.g. left by a crash during a write, is skipped.
+
+    Args:
+        path (str): The path to the JSON Lines file.
+        session_ids (Optional[set[int]], optional): The IDs of the sessions to be read. Defaults to None, which reads
+            every session.
+
+    Yields:
+        dict[str, Any]: The session information of each session, in the order in which the sessions were written.
+    """
+    with open(path) as file:
+        for line in file:
+            try:
+                session_info = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if session_ids is None or session_info["session_id"] in session_ids:
+                yield session_info
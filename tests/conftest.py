@@ -0,0 +1,15 @@
+import os
+import pytest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def run_in_tmp_path(tmp_path, monkeypatch):
+    # Experiments save their checkpoints and results relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    # Subprocesses still import the package from the repository
+    monkeypatch.setenv(
+        "PYTHONPATH",
+        os.pathsep.join(filter(None, [ROOT_DIRECTORY, os.environ.get("PYTHONPATH")])),
+    )
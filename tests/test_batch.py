@@ -0,0 +1,132 @@
+import json
+from openai import OpenAI
+from talkingtomachines.generative.batch import (
+    BatchClient,
+    build_batch_file,
+    parse_batch_output,
+)
+from talkingtomachines.generative.local_server import LocalLLMServer
+from talkingtomachines.generative.resilience import LLMClientError, LLMServerError
+
+
+def echo_responder(model_info, message_history):
+    return f"{model_info}: {message_history[-1]['content']}"
+
+
+def test_build_batch_file():
+    batch_file = build_batch_file(
+        "gpt-4o",
+        {
+            "request-1": [{"role": "user", "content": "Hello!"}],
+            "request-2": [{"role": "user", "content": "Goodbye!"}],
+        },
+    )
+    lines = [json.loads(line) for line in batch_file.decode("utf-8").splitlines()]
+    assert [line["custom_id"] for line in lines] == ["request-1", "request-2"]
+    assert lines[0]["url"] == "/v1/chat/completions"
+    assert lines[0]["body"] == {
+        "model": "gpt-4o",
+        "messages": [{"role": "user", "content": "Hello!"}],
+    }
+
+
+def test_parse_batch_output():
+    output = "\n".join(
+        [
+            json.dumps(
+                {
+                    "custom_id": "request-1",
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"content": "Hi!"}}],
+                            "usage": {
+                                "prompt_tokens": 9,
+                                "completion_tokens": 3,
+                                "total_tokens": 12,
+                            },
+                        },
+                    },
+                    "error": None,
+                }
+            ),
+            json.dumps(
+                {
+                    "custom_id": "request-2",
+                    "response": {"status_code": 400, "body": {}},
+                    "error": {"message": "Invalid request"},
+                }
+            ),
+            json.dumps(
+                {
+                    "custom_id": "request-3",
+                    "response": {"status_code": 500, "body": {}},
+                    "error": {"message": "Server error"},
+                }
+            ),
+        ]
+    )
+    usage = {}
+    results = parse_batch_output(output, "gpt-4o", usage)
+    assert results["request-1"] == "Hi!"
+    assert usage == {
+        "request-1": {
+            "prompt_tokens": 9,
+            "completion_tokens": 3,
+            "total_tokens": 12,
+            "cached_tokens": 0,
+        }
+    }
+    assert isinstance(results["request-2"], LLMClientError)
+    assert isinstance(results["request-3"], LLMServerError)
+
+
+def test_batch_client_against_local_server():
+    with LocalLLMServer(echo_responder) as server:
+        client = OpenAI(base_url=server.base_url, api_key="local", max_retries=0)
+        batch_client = BatchClient(client=client, poll_interval=0)
+        usage = {}
+        results = batch_client.run(
+            "gpt-4o",
+            {
+                "request-1": [{"role": "user", "content": "Hello!"}],
+                "request-2": [{"role": "user", "content": "Goodbye!"}],
+            },
+            usage=usage,
+        )
+        assert results == {
+            "request-1": "gpt-4o: Hello!",
+            "request-2": "gpt-4o: Goodbye!",
+        }
+        assert len(server.batches) == 1
+        assert usage["request-1"]["total_tokens"] > 0
+
+
+def test_batch_client_resubmits_failed_requests():
+    attempts = {}
+
+    def flaky_responder(model_info, message_history):
+        content = message_history[-1]["content"]
+        attempts[content] = attempts.get(content, 0) + 1
+        if content == "Flaky" and attempts[content] == 1:
+            raise RuntimeError("Temporary failure")
+        if content == "Broken":
+            raise RuntimeError("Permanent failure")
+        return content.upper()
+
+    with LocalLLMServer(flaky_responder) as server:
+        client = OpenAI(base_url=server.base_url, api_key="local", max_retries=0)
+        batch_client = BatchClient(client=client, poll_interval=0, max_attempts=2)
+        results = batch_client.run(
+            "gpt-4o",
+            {
+                "request-1": [{"role": "user", "content": "Flaky"}],
+                "request-2": [{"role": "user", "content": "Broken"}],
+                "request-3": [{"role": "user", "content": "Fine"}],
+            },
+        )
+        assert results["request-1"] == "FLAKY"
+        assert isinstance(results["request-2"], LLMServerError)
+        assert results["request-3"] == "FINE"
+        assert attempts == {"Flaky": 2, "Broken": 2, "Fine": 1}
+        assert len(server.batches) == 2
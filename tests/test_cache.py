@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch
+from talkingtomachines.generative.cache import ResponseCache, make_cache_key
+
+
+def test_make_cache_key_is_canonical():
+    message_history = [{"role": "user", "content": "Hello!"}]
+    key = make_cache_key("gpt-4o", message_history, temperature=0)
+    assert key == make_cache_key(
+        "gpt-4o", [{"content": "Hello!", "role": "user"}], temperature=0
+    )
+    assert key != make_cache_key("gpt-4o-mini", message_history, temperature=0)
+    assert key != make_cache_key("gpt-4o", message_history, temperature=1)
+    assert key != make_cache_key(
+        "gpt-4o", message_history + [{"role": "assistant", "content": "Hi!"}]
+    )
+
+
+def test_response_cache_memory_lru_eviction():
+    cache = ResponseCache(path=None, max_memory_entries=2)
+    cache.set("a", "response a")
+    cache.set("b", "response b")
+    assert cache.get("a") == "response a"
+    cache.set("c", "response c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "response a"
+    assert cache.get("c") == "response c"
+    stats = cache.get_stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_response_cache_disk_persistence(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path)
+    cache.set("key", "response")
+    cache.close()
+
+    reopened_cache = ResponseCache(path=path)
+    assert reopened_cache.get("key") == "response"
+    assert reopened_cache.get_stats()["disk_hits"] == 1
+    assert reopened_cache.get("key") == "response"
+    assert reopened_cache.get_stats()["memory_hits"] == 1
+
+
+def test_response_cache_disk_size_eviction(tmp_path):
+    cache = ResponseCache(
+        path=str(tmp_path / "cache.db"), max_memory_entries=1, max_disk_entries=2
+    )
+    with patch("talkingtomachines.generative.cache.time.time", side_effect=[1, 2, 3]):
+        cache.set("a", "response a")
+        cache.set("b", "response b")
+        cache.set("c", "response c")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "response b"
+    assert cache.get("c") == "response c"
+
+
+def test_response_cache_ttl_expiry(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), ttl=10)
+    with patch("talkingtomachines.generative.cache.time.time", return_value=100):
+        cache.set("key", "response")
+    with patch("talkingtomachines.generative.cache.time.time", return_value=105):
+        assert cache.get("key") == "response"
+    with patch("talkingtomachines.generative.cache.time.time", return_value=111):
+        assert cache.get("key") is None
+
+
+def test_response_cache_namespaces(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), namespace="experiment_a")
+    cache.set("key", "response a")
+    cache.namespace = "experiment_b"
+    assert cache.get("key") is None
+    cache.set("key", "response b")
+
+    cache.clear("experiment_a")
+    cache.namespace = "experiment_a"
+    assert cache.get("key") is None
+    cache.namespace = "experiment_b"
+    assert cache.get("key") == "response b"
+
+
+def test_response_cache_invalid_arguments():
+    with pytest.raises(ValueError):
+        ResponseCache(path=None, max_memory_entries=0)
+    with pytest.raises(ValueError):
+        ResponseCache(path=None, max_disk_entries=0)
+    with pytest.raises(ValueError):
+        ResponseCache(path=None, ttl=0)
@@ -0,0 +1,199 @@
+import asyncio
+import pandas as pd
+import pytest
+from talkingtomachines.generative.concurrency import AIMDController
+from talkingtomachines.generative.llm import (
+    LLMRateLimitError,
+    disable_adaptive_concurrency,
+    enable_adaptive_concurrency,
+    get_concurrency_controller,
+    report_call_outcome,
+)
+from talkingtomachines.management.experiment import AItoAIConversationalExperiment
+
+
+def test_aimd_controller_invalid_arguments():
+    with pytest.raises(ValueError):
+        AIMDController(initial_limit=0)
+    with pytest.raises(ValueError):
+        AIMDController(initial_limit=8, max_limit=4)
+    with pytest.raises(ValueError):
+        AIMDController(decrease_factor=1)
+    with pytest.raises(ValueError):
+        AIMDController(latency_tolerance=1)
+
+
+def test_aimd_controller_additive_increase():
+    controller = AIMDController(initial_limit=4, max_limit=6)
+    for _ in range(4):
+        controller.record_success(0.1)
+    assert controller.get_limit() == 4
+    controller.record_success(0.1)
+    assert controller.get_limit() == 5
+
+    for _ in range(100):
+        controller.record_success(0.1)
+    assert controller.get_limit() == 6
+    assert controller.smoothed_latency == pytest.approx(0.1)
+
+
+def test_aimd_controller_multiplicative_decrease():
+    controller = AIMDController(initial_limit=16, min_limit=3)
+    controller.record_rate_limit()
+    assert controller.get_limit() == 8
+    controller.record_rate_limit()
+    assert controller.get_limit() == 4
+
+    controller.record_success(10)
+    controller.last_decrease_time = None
+    controller.record_rate_limit()
+    # Further decreases within one smoothed latency of the last one are ignored
+    controller.record_rate_limit()
+    assert controller.get_limit() == 3
+    assert controller.get_metrics()["decreases"] == 3
+    assert controller.get_metrics()["rate_limits"] == 4
+
+
+def test_aimd_controller_latency_spike():
+    controller = AIMDController(initial_limit=10, latency_tolerance=2)
+    controller.record_success(1.0)
+    controller.record_success(1.5)
+    assert controller.get_limit() == 10
+    controller.record_success(3.0)
+    assert controller.get_limit() == 5
+    assert controller.get_metrics()["latency_spikes"] == 1
+
+
+def test_aimd_controller_slots():
+    controller = AIMDController(initial_limit=2)
+    active, max_active = 0, 0
+
+    async def workload():
+        nonlocal active, max_active
+        async with controller.slot():
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*[workload() for _ in range(6)])
+
+    asyncio.run(run())
+    assert max_active == 2
+    assert controller.in_flight == 0
+
+
+def test_aimd_controller_admits_waiters_when_limit_rises():
+    controller = AIMDController(initial_limit=1, increase=1)
+
+    async def run():
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        controller.record_success(0.1)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert controller.in_flight == 2
+
+        cancelled_waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        cancelled_waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled_waiter
+        assert not controller.waiters
+
+    asyncio.run(run())
+
+
+def test_report_call_outcome():
+    controller = AIMDController(initial_limit=8)
+    report_call_outcome(None, latency=0.1)
+    report_call_outcome(controller, exception=LLMRateLimitError("Too many requests"))
+    assert controller.get_limit() == 4
+    report_call_outcome(controller, exception=ValueError("Bad request"))
+    assert controller.get_metrics()["rate_limits"] == 1
+    report_call_outcome(controller, latency=0.1)
+    assert controller.get_metrics()["successes"] == 1
+
+
+def test_run_experiment_async_adaptive_concurrency(mocker):
+    experiment = AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": list(range(12))}),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_sessions=6,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1"},
+    )
+    mocker.patch.object(experiment, "save_experiment")
+
+    result = asyncio.run(
+        experiment.run_experiment_async(
+            test_mode=False,
+            max_concurrency=3,
+            adaptive_concurrency=True,
+            checkpoint=False,
+        )
+    )
+    assert len(result["sessions"]) == 6
+    assert result["concurrency"]["successes"] == 30
+    assert result["concurrency"]["limit"] == 3
+    assert result["concurrency"]["in_flight"] == 0
+    assert get_concurrency_controller() is None
+
+    controller = enable_adaptive_concurrency(initial_limit=1, max_limit=1)
+    try:
+        result = asyncio.run(
+            experiment.run_experiment_async(
+                test_mode=True, adaptive_concurrency=True, checkpoint=False
+            )
+        )
+        assert result["concurrency"]["successes"] == 5
+        assert get_concurrency_controller() is controller
+    finally:
+        disable_adaptive_concurrency()
+
+
+def test_run_experiment_async_caps_shared_controller(mocker):
+    experiment = AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": list(range(12))}),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_sessions=6,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1"},
+    )
+    mocker.patch.object(experiment, "save_experiment")
+    in_flight, max_in_flight = [0], [0]
+    run_session_async = experiment.run_session_async
+
+    async def tracked_run_session_async(*args, **kwargs):
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.01)
+            return await run_session_async(*args, **kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    mocker.patch.object(
+        experiment, "run_session_async", side_effect=tracked_run_session_async
+    )
+    enable_adaptive_concurrency(initial_limit=8, max_limit=8)
+    try:
+        result = asyncio.run(
+            experiment.run_experiment_async(
+                test_mode=False,
+                max_concurrency=2,
+                adaptive_concurrency=True,
+                checkpoint=False,
+            )
+        )
+    finally:
+        disable_adaptive_concurrency()
+    assert len(result["sessions"]) == 6
+    assert max_in_flight[0] == 2
@@ -0,0 +1,136 @@
+import pytest
+import asyncio
+from unittest.mock import patch
+from talkingtomachines.generative.context import (
+    ContextPolicy,
+    PinnedWindowPolicy,
+    RollingSummaryPolicy,
+    SlidingWindowPolicy,
+    get_recent_start_index,
+)
+from talkingtomachines.generative.synthetic_agent import ConversationalSyntheticAgent
+from talkingtomachines.generative.tokens import estimate_message_tokens
+from talkingtomachines.generative.usage import create_usage
+
+
+def make_history(num_messages, content_length=40):
+    message_history = [{"role": "system", "content": "s" * 40}]
+    for i in range(num_messages):
+        role = "assistant" if i % 2 == 0 else "user"
+        message_history.append({"role": role, "content": f"{i}".ljust(content_length)})
+    return message_history
+
+
+def test_get_recent_start_index():
+    messages = make_history(4)[1:]
+    # Each message consumes 4 + 10 tokens
+    assert get_recent_start_index(messages, 28) == 2
+    assert get_recent_start_index(messages, 100) == 0
+    assert get_recent_start_index(messages, 1) == 3
+    assert get_recent_start_index([], 10) == 0
+
+
+def test_context_policy():
+    message_history = make_history(6)
+    assert ContextPolicy().apply(message_history) is message_history
+
+
+def test_sliding_window_policy():
+    message_history = make_history(10)
+    context = SlidingWindowPolicy(max_tokens=60).apply(message_history)
+    assert context == [message_history[0]] + message_history[-3:]
+    assert estimate_message_tokens(context) <= 60
+
+    with pytest.raises(ValueError):
+        SlidingWindowPolicy(max_tokens=0)
+
+
+def test_pinned_window_policy():
+    message_history = make_history(10)
+    context = PinnedWindowPolicy(max_tokens=60, num_pinned=1).apply(message_history)
+    assert context == message_history[:2] + message_history[-2:]
+    assert estimate_message_tokens(context) <= 60
+
+    with pytest.raises(ValueError):
+        PinnedWindowPolicy(max_tokens=60, num_pinned=-1)
+
+
+def test_rolling_summary_policy():
+    policy = RollingSummaryPolicy(
+        max_tokens=120, summary_model_info="gpt-4o-mini", max_summary_tokens=20
+    )
+    message_history = make_history(4)
+    with patch(
+        "talkingtomachines.generative.context.query_llm", return_value="Summary."
+    ) as mock_query_llm:
+        assert policy.apply(message_history) == message_history
+        mock_query_llm.assert_not_called()
+
+        message_history = make_history(8)
+        context = policy.apply(message_history)
+        mock_query_llm.assert_called_once()
+        assert mock_query_llm.call_args.args[0] == "gpt-4o-mini"
+        summarized_messages = mock_query_llm.call_args.args[1][1]["content"]
+        assert summarized_messages.startswith("assistant: 0")
+        assert context[1] == {
+            "role": "system",
+            "content": "Summary of the earlier conversation: Summary.",
+        }
+        assert context[2:] == message_history[1 + policy.num_summarized :]
+        assert estimate_message_tokens(context) <= 120
+
+        # The summary is only refreshed once the recent window overflows again
+        policy.apply(make_history(9))
+        assert mock_query_llm.call_count == 1
+
+        # Summary calls are recorded under the summary model, so they are priced at its rate
+        usage = create_usage()
+        RollingSummaryPolicy(
+            max_tokens=120, summary_model_info="gpt-4o-mini", max_summary_tokens=20
+        ).apply(make_history(8), usage=usage)
+        assert mock_query_llm.call_args.kwargs["usage"] is (
+            usage["by_model"]["gpt-4o-mini"]
+        )
+        assert usage["calls"] == 0
+
+    with patch(
+        "talkingtomachines.generative.context.query_llm_async",
+        return_value="Longer summary.",
+    ) as mock_query_llm_async:
+        num_summarized = policy.num_summarized
+        asyncio.run(policy.apply_async(make_history(16)))
+        mock_query_llm_async.assert_called_once()
+        assert "Earlier summary: Summary." in (
+            mock_query_llm_async.call_args.args[1][1]["content"]
+        )
+        assert policy.num_summarized > num_summarized
+        assert policy.summary == "Longer summary."
+
+    with pytest.raises(ValueError):
+        RollingSummaryPolicy(max_tokens=100, max_summary_tokens=100)
+
+
+def test_agent_context_policy():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="gpt-4o",
+        treatment="treatment",
+        context_policy=PinnedWindowPolicy(max_tokens=1, num_pinned=0),
+    )
+    with patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        return_value="Response",
+    ) as mock_query_llm:
+        agent.respond("First question")
+        agent.respond("Second question")
+        sent_messages = mock_query_llm.call_args.kwargs["message_history"]
+        assert sent_messages == [
+            agent.get_message_history()[0],
+            {"role": "assistant", "content": "Second question"},
+        ]
+        assert len(agent.get_message_history()) == 5
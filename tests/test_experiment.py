@@ -1,11 +1,42 @@
+import os
+import json
+import shutil
 import pytest
+import asyncio
 import pandas as pd
+from unittest.mock import AsyncMock
 from talkingtomachines.management.experiment import (
     Experiment,
     AIConversationalExperiment,
     AItoAIConversationalExperiment,
     AItoAIInterviewExperiment,
+    AISurveyExperiment,
+    resume_experiment,
 )
+from talkingtomachines.generative.llm import (
+    LLMServerError,
+    disable_adaptive_concurrency,
+    enable_adaptive_concurrency,
+    get_concurrency_controller,
+    query_llm,
+)
+from talkingtomachines.storage.experiment import (
+    EXPERIMENT_DIRECTORY,
+    JSONLSessionSink,
+    get_checkpoint_directory,
+    get_session_stream_path,
+    load_experiment_checkpoint,
+    read_sessions,
+)
+from talkingtomachines.generative.context import SlidingWindowPolicy
+from talkingtomachines.generative.persona import PersonaCompiler
+from talkingtomachines.generative.prompt import (
+    generate_demographic_prompt,
+    generate_demographic_prompts,
+)
+from talkingtomachines.generative.batch import BatchClient
+from talkingtomachines.generative.local_server import LocalLLMServer
+from openai import OpenAI
 
 
 @pytest.fixture
@@ -344,6 +375,140 @@ def test_ai_to_ai_conversational_experiment_initialize_agents():
     assert len(agents) == 2
 
 
+def test_ai_to_ai_conversational_experiment_get_demographic_prompt(mocker):
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4],
+            "Age": [25, 30, 35, 40],
+        }
+    )
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_agents_per_session=2,
+        num_sessions=2,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+    )
+    mock_generate_demographic_prompts = mocker.patch(
+        "talkingtomachines.management.experiment.generate_demographic_prompts",
+        wraps=generate_demographic_prompts,
+    )
+    session_info = experiment.initialize_session(experiment.get_session_id_list()[0])
+    experiment.initialize_session(experiment.get_session_id_list()[1])
+
+    # The prompts of every row are rendered once and looked up by ID
+    mock_generate_demographic_prompts.assert_called_once()
+    assert experiment.demographic_prompts == {
+        1: "1) Interviewer: ID Me: 1 2) Interviewer: Age Me: 25 ",
+        2: "1) Interviewer: ID Me: 2 2) Interviewer: Age Me: 30 ",
+        3: "1) Interviewer: ID Me: 3 2) Interviewer: Age Me: 35 ",
+        4: "1) Interviewer: ID Me: 4 2) Interviewer: Age Me: 40 ",
+    }
+    for agent, demographic_info in zip(
+        session_info["agents"], session_info["agents_demographic"]
+    ):
+        assert agent.get_demographic_info() == generate_demographic_prompt(
+            demographic_info
+        )
+
+    # Demographic information that is not a row of agent_demographics is formatted directly
+    assert experiment.get_demographic_prompt({}) == ""
+    assert (
+        experiment.get_demographic_prompt({"ID": 5, "Age": 45})
+        == "1) Interviewer: ID Me: 5 2) Interviewer: Age Me: 45 "
+    )
+    # A row whose values were changed is not served the prompt of the original row
+    assert (
+        experiment.get_demographic_prompt({"ID": 1, "Age": 99})
+        == "1) Interviewer: ID Me: 1 2) Interviewer: Age Me: 99 "
+    )
+    assert (
+        experiment.get_demographic_prompt({"Age": 25, "ID": 1})
+        == "1) Interviewer: Age Me: 25 2) Interviewer: ID Me: 1 "
+    )
+
+
+def test_ai_to_ai_conversational_experiment_system_message_templates():
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4],
+            "Age": [25, 30, 35, 40],
+        }
+    )
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_agents_per_session=2,
+        num_sessions=2,
+        treatments={"treatment1": "value1"},
+        system_message_template="{role}: {role_description}. {treatment}. {demographic_info}",
+    )
+    sessions = [
+        experiment.initialize_session(session_id)
+        for session_id in experiment.get_session_id_list()
+    ]
+
+    # One template is compiled per pair of treatment and role
+    assert list(experiment.system_message_templates) == [
+        ("value1", "agent1"),
+        ("value1", "agent2"),
+    ]
+    assert [agent.get_system_message() for agent in sessions[0]["agents"]] == [
+        f"agent1: Role 1. value1. {sessions[0]['agents'][0].get_demographic_info()}",
+        f"agent2: Role 2. value1. {sessions[0]['agents'][1].get_demographic_info()}",
+    ]
+
+    with pytest.raises(ValueError):
+        AItoAIConversationalExperiment(
+            model_info="gpt-4o",
+            experiment_context="Testing",
+            agent_demographics=agent_demographics,
+            agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+            num_agents_per_session=2,
+            num_sessions=2,
+            treatments={"treatment1": "value1"},
+            system_message_template="{unknown}",
+        )
+
+
+def test_ai_survey_experiment_persona_compiler():
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3],
+            "Age": [25, 30, 35],
+            "Country": ["Kenya", "Ghana", "Nigeria"],
+            "Biography": ["A long biography " * 20] * 3,
+        }
+    )
+    compiler = PersonaCompiler(max_tokens=20, priority=["Country"])
+    experiment = AISurveyExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        questions={"Q1": "How are you?"},
+        persona_compiler=compiler,
+    )
+    session_info = experiment.initialize_session(experiment.get_session_id_list()[0])
+
+    # The respondent keeps every field, while its prompt only has the selected fields
+    respondent_demographic = session_info["respondent_demographic"]
+    assert (
+        respondent_demographic
+        == agent_demographics.to_dict(orient="records")[
+            respondent_demographic["ID"] - 1
+        ]
+    )
+    assert session_info["agents"][0].get_demographic_info() == (
+        f"1) Interviewer: Country Me: {respondent_demographic['Country']} "
+        f"2) Interviewer: Age Me: {respondent_demographic['Age']} "
+    )
+    assert set(compiler.get_token_report()) == {1, 2, 3}
+
+
 def test_ai_to_ai_interview_experiment_initialization():
     agent_demographics = pd.DataFrame(
         {
@@ -529,3 +694,703 @@ def test_ai_to_ai_interview_experiment_initialize_agents():
     agents = experiment.initialize_agents(session_info)
     assert isinstance(agents, list)
     assert len(agents) == len(session_info["agents"]) + 1
+
+
+def test_ai_to_ai_conversational_experiment_run_experiment_async(mocker):
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            "Age": [25, 30, 35, 40, 45, 50, 55, 60, 65, 70],
+        }
+    )
+    agent_roles = {"agent1": "Role 1", "agent2": "Role 2"}
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles=agent_roles,
+        num_agents_per_session=2,
+        num_sessions=5,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+        treatment_assignment_strategy="simple_random",
+    )
+    mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_async",
+        new=AsyncMock(return_value="Mock response"),
+    )
+    mock_save = mocker.patch.object(experiment, "save_experiment")
+
+    result = asyncio.run(
+        experiment.run_experiment_async(test_mode=False, max_concurrency=2)
+    )
+
+    assert result["experiment_id"] == experiment.get_experiment_id()
+    assert list(result["sessions"].keys()) == experiment.get_session_id_list()
+    for session_id, session_info in result["sessions"].items():
+        assert session_info["session_id"] == session_id
+        assert len(session_info["message_history"]) == 7
+        assert isinstance(session_info["agents"][0], dict)
+    mock_save.assert_called_once_with(result)
+
+    with pytest.raises(ValueError):
+        asyncio.run(experiment.run_experiment_async(max_concurrency=0))
+
+
+def test_ai_to_ai_conversational_experiment_run_session_abort_and_resume(mocker):
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            "Age": [25, 30, 35, 40, 45, 50, 55, 60, 65, 70],
+        }
+    )
+    agent_roles = {"agent1": "Role 1", "agent2": "Role 2"}
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles=agent_roles,
+        num_agents_per_session=2,
+        num_sessions=5,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+        treatment_assignment_strategy="simple_random",
+    )
+    mock_query_llm = mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        side_effect=[
+            "Response 1",
+            "Response 2",
+            LLMServerError("Server error"),
+            "Response 3",
+            "Thank you for the conversation.",
+        ],
+    )
+
+    session_info = experiment.initialize_session(experiment.get_session_id_list()[0])
+    session_info = experiment.run_session(session_info)
+    assert session_info["status"] == "aborted"
+    assert session_info["error"]["type"] == "LLMServerError"
+    assert session_info["message_history"][1:] == [
+        {"agent1": "Response 1"},
+        {"agent2": "Response 2"},
+    ]
+
+    session_info = experiment.run_session(session_info)
+    assert session_info["status"] == "completed"
+    assert "error" not in session_info
+    assert session_info["message_history"][1:] == [
+        {"agent1": "Response 1"},
+        {"agent2": "Response 2"},
+        {"agent1": "Response 3"},
+        {"agent2": "Thank you for the conversation."},
+        {"system": "End"},
+    ]
+    assert mock_query_llm.call_count == 5
+
+    mock_query_llm.side_effect = LLMServerError("Server error")
+    session_info = experiment.initialize_session(experiment.get_session_id_list()[1])
+    with pytest.raises(LLMServerError):
+        experiment.run_session(session_info, on_llm_error="raise")
+    with pytest.raises(ValueError):
+        experiment.run_session(session_info, on_llm_error="ignore")
+
+
+def test_ai_to_ai_conversational_experiment_run_experiment_batch_mode(mocker):
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            "Age": [25, 30, 35, 40, 45, 50, 55, 60, 65, 70],
+        }
+    )
+    agent_roles = {"agent1": "Role 1", "agent2": "Role 2"}
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles=agent_roles,
+        num_agents_per_session=2,
+        num_sessions=3,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+        treatment_assignment_strategy="simple_random",
+    )
+    mocker.patch.object(experiment, "save_experiment")
+
+    replies = {
+        "Start": "Hello",
+        "Hello": "How are you?",
+        "How are you?": "Thank you for the conversation.",
+    }
+
+    def responder(model_info, message_history):
+        return replies[message_history[-1]["content"]]
+
+    with LocalLLMServer(responder) as server:
+        client = OpenAI(base_url=server.base_url, api_key="local", max_retries=0)
+        result = experiment.run_experiment(
+            test_mode=False,
+            mode="batch",
+            batch_client=BatchClient(client=client, poll_interval=0),
+        )
+        num_batches = len(server.batches)
+
+    assert list(result["sessions"].keys()) == experiment.get_session_id_list()
+    for session_info in result["sessions"].values():
+        assert session_info["status"] == "completed"
+        assert session_info["message_history"][1:] == [
+            {"agent1": "Hello"},
+            {"agent2": "How are you?"},
+            {"agent1": "Thank you for the conversation."},
+            {"system": "End"},
+        ]
+        assert session_info["agents"][0]["message_history"][-1] == {
+            "role": "user",
+            "content": "Thank you for the conversation.",
+        }
+    assert num_batches == 3
+
+    with pytest.raises(ValueError):
+        experiment.run_experiment(mode="unsupported")
+
+
+def test_ai_to_ai_conversational_experiment_run_session_stream(mocker):
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            "Age": [25, 30, 35, 40, 45, 50, 55, 60, 65, 70],
+        }
+    )
+    agent_roles = {"agent1": "Role 1", "agent2": "Role 2"}
+    experiment = AItoAIConversationalExperiment(
+        model_info="gpt-4o",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles=agent_roles,
+        num_agents_per_session=2,
+        num_sessions=5,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+        treatment_assignment_strategy="simple_random",
+    )
+    mock_query_llm_stream = mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_stream",
+        side_effect=[
+            iter(["Hello", " there"]),
+            iter(["Thank you for the conversation."]),
+        ],
+    )
+
+    session_info = experiment.initialize_session(experiment.get_session_id_list()[0])
+    session_info = experiment.run_session(session_info, test_mode=True, stream=True)
+
+    assert session_info["message_history"][1:] == [
+        {"agent1": "Hello there"},
+        {"agent2": "Thank you for the conversation."},
+        {"system": "End"},
+    ]
+    assert mock_query_llm_stream.call_args.kwargs["stop_pattern"] == (
+        "Thank you for the conversation."
+    )
+    assert [metrics["role"] for metrics in session_info["turn_metrics"]] == [
+        "agent1",
+        "agent2",
+    ]
+    for metrics in session_info["turn_metrics"]:
+        assert 0 <= metrics["time_to_first_token"] <= metrics["duration"]
+
+
+def test_ai_to_ai_conversational_experiment_run_experiment_mock_model(mocker):
+    agent_demographics = pd.DataFrame({"ID": [1, 2, 3, 4], "Age": [25, 30, 35, 40]})
+    experiment = AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_agents_per_session=2,
+        num_sessions=2,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+        treatment_assignment_strategy="simple_random",
+    )
+    mocker.patch.object(experiment, "save_experiment")
+
+    result = experiment.run_experiment(test_mode=False)
+    assert list(result["sessions"].keys()) == experiment.get_session_id_list()
+    for session_info in result["sessions"].values():
+        assert session_info["status"] == "completed"
+        assert all(
+            message["content"]
+            for agent in session_info["agents"]
+            for message in agent["message_history"]
+        )
+        assert session_info["usage"]["calls"] == 5
+        assert session_info["usage"]["cost"] == 0
+
+    assert result["usage"]["total"]["calls"] == 10
+    assert result["usage"]["total"]["total_tokens"] == sum(
+        session_info["usage"]["total_tokens"]
+        for session_info in result["sessions"].values()
+    )
+    assert set(result["usage"]["by_role"]) == {"agent1", "agent2"}
+    assert result["usage"]["by_role"]["agent1"]["calls"] == 6
+    assert sum(
+        usage["calls"] for usage in result["usage"]["by_treatment"].values()
+    ) == (10)
+
+
+def test_ai_to_ai_conversational_experiment_cache_friendly_prompt_layout():
+    agent_demographics = pd.DataFrame({"ID": [1, 2, 3, 4], "Age": [25, 30, 35, 40]})
+    experiment_options = {
+        "model_info": "mock",
+        "experiment_context": "Testing",
+        "agent_demographics": agent_demographics,
+        "agent_roles": {"agent1": "Role 1", "agent2": "Role 2"},
+        "num_sessions": 2,
+        "treatments": {"treatment1": "value1", "treatment2": "value2"},
+    }
+    experiment = AItoAIConversationalExperiment(
+        prompt_layout="cache_friendly", **experiment_options
+    )
+    for session_id in experiment.get_session_id_list():
+        session_info = experiment.initialize_session(session_id)
+        for agent, role_description in zip(
+            session_info["agents"], ["Role 1", "Role 2"]
+        ):
+            assert agent.system_message.startswith(
+                f"Testing\n\n{role_description}\n\n{session_info['treatment']}"
+            )
+
+    with pytest.raises(ValueError):
+        AItoAIConversationalExperiment(prompt_layout="compact", **experiment_options)
+
+
+def test_ai_survey_experiment_initialization():
+    agent_demographics = pd.DataFrame({"ID": [1, 2, 3], "Age": [25, 30, 35]})
+    experiment_options = {
+        "model_info": "mock",
+        "experiment_context": "Testing",
+        "agent_demographics": agent_demographics,
+        "questions": {"Q1": "Question 1?", "Q2": "Question 2?"},
+    }
+    experiment = AISurveyExperiment(**experiment_options)
+    assert experiment.get_num_sessions() == 3
+    assert sorted(
+        demographic["ID"]
+        for demographic in experiment.get_respondent_assignment().values()
+    ) == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        AISurveyExperiment(**{**experiment_options, "questions": {}})
+    with pytest.raises(ValueError):
+        AISurveyExperiment(**experiment_options, options={"Q3": ["Yes", "No"]})
+    with pytest.raises(ValueError):
+        AISurveyExperiment(**experiment_options, block_size=0)
+    with pytest.raises(ValueError):
+        AISurveyExperiment(**experiment_options, num_sessions=4)
+
+
+def test_ai_survey_experiment_run_experiment(mocker):
+    agent_demographics = pd.DataFrame({"ID": [1, 2, 3], "Age": [25, 30, 35]})
+    questions = {f"Q{index}": f"Question {index}?" for index in range(1, 41)}
+    experiment = AISurveyExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=agent_demographics,
+        questions=questions,
+        block_size=20,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+    )
+    mocker.patch.object(experiment, "save_experiment")
+    answers = {question_id: "An answer" for question_id in questions}
+    mock_query_llm = mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        return_value=json.dumps(answers),
+    )
+
+    result = experiment.run_experiment(test_mode=False)
+    assert len(result["responses"]) == 3
+    for row in result["responses"]:
+        assert row["Q1"] == "An answer" and row["Q40"] == "An answer"
+        assert row["treatment"] in ["treatment1", "treatment2"]
+    assert {row["ID"] for row in result["responses"]} == {1, 2, 3}
+    for session_info in result["sessions"].values():
+        assert session_info["status"] == "completed"
+    # Two blocks of 20 questions per respondent
+    assert mock_query_llm.call_count == 6
+
+    mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_async",
+        AsyncMock(side_effect=LLMServerError("Server error")),
+    )
+    result = asyncio.run(experiment.run_experiment_async(test_mode=True))
+    session_info = list(result["sessions"].values())[0]
+    assert session_info["status"] == "aborted"
+    assert session_info["error"]["type"] == "LLMServerError"
+    assert result["responses"][0]["Q1"] is None
+
+    mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_async",
+        AsyncMock(return_value=json.dumps(answers)),
+    )
+    result = asyncio.run(
+        experiment.run_experiment_async(
+            test_mode=False, max_concurrency=2, adaptive_concurrency=True
+        )
+    )
+    assert [row["session_id"] for row in result["responses"]] == (
+        experiment.get_session_id_list()
+    )
+    assert result["concurrency"]["limit"] <= 2
+    assert result["concurrency"]["in_flight"] == 0
+
+
+def test_resume_experiment_resumes_survey_experiment(mocker):
+    questions = {f"Q{index}": f"Question {index}?" for index in range(1, 41)}
+    experiment = AISurveyExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": [1, 2, 3], "Age": [25, 30, 35]}),
+        questions=questions,
+        block_size=20,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+    )
+    experiment_id = experiment.get_experiment_id()
+    answers = json.dumps({question_id: "An answer" for question_id in questions})
+    mock_query_llm = mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        return_value=answers,
+    )
+    experiment.run_experiment(test_mode=False, checkpoint=True)
+    expected_experiment = load_saved_experiment(experiment_id)
+    shutil.rmtree(f"{get_checkpoint_directory(experiment_id)}/sessions")
+
+    # The second block of the first respondent fails and stops the survey
+    mock_query_llm.side_effect = [answers, LLMServerError("Server error")]
+    with pytest.raises(LLMServerError):
+        experiment.run_experiment(
+            test_mode=False, on_llm_error="raise", checkpoint=True
+        )
+    mock_query_llm.side_effect = None
+
+    first_session_id = experiment.get_session_id_list()[0]
+    _, saved_sessions = load_experiment_checkpoint(experiment_id)
+    assert list(saved_sessions) == [first_session_id]
+    assert saved_sessions[first_session_id]["status"] == "aborted"
+    assert len(saved_sessions[first_session_id]["agents"][0]["answers"]) == 20
+
+    # The aborted respondent resumes from its second block
+    mock_query_llm.reset_mock()
+    result = resume_experiment(experiment_id)
+    assert mock_query_llm.call_count == 5
+    assert [row["session_id"] for row in result["responses"]] == (
+        experiment.get_session_id_list()
+    )
+    assert load_saved_experiment(experiment_id) == expected_experiment
+
+    with pytest.raises(ValueError):
+        asyncio.run(experiment.run_experiment_async(max_concurrency=0))
+
+
+def create_checkpointed_experiment():
+    return AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame(
+            {"ID": [1, 2, 3, 4, 5, 6], "Age": [25, 30, 35, 40, 45, 50]}
+        ),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_sessions=3,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+    )
+
+
+def load_saved_experiment(experiment_id):
+    with open(f"{EXPERIMENT_DIRECTORY}/{experiment_id}.json") as file:
+        return json.load(file)
+
+
+def test_run_experiment_does_not_checkpoint_by_default():
+    experiment = create_checkpointed_experiment()
+    experiment.run_experiment(test_mode=False)
+    asyncio.run(experiment.run_experiment_async(test_mode=False))
+    assert not os.path.exists(get_checkpoint_directory(experiment.get_experiment_id()))
+
+
+def test_resume_experiment_skips_finished_sessions(mocker):
+    experiment = create_checkpointed_experiment()
+    experiment_id = experiment.get_experiment_id()
+    experiment.run_experiment(test_mode=False, checkpoint=True)
+    expected_experiment = load_saved_experiment(experiment_id)
+
+    # Simulate a crash after the first session was saved
+    sessions_directory = f"{get_checkpoint_directory(experiment_id)}/sessions"
+    for session_id in experiment.get_session_id_list()[1:]:
+        os.remove(f"{sessions_directory}/{session_id}.json")
+    os.remove(f"{EXPERIMENT_DIRECTORY}/{experiment_id}.json")
+
+    spy_run_session = mocker.spy(AItoAIConversationalExperiment, "run_session")
+    resume_experiment(experiment_id)
+    assert spy_run_session.call_count == 2
+    assert load_saved_experiment(experiment_id) == expected_experiment
+
+    # Every session is finished, so nothing is run again
+    resume_experiment(experiment_id)
+    assert spy_run_session.call_count == 2
+
+    with pytest.raises(ValueError):
+        resume_experiment("unknown")
+
+
+def test_resume_experiment_restarts_aborted_sessions(mocker):
+    experiment = create_checkpointed_experiment()
+    experiment_id = experiment.get_experiment_id()
+    experiment.run_experiment(test_mode=False, checkpoint=True)
+    expected_experiment = load_saved_experiment(experiment_id)
+    shutil.rmtree(f"{get_checkpoint_directory(experiment_id)}/sessions")
+
+    # The third call of the first session fails and stops the experiment
+    calls = []
+
+    def fail_third_call(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise LLMServerError("Server error")
+        return query_llm(*args, **kwargs)
+
+    mock_query_llm = mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        side_effect=fail_third_call,
+    )
+    with pytest.raises(LLMServerError):
+        experiment.run_experiment(
+            test_mode=False, on_llm_error="raise", checkpoint=True
+        )
+    mock_query_llm.side_effect = query_llm
+
+    first_session_id = experiment.get_session_id_list()[0]
+    _, saved_sessions = load_experiment_checkpoint(experiment_id)
+    assert list(saved_sessions) == [first_session_id]
+    assert saved_sessions[first_session_id]["status"] == "aborted"
+    assert len(saved_sessions[first_session_id]["message_history"]) == 3
+
+    # Without restart_aborted, the aborted session is kept as it is
+    result = resume_experiment(experiment_id, restart_aborted=False)
+    assert result["sessions"][first_session_id]["status"] == "aborted"
+
+    # The aborted session is resumed from its last successful turn
+    mock_query_llm.reset_mock()
+    resume_experiment(experiment_id)
+    assert mock_query_llm.call_count == 3
+    assert load_saved_experiment(experiment_id) == expected_experiment
+
+
+def test_resume_experiment_requires_unsaved_arguments(mocker):
+    experiment = AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": [1, 2], "Age": [25, 30]}),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_sessions=1,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1"},
+        context_policy=SlidingWindowPolicy(max_tokens=1000),
+    )
+    experiment_id = experiment.get_experiment_id()
+    experiment.run_experiment(test_mode=False, checkpoint=True)
+
+    # The context policy is not saved, so resuming without it would change the prompts
+    with pytest.raises(ValueError):
+        resume_experiment(experiment_id)
+
+    spy_resume = mocker.spy(AItoAIConversationalExperiment, "resume")
+    resume_experiment(
+        experiment_id,
+        stream=True,
+        stop_pattern="Bye",
+        context_policy=SlidingWindowPolicy(max_tokens=1000),
+    )
+    assert spy_resume.call_args.kwargs["stream"] is True
+    assert spy_resume.call_args.kwargs["stop_pattern"] == "Bye"
+
+    survey = AISurveyExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": [1], "Age": [25]}),
+        questions={"Q1": "How are you?"},
+    )
+    mocker.patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        return_value=json.dumps({"Q1": "Fine"}),
+    )
+    survey.run_experiment(test_mode=False, checkpoint=True)
+    with pytest.raises(ValueError):
+        resume_experiment(survey.get_experiment_id(), stream=True)
+
+
+def test_stream_experiment_matches_run_experiment():
+    experiment = create_checkpointed_experiment()
+    experiment_id = experiment.get_experiment_id()
+    experiment.run_experiment(test_mode=False, checkpoint=False)
+    expected_experiment = load_saved_experiment(experiment_id)
+
+    summary = experiment.stream_experiment(test_mode=False)
+    assert summary["experiment_id"] == experiment_id
+    assert summary["num_sessions"] == 3
+    assert json.loads(json.dumps(summary["usage"])) == expected_experiment["usage"]
+
+    sessions = list(read_sessions(get_session_stream_path(experiment_id)))
+    assert [session_info["session_id"] for session_info in sessions] == (
+        experiment.get_session_id_list()
+    )
+    for session_info in sessions:
+        assert (
+            session_info
+            == expected_experiment["sessions"][str(session_info["session_id"])]
+        )
+
+    # Only the experiment context, roles and treatments are shared, so streaming does not grow the table
+    assert set(experiment.shared_strings.strings) <= {
+        "Testing",
+        "Role 1",
+        "Role 2",
+        "value1",
+        "value2",
+    }
+
+
+def test_iter_sessions_is_lazy(mocker):
+    experiment = create_checkpointed_experiment()
+    spy_initialize_session = mocker.spy(experiment, "initialize_session")
+
+    session_iterator = experiment.iter_sessions(test_mode=False)
+    assert spy_initialize_session.call_count == 0
+    session_info = next(session_iterator)
+    assert spy_initialize_session.call_count == 1
+    assert session_info["status"] == "completed"
+    assert all(isinstance(agent, dict) for agent in session_info["agents"])
+
+    sessions = []
+    summary = experiment.stream_experiment(sink=sessions.append, test_mode=True)
+    assert summary["num_sessions"] == 1
+    assert sessions[0]["session_id"] == experiment.get_session_id_list()[0]
+    assert not os.path.exists(get_session_stream_path(experiment.get_experiment_id()))
+
+
+def test_stream_experiment_async_bounds_sessions_in_flight(mocker):
+    experiment = create_checkpointed_experiment()
+    in_flight, max_in_flight = [0], [0]
+    run_session_async = experiment.run_session_async
+
+    async def tracked_run_session_async(*args, **kwargs):
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        try:
+            return await run_session_async(*args, **kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    mocker.patch.object(
+        experiment, "run_session_async", side_effect=tracked_run_session_async
+    )
+    sessions = []
+    summary = asyncio.run(
+        experiment.stream_experiment_async(
+            sink=sessions.append, test_mode=False, max_concurrency=2
+        )
+    )
+    assert summary["num_sessions"] == 3
+    assert max_in_flight[0] == 2
+    assert sorted(session_info["session_id"] for session_info in sessions) == sorted(
+        experiment.get_session_id_list()
+    )
+    assert summary["usage"]["total"]["calls"] == 15
+
+    with pytest.raises(ValueError):
+        asyncio.run(experiment.stream_experiment_async(max_concurrency=0))
+
+
+def test_stream_experiment_async_admits_sessions_through_controller(mocker):
+    experiment = create_checkpointed_experiment()
+    in_flight, max_in_flight = [0], [0]
+    run_session_async = experiment.run_session_async
+
+    async def tracked_run_session_async(*args, **kwargs):
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        try:
+            return await run_session_async(*args, **kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    mocker.patch.object(
+        experiment, "run_session_async", side_effect=tracked_run_session_async
+    )
+    controller = enable_adaptive_concurrency(initial_limit=1, max_limit=1)
+    try:
+        summary = asyncio.run(
+            experiment.stream_experiment_async(
+                sink=lambda session_info: None,
+                test_mode=False,
+                max_concurrency=2,
+                adaptive_concurrency=True,
+            )
+        )
+    finally:
+        disable_adaptive_concurrency()
+    assert summary["num_sessions"] == 3
+    # The shared controller admits one session at a time, below max_concurrency
+    assert max_in_flight[0] == 1
+    assert controller.get_metrics()["in_flight"] == 0
+    assert controller.get_metrics()["successes"] > 0
+
+    # Without a shared controller, one is only enabled for the duration of the run
+    asyncio.run(
+        experiment.stream_experiment_async(
+            sink=lambda session_info: None,
+            test_mode=False,
+            max_concurrency=2,
+            adaptive_concurrency=True,
+        )
+    )
+    assert get_concurrency_controller() is None
+
+    # The sync and async streams account for sessions alike
+    sync_summary = experiment.stream_experiment(
+        sink=lambda session_info: None, test_mode=False
+    )
+    assert sync_summary == summary
+
+
+def test_jsonl_session_sink(tmp_path):
+    path = str(tmp_path / "sessions" / "experiment.jsonl")
+    with JSONLSessionSink(path, flush_every=2) as sink:
+        sink.write({"session_id": 0, "treatment": ("a", "b")})
+        sink.write({"session_id": 1, "treatment": "c"})
+    assert sink.num_sessions == 2
+
+    # A crash during a write leaves a truncated last line behind
+    with open(path, "a") as file:
+        file.write('{"session_id": 2, "treat')
+
+    assert list(read_sessions(path)) == [
+        {"session_id": 0, "treatment": ["a", "b"]},
+        {"session_id": 1, "treatment": "c"},
+    ]
+    assert list(read_sessions(path, session_ids={1})) == [
+        {"session_id": 1, "treatment": "c"}
+    ]
+
+    with pytest.raises(ValueError):
+        JSONLSessionSink(path, flush_every=0)
+
+
+def test_run_experiment_async_matches_run_experiment(mocker):
+    experiment = create_checkpointed_experiment()
+    mocker.patch.object(experiment, "save_experiment")
+
+    expected_experiment = experiment.run_experiment(test_mode=False)
+    result = asyncio.run(experiment.run_experiment_async(test_mode=False))
+    assert result == expected_experiment
+    assert list(result["sessions"]) == list(expected_experiment["sessions"])
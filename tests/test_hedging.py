@@ -0,0 +1,189 @@
+import time
+import asyncio
+import threading
+import pytest
+from talkingtomachines.generative.hedging import HedgingPolicy
+from talkingtomachines.generative.llm import (
+    disable_hedging,
+    enable_hedging,
+    get_hedging_policy,
+    model_providers,
+    providers,
+    query_llm,
+    query_llm_async,
+    register_provider,
+)
+from talkingtomachines.generative.providers import ProviderBackend
+from talkingtomachines.generative.usage import create_usage
+
+
+def make_policy(latency=0.01, max_hedge_ratio=1):
+    policy = HedgingPolicy(min_samples=5, max_hedge_ratio=max_hedge_ratio)
+    for _ in range(100):
+        policy.record_latency("model", latency)
+    return policy
+
+
+def slow_response():
+    time.sleep(0.05)
+    return "response"
+
+
+def slow_failure():
+    time.sleep(0.05)
+    raise RuntimeError("Call failed")
+
+
+def test_hedging_policy_invalid_arguments():
+    with pytest.raises(ValueError):
+        HedgingPolicy(percentile=100)
+    with pytest.raises(ValueError):
+        HedgingPolicy(min_samples=10, window_size=5)
+    with pytest.raises(ValueError):
+        HedgingPolicy(max_hedge_ratio=1.5)
+
+
+def test_hedging_policy_get_hedge_delay():
+    policy = HedgingPolicy(percentile=90, min_samples=10, window_size=20)
+    for latency in range(9):
+        policy.record_latency("model", latency)
+    assert policy.get_hedge_delay("model") is None
+
+    policy.record_latency("model", 9)
+    assert policy.get_hedge_delay("model") == 8
+    for _ in range(20):
+        policy.record_latency("model", 1)
+    assert policy.get_hedge_delay("model") == 1
+
+
+def test_hedging_policy_budget():
+    policy = HedgingPolicy(max_hedge_ratio=0.25)
+    for _ in range(4):
+        policy.start_call("model")
+    assert policy.try_hedge("model") is True
+    assert policy.try_hedge("model") is False
+    assert policy.get_metrics()["model"] == {
+        "calls": 4,
+        "hedges": 1,
+        "hedge_wins": 0,
+        "losing_usage": create_usage(),
+        "hedge_delay": None,
+    }
+
+
+def test_hedging_policy_call_hedges_slow_call():
+    policy = make_policy()
+    lock = threading.Lock()
+    num_calls = []
+
+    def func():
+        with lock:
+            num_calls.append(1)
+            call_index = len(num_calls)
+        if call_index == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    start_time = time.monotonic()
+    assert policy.call("model", func) == "fast"
+    assert time.monotonic() - start_time < 0.4
+    assert policy.get_metrics()["model"]["hedge_wins"] == 1
+    policy.close()
+
+
+def test_hedging_policy_call_without_budget_or_samples():
+    policy = HedgingPolicy()
+    assert policy.call("model", lambda: "response") == "response"
+    assert policy.get_metrics()["model"]["hedges"] == 0
+
+    policy = make_policy(max_hedge_ratio=0)
+    assert policy.call("model", slow_response) == "response"
+    assert policy.get_metrics()["model"]["hedges"] == 0
+    policy.close()
+
+
+def test_hedging_policy_call_falls_back_to_successful_call():
+    policy = make_policy()
+    num_calls = []
+
+    def func():
+        num_calls.append(1)
+        return slow_failure() if len(num_calls) == 1 else slow_response()
+
+    assert policy.call("model", func) == "response"
+
+    with pytest.raises(RuntimeError):
+        policy.call("model", slow_failure)
+    assert policy.get_metrics()["model"]["hedges"] == 2
+    policy.close()
+
+
+def test_hedging_policy_call_async_cancels_loser():
+    policy = make_policy()
+    cancelled = []
+    num_calls = []
+
+    async def func():
+        num_calls.append(1)
+        if len(num_calls) == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "slow"
+        return "fast"
+
+    assert asyncio.run(policy.call_async("model", func)) == "fast"
+    assert cancelled == [True]
+    assert policy.get_metrics()["model"]["hedges"] == 1
+
+
+class SlowFirstBackend(ProviderBackend):
+    def __init__(self, name):
+        super().__init__(name)
+        self.num_calls = 0
+        self.lock = threading.Lock()
+
+    def complete(self, model_info, message_history):
+        with self.lock:
+            self.num_calls += 1
+            num_calls = self.num_calls
+        time.sleep(0.5 if num_calls == 6 else 0.01)
+        return {"content": f"response {num_calls}", "usage": {"total_tokens": 1}}
+
+    async def complete_async(self, model_info, message_history):
+        self.num_calls += 1
+        await asyncio.sleep(0.01)
+        return {"content": "response", "usage": {"total_tokens": 1}}
+
+
+def test_query_llm_hedging():
+    register_provider(SlowFirstBackend("slow"), ["slow-model"])
+    policy = enable_hedging(min_samples=5, max_hedge_ratio=0.5)
+    try:
+        assert get_hedging_policy() is policy
+        message_history = [{"role": "user", "content": "Hello"}]
+        usage = {}
+        for _ in range(5):
+            query_llm("slow-model", message_history, usage=usage)
+        assert query_llm("slow-model", message_history, usage=usage) == "response 7"
+        assert policy.get_metrics()["slow-model"]["hedge_wins"] == 1
+        assert usage["calls"] == 6
+
+        # The losing call finishes after the turn without adding to the usage of the caller
+        deadline = time.monotonic() + 2
+        while (
+            policy.get_metrics()["slow-model"]["losing_usage"]["calls"] == 0
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+        assert policy.get_metrics()["slow-model"]["losing_usage"]["total_tokens"] == 1
+        assert usage["calls"] == 6
+        assert asyncio.run(query_llm_async("slow-model", message_history)) == "response"
+    finally:
+        disable_hedging()
+        providers.pop("slow")
+        model_providers.pop("slow-model")
+    assert get_hedging_policy() is None
@@ -0,0 +1,46 @@
+import sys
+import subprocess
+
+# Cumulative import time of talkingtomachines.main in microseconds, with generous headroom for slow machines
+MAIN_IMPORT_TIME_BUDGET = 1_500_000
+HEAVY_MODULES = ["openai", "pandas", "tqdm", "httpx"]
+
+
+def get_cumulative_import_time(module: str) -> int:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+
+    raise AssertionError(f"No import time reported for {module}.")
+
+
+def get_loaded_heavy_modules(module: str) -> list[str]:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def test_main_import_time_budget():
+    assert get_cumulative_import_time("talkingtomachines.main") < (
+        MAIN_IMPORT_TIME_BUDGET
+    )
+
+
+def test_heavy_dependencies_are_imported_lazily():
+    assert get_loaded_heavy_modules("talkingtomachines.main") == []
+    assert get_loaded_heavy_modules("talkingtomachines.management.experiment") == []
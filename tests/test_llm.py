@@ -1,11 +1,42 @@
-from talkingtomachines.generative.llm import query_llm, query_open_ai, openai_client
-from unittest.mock import patch, MagicMock
+import pytest
+import asyncio
+import httpx
+import openai
+from talkingtomachines.generative.llm import (
+    query_llm,
+    query_provider,
+    openai_client,
+    query_llm_async,
+    query_provider_async,
+    async_openai_client,
+    enable_response_cache,
+    disable_response_cache,
+    rate_limiter,
+    configure_resilience,
+    LLMClientError,
+    LLMRateLimitError,
+    LLMServerError,
+    CircuitOpenError,
+    find_stop_pattern,
+    query_llm_stream,
+    query_llm_samples,
+    query_llm_samples_async,
+    register_provider,
+    get_provider,
+    get_supported_models,
+    providers,
+    model_providers,
+    close_providers,
+    aclose_providers,
+)
+from talkingtomachines.generative.providers import OpenAIBackend, ProviderBackend
+from unittest.mock import patch, MagicMock, AsyncMock
 
 
 def test_query_llm_supported_models(mocker):
-    # Mock the query_open_ai function
+    # Mock the query_provider function
     mocker.patch(
-        "talkingtomachines.generative.llm.query_open_ai", return_value="Mock response"
+        "talkingtomachines.generative.llm.query_provider", return_value="Mock response"
     )
 
     supported_models = [
@@ -25,14 +56,24 @@ def test_query_llm_supported_models(mocker):
 def test_query_llm_unsupported_model():
     unsupported_model = "unsupported-model"
     message_history = [{"role": "user", "content": "Hello!"}]
-    response = query_llm(model_info=unsupported_model, message_history=message_history)
-    assert response == ""
+    with pytest.raises(LLMClientError):
+        query_llm(model_info=unsupported_model, message_history=message_history)
+    with pytest.raises(LLMClientError):
+        query_llm_samples(
+            model_info=unsupported_model, message_history=message_history, n=2
+        )
+    with pytest.raises(LLMClientError):
+        list(
+            query_llm_stream(
+                model_info=unsupported_model, message_history=message_history
+            )
+        )
 
 
 def test_query_llm_empty_message_history(mocker):
-    # Mock the query_open_ai function
+    # Mock the query_provider function
     mocker.patch(
-        "talkingtomachines.generative.llm.query_open_ai", return_value="Mock response"
+        "talkingtomachines.generative.llm.query_provider", return_value="Mock response"
     )
 
     model_info = "gpt-4"
@@ -42,9 +83,9 @@ def test_query_llm_empty_message_history(mocker):
 
 
 def test_query_llm_various_message_histories(mocker):
-    # Mock the query_open_ai function
+    # Mock the query_provider function
     mocker.patch(
-        "talkingtomachines.generative.llm.query_open_ai", return_value="Mock response"
+        "talkingtomachines.generative.llm.query_provider", return_value="Mock response"
     )
 
     model_info = "gpt-3.5-turbo"
@@ -66,7 +107,7 @@ def test_query_llm_various_message_histories(mocker):
         assert response == "Mock response"
 
 
-def test_query_open_ai_success():
+def test_query_provider_success():
     model_info = "gpt-4"
     message_history = [{"role": "user", "content": "Hello, how are you?"}]
 
@@ -77,27 +118,428 @@ def test_query_open_ai_success():
     with patch.object(
         openai_client.chat.completions, "create", return_value=mock_response
     ):
-        result = query_open_ai(model_info, message_history)
+        result = query_provider(model_info, message_history)
         assert result == "I am fine, thank you."
 
 
-def test_query_open_ai_invalid_model():
+def test_query_provider_invalid_model():
     model_info = "invalid-model"
     message_history = [{"role": "user", "content": "Hello, how are you?"}]
 
     with patch.object(openai_client.chat.completions, "create") as mock_create:
         mock_create.side_effect = Exception("Model not found")
-        result = query_open_ai(model_info, message_history)
-        assert result == ""
-        mock_create.assert_called_once_with(model=model_info, messages=message_history)
+        with pytest.raises(LLMClientError):
+            query_provider(model_info, message_history)
+        mock_create.assert_not_called()
 
 
-def test_query_open_ai_exception():
+def test_query_provider_exception():
     model_info = "gpt-4"
     message_history = [{"role": "user", "content": "Hello, how are you?"}]
 
     with patch.object(openai_client.chat.completions, "create") as mock_create:
         mock_create.side_effect = Exception("API call failed")
-        result = query_open_ai(model_info, message_history)
-        assert result == ""
+        with pytest.raises(LLMClientError):
+            query_provider(model_info, message_history)
         mock_create.assert_called_once_with(model=model_info, messages=message_history)
+
+
+def test_query_llm_async_supported_model(mocker):
+    mocker.patch(
+        "talkingtomachines.generative.llm.query_provider_async",
+        new=AsyncMock(return_value="Mock response"),
+    )
+    message_history = [{"role": "user", "content": "Hello!"}]
+    response = asyncio.run(
+        query_llm_async(model_info="gpt-4o", message_history=message_history)
+    )
+    assert response == "Mock response"
+
+
+def test_query_llm_async_unsupported_model():
+    message_history = [{"role": "user", "content": "Hello!"}]
+    with pytest.raises(LLMClientError):
+        asyncio.run(
+            query_llm_async(
+                model_info="unsupported-model", message_history=message_history
+            )
+        )
+    with pytest.raises(LLMClientError):
+        asyncio.run(
+            query_llm_samples_async(
+                model_info="unsupported-model", message_history=message_history, n=2
+            )
+        )
+
+
+def test_query_provider_async_success():
+    model_info = "gpt-4"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    mock_response = MagicMock()
+    mock_response.choices[0].message.content = "I am fine, thank you."
+
+    with patch.object(
+        async_openai_client.chat.completions,
+        "create",
+        new=AsyncMock(return_value=mock_response),
+    ) as mock_create:
+        result = asyncio.run(query_provider_async(model_info, message_history))
+        assert result == "I am fine, thank you."
+        mock_create.assert_awaited_once_with(model=model_info, messages=message_history)
+
+
+def test_query_provider_async_exception():
+    model_info = "gpt-4"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    with patch.object(
+        async_openai_client.chat.completions,
+        "create",
+        new=AsyncMock(side_effect=Exception("API call failed")),
+    ):
+        with pytest.raises(LLMClientError):
+            asyncio.run(query_provider_async(model_info, message_history))
+
+
+def test_query_llm_response_cache(tmp_path):
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    mock_response = MagicMock()
+    mock_response.choices[0].message.content = "I am fine, thank you."
+
+    cache = enable_response_cache(path=str(tmp_path / "cache.db"))
+    try:
+        with patch.object(
+            openai_client.chat.completions, "create", return_value=mock_response
+        ) as mock_create:
+            assert query_llm(model_info, message_history) == "I am fine, thank you."
+            assert query_llm(model_info, message_history) == "I am fine, thank you."
+            mock_create.assert_called_once()
+
+        with patch.object(
+            async_openai_client.chat.completions, "create", new=AsyncMock()
+        ) as mock_async_create:
+            response = asyncio.run(query_llm_async(model_info, message_history))
+            assert response == "I am fine, thank you."
+            mock_async_create.assert_not_awaited()
+
+        assert cache.get_stats()["hits"] == 2
+        assert cache.get_stats()["misses"] == 1
+    finally:
+        disable_response_cache()
+
+
+def test_query_llm_response_cache_skips_failures(tmp_path):
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    mock_response = MagicMock()
+    mock_response.choices[0].message.content = ""
+
+    enable_response_cache(path=str(tmp_path / "cache.db"))
+    try:
+        with patch.object(
+            openai_client.chat.completions, "create", return_value=mock_response
+        ) as mock_create:
+            assert query_llm(model_info, message_history) == ""
+            assert query_llm(model_info, message_history) == ""
+            assert mock_create.call_count == 2
+    finally:
+        disable_response_cache()
+
+
+def test_query_provider_consults_rate_limiter():
+    model_info = "gpt-4"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    mock_response = MagicMock()
+    mock_response.choices[0].message.content = "I am fine, thank you."
+    mock_response.usage.total_tokens = 42
+
+    with patch.object(
+        openai_client.chat.completions, "create", return_value=mock_response
+    ), patch.object(rate_limiter, "acquire") as mock_acquire, patch.object(
+        rate_limiter, "reconcile"
+    ) as mock_reconcile:
+        assert query_provider(model_info, message_history) == "I am fine, thank you."
+        mock_acquire.assert_called_once_with(model_info, 12)
+        mock_reconcile.assert_called_once_with(model_info, 12, 42)
+
+
+def make_api_error(error_class, status_code):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(
+        status_code, request=request, headers={"retry-after": "0"}
+    )
+    return error_class("API error", response=response, body=None)
+
+
+def test_query_provider_retries_transient_errors(mocker):
+    model_info = "gpt-4"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    mock_response = MagicMock()
+    mock_response.choices[0].message.content = "I am fine, thank you."
+    mock_sleep = mocker.patch("talkingtomachines.generative.resilience.time.sleep")
+
+    configure_resilience(max_attempts=3)
+    try:
+        with patch.object(
+            openai_client.chat.completions,
+            "create",
+            side_effect=[
+                make_api_error(openai.RateLimitError, 429),
+                make_api_error(openai.InternalServerError, 500),
+                mock_response,
+            ],
+        ) as mock_create:
+            result = query_provider(model_info, message_history)
+            assert result == "I am fine, thank you."
+            assert mock_create.call_count == 3
+            assert mock_sleep.call_count == 2
+
+        with patch.object(
+            openai_client.chat.completions,
+            "create",
+            side_effect=make_api_error(openai.RateLimitError, 429),
+        ) as mock_create:
+            with pytest.raises(LLMRateLimitError):
+                query_provider(model_info, message_history)
+            assert mock_create.call_count == 3
+    finally:
+        configure_resilience()
+
+
+def test_query_provider_circuit_breaker(mocker):
+    model_info = "gpt-4"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+    mocker.patch("talkingtomachines.generative.resilience.time.sleep")
+
+    configure_resilience(max_attempts=2, failure_threshold=2, recovery_timeout=60)
+    try:
+        with patch.object(
+            openai_client.chat.completions,
+            "create",
+            side_effect=make_api_error(openai.InternalServerError, 503),
+        ) as mock_create:
+            with pytest.raises(LLMServerError):
+                query_provider(model_info, message_history)
+            with pytest.raises(CircuitOpenError):
+                query_provider(model_info, message_history)
+            assert mock_create.call_count == 2
+    finally:
+        configure_resilience()
+
+
+def make_stream(chunks):
+    events = []
+    for chunk in chunks:
+        event = MagicMock()
+        event.choices[0].delta.content = chunk
+        event.usage = None
+        events.append(event)
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(events)
+    return stream
+
+
+def test_find_stop_pattern():
+    assert find_stop_pattern("", "Hello there", None) is None
+    assert find_stop_pattern("", "Hello there", "Bye") is None
+    assert find_stop_pattern("", "Hi. Bye now", "Bye") == 7
+    assert find_stop_pattern("Hi. B", "ye now", "Bye") == 2
+    assert find_stop_pattern("Bye. ", "More", "Bye") is None
+
+
+def test_query_llm_stream():
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+    stream = make_stream(["I am ", "fine, ", "thank you."])
+
+    with patch.object(
+        openai_client.chat.completions, "create", return_value=stream
+    ) as mock_create:
+        chunks = list(query_llm_stream(model_info, message_history))
+        assert chunks == ["I am ", "fine, ", "thank you."]
+        assert mock_create.call_args.kwargs["stream"] is True
+        stream.close.assert_called_once()
+
+
+def test_query_llm_stream_stop_pattern():
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+    stream = make_stream(["Bye. Thank you for the con", "versation. Extra", " text"])
+
+    with patch.object(openai_client.chat.completions, "create", return_value=stream):
+        chunks = list(
+            query_llm_stream(
+                model_info,
+                message_history,
+                stop_pattern="Thank you for the conversation.",
+            )
+        )
+        assert "".join(chunks) == "Bye. Thank you for the conversation."
+        assert len(chunks) == 2
+        stream.close.assert_called_once()
+
+
+def test_query_llm_stream_instrumentation(mocker):
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+    stream = make_stream(["Bye. ", "Extra", " text"])
+    mock_report_call_outcome = mocker.patch(
+        "talkingtomachines.generative.llm.report_call_outcome"
+    )
+
+    with patch.object(
+        openai_client.chat.completions, "create", return_value=stream
+    ), patch.object(rate_limiter, "acquire") as mock_acquire, patch.object(
+        rate_limiter, "reconcile"
+    ) as mock_reconcile:
+        chunks = query_llm_stream(model_info, message_history, stop_pattern="Bye.")
+        assert list(chunks) == ["Bye."]
+        mock_acquire.assert_called_once_with(model_info, 12)
+        mock_report_call_outcome.assert_called_once()
+        # The stream closed before the provider reported usage, so the streamed tokens are estimated
+        mock_reconcile.assert_called_once()
+        assert mock_reconcile.call_args.args[:2] == (model_info, 12)
+        assert mock_reconcile.call_args.args[2] > 12
+
+
+def test_query_llm_stream_response_cache(tmp_path):
+    model_info = "gpt-4o"
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+
+    enable_response_cache(path=str(tmp_path / "cache.db"))
+    try:
+        with patch.object(
+            openai_client.chat.completions,
+            "create",
+            side_effect=[make_stream(["I am ", "fine."]), make_stream(["Other"])],
+        ) as mock_create:
+            assert "".join(query_llm_stream(model_info, message_history)) == (
+                "I am fine."
+            )
+            assert list(query_llm_stream(model_info, message_history)) == ["I am fine."]
+            assert query_llm(model_info, message_history) == "I am fine."
+            mock_create.assert_called_once()
+    finally:
+        disable_response_cache()
+
+
+class EchoBackend(ProviderBackend):
+    def complete(self, model_info, message_history):
+        return {
+            "content": message_history[-1]["content"],
+            "usage": {"total_tokens": 1},
+        }
+
+    async def complete_async(self, model_info, message_history):
+        return self.complete(model_info, message_history)
+
+    def stream(self, model_info, message_history):
+        for word in message_history[-1]["content"].split(" "):
+            yield {"content": word, "usage": None}
+
+
+def test_register_provider():
+    assert "gpt-4o" in get_supported_models()
+    assert get_provider("gpt-4o") is providers["openai"]
+    assert get_provider("claude-3-haiku-20240307") is providers["anthropic"]
+    assert get_provider("mistral-large-latest") is providers["mistral"]
+    with pytest.raises(LLMClientError):
+        get_provider("invalid-model")
+    with pytest.raises(ValueError):
+        register_provider(EchoBackend("echo"), [])
+
+    register_provider(EchoBackend("echo"), ["echo-model"])
+    try:
+        message_history = [{"role": "user", "content": "Hello there"}]
+        assert "echo-model" in get_supported_models()
+        assert query_llm("echo-model", message_history) == "Hello there"
+        assert asyncio.run(query_llm_async("echo-model", message_history)) == (
+            "Hello there"
+        )
+        assert list(query_llm_stream("echo-model", message_history)) == [
+            "Hello",
+            "there",
+        ]
+    finally:
+        providers.pop("echo")
+        model_providers.pop("echo-model")
+
+
+def test_query_llm_records_usage():
+    message_history = [{"role": "user", "content": "Hello there"}]
+    usage = {}
+    register_provider(EchoBackend("echo"), ["echo-model"])
+    try:
+        query_llm("echo-model", message_history, usage=usage)
+        asyncio.run(query_llm_async("echo-model", message_history, usage=usage))
+        assert usage == {
+            "calls": 2,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "total_tokens": 2,
+        }
+
+        # A stream cancelled at the stop pattern never reports usage, so it is estimated
+        stream_usage = {}
+        chunks = list(
+            query_llm_stream(
+                "echo-model", message_history, stop_pattern="Hello", usage=stream_usage
+            )
+        )
+        assert chunks == ["Hello"]
+        assert stream_usage["calls"] == 1
+        assert stream_usage["completion_tokens"] == 2
+    finally:
+        providers.pop("echo")
+        model_providers.pop("echo-model")
+
+
+def test_query_llm_samples():
+    message_history = [{"role": "user", "content": "Hello there"}]
+    usage = {}
+    register_provider(EchoBackend("echo"), ["echo-model"])
+    try:
+        assert (
+            query_llm_samples("echo-model", message_history, 3, usage=usage)
+            == ["Hello there"] * 3
+        )
+        assert usage["calls"] == 3
+        assert (
+            asyncio.run(query_llm_samples_async("echo-model", message_history, 2))
+            == ["Hello there"] * 2
+        )
+        assert query_llm_samples("mock", message_history, 2, usage=usage) != []
+        assert usage["calls"] == 4
+        with pytest.raises(LLMClientError):
+            query_llm_samples("invalid-model", message_history, 2)
+        with pytest.raises(ValueError):
+            query_llm_samples("echo-model", message_history, 0)
+    finally:
+        providers.pop("echo")
+        model_providers.pop("echo-model")
+
+
+def test_close_providers():
+    backend = OpenAIBackend(name="closing", base_url="http://127.0.0.1:8000/v1")
+    register_provider(backend, ["closing-model"])
+    try:
+        async_http_client = backend.get_async_client()._client
+        backend.get_client()
+        close_providers()
+        assert backend.client is None and backend.async_client is None
+
+        backend.get_client()
+        async_http_client = backend.get_async_client()._client
+        asyncio.run(aclose_providers())
+        assert async_http_client.is_closed
+        assert backend.client is None and backend.async_client is None
+    finally:
+        providers.pop("closing")
+        model_providers.pop("closing-model")
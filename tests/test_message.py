@@ -0,0 +1,55 @@
+import sys
+import pytest
+from talkingtomachines.generative.message import (
+    Message,
+    StringTable,
+    to_message_dicts,
+)
+from talkingtomachines.generative.tokens import count_message_tokens
+
+
+def test_message():
+    message = Message("user", "Hello there")
+    assert message["role"] == "user"
+    assert message["content"] == "Hello there"
+    assert message.get("name") is None
+    with pytest.raises(KeyError):
+        message["name"]
+
+    assert message == {"role": "user", "content": "Hello there"}
+    assert message == Message("user", "Hello there")
+    assert message != Message("assistant", "Hello there")
+    assert message.to_dict() == {"role": "user", "content": "Hello there"}
+    assert count_message_tokens(message) == count_message_tokens(message.to_dict())
+
+    with pytest.raises(AttributeError):
+        message.name = "name"
+
+
+def test_message_is_smaller_than_dict():
+    message = Message("user", "Hello there")
+    assert sys.getsizeof(message) < sys.getsizeof(message.to_dict())
+
+
+def test_to_message_dicts():
+    messages = [Message("system", "Context"), {"role": "system", "content": "Summary"}]
+    assert to_message_dicts(messages) == [
+        {"role": "system", "content": "Context"},
+        {"role": "system", "content": "Summary"},
+    ]
+    assert all(isinstance(message, dict) for message in to_message_dicts(messages))
+
+
+def test_string_table():
+    table = StringTable()
+    first_string = "".join(["shared ", "string"])
+    second_string = "".join(["shared ", "string"])
+    assert first_string is not second_string
+
+    assert table.share(first_string) is first_string
+    assert table.share(second_string) is first_string
+    assert len(table) == 1
+
+    table.clear()
+    assert len(table) == 0
+    assert table.share(second_string) is second_string
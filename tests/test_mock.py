@@ -0,0 +1,157 @@
+import json
+import pytest
+import asyncio
+from unittest.mock import patch
+from talkingtomachines.generative.llm import (
+    query_llm,
+    query_llm_stream,
+    register_provider,
+    providers,
+    model_providers,
+)
+from talkingtomachines.generative.local_server import LocalLLMServer
+from talkingtomachines.generative.mock import (
+    MockBackend,
+    ReplayBackend,
+    get_message_history_key,
+)
+from talkingtomachines.generative.providers import OpenAIBackend
+from talkingtomachines.generative.resilience import LLMClientError
+
+MESSAGE_HISTORY = [
+    {"role": "system", "content": "You are a respondent."},
+    {"role": "assistant", "content": "Hello, how are you?"},
+]
+
+
+def test_mock_backend_is_deterministic():
+    backend = MockBackend(min_response_length=3, max_response_length=8)
+    completion = backend.complete("mock", MESSAGE_HISTORY)
+    assert backend.complete("mock", MESSAGE_HISTORY) == completion
+    assert 3 <= len(completion["content"].split(" ")) <= 8
+    assert completion["usage"]["total_tokens"] > 0
+    assert MockBackend(seed=1).complete("mock", MESSAGE_HISTORY) != completion
+    assert asyncio.run(backend.complete_async("mock", MESSAGE_HISTORY)) == completion
+
+    completions = list(backend.stream("mock", MESSAGE_HISTORY))
+    assert "".join(c["content"] for c in completions) == completion["content"]
+    assert completions[-1]["usage"] == completion["usage"]
+
+
+def test_mock_backend_complete_samples():
+    backend = MockBackend()
+    samples = backend.complete_samples("mock", MESSAGE_HISTORY, 3)
+    assert len(set(samples["contents"])) == 3
+    assert (
+        samples["contents"][0] == backend.complete("mock", MESSAGE_HISTORY)["content"]
+    )
+    assert (
+        samples["usage"]["prompt_tokens"]
+        == backend.complete("mock", MESSAGE_HISTORY)["usage"]["prompt_tokens"]
+    )
+    assert (
+        asyncio.run(backend.complete_samples_async("mock", MESSAGE_HISTORY, 3))
+        == samples
+    )
+
+
+def test_mock_backend_latency():
+    with patch("talkingtomachines.generative.mock.time.sleep") as mock_sleep:
+        MockBackend(mean_latency=0.2).complete("mock", MESSAGE_HISTORY)
+        mock_sleep.assert_called_once_with(0.2)
+
+    for latency_distribution in ["uniform", "exponential", "lognormal"]:
+        backend = MockBackend(
+            latency_distribution=latency_distribution,
+            mean_latency=0.2,
+            latency_spread=0.1,
+        )
+        latency = backend.generate("mock", MESSAGE_HISTORY)[1]
+        assert latency >= 0
+        assert backend.generate("mock", MESSAGE_HISTORY)[1] == latency
+
+    with pytest.raises(ValueError):
+        MockBackend(latency_distribution="invalid")
+    with pytest.raises(ValueError):
+        MockBackend(mean_latency=-1)
+    with pytest.raises(ValueError):
+        MockBackend(min_response_length=10, max_response_length=5)
+
+
+def test_mock_backend_end_of_conversation():
+    backend = MockBackend(
+        end_of_conversation="Thank you for the conversation.",
+        end_of_conversation_probability=1,
+    )
+    response = backend.complete("mock", MESSAGE_HISTORY)["content"]
+    assert response.endswith("Thank you for the conversation.")
+
+
+def test_query_llm_mock_model():
+    response = query_llm("mock", MESSAGE_HISTORY)
+    assert response == MockBackend().complete("mock", MESSAGE_HISTORY)["content"]
+    assert "".join(query_llm_stream("mock", MESSAGE_HISTORY)) == response
+
+
+def test_replay_backend(tmp_path):
+    experiment = {
+        "experiment_id": "1",
+        "sessions": {
+            "0": {
+                "agents": [
+                    {
+                        "message_history": MESSAGE_HISTORY
+                        + [
+                            {"role": "user", "content": "I am fine."},
+                            {"role": "assistant", "content": "Good."},
+                            {"role": "user", "content": "Goodbye."},
+                        ]
+                    }
+                ]
+            }
+        },
+    }
+    with open(tmp_path / "1.json", "w") as file:
+        json.dump(experiment, file)
+
+    backend = ReplayBackend.from_experiments(directory=str(tmp_path))
+    assert len(backend.transcripts) == 2
+    assert backend.complete("gpt-4o", MESSAGE_HISTORY)["content"] == "I am fine."
+    assert (
+        backend.complete(
+            "gpt-4o",
+            MESSAGE_HISTORY
+            + [
+                {"role": "user", "content": "I am fine."},
+                {"role": "assistant", "content": "Good."},
+            ],
+        )["content"]
+        == "Goodbye."
+    )
+
+    unrecorded = [{"role": "assistant", "content": "Unrecorded"}]
+    with pytest.raises(LLMClientError):
+        backend.complete("gpt-4o", unrecorded)
+    fallback_backend = ReplayBackend(backend.transcripts, fallback=True)
+    assert fallback_backend.complete("gpt-4o", unrecorded)["content"]
+    assert get_message_history_key(unrecorded) != get_message_history_key(
+        MESSAGE_HISTORY
+    )
+
+
+def test_local_server_chat_completions():
+    mock_backend = MockBackend()
+    expected = mock_backend.complete("local-mock", MESSAGE_HISTORY)["content"]
+
+    with LocalLLMServer(mock_backend.respond) as server:
+        backend = OpenAIBackend(name="local", base_url=server.base_url)
+        register_provider(backend, ["local-mock"])
+        try:
+            assert query_llm("local-mock", MESSAGE_HISTORY) == expected
+            assert "".join(query_llm_stream("local-mock", MESSAGE_HISTORY)) == (
+                expected
+            )
+        finally:
+            providers.pop("local")
+            model_providers.pop("local-mock")
+            backend.close()
@@ -0,0 +1,128 @@
+import pandas as pd
+import pytest
+from talkingtomachines.generative.llm import (
+    disable_response_cache,
+    enable_response_cache,
+    query_llm,
+)
+from talkingtomachines.main import create_app
+from talkingtomachines.management.experiment import AItoAIConversationalExperiment
+from talkingtomachines.generative.metrics import (
+    Histogram,
+    MetricsRegistry,
+    format_labels,
+    metrics_registry,
+)
+from talkingtomachines.management.monitoring import monitor_experiment
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics_registry():
+    metrics_registry.reset()
+    yield
+    metrics_registry.reset()
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    assert histogram.get_percentile(50) is None
+    for value in range(1, 1001):
+        histogram.record(value / 1000)
+
+    assert histogram.count == 1000
+    assert histogram.sum == pytest.approx(500.5)
+    for percentile in [50, 90, 99, 99.9]:
+        assert histogram.get_percentile(percentile) == pytest.approx(
+            percentile / 100, rel=1 / 128
+        )
+    assert histogram.get_percentile(100) == pytest.approx(1, rel=1 / 128)
+    assert len(histogram.counts) < 1000
+
+
+def test_histogram_small_values_and_merge():
+    histogram = Histogram()
+    histogram.record(0)
+    histogram.record(5e-6)
+    assert histogram.get_percentile(50) == 0
+    assert histogram.get_percentile(100) == pytest.approx(5e-6)
+
+    other_histogram = Histogram()
+    other_histogram.record(2.0)
+    histogram.merge(other_histogram)
+    assert histogram.summarize()["count"] == 3
+    assert histogram.get_percentile(100) == pytest.approx(2.0, rel=1 / 128)
+
+
+def test_metrics_registry_export_prometheus():
+    registry = MetricsRegistry()
+    registry.increment("llm_retries_total", model="gpt-4o")
+    registry.increment("llm_retries_total", value=2, model="gpt-4o")
+    registry.observe("llm_request_duration_seconds", 0.5, model="gpt-4o")
+    assert registry.get_counter("llm_retries_total", model="gpt-4o") == 3
+    assert registry.get_counter("llm_retries_total", model="gpt-4") == 0
+    assert (
+        registry.get_histogram("llm_request_duration_seconds", model="gpt-4o").count
+        == 1
+    )
+
+    output = registry.export_prometheus(quantiles=[0.5])
+    assert "# TYPE llm_retries_total counter" in output
+    assert 'llm_retries_total{model="gpt-4o"} 3' in output
+    assert "# TYPE llm_request_duration_seconds summary" in output
+    assert 'llm_request_duration_seconds{model="gpt-4o",quantile="0.5"} 0.5' in output
+    assert 'llm_request_duration_seconds_count{model="gpt-4o"} 1' in output
+
+    registry.reset()
+    assert registry.export_prometheus() == "\n"
+
+
+def test_format_labels():
+    assert format_labels(()) == ""
+    assert format_labels((("role", 'a"b\\c\n'),)) == '{role="a\\"b\\\\c\\n"}'
+
+
+def test_metrics_route():
+    metrics_registry.increment("llm_retries_total", model="mock")
+    client = create_app().test_client()
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert 'llm_retries_total{model="mock"} 1' in response.get_data(as_text=True)
+
+
+def test_query_llm_metrics():
+    message_history = [{"role": "user", "content": "Hello"}]
+    enable_response_cache(path=None)
+    try:
+        query_llm("mock", message_history)
+        query_llm("mock", message_history)
+    finally:
+        disable_response_cache()
+
+    assert metrics_registry.get_counter("llm_cache_misses_total", model="mock") == 1
+    assert metrics_registry.get_counter("llm_cache_hits_total", model="mock") == 1
+    histogram = metrics_registry.get_histogram(
+        "llm_request_duration_seconds", model="mock"
+    )
+    assert histogram.count == 1
+
+
+def test_monitor_experiment(mocker):
+    experiment = AItoAIConversationalExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": [1, 2, 3, 4]}),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_sessions=2,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1"},
+    )
+    mocker.patch.object(experiment, "save_experiment")
+    experiment.run_experiment(test_mode=False)
+
+    summary = monitor_experiment(experiment.get_experiment_id())
+    assert summary["completed_sessions"] == 2
+    assert summary["aborted_sessions"] == 0
+    assert summary["session_duration"]["count"] == 2
+    assert summary["turn_duration"]["count"] == 10
+    assert monitor_experiment("unknown")["session_duration"]["count"] == 0
@@ -0,0 +1,88 @@
+import math
+import pytest
+import pandas as pd
+from talkingtomachines.generative.persona import PersonaCompiler, is_missing_value
+from talkingtomachines.generative.prompt import generate_demographic_prompt
+from talkingtomachines.generative.tokens import count_tokens
+
+
+def test_is_missing_value():
+    assert is_missing_value(None)
+    assert is_missing_value(math.nan)
+    assert is_missing_value(pd.NaT)
+    assert is_missing_value(pd.NA)
+    assert is_missing_value("  ")
+    assert not is_missing_value(0)
+    assert not is_missing_value("No")
+    assert not is_missing_value(pd.Timestamp("2020-01-01"))
+
+
+def test_persona_compiler_invalid_max_tokens():
+    with pytest.raises(ValueError):
+        PersonaCompiler(max_tokens=0)
+
+
+def test_persona_compiler_without_budget():
+    compiler = PersonaCompiler()
+    demographic_info = {"ID": 1, "Age": 30, "Income": math.nan, "Country": "Kenya"}
+    assert compiler.compile(demographic_info) == generate_demographic_prompt(
+        {"Age": 30, "Country": "Kenya"}
+    )
+
+
+def test_persona_compiler_priority_and_relevance_scores():
+    compiler = PersonaCompiler(
+        priority=["Country"],
+        relevance_scores={"Age": 0.5, "Religion": 0.9, "Occupation": 0},
+    )
+    demographic_info = {
+        "ID": 1,
+        "Age": 30,
+        "Occupation": "Farmer",
+        "Religion": "None",
+        "Country": "Kenya",
+        "Language": "Swahili",
+    }
+    assert compiler.compile(demographic_info) == generate_demographic_prompt(
+        {"Country": "Kenya", "Religion": "None", "Age": 30, "Language": "Swahili"}
+    )
+
+
+def test_persona_compiler_token_budget():
+    compiler = PersonaCompiler(max_tokens=16, priority=["Biography", "Age"])
+    demographic_info = {
+        "ID": 1,
+        "Biography": "A very long biography " * 10,
+        "Age": 30,
+        "Country": "Kenya",
+    }
+    persona = compiler.compile(demographic_info)
+
+    # The biography does not fit, so the shorter fields of lower priority are selected
+    assert persona == generate_demographic_prompt({"Age": 30, "Country": "Kenya"})
+    assert count_tokens(persona) <= 16
+    assert compiler.get_token_report() == {
+        1: {
+            "num_fields": 2,
+            "num_tokens": count_tokens(persona),
+            "full_num_tokens": count_tokens(
+                generate_demographic_prompt(demographic_info)
+            ),
+        }
+    }
+
+
+def test_persona_compiler_caches_personas_by_id(mocker):
+    compiler = PersonaCompiler(max_tokens=20)
+    agent_demographics = pd.DataFrame(
+        {"ID": [1, 2], "Age": [30, 40], "Country": ["Kenya", "Ghana"]}
+    )
+    personas = compiler.compile_personas(agent_demographics)
+    assert personas == [
+        generate_demographic_prompt({"Age": 30, "Country": "Kenya"}),
+        generate_demographic_prompt({"Age": 40, "Country": "Ghana"}),
+    ]
+
+    mock_select_fields = mocker.patch.object(compiler, "select_fields")
+    assert compiler.compile({"ID": 1, "Age": 30, "Country": "Kenya"}) == personas[0]
+    mock_select_fields.assert_not_called()
@@ -0,0 +1,196 @@
+import time
+import asyncio
+import pytest
+from talkingtomachines.generative.llm import (
+    create_openai_backend,
+    get_provider_metrics,
+    providers,
+    register_provider,
+    model_providers,
+    query_llm,
+)
+from talkingtomachines.generative.pool import PoolMember, ProviderPool
+from talkingtomachines.generative.providers import OpenAIBackend, ProviderBackend
+from talkingtomachines.generative.resilience import (
+    LLMClientError,
+    LLMRateLimitError,
+    LLMServerError,
+)
+
+MESSAGE_HISTORY = [{"role": "user", "content": "Hello there"}]
+
+
+class RecordingBackend(ProviderBackend):
+    def __init__(self, name, error=None):
+        super().__init__(name)
+        self.error = error
+        self.calls = 0
+
+    def complete(self, model_info, message_history):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return {"content": self.name, "usage": {"total_tokens": 10}}
+
+    async def complete_async(self, model_info, message_history):
+        return self.complete(model_info, message_history)
+
+    def stream(self, model_info, message_history):
+        self.calls += 1
+        yield {"content": self.name, "usage": None}
+        yield {"content": "", "usage": {"total_tokens": 10}}
+
+
+def test_provider_pool_invalid_arguments():
+    with pytest.raises(ValueError):
+        ProviderPool([])
+    with pytest.raises(ValueError):
+        ProviderPool([RecordingBackend("a")], routing="random")
+    with pytest.raises(ValueError):
+        ProviderPool([RecordingBackend("a"), RecordingBackend("a")])
+
+
+def test_provider_pool_least_outstanding_routing():
+    pool = ProviderPool([RecordingBackend("a"), RecordingBackend("b")])
+    first_member, _ = pool.reserve(10)
+    second_member, _ = pool.reserve(10)
+    assert first_member is not second_member
+
+    pool.release(first_member)
+    pool.record_success(first_member, 10, None, 0.1)
+    assert pool.reserve(10)[0] is first_member
+
+
+def test_provider_pool_releases_cancelled_requests():
+    class HangingBackend(RecordingBackend):
+        async def complete_async(self, model_info, message_history):
+            await asyncio.sleep(10)
+
+    pool = ProviderPool([HangingBackend("a"), RecordingBackend("b")])
+    message_history = [{"role": "user", "content": "Hello"}]
+
+    async def cancel_request():
+        task = asyncio.ensure_future(pool.complete_async("gpt-4o", message_history))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_request())
+    metrics = pool.get_metrics()
+    assert metrics["a"]["in_flight"] == 0
+    assert metrics["a"]["failures"] == 0
+    assert metrics["a"]["ejections"] == 0
+
+
+def test_provider_pool_remaining_quota_routing():
+    pool = ProviderPool(
+        [
+            PoolMember(RecordingBackend("small"), tokens_per_minute=1000),
+            PoolMember(RecordingBackend("large"), tokens_per_minute=100_000),
+        ],
+        routing="remaining_quota",
+    )
+    assert pool.complete("model", MESSAGE_HISTORY)["content"] == "small"
+    for _ in range(3):
+        assert pool.complete("model", MESSAGE_HISTORY)["content"] == "large"
+    assert pool.get_metrics()["small"]["remaining_quota"] < 1
+
+
+def test_provider_pool_waits_for_quota():
+    pool = ProviderPool([PoolMember(RecordingBackend("a"), requests_per_minute=1)])
+    assert pool.reserve(10)[1] == 0
+    assert pool.reserve(10)[1] == pytest.approx(60, abs=0.1)
+
+
+def test_provider_pool_ejects_unhealthy_members():
+    failing_backend = RecordingBackend("failing", error=LLMServerError("Outage"))
+    healthy_backend = RecordingBackend("healthy")
+    pool = ProviderPool(
+        [failing_backend, healthy_backend], failure_threshold=2, ejection_time=60
+    )
+    for _ in range(2):
+        pool.members[1].in_flight = 1
+        with pytest.raises(LLMServerError):
+            pool.complete("model", MESSAGE_HISTORY)
+    pool.members[1].in_flight = 0
+
+    for _ in range(3):
+        assert pool.complete("model", MESSAGE_HISTORY)["content"] == "healthy"
+    assert failing_backend.calls == 2
+
+    metrics = pool.get_metrics()
+    assert metrics["failing"]["ejected"] is True
+    assert metrics["failing"]["failures"] == 2
+    assert metrics["failing"]["ejections"] == 1
+    assert metrics["healthy"]["requests"] == 3
+    assert metrics["healthy"]["total_tokens"] == 30
+    assert metrics["healthy"]["in_flight"] == 0
+
+
+def test_provider_pool_ejection_on_rate_limit_and_client_errors():
+    pool = ProviderPool(
+        [
+            RecordingBackend(
+                "limited", error=LLMRateLimitError("Slow down", retry_after=0.05)
+            ),
+            RecordingBackend("invalid", error=LLMClientError("Bad request")),
+        ]
+    )
+    with pytest.raises(LLMRateLimitError):
+        pool.complete("model", MESSAGE_HISTORY)
+    with pytest.raises(LLMClientError):
+        pool.complete("model", MESSAGE_HISTORY)
+
+    metrics = pool.get_metrics()
+    assert metrics["limited"]["ejected"] is True
+    assert metrics["invalid"]["ejected"] is False
+
+    time.sleep(0.06)
+    assert pool.get_metrics()["limited"]["ejected"] is False
+
+
+def test_provider_pool_routes_to_first_returning_member_when_all_ejected():
+    pool = ProviderPool([RecordingBackend("a"), RecordingBackend("b")])
+    pool.members[0].ejected_until = time.monotonic() + 60
+    pool.members[1].ejected_until = time.monotonic() + 30
+    assert pool.reserve(10)[0].backend.name == "b"
+
+
+def test_provider_pool_async_and_stream():
+    pool = ProviderPool([RecordingBackend("a")])
+    completion = asyncio.run(pool.complete_async("model", MESSAGE_HISTORY))
+    assert completion["content"] == "a"
+
+    chunks = list(pool.stream("model", MESSAGE_HISTORY))
+    assert chunks[-1]["usage"] == {"total_tokens": 10}
+
+    stream = pool.stream("model", MESSAGE_HISTORY)
+    next(stream)
+    stream.close()
+    metrics = pool.get_metrics()["a"]
+    assert metrics["requests"] == 3
+    assert metrics["failures"] == 0
+    assert metrics["in_flight"] == 0
+
+
+def test_provider_pool_registration():
+    pool = ProviderPool([RecordingBackend("a"), RecordingBackend("b")], name="pool")
+    register_provider(pool, ["pool-model"])
+    try:
+        assert query_llm("pool-model", MESSAGE_HISTORY) in ["a", "b"]
+        metrics = get_provider_metrics()["pool"]
+        assert metrics["a"]["requests"] + metrics["b"]["requests"] == 1
+    finally:
+        providers.pop("pool")
+        model_providers.pop("pool-model")
+
+
+def test_create_openai_backend():
+    assert isinstance(create_openai_backend(["key"]), OpenAIBackend)
+
+    pool = create_openai_backend(["key-1", "key-2"])
+    assert isinstance(pool, ProviderPool)
+    assert pool.name == "openai"
+    assert [member.backend.api_key for member in pool.members] == ["key-1", "key-2"]
+    assert pool.get_client() is pool.members[0].backend.get_client()
@@ -1,7 +1,18 @@
+import pytest
+import numpy as np
+import pandas as pd
 from talkingtomachines.generative.prompt import (
+    PromptTemplate,
+    check_conversational_agent_template,
+    check_prompt_layout,
+    compile_conversational_agent_system_message_template,
     generate_demographic_prompt,
+    generate_demographic_prompts,
     generate_conversational_agent_system_message,
     generate_conversational_session_system_message,
+    generate_survey_block_prompt,
+    generate_survey_question_prompt,
+    generate_survey_system_message,
 )
 
 
@@ -33,6 +44,26 @@ def test_generate_demographic_prompt_invalid_input():
     assert generate_demographic_prompt(demographic_info) == expected_output
 
 
+def test_generate_demographic_prompts_matches_generate_demographic_prompt():
+    agent_demographics = pd.DataFrame(
+        {
+            "ID": [1, 2, 3],
+            "Age": [25.5, np.nan, 3.0],
+            "What is your {name}?": ["Alice", None, "Carol"],
+            "Birthday": pd.to_datetime(["2000-01-01", "2001-02-03", None]),
+            "Employed": [True, False, True],
+            "Region": pd.Categorical(["North", "South", "North"]),
+            "Children": pd.array([1, None, 3], dtype="Int64"),
+        }
+    )
+    expected_output = [
+        generate_demographic_prompt(demographic_info)
+        for demographic_info in agent_demographics.to_dict(orient="records")
+    ]
+    assert generate_demographic_prompts(agent_demographics) == expected_output
+    assert generate_demographic_prompts(agent_demographics[[]]) == ["", "", ""]
+
+
 def test_generate_conversational_agent_system_message_valid_input():
     experiment_context = "Experiment A"
     treatment = "Treatment 1"
@@ -103,3 +134,155 @@ def test_generate_conversational_session_system_message_none_input():
         generate_conversational_session_system_message(experiment_context, treatment)
         == expected_output
     )
+
+
+def test_generate_conversational_agent_system_message_cache_friendly():
+    system_messages = [
+        generate_conversational_agent_system_message(
+            " Experiment A\n",
+            treatment,
+            "Interviewer",
+            demographic_info,
+            prompt_layout="cache_friendly",
+        )
+        for treatment, demographic_info in [
+            ("Treatment 1", "Alice"),
+            ("Treatment 2", ""),
+        ]
+    ]
+    assert system_messages == [
+        "Experiment A\n\nInterviewer\n\nTreatment 1\n\nAlice",
+        "Experiment A\n\nInterviewer\n\nTreatment 2",
+    ]
+    assert (
+        generate_conversational_session_system_message(
+            "Experiment A", "", prompt_layout="cache_friendly"
+        )
+        == "Experiment A"
+    )
+
+
+def test_check_prompt_layout_invalid():
+    assert check_prompt_layout("cache_friendly") == "cache_friendly"
+    with pytest.raises(ValueError):
+        check_prompt_layout("compact")
+    with pytest.raises(ValueError):
+        generate_conversational_agent_system_message(
+            "Experiment A",
+            "Treatment 1",
+            "Interviewer",
+            "Alice",
+            prompt_layout="compact",
+        )
+
+
+def test_generate_survey_prompts():
+    assert (
+        generate_survey_system_message("Context", "", "Age: 30") == "Context\n\nAge: 30"
+    )
+
+    block_prompt = generate_survey_block_prompt(
+        {"Q1": "Do you trust the police?", "Q2": "How old are you?"},
+        {"Q1": ["Yes", "No"]},
+    )
+    assert "JSON object" in block_prompt
+    assert block_prompt.endswith(
+        "Q1: Do you trust the police? Options: Yes; No\nQ2: How old are you?"
+    )
+
+    question_prompt = generate_survey_question_prompt(
+        "Q1", "Do you trust the police?", ["Yes", "No"]
+    )
+    assert "exactly one of the options" in question_prompt
+    assert question_prompt.endswith("Q1: Do you trust the police? Options: Yes; No")
+
+
+def test_prompt_template_partial_and_render():
+    template = PromptTemplate(
+        ["{context}", "Role: {role!r}", "{{literal}} {score:.1f}", "{demographic_info}"]
+    )
+    assert template.placeholders == ["context", "role", "score", "demographic_info"]
+
+    compiled_template = template.partial(
+        context="Context with {braces}", role="Buyer", score=2, unused="value"
+    )
+    assert compiled_template.placeholders == ["demographic_info"]
+    assert compiled_template.sections[0] == (
+        "Context with {braces}\n\nRole: 'Buyer'\n\n{literal} 2.0",
+    )
+    assert (
+        compiled_template.render(demographic_info="Age: 30")
+        == "Context with {braces}\n\nRole: 'Buyer'\n\n{literal} 2.0\n\nAge: 30"
+    )
+
+    with pytest.raises(ValueError):
+        compiled_template.render()
+    with pytest.raises(ValueError):
+        PromptTemplate("{0} and {}")
+    with pytest.raises(ValueError):
+        PromptTemplate("{unclosed")
+
+
+def test_prompt_template_skip_empty_sections():
+    template = PromptTemplate(
+        ["{first}", "{second}", "{third}"], skip_empty_sections=True
+    ).partial(first="  First ", second=" ")
+    assert template.sections == [("First",), (("third", None, ""),)]
+    assert template.render(third="") == "First"
+    assert template.render(third=" Third ") == "First\n\nThird"
+
+
+@pytest.mark.parametrize("prompt_layout", ["default", "cache_friendly"])
+@pytest.mark.parametrize("treatment", ["Treatment {A}", ""])
+@pytest.mark.parametrize("demographic_info", ["1) Interviewer: Age Me: 30 ", ""])
+def test_compile_conversational_agent_system_message_template(
+    prompt_layout, treatment, demographic_info
+):
+    template = compile_conversational_agent_system_message_template(
+        experiment_context="Context",
+        treatment=treatment,
+        role_description="Role description",
+        prompt_layout=prompt_layout,
+    )
+    assert template.placeholders == ["demographic_info"]
+    expected_output = {
+        "default": f"Context\n\n{treatment}\n\nRole description\n\n{demographic_info}",
+        "cache_friendly": "\n\n".join(
+            section.strip()
+            for section in [
+                "Context",
+                "Role description",
+                treatment,
+                demographic_info,
+            ]
+            if section.strip()
+        ),
+    }[prompt_layout]
+    assert template.render(demographic_info=demographic_info) == expected_output
+    assert (
+        generate_conversational_agent_system_message(
+            experiment_context="Context",
+            treatment=treatment,
+            role_description="Role description",
+            demographic_info=demographic_info,
+            prompt_layout=prompt_layout,
+        )
+        == expected_output
+    )
+
+
+def test_compile_conversational_agent_system_message_custom_template():
+    template = compile_conversational_agent_system_message_template(
+        experiment_context="Context",
+        treatment="Treatment",
+        role_description="Role description",
+        role="Buyer",
+        template="You are the {role} in {experiment_context}. {treatment}\n{demographic_info}",
+    )
+    assert (
+        template.render(demographic_info="Age: 30")
+        == "You are the Buyer in Context. Treatment\nAge: 30"
+    )
+
+    with pytest.raises(ValueError):
+        check_conversational_agent_template("{experiment_context} {unknown}")
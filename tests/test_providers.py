@@ -0,0 +1,225 @@
+import json
+import asyncio
+import httpx
+from unittest.mock import MagicMock
+from talkingtomachines.generative.providers import (
+    AnthropicBackend,
+    OpenAIBackend,
+    ProviderBackend,
+    normalize_usage,
+)
+
+
+def make_anthropic_backend(handler):
+    backend = AnthropicBackend(api_key="test_key", base_url="https://anthropic.test/v1")
+    transport = httpx.MockTransport(handler)
+    backend.client = httpx.Client(
+        base_url="https://anthropic.test/v1",
+        headers=backend.get_headers(),
+        transport=transport,
+    )
+    backend.async_client = httpx.AsyncClient(
+        base_url="https://anthropic.test/v1",
+        headers=backend.get_headers(),
+        transport=transport,
+    )
+    return backend
+
+
+def test_normalize_usage():
+    assert normalize_usage(None) is None
+
+    usage = MagicMock(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    usage.prompt_tokens_details.cached_tokens = 8
+    assert normalize_usage(usage) == {
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "total_tokens": 15,
+        "cached_tokens": 8,
+    }
+    assert normalize_usage({"prompt_tokens": 3, "total_tokens": 3}) == {
+        "prompt_tokens": 3,
+        "completion_tokens": 0,
+        "total_tokens": 3,
+        "cached_tokens": 0,
+    }
+
+
+def test_openai_backend_pooled_clients():
+    backend = OpenAIBackend(name="local", base_url="http://127.0.0.1:8000/v1")
+    assert backend.name == "local"
+    assert backend.client is None and backend.async_client is None
+
+    client = backend.get_client()
+    assert backend.get_client() is client
+    assert str(client.base_url) == "http://127.0.0.1:8000/v1/"
+    assert client.max_retries == 0
+    assert isinstance(client._client, httpx.Client)
+    assert isinstance(backend.get_async_client()._client, httpx.AsyncClient)
+
+    backend.close()
+    assert backend.client is None
+    assert backend.async_client is None
+
+
+def test_provider_backends_aclose():
+    openai_backend = OpenAIBackend(name="local", base_url="http://127.0.0.1:8000/v1")
+    anthropic_backend = make_anthropic_backend(lambda request: httpx.Response(200))
+
+    async def close_backends():
+        async_http_client = openai_backend.get_async_client()._client
+        openai_backend.get_client()
+        await openai_backend.aclose()
+        assert async_http_client.is_closed
+
+        async_client = anthropic_backend.async_client
+        await anthropic_backend.aclose()
+        assert async_client.is_closed
+        # Closing a backend whose clients were never constructed does nothing
+        await anthropic_backend.aclose()
+
+    asyncio.run(close_backends())
+    assert openai_backend.client is None and openai_backend.async_client is None
+    assert anthropic_backend.client is None
+
+
+def test_anthropic_backend_build_payload():
+    backend = AnthropicBackend(max_tokens=256)
+    payload = backend.build_payload(
+        "claude-3-haiku-20240307",
+        [
+            {"role": "system", "content": "You are a respondent."},
+            {"role": "user", "content": "Hello"},
+        ],
+    )
+    assert payload == {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": 256,
+        "messages": [{"role": "user", "content": "Hello"}],
+        "system": "You are a respondent.",
+    }
+
+
+def test_anthropic_backend_prompt_caching():
+    backend = AnthropicBackend(prompt_caching=True)
+    assert backend.get_headers()["anthropic-beta"] == backend.PROMPT_CACHING_BETA
+    payload = backend.build_payload(
+        "claude-3-haiku-20240307",
+        [
+            {"role": "system", "content": "You are a respondent."},
+            {"role": "user", "content": "Hello"},
+        ],
+    )
+    assert payload["system"] == [
+        {
+            "type": "text",
+            "text": "You are a respondent.",
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    assert "anthropic-beta" not in AnthropicBackend().get_headers()
+
+
+def test_anthropic_backend_complete():
+    def handler(request):
+        assert request.url.path == "/v1/messages"
+        assert request.headers["x-api-key"] == "test_key"
+        assert json.loads(request.content)["model"] == "claude-3-haiku-20240307"
+        return httpx.Response(
+            200,
+            json={
+                "content": [{"type": "text", "text": "I am fine."}],
+                "usage": {"input_tokens": 12, "output_tokens": 4},
+            },
+        )
+
+    backend = make_anthropic_backend(handler)
+    message_history = [{"role": "user", "content": "Hello, how are you?"}]
+    expected = {
+        "content": "I am fine.",
+        "usage": {
+            "prompt_tokens": 12,
+            "completion_tokens": 4,
+            "total_tokens": 16,
+            "cached_tokens": 0,
+        },
+    }
+    assert backend.complete("claude-3-haiku-20240307", message_history) == expected
+    assert (
+        asyncio.run(backend.complete_async("claude-3-haiku-20240307", message_history))
+        == expected
+    )
+
+
+def test_anthropic_backend_stream():
+    events = [
+        {"type": "message_start", "message": {"usage": {"input_tokens": 12}}},
+        {"type": "content_block_delta", "delta": {"text": "I am "}},
+        {"type": "content_block_delta", "delta": {"text": "fine."}},
+        {"type": "message_delta", "usage": {"output_tokens": 4}},
+    ]
+    body = "".join(
+        f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events
+    )
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=body)
+
+    backend = make_anthropic_backend(handler)
+    completions = list(
+        backend.stream(
+            "claude-3-haiku-20240307", [{"role": "user", "content": "Hello"}]
+        )
+    )
+    assert [completion["content"] for completion in completions] == [
+        "I am ",
+        "fine.",
+        "",
+    ]
+    assert completions[-1]["usage"]["total_tokens"] == 16
+
+
+class CountingBackend(ProviderBackend):
+    def __init__(self):
+        super().__init__("counting")
+        self.calls = 0
+
+    def complete(self, model_info, message_history):
+        self.calls += 1
+        return {
+            "content": f"Response {self.calls}",
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        }
+
+    async def complete_async(self, model_info, message_history):
+        return self.complete(model_info, message_history)
+
+
+def test_provider_backend_complete_samples_fallback():
+    backend = CountingBackend()
+    samples = backend.complete_samples("model", [], 3)
+    assert samples["contents"] == ["Response 1", "Response 2", "Response 3"]
+    assert samples["usage"]["calls"] == 3
+    assert samples["usage"]["prompt_tokens"] == 30
+    assert samples["usage"]["total_tokens"] == 36
+
+    samples = asyncio.run(backend.complete_samples_async("model", [], 2))
+    assert len(samples["contents"]) == 2
+    assert backend.calls == 5
+
+
+def test_openai_backend_complete_samples():
+    backend = OpenAIBackend()
+    response = MagicMock()
+    response.choices = [MagicMock(), MagicMock()]
+    response.choices[0].message.content = "Yes"
+    response.choices[1].message.content = "No"
+    response.usage = {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+    backend.client = MagicMock()
+    backend.client.chat.completions.create.return_value = response
+
+    samples = backend.complete_samples("gpt-4o", [], 2)
+    assert samples["contents"] == ["Yes", "No"]
+    assert samples["usage"]["prompt_tokens"] == 10
+    assert backend.client.chat.completions.create.call_args.kwargs["n"] == 2
@@ -0,0 +1,129 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, patch
+from talkingtomachines.generative.rate_limit import TokenBucket, RateLimiter
+from talkingtomachines.generative.tokens import (
+    TokenCountCache,
+    count_tokens,
+    estimate_message_tokens,
+    token_count_cache,
+)
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("Hi") == 1
+    assert count_tokens("a" * 40) == 10
+
+
+def test_count_tokens_cache():
+    cache = TokenCountCache(max_characters=100, max_text_length=50)
+    cache.set("a" * 40, 10)
+    cache.set("b" * 40, 10)
+    assert cache.get("a" * 40) == 10 and cache.hits == 1
+    # The cache is bounded by the length of its texts, evicting the least recently used
+    cache.set("c" * 40, 10)
+    assert cache.get("b" * 40) is None
+    assert cache.num_characters == 80
+    cache.set("d" * 60, 15)
+    assert cache.get("d" * 60) is None
+
+    encode = MagicMock(side_effect=lambda text: text.split())
+    with patch(
+        "talkingtomachines.generative.tokens.encoding", MagicMock(encode=encode)
+    ):
+        token_count_cache.clear()
+        assert count_tokens("one two three") == 3
+        assert count_tokens("one two three") == 3
+        assert encode.call_count == 1
+    token_count_cache.clear()
+
+
+def test_estimate_message_tokens():
+    message_history = [
+        {"role": "system", "content": "a" * 40},
+        {"role": "user", "content": "a" * 8},
+    ]
+    assert estimate_message_tokens([]) == 3
+    assert estimate_message_tokens(message_history) == 3 + (4 + 10) + (4 + 2)
+
+
+def test_token_bucket_wait_time():
+    with patch(
+        "talkingtomachines.generative.rate_limit.time.monotonic", return_value=0
+    ):
+        bucket = TokenBucket(capacity=60, refill_rate=1)
+        assert bucket.get_wait_time(60) == 0
+        bucket.consume(60)
+        assert bucket.get_wait_time(10) == 10
+        assert bucket.get_wait_time(120) == 60
+
+    with patch(
+        "talkingtomachines.generative.rate_limit.time.monotonic", return_value=10
+    ):
+        assert bucket.get_wait_time(10) == 0
+
+
+def test_rate_limiter_unconfigured_model_is_not_limited():
+    rate_limiter = RateLimiter()
+    for _ in range(1000):
+        assert rate_limiter.reserve("gpt-4o", 10_000) == 0
+
+
+def test_rate_limiter_request_and_token_limits():
+    rate_limiter = RateLimiter()
+    with patch(
+        "talkingtomachines.generative.rate_limit.time.monotonic", return_value=0
+    ):
+        rate_limiter.configure("gpt-4o", requests_per_minute=2, tokens_per_minute=600)
+        assert rate_limiter.reserve("gpt-4o", 100) == 0
+        assert rate_limiter.reserve("gpt-4o", 100) == 0
+        assert rate_limiter.reserve("gpt-4o", 100) == pytest.approx(30)
+        assert rate_limiter.reserve("gpt-4o-mini", 100) == 0
+
+    with patch(
+        "talkingtomachines.generative.rate_limit.time.monotonic", return_value=0
+    ):
+        rate_limiter.configure("gpt-4o", requests_per_minute=100, tokens_per_minute=600)
+        assert rate_limiter.reserve("gpt-4o", 500) == 0
+        assert rate_limiter.reserve("gpt-4o", 200) == pytest.approx(10)
+
+
+def test_rate_limiter_reconcile():
+    rate_limiter = RateLimiter()
+    with patch(
+        "talkingtomachines.generative.rate_limit.time.monotonic", return_value=0
+    ):
+        rate_limiter.configure("gpt-4o", tokens_per_minute=600)
+        assert rate_limiter.reserve("gpt-4o", 100) == 0
+        rate_limiter.reconcile("gpt-4o", estimated_tokens=100, actual_tokens=400)
+        assert rate_limiter.token_buckets["gpt-4o"].available == 200
+        rate_limiter.reconcile("gpt-4o", estimated_tokens=100, actual_tokens=None)
+        assert rate_limiter.token_buckets["gpt-4o"].available == 200
+
+
+def test_rate_limiter_acquire_waits():
+    rate_limiter = RateLimiter()
+    rate_limiter.configure("gpt-4o", requests_per_minute=1)
+    with patch.object(rate_limiter, "reserve", side_effect=[5.0, 0.0]), patch(
+        "talkingtomachines.generative.rate_limit.time.sleep"
+    ) as mock_sleep:
+        rate_limiter.acquire("gpt-4o", 10)
+        mock_sleep.assert_called_once_with(5.0)
+
+    async def no_sleep(seconds):
+        return None
+
+    with patch.object(rate_limiter, "reserve", side_effect=[5.0, 0.0]), patch(
+        "talkingtomachines.generative.rate_limit.asyncio.sleep", side_effect=no_sleep
+    ) as mock_sleep:
+        asyncio.run(rate_limiter.acquire_async("gpt-4o", 10))
+        mock_sleep.assert_called_once_with(5.0)
+
+
+def test_rate_limiter_invalid_limits():
+    rate_limiter = RateLimiter()
+    with pytest.raises(ValueError):
+        rate_limiter.configure("gpt-4o", requests_per_minute=0)
+    with pytest.raises(ValueError):
+        rate_limiter.configure("gpt-4o", tokens_per_minute=-1)
@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+import httpx
+import openai
+from unittest.mock import patch
+from talkingtomachines.generative.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMClientError,
+    LLMRateLimitError,
+    LLMServerError,
+    LLMTimeoutError,
+    ResilientCaller,
+    RetryPolicy,
+    classify_error,
+)
+
+
+def make_api_error(error_class, status_code, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request, headers=headers or {})
+    return error_class("API error", response=response, body=None)
+
+
+def test_classify_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+    rate_limit_error = classify_error(
+        make_api_error(openai.RateLimitError, 429, {"retry-after": "7"}), "gpt-4o"
+    )
+    assert isinstance(rate_limit_error, LLMRateLimitError)
+    assert rate_limit_error.retry_after == 7
+    assert rate_limit_error.model_info == "gpt-4o"
+    assert isinstance(
+        classify_error(openai.APITimeoutError(request=request)), LLMTimeoutError
+    )
+    assert isinstance(
+        classify_error(make_api_error(openai.InternalServerError, 502)),
+        LLMServerError,
+    )
+    assert isinstance(
+        classify_error(make_api_error(openai.AuthenticationError, 401)),
+        LLMClientError,
+    )
+    assert isinstance(classify_error(ValueError("bad input")), LLMClientError)
+    assert LLMRateLimitError.retryable and not LLMClientError.retryable
+
+
+def test_retry_policy_decorrelated_jitter():
+    retry_policy = RetryPolicy(max_attempts=5, base_delay=1, max_delay=10)
+    error = LLMServerError("Server error")
+    delay = retry_policy.base_delay
+    for _ in range(20):
+        next_delay = retry_policy.get_next_delay(delay, error)
+        assert 1 <= next_delay <= min(10, delay * 3)
+        delay = next_delay
+
+    assert retry_policy.get_next_delay(1, LLMRateLimitError("", retry_after=8)) >= 8
+
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(base_delay=5, max_delay=1)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    monotonic = "talkingtomachines.generative.resilience.time.monotonic"
+
+    with patch(monotonic, return_value=0):
+        circuit_breaker.record_failure(LLMClientError("Bad request"))
+        circuit_breaker.record_failure(LLMServerError("Server error"))
+        assert circuit_breaker.get_state() == "closed"
+        circuit_breaker.record_failure(LLMTimeoutError("Timeout"))
+        assert circuit_breaker.get_state() == "open"
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.before_call("gpt-4o")
+
+    with patch(monotonic, return_value=31):
+        assert circuit_breaker.get_state() == "half_open"
+        circuit_breaker.before_call("gpt-4o")
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.before_call("gpt-4o")
+        circuit_breaker.record_success()
+        assert circuit_breaker.get_state() == "closed"
+        circuit_breaker.before_call("gpt-4o")
+
+
+def test_cancelled_probe_call_releases_circuit():
+    caller = ResilientCaller(
+        RetryPolicy(max_attempts=1), failure_threshold=1, recovery_timeout=30
+    )
+    monotonic = "talkingtomachines.generative.resilience.time.monotonic"
+
+    async def fail():
+        raise LLMServerError("Server error")
+
+    async def succeed():
+        return "Response"
+
+    async def run_calls():
+        with patch(monotonic, return_value=0):
+            with pytest.raises(LLMServerError):
+                await caller.call_async("gpt-4o", fail)
+
+        with patch(monotonic, return_value=31):
+            probe_started = asyncio.Event()
+
+            async def hang():
+                probe_started.set()
+                await asyncio.sleep(10)
+
+            probe = asyncio.create_task(caller.call_async("gpt-4o", hang))
+            await probe_started.wait()
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+            # The cancelled probe lets the next call probe the circuit
+            assert await caller.call_async("gpt-4o", succeed) == "Response"
+            assert caller.get_circuit_breaker("gpt-4o").get_state() == "closed"
+
+    asyncio.run(run_calls())
+
+
+def test_classify_httpx_error():
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(529, request=request, headers={"retry-after": "3"})
+    status_error = httpx.HTTPStatusError(
+        "Overloaded", request=request, response=response
+    )
+    server_error = classify_error(status_error, "claude-3-haiku-20240307")
+    assert isinstance(server_error, LLMServerError)
+    assert server_error.retry_after == 3
+
+    assert isinstance(
+        classify_error(httpx.ConnectError("Connection refused", request=request)),
+        LLMTimeoutError,
+    )
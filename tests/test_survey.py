@@ -0,0 +1,25 @@
+from talkingtomachines.generative.survey import (
+    parse_survey_answers,
+    validate_survey_answer,
+)
+
+
+def test_parse_survey_answers():
+    assert parse_survey_answers('{"Q1": "Yes", "Q2": 3}') == {"Q1": "Yes", "Q2": 3}
+    assert parse_survey_answers('```json\n{"Q1": "Yes"}\n```') == {"Q1": "Yes"}
+    assert parse_survey_answers('Here are my answers: {"Q1": "No"}. Thanks!') == {
+        "Q1": "No"
+    }
+    assert parse_survey_answers("I would rather not say.") == {}
+    assert parse_survey_answers('{"Q1": "Yes",}') == {}
+    assert parse_survey_answers("[1, 2]") == {}
+
+
+def test_validate_survey_answer():
+    options = ["Strongly agree", "Agree", "Disagree"]
+    assert validate_survey_answer(" agree ", options) == "Agree"
+    assert validate_survey_answer("Somewhat agree", options) is None
+    assert validate_survey_answer(None, options) is None
+    assert validate_survey_answer(34) == "34"
+    assert validate_survey_answer("  ") is None
+    assert validate_survey_answer(["Agree"]) is None
@@ -1,10 +1,25 @@
 import pytest
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import Mock, patch, AsyncMock
+import gc
+import tracemalloc
+import json
+from talkingtomachines.generative.llm import (
+    LLMClientError,
+    model_providers,
+    providers,
+    register_provider,
+)
+from talkingtomachines.generative.message import Message, StringTable
+from talkingtomachines.generative.providers import ProviderBackend
+from talkingtomachines.generative.usage import create_usage
 from talkingtomachines.generative.synthetic_agent import (
     SyntheticAgent,
     DemographicInfo,
     ConversationalSyntheticAgent,
+    SurveySyntheticAgent,
 )
+from talkingtomachines.generative.llm import LLMServerError
 
 
 def test_synthetic_agent():
@@ -88,7 +103,391 @@ def test_conversational_synthetic_agent():
     assert agent_dict["role"] == "assistant"
     assert agent_dict["role_description"] == "AI assistant"
     assert agent_dict["treatment"] == "treatment"
+    assert agent_dict["usage"] == agent.get_usage() == create_usage()
 
-    # Test the respond() method
-    response = agent.respond("How can I assist you?")
-    assert isinstance(response, str)
+    # Test the respond() method with a model that no provider serves
+    with pytest.raises(LLMClientError):
+        agent.respond("How can I assist you?")
+    assert len(agent.get_message_history()) == 1
+
+
+def test_conversational_synthetic_agent_respond_async():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="gpt-4o",
+        treatment="treatment",
+    )
+
+    with patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_async",
+        new=AsyncMock(return_value="Async response"),
+    ):
+        response = asyncio.run(agent.respond_async("How can I assist you?"))
+
+    assert response == "Async response"
+    assert agent.get_message_history()[-2] == {
+        "role": "assistant",
+        "content": "How can I assist you?",
+    }
+    assert agent.get_message_history()[-1] == {
+        "role": "user",
+        "content": "Async response",
+    }
+
+
+def test_conversational_synthetic_agent_respond_llm_error():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="gpt-4o",
+        treatment="treatment",
+    )
+
+    with patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm",
+        side_effect=LLMServerError("Server error"),
+    ):
+        with pytest.raises(LLMServerError):
+            agent.respond("How can I assist you?")
+
+    assert len(agent.get_message_history()) == 1
+
+
+def test_conversational_synthetic_agent_respond_on_chunk_error():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="mock",
+        treatment="treatment",
+    )
+
+    def failing_on_chunk(chunk):
+        raise RuntimeError("Display error")
+
+    with pytest.raises(RuntimeError):
+        agent.respond("How can I assist you?", stream=True, on_chunk=failing_on_chunk)
+
+    # No question is left without a response
+    assert len(agent.get_message_history()) == 1
+
+
+def test_conversational_synthetic_agent_respond_stream():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="gpt-4o",
+        treatment="treatment",
+    )
+    received_chunks = []
+
+    with patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_stream",
+        return_value=iter(["Streamed ", "response"]),
+    ) as mock_query_llm_stream:
+        response = agent.respond(
+            "How can I assist you?",
+            stream=True,
+            stop_pattern="Bye",
+            on_chunk=received_chunks.append,
+        )
+
+    assert response == "Streamed response"
+    assert received_chunks == ["Streamed ", "response"]
+    assert mock_query_llm_stream.call_args.kwargs["stop_pattern"] == "Bye"
+    assert agent.get_message_history()[-1] == {
+        "role": "user",
+        "content": "Streamed response",
+    }
+
+
+def test_conversational_synthetic_agent_respond_samples():
+    agent = ConversationalSyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        role="assistant",
+        role_description="AI assistant",
+        model_info="mock",
+        treatment="treatment",
+    )
+
+    branches = agent.respond_samples("How old are you?", 3)
+    assert len(branches) == 3
+    assert len(agent.get_message_history()) == 1
+    assert agent.get_usage()["calls"] == 1
+    for branch in branches:
+        assert branch.get_message_history()[-2] == {
+            "role": "assistant",
+            "content": "How old are you?",
+        }
+        assert branch.get_usage()["calls"] == 0
+    assert (
+        len({branch.get_message_history()[-1]["content"] for branch in branches}) == 3
+    )
+
+    # Branches continue their conversations independently
+    branches[0].respond("Why?")
+    assert len(branches[0].get_message_history()) == 5
+    assert len(branches[1].get_message_history()) == 3
+
+    branches = asyncio.run(agent.respond_samples_async("How old are you?", 2))
+    assert len(branches) == 2
+    assert agent.get_usage()["calls"] == 2
+
+    with patch(
+        "talkingtomachines.generative.synthetic_agent.query_llm_samples",
+        side_effect=LLMServerError("Server error"),
+    ):
+        with pytest.raises(LLMServerError):
+            agent.respond_samples("How old are you?", 3)
+    assert len(agent.get_message_history()) == 1
+
+
+def measure_agent_memory(num_agents, num_turns, shared_strings=None):
+    experiment_context = "You are taking part in an ultimatum game. " * 40
+    treatment = "You are told that the other player is poor. " * 10
+    gc.collect()
+    tracemalloc.start()
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        agents = []
+        for session_id in range(num_agents):
+            # Each agent receives its own copy of the strings, as when they are read from data
+            agent = ConversationalSyntheticAgent(
+                experiment_id="123",
+                experiment_context="".join(experiment_context),
+                session_id=session_id,
+                demographic_info={"age": 30},
+                role="Proposer",
+                role_description="You propose a split of 100 dollars.",
+                model_info="mock",
+                treatment="".join(treatment),
+                shared_strings=shared_strings,
+            )
+            for turn in range(num_turns):
+                agent.update_message_history(f"Question {turn}", "assistant")
+                agent.update_message_history(f"Answer {turn}", "user")
+            agents.append(agent)
+        gc.collect()
+        allocated = sum(
+            stat.size_diff
+            for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+        )
+    finally:
+        tracemalloc.stop()
+
+    return allocated / num_agents
+
+
+def test_conversational_synthetic_agent_memory_footprint():
+    table = StringTable()
+    agents = [
+        ConversationalSyntheticAgent(
+            experiment_id="123",
+            experiment_context="context",
+            session_id=session_id,
+            demographic_info={},
+            role="Interviewer",
+            role_description="You ask the questions.",
+            model_info="mock",
+            treatment="treatment",
+            shared_strings=table,
+        )
+        for session_id in range(2)
+    ]
+    assert not hasattr(agents[0], "__dict__")
+    assert agents[0].get_system_message() is agents[1].get_system_message()
+    assert isinstance(agents[0].message_history[0], Message)
+    assert agents[0].to_dict()["message_history"] == [
+        {"role": "system", "content": agents[0].get_system_message()}
+    ]
+
+    # System messages with demographic information are unique, so they are kept out of the table
+    agents = [
+        ConversationalSyntheticAgent(
+            experiment_id="123",
+            experiment_context="context",
+            session_id=session_id,
+            demographic_info={"age": 30 + session_id},
+            role="Subject",
+            role_description="You answer the questions.",
+            model_info="mock",
+            treatment="treatment",
+            shared_strings=table,
+        )
+        for session_id in range(2)
+    ]
+    assert agents[0].get_experiment_context() is agents[1].get_experiment_context()
+    assert agents[0].get_system_message() not in table.strings
+    assert len(table) == 5
+
+    # Agents whose system messages coincide, e.g. interviewers, hold a single copy of them
+    assert measure_agent_memory(200, 10, StringTable()) < measure_agent_memory(200, 10)
+
+
+class SurveyBackend(ProviderBackend):
+    """Answers blocks of questions with JSON, giving an invalid answer to Q2, and single questions with "No"."""
+
+    def __init__(self):
+        super().__init__("survey")
+        self.requests = []
+
+    def complete(self, model_info, message_history):
+        prompt = message_history[-1]["content"]
+        self.requests.append(prompt)
+        if "JSON object" not in prompt:
+            return {"content": "no", "usage": {"total_tokens": 1}}
+
+        question_ids = [
+            line.split(":")[0] for line in prompt.split("\n\n")[-1].split("\n")
+        ]
+        answers = {
+            question_id: "Maybe" if question_id == "Q2" else "yes"
+            for question_id in question_ids
+        }
+        return {"content": json.dumps(answers), "usage": {"total_tokens": 1}}
+
+    async def complete_async(self, model_info, message_history):
+        return self.complete(model_info, message_history)
+
+
+@pytest.fixture
+def survey_backend():
+    backend = SurveyBackend()
+    register_provider(backend, ["survey-model"])
+    yield backend
+    providers.pop("survey")
+    model_providers.pop("survey-model")
+
+
+def test_survey_synthetic_agent(survey_backend):
+    questions = {f"Q{index}": f"Question {index}?" for index in range(1, 6)}
+    agent = SurveySyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        model_info="survey-model",
+        treatment="treatment",
+        questions=questions,
+        options={question_id: ["Yes", "No"] for question_id in questions},
+        block_size=3,
+    )
+    assert agent.get_question_blocks() == [["Q1", "Q2", "Q3"], ["Q4", "Q5"]]
+
+    answers = agent.answer_survey()
+    assert answers == {"Q1": "Yes", "Q2": "No", "Q3": "Yes", "Q4": "Yes", "Q5": "Yes"}
+    assert agent.get_usage()["calls"] == 3
+    assert agent.to_dict()["fallback_question_ids"] == ["Q2"]
+    assert agent.get_question_blocks() == []
+
+    # Answered questions are not asked again
+    assert agent.answer_survey() == answers
+    assert agent.get_usage()["calls"] == 3
+
+    with pytest.raises(ValueError):
+        SurveySyntheticAgent("123", "context", 1, {}, "survey-model", "", {})
+
+
+def test_survey_synthetic_agent_async_and_invalid_fallback(survey_backend):
+    agent = SurveySyntheticAgent(
+        experiment_id="123",
+        experiment_context="context",
+        session_id=1,
+        demographic_info={"age": 30},
+        model_info="survey-model",
+        treatment="treatment",
+        questions={"Q1": "Question 1?", "Q2": "Question 2?"},
+        options={"Q2": ["Agree", "Disagree"]},
+    )
+    answers = asyncio.run(agent.answer_survey_async())
+    assert answers == {"Q1": "yes", "Q2": None}
+    assert len(survey_backend.requests) == 2
+
+
+class FailingFallbackBackend(SurveyBackend):
+    """Gives invalid block answers to Q1 and Q2, fails the single question Q2 and hangs on the block of Q4."""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = True
+        self.finished_requests = []
+
+    def complete(self, model_info, message_history):
+        completion = super().complete(model_info, message_history)
+        if "JSON object" in message_history[-1]["content"]:
+            answers = json.loads(completion["content"])
+            answers.update({"Q1": "Maybe"} if "Q1" in answers else {})
+            completion["content"] = json.dumps(answers)
+        return completion
+
+    async def complete_async(self, model_info, message_history):
+        prompt = message_history[-1]["content"]
+        if self.failing and "Question 4?" in prompt:
+            await asyncio.sleep(10)
+        elif self.failing and "JSON object" not in prompt and "Question 2?" in prompt:
+            await asyncio.sleep(0.01)
+            raise LLMClientError("Bad request")
+        self.finished_requests.append(prompt)
+        return self.complete(model_info, message_history)
+
+
+def test_survey_synthetic_agent_async_failure_keeps_answers():
+    backend = FailingFallbackBackend()
+    register_provider(backend, ["survey-model"])
+    try:
+        questions = {f"Q{index}": f"Question {index}?" for index in range(1, 7)}
+        agent = SurveySyntheticAgent(
+            experiment_id="123",
+            experiment_context="context",
+            session_id=1,
+            demographic_info={"age": 30},
+            model_info="survey-model",
+            treatment="treatment",
+            questions=questions,
+            options={question_id: ["Yes", "No"] for question_id in questions},
+            block_size=3,
+        )
+        with pytest.raises(LLMClientError):
+            asyncio.run(agent.answer_survey_async())
+
+        # The hanging block is cancelled, and the fallback that succeeded is kept
+        assert not any("Question 4?" in prompt for prompt in backend.finished_requests)
+        assert agent.get_answers() == {"Q1": "No", "Q3": "Yes"}
+        assert agent.to_dict()["fallback_question_ids"] == ["Q1"]
+        usage = agent.get_usage()["calls"]
+
+        # On resume, the failed fallback is asked again and only listed once
+        backend.failing = False
+        answers = asyncio.run(agent.answer_survey_async())
+        assert answers == {
+            "Q1": "No",
+            "Q2": "No",
+            "Q3": "Yes",
+            "Q4": "Yes",
+            "Q5": "Yes",
+            "Q6": "Yes",
+        }
+        assert agent.to_dict()["fallback_question_ids"] == ["Q1", "Q2"]
+        assert agent.get_usage()["calls"] == usage + 3
+    finally:
+        providers.pop("survey")
+        model_providers.pop("survey-model")
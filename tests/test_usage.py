@@ -0,0 +1,103 @@
+import pytest
+from talkingtomachines.generative.usage import (
+    MODEL_PRICES,
+    add_usage,
+    create_usage,
+    get_cache_hit_rate,
+    get_model_usage,
+    estimate_cost,
+    set_model_price,
+    summarize_usage,
+)
+
+
+def test_add_usage():
+    usage = create_usage()
+    add_usage(usage, {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+    add_usage(
+        usage,
+        {
+            "prompt_tokens": 20,
+            "completion_tokens": 5,
+            "cached_tokens": 16,
+            "total_tokens": 25,
+        },
+    )
+    add_usage(usage, None)
+    assert usage == {
+        "calls": 2,
+        "prompt_tokens": 30,
+        "completion_tokens": 10,
+        "cached_tokens": 16,
+        "total_tokens": 40,
+    }
+
+    total_usage = create_usage()
+    add_usage(total_usage, usage)
+    assert total_usage["calls"] == 2
+
+
+def test_estimate_cost():
+    usage = {"prompt_tokens": 1_000_000, "cached_tokens": 400_000}
+    usage["completion_tokens"] = 100_000
+    assert estimate_cost("gpt-4o", usage) == pytest.approx(
+        0.6 * 2.50 + 0.4 * 1.25 + 0.1 * 10.00
+    )
+    assert estimate_cost("unknown-model", usage) is None
+
+    set_model_price("custom-model", prompt=1.0, completion=2.0)
+    try:
+        assert estimate_cost("custom-model", usage) == pytest.approx(1.2)
+        with pytest.raises(ValueError):
+            set_model_price("custom-model", prompt=-1.0, completion=2.0)
+    finally:
+        MODEL_PRICES.pop("custom-model")
+
+
+def test_usage_by_model():
+    usage = create_usage()
+    add_usage(usage, {"prompt_tokens": 1_000_000, "total_tokens": 1_000_000})
+    add_usage(
+        get_model_usage(usage, "gpt-4o-mini"),
+        {"prompt_tokens": 1_000_000, "total_tokens": 1_000_000},
+    )
+    assert usage["calls"] == 1 and usage["prompt_tokens"] == 1_000_000
+    assert estimate_cost("gpt-4o", usage) == pytest.approx(2.50 + 0.15)
+
+    total_usage = create_usage()
+    add_usage(total_usage, usage)
+    add_usage(total_usage, usage)
+    assert total_usage["by_model"]["gpt-4o-mini"]["calls"] == 2
+    assert summarize_usage("gpt-4o", [usage, usage])["cost"] == pytest.approx(5.30)
+
+    get_model_usage(usage, "unknown-model")["prompt_tokens"] = 1
+    assert estimate_cost("gpt-4o", usage) is None
+
+
+def test_summarize_usage():
+    summary = summarize_usage(
+        "gpt-4o-mini",
+        [
+            {"calls": 2, "prompt_tokens": 1_000_000, "total_tokens": 1_000_000},
+            None,
+            {"completion_tokens": 1_000_000, "total_tokens": 1_000_000},
+        ],
+    )
+    assert summary["calls"] == 3
+    assert summary["total_tokens"] == 2_000_000
+    assert summary["cost"] == pytest.approx(0.75)
+    assert summarize_usage("unknown-model", [])["cost"] is None
+
+
+def test_get_cache_hit_rate():
+    assert get_cache_hit_rate(create_usage()) is None
+    assert get_cache_hit_rate({"prompt_tokens": 200, "cached_tokens": 150}) == 0.75
+
+    summary = summarize_usage(
+        "gpt-4o-mini",
+        [
+            {"prompt_tokens": 100, "cached_tokens": 0},
+            {"prompt_tokens": 300, "cached_tokens": 200},
+        ],
+    )
+    assert summary["cache_hit_rate"] == 0.5
@@ -0,0 +1,151 @@
+import time
+import pytest
+import pandas as pd
+from talkingtomachines.management.experiment import (
+    AItoAIConversationalExperiment,
+    AItoAIInterviewExperiment,
+    load_experiment_from_config,
+)
+from talkingtomachines.management.work_queue import WorkQueue, run_worker
+
+
+@pytest.fixture
+def work_queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.db"), lease_duration=60)
+
+
+def create_experiment(model_info="mock", num_sessions=3):
+    return AItoAIConversationalExperiment(
+        model_info=model_info,
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame(
+            {"ID": [1, 2, 3, 4, 5, 6], "Age": [25, 30, 35, 40, 45, 50]}
+        ),
+        agent_roles={"agent1": "Role 1", "agent2": "Role 2"},
+        num_agents_per_session=2,
+        num_sessions=num_sessions,
+        max_conversation_length=5,
+        treatments={"treatment1": "value1", "treatment2": "value2"},
+    )
+
+
+def test_work_queue_invalid_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        WorkQueue(str(tmp_path / "queue.db"), lease_duration=0)
+    with pytest.raises(ValueError):
+        WorkQueue(str(tmp_path / "queue.db"), max_attempts=0)
+    with pytest.raises(ValueError):
+        WorkQueue(str(tmp_path / "queue.db")).load_config("unknown")
+
+
+def test_work_queue_claim_and_complete(work_queue):
+    assert work_queue.enqueue("exp", {0: {"session_id": 0}, 1: {"session_id": 1}}) == 2
+    assert work_queue.enqueue("exp", {0: {"session_id": 0}}) == 0
+
+    assert work_queue.claim("exp", "worker1") == (0, {"session_id": 0})
+    assert work_queue.claim("exp", "worker2") == (1, {"session_id": 1})
+    assert work_queue.claim("exp", "worker3") is None
+    assert work_queue.get_progress("exp") == {
+        "pending": 0,
+        "leased": 2,
+        "done": 0,
+        "failed": 0,
+    }
+
+    assert work_queue.renew("exp", 0, "worker1")
+    assert not work_queue.renew("exp", 0, "worker2")
+    assert work_queue.complete("exp", 0, "worker1", {"status": "completed"})
+    assert not work_queue.complete("exp", 0, "worker2", {"status": "completed"})
+
+    # A released task is claimed again
+    work_queue.release("exp", 1, "worker2")
+    assert work_queue.claim("exp", "worker3") == (1, {"session_id": 1})
+    assert work_queue.get_results("exp") == {0: {"status": "completed"}}
+
+
+def test_work_queue_reclaims_expired_leases(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / "queue.db"), lease_duration=0.05)
+    work_queue.enqueue("exp", {0: {"session_id": 0}})
+
+    assert work_queue.claim("exp", "worker1") == (0, {"session_id": 0})
+    assert work_queue.claim("exp", "worker2") is None
+    time.sleep(0.1)
+
+    # The lease of the first worker expired, e.g. because it died
+    assert work_queue.claim("exp", "worker2") == (0, {"session_id": 0})
+    assert not work_queue.renew("exp", 0, "worker1")
+
+    time.sleep(0.1)
+    assert work_queue.claim("exp", "worker3") == (0, {"session_id": 0})
+    time.sleep(0.1)
+
+    # The task is marked as failed after max_attempts claims without a result
+    assert work_queue.claim("exp", "worker4") is None
+    assert work_queue.get_progress("exp")["failed"] == 1
+
+
+def test_experiment_config_round_trip():
+    experiment = AItoAIInterviewExperiment(
+        model_info="mock",
+        experiment_context="Testing",
+        agent_demographics=pd.DataFrame({"ID": [1, 2, 3, 4], "Age": [25, 30, 35, 40]}),
+        agent_roles={"Interviewer": "Ask questions", "Subject": "Answer questions"},
+        num_sessions=2,
+        treatments={"treatment1": "value1"},
+        prompt_layout="cache_friendly",
+    )
+    config = experiment.to_config()
+    rebuilt_experiment = load_experiment_from_config(config)
+
+    assert isinstance(rebuilt_experiment, AItoAIInterviewExperiment)
+    assert rebuilt_experiment.get_experiment_id() == experiment.get_experiment_id()
+    assert rebuilt_experiment.to_config() == config
+
+    with pytest.raises(ValueError):
+        load_experiment_from_config({**config, "experiment_type": "Unknown"})
+
+
+def test_run_worker_and_merge_results(work_queue, mocker):
+    experiment = create_experiment()
+    mocker.patch.object(AItoAIConversationalExperiment, "save_experiment")
+    assert experiment.enqueue_sessions(work_queue) == 3
+
+    # Two workers share the sessions of the experiment
+    assert run_worker(work_queue, experiment.get_experiment_id(), max_sessions=2) == 2
+    assert work_queue.get_progress(experiment.get_experiment_id())["pending"] == 1
+    assert run_worker(work_queue, experiment.get_experiment_id()) == 1
+
+    result = experiment.merge_results(work_queue)
+    assert list(result["sessions"]) == experiment.get_session_id_list()
+    for session_id, session_info in result["sessions"].items():
+        assert session_info["status"] == "completed"
+        assert session_info["agents_demographic"] == (
+            experiment.get_agent_assignment()[session_id]
+        )
+        assert (
+            session_info["treatment"]
+            == experiment.get_treatments()[
+                experiment.get_treatment_assignment()[session_id]
+            ]
+        )
+    assert result["usage"]["total"]["calls"] == 15
+
+    # The results can also be merged by another process that only has the queue
+    rebuilt_experiment = load_experiment_from_config(
+        work_queue.load_config(experiment.get_experiment_id())
+    )
+    assert rebuilt_experiment.merge_results(work_queue) == result
+
+
+def test_run_worker_releases_task_on_error(work_queue, mocker):
+    experiment = create_experiment(num_sessions=1)
+    experiment.enqueue_sessions(work_queue)
+    mocker.patch.object(
+        AItoAIConversationalExperiment,
+        "run_session_spec",
+        side_effect=RuntimeError("Worker error"),
+    )
+
+    with pytest.raises(RuntimeError):
+        run_worker(work_queue, experiment.get_experiment_id())
+    assert work_queue.get_progress(experiment.get_experiment_id())["pending"] == 1